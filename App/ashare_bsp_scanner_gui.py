@@ -49,6 +49,7 @@ import pandas as pd
 from Chan import CChan
 from ChanConfig import CChanConfig
 from Common.CEnum import AUTYPE, DATA_SRC, KL_TYPE
+from Scanner.ChanScanner import CChanScanner
 
 
 def get_tradable_stocks():
@@ -106,12 +107,12 @@ class ScanThread(QThread):
     """
     批量扫描股票的后台线程
 
-    在独立线程中遍历股票列表，对每只股票进行缠论分析，
-    检测最近3天内是否出现买点。
+    通过 CChanScanner 用进程池并行计算每只股票的缠论结果，
+    在本线程中按完成顺序检测最近3天内是否出现买点。
 
     Signals:
         progress: (int, int, str) 当前进度、总数、当前股票信息
-        found_signal: (dict) 发现买点时发出，包含股票详情和 CChan 对象
+        found_signal: (dict) 发现买点时发出，包含股票详情
         finished: (int, int) 扫描完成，返回成功数和失败数
         log_signal: (str) 日志消息
     """
@@ -120,7 +121,7 @@ class ScanThread(QThread):
     finished = pyqtSignal(int, int)
     log_signal = pyqtSignal(str)
 
-    def __init__(self, stock_list, config, days=365):
+    def __init__(self, stock_list, config, days=365, max_workers=None):
         """
         初始化扫描线程
 
@@ -128,20 +129,23 @@ class ScanThread(QThread):
             stock_list: pd.DataFrame, 待扫描的股票列表
             config: CChanConfig, 缠论配置
             days: int, 获取多少天的历史数据，默认365天
+            max_workers: int, 扫描进程数，默认为CPU核数，<=1时不开子进程
         """
         super().__init__()
         self.stock_list = stock_list
         self.config = config
         self.days = days
-        self.is_running = True
+        self.max_workers = max_workers
+        self.scanner = None
 
     def stop(self):
-        """停止扫描，设置标志位让 run() 循环退出"""
-        self.is_running = False
+        """停止扫描，未开始计算的股票会被取消"""
+        if self.scanner:
+            self.scanner.stop()
 
     def run(self):
         """
-        线程主函数，遍历股票列表进行缠论分析
+        线程主函数，流式接收每只股票的扫描结果
 
         扫描逻辑:
             1. 跳过无K线数据的股票
@@ -152,72 +156,67 @@ class ScanThread(QThread):
         begin_time = (datetime.now() - timedelta(days=self.days)).strftime("%Y-%m-%d")
         end_time = datetime.now().strftime("%Y-%m-%d")
         total = len(self.stock_list)
+        rows = self.stock_list.to_dict('records')
         success_count = 0
         fail_count = 0
 
-        for idx, row in self.stock_list.iterrows():
-            if not self.is_running:
-                break
-
+        self.scanner = CChanScanner(
+            [row['代码'] for row in rows],
+            self.config,
+            data_src=DATA_SRC.AKSHARE,
+            lv_list=[KL_TYPE.K_DAY],
+            begin_time=begin_time,
+            end_time=end_time,
+            autype=AUTYPE.QFQ,
+            max_workers=self.max_workers,
+        )
+        for res in self.scanner.scan_iter():
+            row = rows[res.idx]
             code = row['代码']
             name = row['名称']
-            self.progress.emit(idx + 1, total, f"{code} {name}")
-            self.log_signal.emit(f"🔍 扫描 {code} {name}...")
-
-            try:
-                chan = CChan(
-                    code=code,
-                    begin_time=begin_time,
-                    end_time=end_time,
-                    data_src=DATA_SRC.AKSHARE,
-                    lv_list=[KL_TYPE.K_DAY],
-                    config=self.config,
-                    autype=AUTYPE.QFQ,
-                )
-
-                # 检查最近15天是否有数据
-                if len(chan[0]) == 0:
-                    fail_count += 1
-                    self.log_signal.emit(f"⏭️ {code} {name}: 无K线数据")
-                    continue
-                last_klu = chan[0][-1][-1]
-                last_time = last_klu.time
-                last_date = datetime(last_time.year, last_time.month, last_time.day)
-                if (datetime.now() - last_date).days > 15:
-                    fail_count += 1
-                    self.log_signal.emit(f"⏸️ {code} {name}: 停牌超过15天")
-                    continue
-
-                success_count += 1
-
-                # 检查是否有买点（只找最近3天内出现的买点）
-                bsp_list = chan.get_latest_bsp(number=0)
-                cutoff_date = datetime.now() - timedelta(days=3)
-                buy_points = [
-                    bsp for bsp in bsp_list
-                    if bsp.is_buy and datetime(bsp.klu.time.year, bsp.klu.time.month, bsp.klu.time.day) >= cutoff_date
-                ]
-
-                if buy_points:
-                    # 获取最近的买点
-                    latest_buy = buy_points[0]
-                    self.log_signal.emit(f"✅ {code} {name}: 发现买点 {latest_buy.type2str()}")
-                    self.found_signal.emit({
-                        'code': code,
-                        'name': name,
-                        'price': row['最新价'],
-                        'change': row['涨跌幅'],
-                        'bsp_type': latest_buy.type2str(),
-                        'bsp_time': str(latest_buy.klu.time),
-                        'chan': chan,
-                    })
-                else:
-                    self.log_signal.emit(f"➖ {code} {name}: 无近期买点")
-            except Exception as e:
+            self.progress.emit(self.scanner.finish_cnt, total, f"{code} {name} ({self.scanner.symbols_per_sec:.1f}只/秒)")
+
+            if not res.ok:
+                fail_count += 1
+                self.log_signal.emit(f"❌ {code} {name}: {res.error[:50]}")
+                continue
+
+            # 检查最近15天是否有数据
+            if res.last_time is None:
                 fail_count += 1
-                self.log_signal.emit(f"❌ {code} {name}: {str(e)[:50]}")
+                self.log_signal.emit(f"⏭️ {code} {name}: 无K线数据")
+                continue
+            last_date = datetime(res.last_time.year, res.last_time.month, res.last_time.day)
+            if (datetime.now() - last_date).days > 15:
+                fail_count += 1
+                self.log_signal.emit(f"⏸️ {code} {name}: 停牌超过15天")
                 continue
 
+            success_count += 1
+
+            # 检查是否有买点（只找最近3天内出现的买点）
+            cutoff_date = datetime.now() - timedelta(days=3)
+            buy_points = [
+                bsp for bsp in res.bsp_lst
+                if bsp.is_buy and datetime(bsp.time.year, bsp.time.month, bsp.time.day) >= cutoff_date
+            ]
+
+            if buy_points:
+                # 获取最近的买点
+                latest_buy = buy_points[0]
+                self.log_signal.emit(f"✅ {code} {name}: 发现买点 {latest_buy.type}")
+                self.found_signal.emit({
+                    'code': code,
+                    'name': name,
+                    'price': row['最新价'],
+                    'change': row['涨跌幅'],
+                    'bsp_type': latest_buy.type,
+                    'bsp_time': str(latest_buy.time),
+                })
+            else:
+                self.log_signal.emit(f"➖ {code} {name}: 无近期买点")
+
+        self.log_signal.emit(f"⏱️ 扫描{self.scanner.finish_cnt}只，耗时{self.scanner.elapsed:.1f}秒，{self.scanner.symbols_per_sec:.1f}只/秒")
         self.finished.emit(success_count, fail_count)
 
 
@@ -312,7 +311,6 @@ class AkshareGUI(QMainWindow):
         self.chan = None  # 当前分析的 CChan 对象
         self.scan_thread = None  # 批量扫描线程
         self.analysis_thread = None  # 单股分析线程
-        self.stock_cache = {}  # 缓存已分析的股票 {code: CChan}
         self.init_ui()
 
     def init_ui(self):
@@ -552,7 +550,6 @@ class AkshareGUI(QMainWindow):
         self.stop_btn.setEnabled(True)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
-        self.stock_cache.clear()
 
         self.statusBar.showMessage('正在获取股票列表...')
         QApplication.processEvents()
@@ -598,7 +595,7 @@ class AkshareGUI(QMainWindow):
         发现买点的回调函数
 
         Args:
-            data: dict, 包含股票代码、名称、价格、买点类型、CChan对象等信息
+            data: dict, 包含股票代码、名称、价格、涨跌幅、买点类型和时间
         """
         row = self.stock_table.rowCount()
         self.stock_table.insertRow(row)
@@ -608,9 +605,6 @@ class AkshareGUI(QMainWindow):
         self.stock_table.setItem(row, 3, QTableWidgetItem(f"{data['change']:.2f}%"))
         self.stock_table.setItem(row, 4, QTableWidgetItem(f"{data['bsp_type']} ({data['bsp_time']})"))
 
-        # 缓存 chan 对象
-        self.stock_cache[data['code']] = data['chan']
-
     def on_scan_finished(self, success_count, fail_count):
         """扫描完成"""
         self.scan_btn.setEnabled(True)
@@ -622,16 +616,9 @@ class AkshareGUI(QMainWindow):
 
     def on_stock_clicked(self, row, col):
         """点击股票列表"""
+        # 扫描在子进程中完成，chan 对象不回传，点击时按当前配置重新分析
         code = self.stock_table.item(row, 0).text()
-        name = self.stock_table.item(row, 1).text()
-
-        if code in self.stock_cache:
-            self.chan = self.stock_cache[code]
-            self.plot_chart()
-            self.statusBar.showMessage(f'显示: {code} {name}')
-        else:
-            # 重新分析
-            self.analyze_stock(code)
+        self.analyze_stock(code)
 
     def analyze_single(self):
         """分析单只股票"""
@@ -713,7 +700,6 @@ class AkshareGUI(QMainWindow):
     def clear_stock_list(self):
         """清空股票列表"""
         self.stock_table.setRowCount(0)
-        self.stock_cache.clear()
         self.statusBar.showMessage('列表已清空')
 
 
@@ -0,0 +1,278 @@
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from BuySellPoint.BS_Point import CBS_Point
+from Chan import CChan
+from Common.CEnum import BSP_TYPE, FX_TYPE
+from Common.ChanException import CChanException, ErrCode
+from Common.CTime import CTime
+from KLine.KLine_List import CKLine_List
+
+"""
+事件驱动的买卖点回测：一次step_load(或者每次append_bar之后调用on_step)，同时评估很多组开平仓规则和仓位参数
+每一步只看最新的买点和最新的卖点，产生两种信号：
+    bsp: 买卖点第一次出现
+    fx: 买卖点所在的合并K线成为倒数第二根，并且已经形成底分型(买点)/顶分型(卖点)，同Debug/strategy_demo.py
+规则按(信号类型, 买卖点类型集合)分组，有信号时只检查类型匹配的规则；止损/止盈/最长持仓用numpy对所有规则一次比较
+"""
+
+CONFIRM_LST = ("bsp", "fx")
+BspTypes = Union[str, Iterable[BSP_TYPE]]
+
+
+def parse_bsp_types(types: BspTypes) -> FrozenSet[BSP_TYPE]:
+    # "1,1p,2" 或者 BSP_TYPE列表
+    if isinstance(types, str):
+        return frozenset(BSP_TYPE(_type.strip()) for _type in types.split(",") if _type.strip())
+    return frozenset(types)
+
+
+class CBtRule:
+    def __init__(
+        self,
+        name: str,
+        entry_types: BspTypes = "1,1p",
+        exit_types: BspTypes = "1,1p",
+        entry_confirm: str = "fx",
+        exit_confirm: str = "fx",
+        stop_loss: Optional[float] = None,
+        take_profit: Optional[float] = None,
+        max_hold: Optional[int] = None,
+        size: float = 1.0,
+        fee: float = 0.0,
+        entry_filter: Optional[Callable[[CChan, CBS_Point], bool]] = None,
+    ):
+        if entry_confirm not in CONFIRM_LST or exit_confirm not in CONFIRM_LST:
+            raise CChanException(f"unknown confirm = {entry_confirm}/{exit_confirm}, should be one of {CONFIRM_LST}", ErrCode.PARA_ERROR)
+        if not 0 < size <= 1:
+            raise CChanException(f"size should be in (0, 1], got {size}", ErrCode.PARA_ERROR)
+        self.name = name
+        self.entry_types = parse_bsp_types(entry_types)  # 买点有其中任一类型时开仓
+        self.exit_types = parse_bsp_types(exit_types)  # 卖点有其中任一类型时平仓，为空则只按止损止盈/最长持仓平仓
+        self.entry_confirm = entry_confirm
+        self.exit_confirm = exit_confirm
+        self.stop_loss = stop_loss  # 相对开仓价跌了多少比例止损，如0.05
+        self.take_profit = take_profit  # 相对开仓价涨了多少比例止盈
+        self.max_hold = max_hold  # 最多持有多少步
+        self.size = size  # 开仓用当前资金的比例
+        self.fee = fee  # 单边费率
+        self.entry_filter = entry_filter  # 额外的开仓条件，只在类型匹配的买点信号出现时调用
+
+
+class CBtTrade:
+    def __init__(self, entry_step: int, entry_time: CTime, entry_price: float, entry_type: str, qty: float, cost: float):
+        self.entry_step = entry_step
+        self.entry_time = entry_time
+        self.entry_price = entry_price
+        self.entry_type = entry_type
+        self.qty = qty
+        self.cost = cost  # 开仓占用的资金(含手续费)
+        self.exit_step: Optional[int] = None
+        self.exit_time: Optional[CTime] = None
+        self.exit_price: Optional[float] = None
+        self.exit_reason: Optional[str] = None  # bsp/stop_loss/take_profit/max_hold
+        self.proceeds = 0.0  # 平仓收回的资金(扣除手续费)
+
+    @property
+    def profit(self) -> float:
+        return self.proceeds - self.cost
+
+    @property
+    def ret(self) -> float:
+        return self.profit / self.cost
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "entry_time": str(self.entry_time),
+            "entry_price": self.entry_price,
+            "entry_type": self.entry_type,
+            "qty": self.qty,
+            "exit_time": str(self.exit_time) if self.exit_time is not None else None,
+            "exit_price": self.exit_price,
+            "exit_reason": self.exit_reason,
+            "profit": self.profit if self.exit_step is not None else None,
+            "ret": self.ret if self.exit_step is not None else None,
+        }
+
+
+def group_rule(rule_lst: List[CBtRule], confirm_attr: str, types_attr: str) -> Dict[str, List[Tuple[FrozenSet[BSP_TYPE], np.ndarray]]]:
+    # {信号类型: [(买卖点类型集合, 规则下标数组)]}
+    group: Dict[Tuple[str, FrozenSet[BSP_TYPE]], List[int]] = {}
+    for rule_idx, rule in enumerate(rule_lst):
+        if getattr(rule, types_attr):
+            group.setdefault((getattr(rule, confirm_attr), getattr(rule, types_attr)), []).append(rule_idx)
+    res: Dict[str, List[Tuple[FrozenSet[BSP_TYPE], np.ndarray]]] = {confirm: [] for confirm in CONFIRM_LST}
+    for (confirm, types), idx_lst in group.items():
+        res[confirm].append((types, np.array(idx_lst, dtype=np.int64)))
+    return res
+
+
+class CChanBacktest:
+    """
+    多规则回测：规则之间互不影响，每个规则同一时间最多持有一笔多仓，按每一步最后一根K线的收盘价成交；
+    资金曲线只记录每个规则现金和持仓变化的位置，需要时再按收盘价展开
+    """
+    def __init__(self, rule_lst: Iterable[CBtRule], lv_idx: int = 0, init_cash: float = 1.0):
+        self.rule_lst = list(rule_lst)
+        self.lv_idx = lv_idx
+        self.init_cash = init_cash
+        rule_cnt = len(self.rule_lst)
+        self.cash = np.full(rule_cnt, init_cash, dtype=np.float64)
+        self.qty = np.zeros(rule_cnt, dtype=np.float64)
+        # 持仓时的平仓线，空仓时为不可能触发的值
+        self.stop_price = np.full(rule_cnt, -np.inf)
+        self.take_price = np.full(rule_cnt, np.inf)
+        self.expire_step = np.full(rule_cnt, np.iinfo(np.int64).max, dtype=np.int64)
+        self.hold_cnt = 0
+
+        self.entry_group = group_rule(self.rule_lst, "entry_confirm", "entry_types")
+        self.exit_group = group_rule(self.rule_lst, "exit_confirm", "exit_types")
+        self.used_confirm = {rule.entry_confirm for rule in self.rule_lst} | {rule.exit_confirm for rule in self.rule_lst}
+        self.seen_bsp: Dict[Tuple[str, bool], set] = {(confirm, is_buy): set() for confirm in CONFIRM_LST for is_buy in (True, False)}
+
+        self.open_trade: List[Optional[CBtTrade]] = [None for _ in self.rule_lst]
+        self.trade_lst: List[List[CBtTrade]] = [[] for _ in self.rule_lst]
+        self.change_lst: List[List[Tuple[int, float, float]]] = [[(0, init_cash, 0.0)] for _ in self.rule_lst]  # (step, 现金, 持仓)
+        self.close_lst: List[float] = []
+        self.time_lst: List[CTime] = []
+        self.step_idx = -1
+
+    def run(self, chan: CChan) -> 'CChanBacktest':
+        if not chan.conf.trigger_step:
+            raise CChanException("CChanBacktest.run需要trigger_step=True", ErrCode.PARA_ERROR)
+        for _ in chan.step_load():
+            self.on_step(chan)
+        return self
+
+    def get_signal(self, kl_list: CKLine_List) -> Dict[Tuple[str, bool], CBS_Point]:
+        res: Dict[Tuple[str, bool], CBS_Point] = {}
+        for is_buy in (True, False):
+            bsp_lst = kl_list.bs_point_lst.get_latest_bsp(1, is_buy=is_buy)
+            if not bsp_lst:
+                continue
+            bsp = bsp_lst[0]
+            key = bsp.klu.idx
+            if "bsp" in self.used_confirm and key not in self.seen_bsp["bsp", is_buy]:
+                self.seen_bsp["bsp", is_buy].add(key)
+                res["bsp", is_buy] = bsp
+            if "fx" in self.used_confirm and len(kl_list) >= 2 and key not in self.seen_bsp["fx", is_buy]:
+                klc = kl_list[-2]
+                if bsp.klu.klc.idx == klc.idx and klc.fx == (FX_TYPE.BOTTOM if is_buy else FX_TYPE.TOP):
+                    self.seen_bsp["fx", is_buy].add(key)
+                    res["fx", is_buy] = bsp
+        return res
+
+    def on_step(self, chan: CChan):
+        kl_list = chan[self.lv_idx]
+        if len(kl_list) == 0:
+            return
+        klu = kl_list[-1][-1]
+        self.step_idx += 1
+        self.close_lst.append(klu.close)
+        self.time_lst.append(klu.time)
+        signal = self.get_signal(kl_list)
+        if self.hold_cnt > 0:
+            self.check_exit(klu.close, klu.time, signal)
+        for (confirm, is_buy), bsp in signal.items():
+            if not is_buy:
+                continue
+            bsp_types = set(bsp.type)
+            for types, idx_arr in self.entry_group[confirm]:
+                if types.isdisjoint(bsp_types):
+                    continue
+                for rule_idx in idx_arr[self.qty[idx_arr] == 0].tolist():
+                    entry_filter = self.rule_lst[rule_idx].entry_filter
+                    if entry_filter is None or entry_filter(chan, bsp):
+                        self.open_position(rule_idx, klu.close, klu.time, bsp.type2str())
+
+    def check_exit(self, close: float, time: CTime, signal: Dict[Tuple[str, bool], CBS_Point]):
+        reason: Dict[int, str] = {}
+        for (confirm, is_buy), bsp in signal.items():
+            if is_buy:
+                continue
+            bsp_types = set(bsp.type)
+            for types, idx_arr in self.exit_group[confirm]:
+                if not types.isdisjoint(bsp_types):
+                    for rule_idx in idx_arr[self.qty[idx_arr] > 0].tolist():
+                        reason[rule_idx] = "bsp"
+        hit = (close <= self.stop_price) | (close >= self.take_price) | (self.step_idx >= self.expire_step)
+        if hit.any():
+            for rule_idx in np.flatnonzero(hit).tolist():
+                if close <= self.stop_price[rule_idx]:
+                    reason[rule_idx] = "stop_loss"
+                elif close >= self.take_price[rule_idx]:
+                    reason[rule_idx] = "take_profit"
+                else:
+                    reason.setdefault(rule_idx, "max_hold")
+        for rule_idx, exit_reason in reason.items():
+            self.close_position(rule_idx, close, time, exit_reason)
+
+    def open_position(self, rule_idx: int, price: float, time: CTime, entry_type: str):
+        rule = self.rule_lst[rule_idx]
+        cost = float(self.cash[rule_idx]) * rule.size
+        qty = cost * (1 - rule.fee) / price
+        self.cash[rule_idx] -= cost
+        self.qty[rule_idx] = qty
+        if rule.stop_loss is not None:
+            self.stop_price[rule_idx] = price * (1 - rule.stop_loss)
+        if rule.take_profit is not None:
+            self.take_price[rule_idx] = price * (1 + rule.take_profit)
+        if rule.max_hold is not None:
+            self.expire_step[rule_idx] = self.step_idx + rule.max_hold
+        self.hold_cnt += 1
+        self.open_trade[rule_idx] = CBtTrade(self.step_idx, time, price, entry_type, qty, cost)
+        self.change_lst[rule_idx].append((self.step_idx, float(self.cash[rule_idx]), qty))
+
+    def close_position(self, rule_idx: int, price: float, time: CTime, reason: str):
+        trade = self.open_trade[rule_idx]
+        assert trade is not None
+        proceeds = float(self.qty[rule_idx]) * price * (1 - self.rule_lst[rule_idx].fee)
+        self.cash[rule_idx] += proceeds
+        self.qty[rule_idx] = 0.0
+        self.stop_price[rule_idx] = -np.inf
+        self.take_price[rule_idx] = np.inf
+        self.expire_step[rule_idx] = np.iinfo(np.int64).max
+        self.hold_cnt -= 1
+        trade.exit_step, trade.exit_time, trade.exit_price, trade.exit_reason, trade.proceeds = self.step_idx, time, price, reason, proceeds
+        self.trade_lst[rule_idx].append(trade)
+        self.open_trade[rule_idx] = None
+        self.change_lst[rule_idx].append((self.step_idx, float(self.cash[rule_idx]), 0.0))
+
+    def get_rule_idx(self, rule: Union[int, str]) -> int:
+        if isinstance(rule, int):
+            return rule
+        for rule_idx, _rule in enumerate(self.rule_lst):
+            if _rule.name == rule:
+                return rule_idx
+        raise CChanException(f"rule {rule} not found", ErrCode.COMMON_ERROR)
+
+    def equity_curve(self, rule: Union[int, str]) -> np.ndarray:
+        # 每一步收盘时的权益
+        change_lst = self.change_lst[self.get_rule_idx(rule)]
+        step_arr = np.array([item[0] for item in change_lst], dtype=np.int64)
+        pos = np.searchsorted(step_arr, np.arange(len(self.close_lst)), side="right") - 1
+        cash_arr = np.array([item[1] for item in change_lst])
+        qty_arr = np.array([item[2] for item in change_lst])
+        return cash_arr[pos] + qty_arr[pos] * np.array(self.close_lst, dtype=np.float64)
+
+    def trades(self, rule: Union[int, str], include_open: bool = False) -> List[CBtTrade]:
+        rule_idx = self.get_rule_idx(rule)
+        open_trade = self.open_trade[rule_idx]
+        return self.trade_lst[rule_idx] + ([open_trade] if include_open and open_trade is not None else [])
+
+    def stat(self) -> List[Dict[str, Any]]:
+        res = []
+        for rule_idx, rule in enumerate(self.rule_lst):
+            equity = self.equity_curve(rule_idx)
+            trade_lst = self.trade_lst[rule_idx]
+            peak = np.maximum.accumulate(equity) if len(equity) else equity
+            res.append({
+                "name": rule.name,
+                "trades": len(trade_lst),
+                "win_rate": sum(1 for trade in trade_lst if trade.profit > 0) / len(trade_lst) if trade_lst else None,
+                "total_return": float(equity[-1] / self.init_cash - 1) if len(equity) else 0.0,
+                "max_drawdown": float(np.max(1 - equity / peak)) if len(equity) else 0.0,
+                "holding": self.open_trade[rule_idx] is not None,
+            })
+        return res
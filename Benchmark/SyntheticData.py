@@ -0,0 +1,197 @@
+import datetime
+import random
+import zlib
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, KL_TYPE
+from Common.CTime import CTime
+from DataAPI.CommonStockAPI import CCommonStockApi
+from KLine.KLine_Unit import CKLine_Unit
+
+KL_TYPE_MINUTES = {
+    KL_TYPE.K_1M: 1,
+    KL_TYPE.K_3M: 3,
+    KL_TYPE.K_5M: 5,
+    KL_TYPE.K_15M: 15,
+    KL_TYPE.K_30M: 30,
+    KL_TYPE.K_60M: 60,
+    KL_TYPE.K_4H: 240,
+}
+
+
+def period_key(kl_type: KL_TYPE, day: datetime.date):
+    # 天级别及以上，同一根K线内的交易日key相同
+    if kl_type == KL_TYPE.K_DAY:
+        return day
+    if kl_type == KL_TYPE.K_WEEK:
+        return day.isocalendar()[:2]
+    if kl_type == KL_TYPE.K_MON:
+        return day.year, day.month
+    if kl_type == KL_TYPE.K_QUARTER:
+        return day.year, (day.month - 1) // 3
+    if kl_type == KL_TYPE.K_YEAR:
+        return day.year
+    raise ValueError(f"unsupported kl_type: {kl_type}")
+
+
+def gen_time_lst(n: int, kl_type: KL_TYPE, begin: datetime.datetime) -> List[CTime]:
+    # 分钟级别连续递增(跨过0点，所以不能用auto)；天级别及以上跳过周末，时间取周期内最后一个交易日
+    res: List[CTime] = []
+    if kl_type in KL_TYPE_MINUTES:
+        step = np.timedelta64(KL_TYPE_MINUTES[kl_type], "m")
+        return CTime.from_datetime64(np.datetime64(begin, "m") + step * np.arange(1, n + 1), auto=False)
+    day = begin.date()
+    last_day, last_key = None, None
+    while len(res) < n:
+        if day.weekday() < 5:
+            key = period_key(kl_type, day)
+            if last_day is not None and key != last_key:
+                res.append(CTime(last_day.year, last_day.month, last_day.day, 0, 0))
+            last_day, last_key = day, key
+        day += datetime.timedelta(days=1)
+    return res
+
+
+def gen_random_walk_klu(
+    n: int,
+    kl_type: KL_TYPE = KL_TYPE.K_1M,
+    seed: int = 0,
+    begin: datetime.datetime = datetime.datetime(2015, 1, 5, 9, 30),
+    price: float = 100.0,
+    volatility: float = 0.004,
+    new_klu: Callable[..., CKLine_Unit] = CKLine_Unit,
+) -> Iterable[CKLine_Unit]:
+    # 可复现的随机游走OHLCV，和数据源一样逐根生成CKLine_Unit(new_klu传数据源的new_klu时按数据源的设置生成)
+    rnd = random.Random(seed)
+    for t in gen_time_lst(n, kl_type, begin):
+        _open = price
+        _close = max(0.01, _open * (1 + rnd.gauss(0, volatility)))
+        _high = max(_open, _close) * (1 + abs(rnd.gauss(0, volatility / 2)))
+        _low = min(_open, _close) * (1 - abs(rnd.gauss(0, volatility / 2)))
+        yield new_klu({
+            DATA_FIELD.FIELD_TIME: t,
+            DATA_FIELD.FIELD_OPEN: round(_open, 2),
+            DATA_FIELD.FIELD_HIGH: round(_high, 2),
+            DATA_FIELD.FIELD_LOW: round(_low, 2),
+            DATA_FIELD.FIELD_CLOSE: round(_close, 2),
+            DATA_FIELD.FIELD_VOLUME: float(rnd.randint(100, 100000)),
+        }, autofix=True)
+        price = _close
+
+
+# A股交易时段每一分钟K线的结束时间：09:31~11:30，13:01~15:00
+SESSION_MINUTES = [(9 + (30 + i) // 60, (30 + i) % 60) for i in range(1, 121)] + [(13 + i // 60, i % 60) for i in range(1, 121)]
+
+
+def gen_multi_level_klu(
+    day_cnt: int,
+    kl_type: KL_TYPE,
+    seed: int = 0,
+    begin: datetime.date = datetime.date(2015, 1, 5),
+    price: float = 100.0,
+    volatility: float = 0.001,
+    new_klu: Callable[..., CKLine_Unit] = CKLine_Unit,
+) -> Iterable[CKLine_Unit]:
+    # 先按交易时段生成1分钟随机游走，再合成到kl_type(任意分钟级别或天/周/月/季/年)；同一个seed各级别互相对齐，可用于多级别联立
+    rnd = random.Random(seed)
+    day = begin
+    is_minute = kl_type in KL_TYPE_MINUTES
+    minutes = KL_TYPE_MINUTES[kl_type] if is_minute else 1
+    assert len(SESSION_MINUTES) % minutes == 0
+    bar, bar_key, t = None, None, None
+    for _ in range(day_cnt):
+        while day.weekday() >= 5:
+            day += datetime.timedelta(days=1)
+        if not is_minute:
+            key = period_key(kl_type, day)
+            if bar is not None and key != bar_key:
+                yield make_klu(t, bar, new_klu)
+                bar = None
+            bar_key = key
+            t = CTime(day.year, day.month, day.day, 0, 0)
+        for minute_idx, (hour, minute) in enumerate(SESSION_MINUTES, start=1):
+            _open = price
+            _close = max(0.01, _open * (1 + rnd.gauss(0, volatility)))
+            _high = max(_open, _close) * (1 + abs(rnd.gauss(0, volatility / 2)))
+            _low = min(_open, _close) * (1 - abs(rnd.gauss(0, volatility / 2)))
+            volume = float(rnd.randint(100, 10000))
+            price = _close
+            if bar is None:
+                bar = [_open, _high, _low, _close, volume]
+            else:
+                bar = [bar[0], max(bar[1], _high), min(bar[2], _low), _close, bar[4] + volume]
+            if is_minute and minute_idx % minutes == 0:
+                yield make_klu(CTime(day.year, day.month, day.day, hour, minute, auto=False), bar, new_klu)
+                bar = None
+        day += datetime.timedelta(days=1)
+    if bar is not None:
+        yield make_klu(t, bar, new_klu)  # 最后一个周期可能还没走完，和实盘一样
+
+
+def make_klu(t: CTime, bar: list, new_klu: Callable[..., CKLine_Unit] = CKLine_Unit) -> CKLine_Unit:
+    return new_klu({
+        DATA_FIELD.FIELD_TIME: t,
+        DATA_FIELD.FIELD_OPEN: round(bar[0], 2),
+        DATA_FIELD.FIELD_HIGH: round(bar[1], 2),
+        DATA_FIELD.FIELD_LOW: round(bar[2], 2),
+        DATA_FIELD.FIELD_CLOSE: round(bar[3], 2),
+        DATA_FIELD.FIELD_VOLUME: bar[4],
+    }, autofix=True)
+
+
+class CSyntheticStockApi(CCommonStockApi):
+    # 可作为CChan的data_src直接传入，同一个code每次生成的数据都一样
+    BAR_CNT = 2000
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from gen_random_walk_klu(self.BAR_CNT, self.k_type, seed=zlib.crc32(str(self.code).encode()), new_klu=self.new_klu)
+
+    def SetBasciInfo(self):
+        self.name = str(self.code)
+        self.is_stock = True
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+class CSyntheticMultiLevelApi(CSyntheticStockApi):
+    # 多级别互相对齐的数据，DAY_CNT个交易日
+    DAY_CNT = 250
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from gen_multi_level_klu(self.DAY_CNT, self.k_type, seed=zlib.crc32(str(self.code).encode()), new_klu=self.new_klu)
+
+
+class CPreparedStockApi(CSyntheticStockApi):
+    # 数据提前生成好按(code, k_type)保存成元组，读取时只构造CKLine_Unit，计时不包含随机数据生成的耗时
+    BARS: Dict[Tuple[str, KL_TYPE], List[tuple]] = {}
+
+    @classmethod
+    def prepare(cls, code: str, k_type: KL_TYPE, klu_iter: Iterable[CKLine_Unit]) -> int:
+        cls.BARS[(code, k_type)] = [
+            (klu.time, klu.open, klu.high, klu.low, klu.close, klu.trade_info.metric.get(DATA_FIELD.FIELD_VOLUME))
+            for klu in klu_iter
+        ]
+        return len(cls.BARS[(code, k_type)])
+
+    @classmethod
+    def iter_klu(cls, code: str, k_type: KL_TYPE, new_klu: Callable[..., CKLine_Unit] = CKLine_Unit) -> Iterable[CKLine_Unit]:
+        for t, _open, high, low, close, volume in cls.BARS[(code, k_type)]:
+            yield new_klu({
+                DATA_FIELD.FIELD_TIME: t,
+                DATA_FIELD.FIELD_OPEN: _open,
+                DATA_FIELD.FIELD_HIGH: high,
+                DATA_FIELD.FIELD_LOW: low,
+                DATA_FIELD.FIELD_CLOSE: close,
+                DATA_FIELD.FIELD_VOLUME: volume,
+            })
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from self.iter_klu(self.code, self.k_type, self.new_klu)
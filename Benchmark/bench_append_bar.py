@@ -0,0 +1,108 @@
+"""
+实盘逐根推送：在n根历史K线上追加/更新一根K线的延迟，对比trigger_load，并校验结果与一次性全量计算一致
+python -m Benchmark.bench_append_bar --n 100000 --m 500
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import zlib
+from typing import List
+
+from Benchmark.SyntheticData import CSyntheticStockApi, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_FIELD, KL_TYPE
+from KLine.KLine_Unit import CKLine_Unit
+
+CODE = "SYN00000"
+
+
+def latency_stat(cost_lst):
+    cost_lst = sorted(cost_lst)
+    return {
+        "mean_ms": round(statistics.mean(cost_lst) * 1000, 4),
+        "p50_ms": round(cost_lst[len(cost_lst) // 2] * 1000, 4),
+        "p99_ms": round(cost_lst[min(int(len(cost_lst) * 0.99), len(cost_lst) - 1)] * 1000, 4),
+        "max_ms": round(cost_lst[-1] * 1000, 4),
+    }
+
+
+def unfinished_klu(klu: CKLine_Unit) -> CKLine_Unit:
+    # 模拟K线走到一半时推送的数据
+    close = round((klu.open + klu.close) / 2, 2)
+    return CKLine_Unit({
+        DATA_FIELD.FIELD_TIME: klu.time,
+        DATA_FIELD.FIELD_OPEN: klu.open,
+        DATA_FIELD.FIELD_HIGH: max(klu.open, close),
+        DATA_FIELD.FIELD_LOW: min(klu.open, close),
+        DATA_FIELD.FIELD_CLOSE: close,
+    })
+
+
+def chan_signature(chan: CChan):
+    kl_list = chan[0]
+    return (
+        [(bi.idx, bi.get_begin_klu().idx, bi.get_end_klu().idx, bi.is_sure) for bi in kl_list.bi_list],
+        [(seg.idx, seg.start_bi.idx, seg.end_bi.idx, seg.is_sure) for seg in kl_list.seg_list],
+        [(zs.begin_bi.idx, zs.end_bi.idx) for zs in kl_list.zs_list],
+        sorted((bsp.klu.idx, bsp.is_buy, bsp.type2str()) for bsp in kl_list.bs_point_lst.bsp_iter()),
+    )
+
+
+def gen_klu_lst(n, m) -> List[CKLine_Unit]:
+    return list(gen_random_walk_klu(n + m, KL_TYPE.K_1M, seed=zlib.crc32(CODE.encode())))[n:]
+
+
+def load_chan(n, config):
+    CSyntheticStockApi.BAR_CNT = n
+    return CChan(code=CODE, data_src=CSyntheticStockApi, lv_list=[KL_TYPE.K_1M], config=config)
+
+
+def bench(n, m, config_dict):
+    config = CChanConfig(config_dict)
+    klu_lst = gen_klu_lst(n, m)
+    t0 = time.perf_counter()
+    chan = load_chan(n, config)
+    load_cost = time.perf_counter() - t0
+
+    append_cost, update_cost, change_cnt = [], [], 0
+    for klu in klu_lst:
+        tmp_klu = unfinished_klu(klu)  # 先推送未完成的K线，再用最终数据更新
+        t0 = time.perf_counter()
+        chan.append_bar(KL_TYPE.K_1M, tmp_klu)
+        append_cost.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        diff = chan.update_bar(KL_TYPE.K_1M, klu)
+        update_cost.append(time.perf_counter() - t0)
+        change_cnt += diff.has_change
+
+    trigger_chan = load_chan(n, config)
+    trigger_cost = []
+    for klu in gen_klu_lst(n, m):
+        t0 = time.perf_counter()
+        trigger_chan.trigger_load({KL_TYPE.K_1M: [klu]})
+        trigger_cost.append(time.perf_counter() - t0)
+
+    full_chan = load_chan(n + m, config)
+    return {
+        "history_bars": n,
+        "append_cnt": m,
+        "load_seconds": round(load_cost, 3),
+        "append_bar": latency_stat(append_cost),
+        "update_bar": latency_stat(update_cost),
+        "trigger_load": latency_stat(trigger_cost),
+        "diff_with_change": change_cnt,
+        "same_as_full_load": chan_signature(chan) == chan_signature(full_chan),
+        "trigger_load_same_as_full_load": chan_signature(trigger_chan) == chan_signature(full_chan),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--m", type=int, default=500)
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)  # 一次性计算线段时递归深度和线段个数成正比
+    print(json.dumps(bench(args.n, args.m, {"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False}), indent=2))
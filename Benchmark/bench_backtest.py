@@ -0,0 +1,96 @@
+"""
+买卖点回测：一次step_load同时评估一组规则(开仓类型 x 信号类型 x 止损 x 止盈 x 仓位)，
+对比只跑step_load的耗时得到回测本身的开销和 规则*步数/秒，并抽几个规则单独跑一遍校验交易记录和资金曲线一致
+python -m Benchmark.bench_backtest --n 20000
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from Backtest.ChanBacktest import CBtRule, CChanBacktest
+from Benchmark.SyntheticData import CPreparedStockApi, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+
+CODE = "SYN00000"
+
+
+def make_rule_lst():
+    grid = itertools.product(
+        ["1,1p", "2,2s", "3a,3b", "1,1p,2,2s,3a,3b"],  # 开仓买点类型
+        ["bsp", "fx"],  # 信号类型
+        [None, 0.02, 0.05],  # 止损
+        [None, 0.05],  # 止盈
+        [0.5, 1.0],  # 仓位
+    )
+    return [
+        CBtRule(
+            name=f"{entry_types}|{confirm}|sl={stop_loss}|tp={take_profit}|size={size}",
+            entry_types=entry_types,
+            exit_types="1,1p,2,2s,3a,3b",
+            entry_confirm=confirm,
+            exit_confirm=confirm,
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            max_hold=2000,
+            size=size,
+            fee=0.0005,
+        )
+        for entry_types, confirm, stop_loss, take_profit, size in grid
+    ]
+
+
+def new_chan():
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "trigger_step": True})
+    return CChan(code=CODE, data_src=CPreparedStockApi, lv_list=[KL_TYPE.K_1M], config=config)
+
+
+def bench(n, check_cnt):
+    CPreparedStockApi.prepare(CODE, KL_TYPE.K_1M, gen_random_walk_klu(n, KL_TYPE.K_1M, seed=zlib.crc32(CODE.encode())))
+    rule_lst = make_rule_lst()
+
+    t0 = time.perf_counter()
+    step_cnt = sum(1 for _ in new_chan().step_load())
+    step_cost = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    backtest = CChanBacktest(rule_lst).run(new_chan())
+    cost = time.perf_counter() - t0
+    overhead = max(cost - step_cost, 1e-9)
+
+    same = True
+    for rule_idx in np.linspace(0, len(rule_lst) - 1, check_cnt).astype(int).tolist():
+        single = CChanBacktest([rule_lst[rule_idx]]).run(new_chan())
+        same &= [trade.to_dict() for trade in single.trades(0, include_open=True)] == [trade.to_dict() for trade in backtest.trades(rule_idx, include_open=True)]
+        same &= bool(np.array_equal(single.equity_curve(0), backtest.equity_curve(rule_idx)))
+    stat_lst = backtest.stat()
+    best = max(stat_lst, key=lambda item: item["total_return"])
+    return {
+        "bars": n,
+        "steps": step_cnt,
+        "rules": len(rule_lst),
+        "step_load_seconds": round(step_cost, 3),
+        "backtest_seconds": round(cost, 3),
+        "backtest_overhead_seconds": round(overhead, 3),
+        "rule_steps_per_sec": round(len(rule_lst) * step_cnt / overhead),
+        "rules_per_sec": round(len(rule_lst) / cost, 2),  # 含step_load，每条规则单独跑一遍约为 1/step_load_seconds
+        "separate_pass_seconds_est": round(len(rule_lst) * step_cost, 3),
+        "trades": sum(item["trades"] for item in stat_lst),
+        "best_rule": best,
+        "same_as_single_rule_pass": same,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--check", type=int, default=3, help="抽多少个规则单独回测校验")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.n, args.check), indent=2))
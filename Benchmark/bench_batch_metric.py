@@ -0,0 +1,76 @@
+"""
+对比逐根计算指标与批量向量化计算指标(batch_metric)的速度和最大误差
+python -m Benchmark.bench_batch_metric --n 200000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from Benchmark.SyntheticData import gen_random_walk_klu
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from KLine.KLine_Unit import set_metric_batch
+
+METRIC_CONF = {
+    "macd": {"fast": 12, "slow": 26, "signal": 9},
+    "mean_metrics": [5, 20, 60],
+    "trend_metrics": [20, 60],
+    "boll_n": 20,
+    "cal_rsi": True,
+    "cal_kdj": True,
+    "print_warning": False,
+}
+
+
+def gen_klu_lst(n, seed):
+    klu_lst = list(gen_random_walk_klu(n, KL_TYPE.K_1M, seed=seed))
+    for idx, klu in enumerate(klu_lst):
+        klu.set_idx(idx)
+    return klu_lst
+
+
+def metric_matrix(klu_lst):
+    res = []
+    for klu in klu_lst:
+        row = [klu.macd.fast_ema, klu.macd.slow_ema, klu.macd.DIF, klu.macd.DEA, klu.boll.MID, klu.boll.UP, klu.boll.DOWN, klu.rsi, klu.kdj.k, klu.kdj.d, klu.kdj.j]
+        for T_dict in klu.trend.values():
+            row.extend(T_dict[T] for T in sorted(T_dict))
+        res.append(row)
+    return np.array(res, dtype=np.float64)
+
+
+def bench(n, seed):
+    conf = CChanConfig(METRIC_CONF)
+    klu_lst = gen_klu_lst(n, seed)
+    model_lst = conf.GetMetricModel()
+    t0 = time.perf_counter()
+    for klu in klu_lst:
+        klu.set_metric(model_lst)
+    incremental_cost = time.perf_counter() - t0
+    incremental = metric_matrix(klu_lst)
+
+    klu_lst = gen_klu_lst(n, seed)
+    model_lst = conf.GetMetricModel()
+    t0 = time.perf_counter()
+    set_metric_batch(klu_lst, model_lst)
+    batch_cost = time.perf_counter() - t0
+    batch = metric_matrix(klu_lst)
+
+    return {
+        "bars": n,
+        "incremental_seconds": round(incremental_cost, 3),
+        "batch_seconds": round(batch_cost, 3),
+        "speedup": round(incremental_cost / batch_cost, 2),
+        "max_abs_err": float(np.max(np.abs(batch - incremental))),
+        "max_rel_err": float(np.max(np.abs(batch - incremental) / np.maximum(np.abs(incremental), 1e-12))),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.n, args.seed), indent=2))
@@ -0,0 +1,78 @@
+"""
+买卖点查询：按索引查询(get_latest_bsp/query_bsp) vs 原来用bsp_iter_v2遍历再过滤，结果必须一致
+python -m Benchmark.bench_bsp_index --n 200000
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+from itertools import islice
+
+from Benchmark.SyntheticData import CPreparedStockApi, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import BSP_TYPE, KL_TYPE
+
+CODE = "SYN00000"
+
+
+def per_call_us(func, min_seconds=0.2):
+    cnt, t0 = 0, time.perf_counter()
+    while True:
+        res = func()
+        cnt += 1
+        cost = time.perf_counter() - t0
+        if cost >= min_seconds:
+            return res, round(cost / cnt * 1e6, 2)
+
+
+def bench(n):
+    CPreparedStockApi.prepare(CODE, KL_TYPE.K_1M, gen_random_walk_klu(n, KL_TYPE.K_1M, seed=zlib.crc32(CODE.encode())))
+    chan = CChan(code=CODE, data_src=CPreparedStockApi, lv_list=[KL_TYPE.K_1M], config=CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False}))
+    bsp_list = chan[0].bs_point_lst
+    last_time = chan[0][-1][-1].time
+    begin_time = chan[0][len(chan[0]) * 9 // 10][0].time  # 最近10%的K线
+    types = [BSP_TYPE.T1, BSP_TYPE.T2]
+
+    def match(bsp):
+        return bsp.is_buy and any(bs_type in types for bs_type in bsp.type)
+
+    cases = {
+        "latest_all": (
+            lambda: list(bsp_list.bsp_iter_v2()),
+            lambda: chan.get_latest_bsp(number=0),
+        ),
+        "latest_10": (
+            lambda: list(islice(bsp_list.bsp_iter_v2(), 10)),
+            lambda: chan.get_latest_bsp(number=10),
+        ),
+        "latest_5_buy": (
+            lambda: list(islice((bsp for bsp in bsp_list.bsp_iter_v2() if bsp.is_buy), 5)),
+            lambda: chan.get_latest_bsp(number=5, is_buy=True),
+        ),
+        "buy_1_2_in_last_10pct": (
+            lambda: [bsp for bsp in bsp_list.bsp_iter_v2() if begin_time <= bsp.klu.time <= last_time and match(bsp)][::-1],
+            lambda: chan.query_bsp(begin_time=begin_time, end_time=last_time, types=types, is_buy=True),
+        ),
+    }
+    res = {"bars": n, "bsp_cnt": len(bsp_list), "cases": {}}
+    for name, (old_func, new_func) in cases.items():
+        old_res, old_us = per_call_us(old_func)
+        new_res, new_us = per_call_us(new_func)
+        res["cases"][name] = {
+            "result_cnt": len(new_res),
+            "iter_v2_us": old_us,
+            "index_us": new_us,
+            "speedup": round(old_us / new_us, 1),
+            "same": old_res == new_res,
+        }
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200000)
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.n), indent=2))
@@ -0,0 +1,78 @@
+"""
+CCXT分页拉取：用本地假交易所(单页上限、每次请求的模拟延迟、rateLimit)对比原来的单次fetch_ohlcv、逐页串行和并发分页的吞吐(根/秒)，
+并校验分页结果完整、按时间排序且没有重复
+python -m Benchmark.bench_ccxt_paged --days 30 --latency_ms 50 --workers 1,4,8
+"""
+import argparse
+import json
+import random
+import time
+
+from Common.CEnum import KL_TYPE
+from DataAPI.PagedFetch import TIMEFRAME_MS, fetch_ohlcv_paged
+
+
+class CStubExchange:
+    # 按时间戳生成确定的OHLCV，只实现fetch_ohlcv
+    def __init__(self, tf_ms, first_ts, last_ts, page_cap=500, latency_ms=50.0, rate_limit_ms=10.0):
+        self.tf_ms = tf_ms
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.page_cap = page_cap
+        self.latency = latency_ms / 1000
+        self.rateLimit = rate_limit_ms
+        self.request_cnt = 0
+
+    def candle(self, ts):
+        rnd = random.Random(ts)
+        _open = 100 + rnd.random()
+        _close = 100 + rnd.random()
+        return [ts, _open, max(_open, _close) + 0.1, min(_open, _close) - 0.1, _close, rnd.randint(1, 1000)]
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.request_cnt += 1
+        time.sleep(self.latency)
+        cnt = min(limit or self.page_cap, self.page_cap)
+        if since is None:
+            begin = self.last_ts - (cnt - 1) * self.tf_ms
+        else:
+            begin = max(self.first_ts, since + (self.first_ts - since) % self.tf_ms)
+        end = min(begin + cnt * self.tf_ms, self.last_ts + 1)
+        return [self.candle(ts) for ts in range(begin, end, self.tf_ms)]
+
+
+def bench(days, latency_ms, page_cap, rate_limit_ms, workers_lst):
+    tf_ms = TIMEFRAME_MS[KL_TYPE.K_5M]
+    since = 1700000000000 // tf_ms * tf_ms
+    end = since + days * 24 * 3600 * 1000 - 1
+    expect = [ts for ts in range(since, end + 1, tf_ms)]
+    res = {"candles": len(expect)}
+
+    exchange = CStubExchange(tf_ms, since, end, page_cap, latency_ms, rate_limit_ms)
+    t0 = time.perf_counter()
+    data = exchange.fetch_ohlcv("BTC/USDT", "5m", since=since)
+    res["single_call"] = {"candles": len(data), "seconds": round(time.perf_counter() - t0, 3)}
+
+    for workers in workers_lst:
+        exchange = CStubExchange(tf_ms, since, end, page_cap, latency_ms, rate_limit_ms)
+        t0 = time.perf_counter()
+        data = fetch_ohlcv_paged(exchange, "BTC/USDT", "5m", since, end, tf_ms, limit=1000, max_workers=workers)
+        cost = time.perf_counter() - t0
+        res[f"paged_workers_{workers}"] = {
+            "seconds": round(cost, 3),
+            "candles_per_sec": round(len(data) / cost, 1),
+            "requests": exchange.request_cnt,
+            "complete": [candle[0] for candle in data] == expect and data == [exchange.candle(ts) for ts in expect],
+        }
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30, help="5分钟K线的天数")
+    parser.add_argument("--latency_ms", type=float, default=50.0, help="每次请求的模拟延迟")
+    parser.add_argument("--page_cap", type=int, default=500, help="交易所单页最多返回的K线数")
+    parser.add_argument("--rate_limit_ms", type=float, default=10.0, help="相邻请求的最小间隔")
+    parser.add_argument("--workers", type=str, default="1,4,8", help="并发线程数，逗号分隔")
+    args = parser.parse_args()
+    print(json.dumps(bench(args.days, args.latency_ms, args.page_cap, args.rate_limit_ms, [int(x) for x in args.workers.split(",")]), indent=2))
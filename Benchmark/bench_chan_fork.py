@@ -0,0 +1,66 @@
+"""
+CChan复制：fork(结构共享，只复制尾部)对比copy.deepcopy的耗时随历史K线数的变化，
+并校验fork之后两边各自追加不同的K线，结果都和一次性全量计算一致
+python -m Benchmark.bench_chan_fork --n 10000,100000,1000000 --m 200
+"""
+import argparse
+import copy
+import gc
+import json
+import sys
+import time
+
+from Benchmark.bench_append_bar import chan_signature, gen_klu_lst, load_chan, unfinished_klu
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+
+
+def timeit(func, *args, repeat=1):
+    gc.collect()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        res = func(*args)
+    return res, (time.perf_counter() - t0) / repeat
+
+
+def copied_klu_cnt(chan, new_chan) -> int:
+    return sum(a is not b for a, b in zip(chan[0].klu_iter(), new_chan[0].klu_iter()))
+
+
+def bench(n, m, config_dict, deepcopy_max):
+    config = CChanConfig(config_dict)
+    chan = load_chan(n, config)
+    new_chan, fork_cost = timeit(chan.fork, repeat=20)
+    result = {
+        "history_bars": n,
+        "fork_ms": round(fork_cost * 1000, 3),
+        "fork_copied_klu": copied_klu_cnt(chan, new_chan),
+    }
+    if n <= deepcopy_max:
+        _, deepcopy_cost = timeit(copy.deepcopy, chan)
+        result["deepcopy_ms"] = round(deepcopy_cost * 1000, 3)
+        result["speedup"] = round(deepcopy_cost / fork_cost, 1)
+
+    # 原对象追加真实数据，fork出来的对象追加未完成的K线(另一份数据)，两边互不影响
+    klu_lst = gen_klu_lst(n, m)
+    for klu, tmp_klu in zip(klu_lst, gen_klu_lst(n, m)):
+        chan.append_bar(KL_TYPE.K_1M, klu)
+        new_chan.append_bar(KL_TYPE.K_1M, unfinished_klu(tmp_klu))
+    other_chan = load_chan(n, config)
+    for tmp_klu in gen_klu_lst(n, m):
+        other_chan.append_bar(KL_TYPE.K_1M, unfinished_klu(tmp_klu))
+    result["same_as_full_load"] = chan_signature(chan) == chan_signature(load_chan(n + m, config))
+    result["fork_same_as_append"] = chan_signature(new_chan) == chan_signature(other_chan)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=str, default="10000,100000,1000000", help="历史K线数，逗号分隔")
+    parser.add_argument("--m", type=int, default=200, help="fork之后两边各自追加的K线数")
+    parser.add_argument("--deepcopy_max", type=int, default=100000, help="历史K线数超过这个值不再跑deepcopy")
+    parser.add_argument("--columnar", action="store_true", help="使用kl_columnar列式存储")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x100000)  # 一次性计算线段和deepcopy时递归深度和历史长度成正比
+    config = {"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "kl_columnar": args.columnar}
+    print(json.dumps([bench(int(n), args.m, config, args.deepcopy_max) for n in args.n.split(",")], indent=2))
@@ -0,0 +1,99 @@
+"""
+CChan落盘/加载：chan_dump_pickle/chan_load_pickle 对比 chan_dump_snapshot/chan_load_snapshot 的文件大小和耗时
+python -m Benchmark.bench_chan_snapshot --n 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+from typing import Iterable
+
+from Benchmark.SyntheticData import (KL_TYPE_MINUTES, CSyntheticStockApi,
+                                     gen_random_walk_klu)
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from KLine.KLine_Unit import CKLine_Unit
+
+CODE = "SYN00000"
+LV_LIST = [KL_TYPE.K_60M, KL_TYPE.K_5M, KL_TYPE.K_1M]
+
+
+class CMultiLevelStockApi(CSyntheticStockApi):
+    # 各级别覆盖相同的时间段，BAR_CNT为最低级别的K线数
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        bar_cnt = self.BAR_CNT * KL_TYPE_MINUTES[LV_LIST[-1]] // KL_TYPE_MINUTES[self.k_type]
+        yield from gen_random_walk_klu(bar_cnt, self.k_type, seed=zlib.crc32(f"{self.code}{self.k_type}".encode()), new_klu=self.new_klu)
+
+
+def chan_signature(chan: CChan):
+    res = []
+    for lv in chan.lv_list:
+        kl_list = chan[lv]
+        res.append((
+            [(klu.idx, klu.close, len(klu.sub_kl_list)) for klu in kl_list.klu_iter()],
+            [(bi.idx, bi.get_begin_klu().idx, bi.get_end_klu().idx, bi.is_sure) for bi in kl_list.bi_list],
+            [(seg.idx, seg.start_bi.idx, seg.end_bi.idx, seg.is_sure) for seg in kl_list.seg_list],
+            [(zs.begin_bi.idx, zs.end_bi.idx) for zs in kl_list.zs_list],
+            sorted((bsp.klu.idx, bsp.is_buy, bsp.type2str()) for bsp in kl_list.bs_point_lst.bsp_iter()),
+        ))
+    return res
+
+
+def timeit(func, *args):
+    gc.collect()  # 不把上一步遗留的垃圾回收算进来
+    t0 = time.perf_counter()
+    res = func(*args)
+    return res, round(time.perf_counter() - t0, 3)
+
+
+def bench(n, config_dict, tmp_dir):
+    CMultiLevelStockApi.BAR_CNT = n
+    chan, load_cost = timeit(CChan, CODE, None, None, CMultiLevelStockApi, LV_LIST, CChanConfig(config_dict))
+    signature = chan_signature(chan)
+    result = {
+        "bar_cnt": {lv.name: len(list(chan[lv].klu_iter())) for lv in LV_LIST},
+        "cal_seconds": load_cost,
+    }
+
+    chan.g_kl_iter.clear()  # 次级别数据源的生成器没有读完，pickle不了
+    pickle_path = os.path.join(tmp_dir, "chan.pkl")
+    _, dump_cost = timeit(chan.chan_dump_pickle, pickle_path)
+    pickle_chan, load_cost = timeit(CChan.chan_load_pickle, pickle_path)
+    result["pickle"] = {
+        "size_mb": round(os.path.getsize(pickle_path) / 2**20, 2),
+        "dump_seconds": dump_cost,
+        "load_seconds": load_cost,
+        "same": chan_signature(pickle_chan) == signature,
+    }
+    del pickle_chan
+
+    snapshot_path = os.path.join(tmp_dir, "chan.snap")
+    _, dump_cost = timeit(chan.chan_dump_snapshot, snapshot_path)
+    result["snapshot"] = {"size_mb": round(os.path.getsize(snapshot_path) / 2**20, 2), "dump_seconds": dump_cost}
+    for use_mmap in [True, False]:
+        snapshot_chan, load_cost = timeit(CChan.chan_load_snapshot, snapshot_path, use_mmap)
+        result["snapshot"]["load_seconds" if use_mmap else "load_seconds_no_mmap"] = load_cost
+        result["snapshot"]["same" if use_mmap else "same_no_mmap"] = chan_signature(snapshot_chan) == signature
+        del snapshot_chan
+
+    result["speedup"] = {
+        "dump": round(result["pickle"]["dump_seconds"] / result["snapshot"]["dump_seconds"], 2),
+        "load": round(result["pickle"]["load_seconds"] / result["snapshot"]["load_seconds"], 2),
+    }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1000000, help="最低级别K线数")
+    parser.add_argument("--columnar", action="store_true", help="计算时使用kl_columnar列式存储")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)  # 一次性计算线段时递归深度和线段个数成正比
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = {"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "kl_data_check": False, "kl_columnar": args.columnar}  # 合成数据跨0点，不检查父子级别日期
+        print(json.dumps(bench(args.n, config, tmp_dir), indent=2))
@@ -0,0 +1,105 @@
+"""
+CSV数据源：原逐行读取(字符串比较日期、逐字段str2float)对比整块解析成数组的读取速度(MB/s)，并校验两者生成的K线一致
+python -m Benchmark.bench_csv_loader --n 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from Benchmark.SyntheticData import gen_random_walk_klu
+from Common.CEnum import DATA_FIELD, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.csvAPI import CSV_API, create_item_dict
+from KLine.KLine_Unit import CKLine_Unit
+
+COLUMNS = [
+    DATA_FIELD.FIELD_TIME,
+    DATA_FIELD.FIELD_OPEN,
+    DATA_FIELD.FIELD_HIGH,
+    DATA_FIELD.FIELD_LOW,
+    DATA_FIELD.FIELD_CLOSE,
+    DATA_FIELD.FIELD_VOLUME,
+    DATA_FIELD.FIELD_TURNOVER,
+]
+
+
+class CBenchCsvApi(CSV_API):
+    file_path = ""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.columns = COLUMNS
+
+    def get_file_path(self):
+        return self.file_path
+
+
+def old_get_kl_data(api: CSV_API):
+    # 原实现的CSV_API.get_kl_data
+    for line_number, line in enumerate(open(api.get_file_path(), 'r')):
+        if api.headers_exist and line_number == 0:
+            continue
+        data = line.strip("\n").split(",")
+        if len(data) != len(api.columns):
+            raise CChanException(f"file format error: {api.get_file_path()}", ErrCode.SRC_DATA_FORMAT_ERROR)
+        if api.begin_date is not None and data[api.time_column_idx] < api.begin_date:
+            continue
+        if api.end_date is not None and data[api.time_column_idx] > api.end_date:
+            continue
+        yield CKLine_Unit(create_item_dict(data, api.columns))
+
+
+def write_csv(path, n):
+    with open(path, "w") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        for klu in gen_random_walk_klu(n, KL_TYPE.K_1M):
+            t = klu.time
+            volume = klu.trade_info.metric[DATA_FIELD.FIELD_VOLUME]
+            f.write(f"{t.year:04}-{t.month:02}-{t.day:02} {t.hour:02}:{t.minute:02}:00,{klu.open},{klu.high},{klu.low},{klu.close},{volume},{round(volume * klu.close, 2)}\n")
+
+
+def signature(klu_lst):
+    return [(klu.time.key, klu.open, klu.high, klu.low, klu.close, tuple(klu.trade_info.metric.values())) for klu in klu_lst]
+
+
+def timeit(func):
+    t0 = time.perf_counter()
+    res = func()
+    return res, time.perf_counter() - t0
+
+
+def bench(n):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        CBenchCsvApi.file_path = os.path.join(tmp_dir, "bench_1m.csv")
+        write_csv(CBenchCsvApi.file_path, n)
+        size_mb = os.path.getsize(CBenchCsvApi.file_path) / (1 << 20)
+        api = CBenchCsvApi("bench", KL_TYPE.K_1M)
+        old_lst, old_cost = timeit(lambda: list(old_get_kl_data(api)))
+        new_lst, new_cost = timeit(lambda: list(api.get_kl_data()))
+        _, parse_cost = timeit(lambda: sum(len(arrays["year"]) for arrays in api.iter_arrays()))
+
+        # 取中间一段，二分定位起点，遇到end_date之后不再读取
+        mid_klu = old_lst[n // 2]
+        begin_date, end_date = mid_klu.time.toDateStr("-"), old_lst[min(n // 2 + 5000, n - 1)].time.toDateStr("-")
+        range_api = CBenchCsvApi("bench", KL_TYPE.K_1M, begin_date=begin_date, end_date=end_date)
+        range_lst, range_cost = timeit(lambda: list(range_api.get_kl_data()))
+        return {
+            "bars": n,
+            "file_mb": round(size_mb, 2),
+            "old_mb_per_sec": round(size_mb / old_cost, 2),
+            "bulk_mb_per_sec": round(size_mb / new_cost, 2),
+            "bulk_parse_only_mb_per_sec": round(size_mb / parse_cost, 2),
+            "range_bars": len(range_lst),
+            "range_ms": round(range_cost * 1000, 2),
+            "same": signature(old_lst) == signature(new_lst),
+            "range_same": signature(range_lst) == signature(range_api.get_kl_data_by_line()),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1000000, help="1分钟K线数")
+    args = parser.parse_args()
+    print(json.dumps(bench(args.n), indent=2))
@@ -0,0 +1,53 @@
+"""
+CTime构造、比较、格式化的耗时：逐个构造(原实现按本地时区走datetime.timestamp)对比整数ts和datetime64列批量构造
+python -m Benchmark.bench_ctime --n 1000000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from Common.CTime import CTime
+
+
+def old_timestamp(t: CTime) -> float:
+    # 原实现的set_timestamp
+    if t.hour == 0 and t.minute == 0 and t.auto:
+        return datetime(t.year, t.month, t.day, 23, 59, t.second).timestamp()
+    return datetime(t.year, t.month, t.day, t.hour, t.minute, t.second).timestamp()
+
+
+def timeit(func, *args):
+    t0 = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - t0
+
+
+def bench(n):
+    arr = np.datetime64("2015-01-05T09:30") + np.arange(n) * np.timedelta64(1, "m")
+    fields = [(t.year, t.month, t.day, t.hour, t.minute) for t in arr.astype(datetime).tolist()]
+    time_lst, init_cost = timeit(lambda: [CTime(*f, auto=False) for f in fields])
+    batch_lst, batch_cost = timeit(CTime.from_datetime64, arr, False)
+    _, old_ts_cost = timeit(lambda: [old_timestamp(t) for t in time_lst])
+    _, cmp_cost = timeit(lambda: sum(a < b for a, b in zip(time_lst, time_lst[1:])))
+    _, str_cost = timeit(lambda: [t.to_str() for t in time_lst])
+    _, cached_str_cost = timeit(lambda: [t.to_str() for t in time_lst])
+    return {
+        "n": n,
+        "old_datetime_timestamp_s": round(old_ts_cost, 3),
+        "init_s": round(init_cost, 3),
+        "from_datetime64_s": round(batch_cost, 3),
+        "compare_s": round(cmp_cost, 3),
+        "to_str_first_s": round(str_cost, 3),
+        "to_str_cached_s": round(cached_str_cost, 3),
+        "same_result": all(a.key == b.key and a.to_str() == b.to_str() for a, b in zip(time_lst, batch_lst)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1000000)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.n), indent=2))
@@ -0,0 +1,128 @@
+"""
+本地K线缓存：用进程内的假数据源(每根K线模拟一段网络延迟)对比不缓存/冷启动/热启动/历史增长后补拉尾部的耗时和拉取的K线数，
+并校验缓存返回的K线和数据源一致、复权变化时整段重拉、缓存目录大小不超过上限
+python -m Benchmark.bench_data_cache --n 100000 --m 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+from Benchmark.SyntheticData import gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import AUTYPE, DATA_FIELD, KL_TYPE
+from DataAPI.CommonStockAPI import CCommonStockApi
+from DataAPI.csvAPI import date_key
+from KLine.KLine_Unit import CKLine_Unit
+
+
+class CFakeRemoteApi(CCommonStockApi):
+    # 模拟远程数据源：bar_cnt控制当前能拉到多少根，price_scale模拟复权因子变化
+    bar_cnt = 1000
+    price_scale = 1.0
+    latency = 2e-5  # 每根K线的模拟延迟(秒)
+    fetched_bars = 0
+    history = {}
+
+    def get_kl_data(self):
+        if len(self.history.get(self.code, [])) < self.bar_cnt:
+            self.history[self.code] = list(gen_random_walk_klu(self.bar_cnt, KL_TYPE.K_1M, seed=zlib.crc32(self.code.encode())))
+        begin_key, end_key = date_key(self.begin_date, False), date_key(self.end_date, True)
+        res = []
+        for klu in self.history[self.code][:self.bar_cnt]:
+            t = klu.time
+            key = (((t.year * 100 + t.month) * 100 + t.day) * 100 + t.hour) * 100 + t.minute
+            if (begin_key is None or key >= begin_key) and (end_key is None or key <= end_key):
+                res.append(klu)
+        CFakeRemoteApi.fetched_bars += len(res)
+        time.sleep(self.latency * len(res))
+        for klu in res:
+            yield CKLine_Unit({
+                DATA_FIELD.FIELD_TIME: klu.time,
+                DATA_FIELD.FIELD_OPEN: round(klu.open * self.price_scale, 2),
+                DATA_FIELD.FIELD_HIGH: round(klu.high * self.price_scale, 2),
+                DATA_FIELD.FIELD_LOW: round(klu.low * self.price_scale, 2),
+                DATA_FIELD.FIELD_CLOSE: round(klu.close * self.price_scale, 2),
+                DATA_FIELD.FIELD_VOLUME: klu.trade_info.metric[DATA_FIELD.FIELD_VOLUME],
+            })
+
+    def SetBasciInfo(self):
+        self.name = self.code
+        self.is_stock = True
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+def signature(klu_iter):
+    return [(klu.time.key, klu.open, klu.high, klu.low, klu.close, tuple(klu.trade_info.metric.values())) for klu in klu_iter]
+
+
+def run(code, begin=None, end=None, cache_dir=None, max_mb=1024):
+    CFakeRemoteApi.fetched_bars = 0
+    config = CChanConfig({"print_warning": False, "data_cache_dir": cache_dir, "data_cache_max_mb": max_mb})
+    t0 = time.perf_counter()
+    chan = CChan(code=code, begin_time=begin, end_time=end, data_src=CFakeRemoteApi, lv_list=[KL_TYPE.K_1M], config=config, autype=AUTYPE.QFQ)
+    cost = time.perf_counter() - t0
+    return chan, {"seconds": round(cost, 3), "fetched_bars": CFakeRemoteApi.fetched_bars, "bars": len(list(chan[0].klu_iter()))}
+
+
+def same(chan1, chan2):
+    return signature(chan1[0].klu_iter()) == signature(chan2[0].klu_iter())
+
+
+def bench(n, m):
+    code = "FAKE0001"
+    res = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        CFakeRemoteApi.bar_cnt, CFakeRemoteApi.price_scale = n, 1.0
+        no_cache, res["no_cache"] = run(code)
+        _, res["cold"] = run(code, cache_dir=cache_dir)
+        warm, res["warm"] = run(code, cache_dir=cache_dir)
+        res["warm"]["same"] = same(warm, no_cache)
+
+        CFakeRemoteApi.bar_cnt = n + m
+        grown, res["grown_tail"] = run(code, cache_dir=cache_dir)
+        res["grown_tail"]["same"] = same(grown, run(code)[0])
+
+        # 已经缓存过的历史区间完全从本地读取
+        mid_time = list(no_cache[0].klu_iter())[n // 2].time
+        begin, end = "2015-01-06", mid_time.toDateStr("-")
+        past, res["past_range"] = run(code, begin, end, cache_dir=cache_dir)
+        res["past_range"]["same"] = same(past, run(code, begin, end)[0])
+
+        CFakeRemoteApi.price_scale = 1.1
+        adjusted, res["adjusted_refetch"] = run(code, cache_dir=cache_dir)
+        res["adjusted_refetch"]["same"] = same(adjusted, run(code)[0])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        CFakeRemoteApi.bar_cnt, CFakeRemoteApi.price_scale = 20000, 1.0
+        max_mb = 2
+        for idx in range(8):
+            run(f"FAKE{idx:04}", cache_dir=cache_dir, max_mb=max_mb)
+        res["eviction"] = {
+            "max_mb": max_mb,
+            "cache_mb": round(sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir)) / (1 << 20), 3),
+            "files": len(os.listdir(cache_dir)),
+        }
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000, help="初始历史K线数")
+    parser.add_argument("--m", type=int, default=500, help="历史增长的K线数")
+    parser.add_argument("--latency_us", type=float, default=20.0, help="每根K线的模拟网络延迟(微秒)")
+    args = parser.parse_args()
+    CFakeRemoteApi.latency = args.latency_us / 1e6
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.n, args.m), indent=2))
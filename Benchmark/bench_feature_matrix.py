@@ -0,0 +1,126 @@
+"""
+买卖点特征导出：逐个品种把买卖点特征拼成训练矩阵，
+对比 每个品种逐行取dict再np.vstack到总矩阵(拷贝量随品种数平方增长) 和 CFeatureMatrix按列追加，并校验两者结果一致
+python -m Benchmark.bench_feature_matrix --symbols 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from Benchmark.SyntheticData import CSyntheticStockApi
+from Chan import CChan
+from ChanConfig import CChanConfig
+from ChanModel.FeatureMatrix import CFeatureMatrix
+from Common.CEnum import BSP_TYPE, KL_TYPE
+from KLine.KLine_Store import pack_time
+
+FEAT_CNT = 60
+
+
+def make_chan_lst(chan_cnt, bar_cnt):
+    CSyntheticStockApi.BAR_CNT = bar_cnt
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False})
+    chan_lst = [CChan(code=f"SYN{idx:05d}", data_src=CSyntheticStockApi, lv_list=[KL_TYPE.K_DAY], config=config) for idx in range(chan_cnt)]
+    # 模拟策略给买卖点加的特征：部分特征缺失/为None，部分品种多出几个特征
+    rnd = random.Random(0)
+    for chan_idx, chan in enumerate(chan_lst):
+        for bsp in chan[0].bs_point_lst.bsp_iter():
+            klu = bsp.klu
+            feat = {f"feat_{i}": klu.close * (i + 1) / (klu.high - klu.low + 1) for i in range(FEAT_CNT) if rnd.random() > 0.1}
+            feat["feat_0"] = None if rnd.random() < 0.1 else feat.get("feat_0")
+            if chan_idx % 7 == 0:
+                feat[f"extra_{chan_idx % 3}"] = float(klu.idx)
+            bsp.add_feat(feat)
+    return chan_lst
+
+
+def naive_export(chan_lst, symbols):
+    # 逐行从dict取值，每个品种做一次vstack
+    schema = []
+    matrix = np.zeros((0, 0))
+    meta = np.zeros((0, 4), dtype=np.int64)
+    for sym_idx in range(symbols):
+        chan = chan_lst[sym_idx % len(chan_lst)]
+        bsp_lst = chan[0].bs_point_lst.query_bsp()
+        feat_lst = [dict(bsp.features.items()) for bsp in bsp_lst]
+        for feat in feat_lst:
+            for name in feat:
+                if name not in schema:
+                    schema.append(name)
+                    matrix = np.hstack([matrix, np.full((matrix.shape[0], 1), np.nan)])
+        rows = [[np.nan if feat.get(name) is None else feat[name] for name in schema] for feat in feat_lst]
+        matrix = np.vstack([matrix, np.array(rows, dtype=np.float64).reshape(len(rows), len(schema))])
+        meta = np.vstack([meta, np.array([[sym_idx, pack_time(bsp.klu.time), bsp.klu.idx, bsp.is_buy] for bsp in bsp_lst], dtype=np.int64).reshape(len(bsp_lst), 4)])
+    return schema, matrix, meta
+
+
+def matrix_export(chan_lst, symbols):
+    res = CFeatureMatrix()
+    for sym_idx in range(symbols):
+        res.add_chan(chan_lst[sym_idx % len(chan_lst)], code=sym_idx)
+    return res
+
+
+def bench(symbols, chan_cnt, bar_cnt):
+    chan_lst = make_chan_lst(chan_cnt, bar_cnt)
+
+    t0 = time.perf_counter()
+    schema, naive_matrix, naive_meta = naive_export(chan_lst, symbols)
+    naive_cost = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    feature_matrix = matrix_export(chan_lst, symbols)
+    cost = time.perf_counter() - t0
+
+    columns = feature_matrix.columns()
+    same = np.array_equal(feature_matrix.to_numpy(schema), naive_matrix, equal_nan=True)
+    same &= np.array_equal(columns["code"].astype(np.int64), naive_meta[:, 0])
+    same &= np.array_equal(columns["time"], naive_meta[:, 1])
+    same &= np.array_equal(columns["klu_idx"], naive_meta[:, 2])
+    same &= np.array_equal(columns["is_buy"], naive_meta[:, 3].astype(bool))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "feat.npy")
+        t0 = time.perf_counter()
+        feature_matrix.save_npy(path)
+        save_cost = time.perf_counter() - t0
+        loaded = CFeatureMatrix.load_npy(path)
+        same &= loaded.feature_names == feature_matrix.feature_names
+        same &= all(np.array_equal(arr, columns[name], equal_nan=arr.dtype == np.float64) for name, arr in loaded.columns().items())
+        # mmap加载时特征列直接读文件，追加行时才复制
+        mapped = CFeatureMatrix.load_npy(path, mmap_mode="r")
+        same &= all(isinstance(arr.base, np.memmap) for arr in mapped.feat.values())
+        same &= np.array_equal(mapped.to_numpy(), feature_matrix.to_numpy(), equal_nan=True)
+        mapped.extend(feature_matrix)
+        same &= np.array_equal(mapped.to_numpy(), np.vstack([feature_matrix.to_numpy()] * 2), equal_nan=True)
+        del mapped
+
+    return {
+        "symbols": symbols,
+        "rows": len(feature_matrix),
+        "features": len(feature_matrix.feature_names),
+        "naive_vstack_seconds": round(naive_cost, 3),
+        "feature_matrix_seconds": round(cost, 3),
+        "speedup": round(naive_cost / cost, 2),
+        "rows_per_sec": round(len(feature_matrix) / cost),
+        "save_npy_seconds": round(save_cost, 3),
+        "nan_ratio": round(float(np.isnan(feature_matrix.to_numpy()).mean()), 4),
+        "type_1_rows": int(columns[f"type_{BSP_TYPE.T1.value}"].sum()),
+        "same": bool(same),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=2000, help="导出的品种数，循环复用chan_cnt个CChan的结果")
+    parser.add_argument("--chan_cnt", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=3000, help="每个CChan的日K数量")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.symbols, args.chan_cnt, args.bars), indent=2))
@@ -0,0 +1,67 @@
+"""
+对比逐根对象存储与列式存储(kl_columnar)的单级别加载内存和速度
+python -m Benchmark.bench_kline_store --n 200000
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from Benchmark.SyntheticData import gen_random_walk_klu
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_Store import CKLine_Unit_View
+from KLine.KLine_Unit import CKLine_Unit
+
+
+def load_kl_list(n, columnar, seed):
+    kl_list = CKLine_List(KL_TYPE.K_1M, CChanConfig({"kl_columnar": columnar, "print_warning": False}))
+    pre_klu = None
+    new_klu = CKLine_Unit_View.from_dict if columnar else CKLine_Unit  # 和数据源的new_klu一致，列式存储不创建中间的CKLine_Unit
+    for idx, klu in enumerate(gen_random_walk_klu(n, KL_TYPE.K_1M, seed=seed, new_klu=new_klu)):
+        klu.set_idx(idx)
+        klu.kl_type = KL_TYPE.K_1M
+        klu = kl_list.store_klu(klu)
+        klu.set_pre_klu(pre_klu)
+        pre_klu = klu
+        kl_list.add_single_klu(klu)
+    kl_list.cal_seg_and_zs()
+    return kl_list
+
+
+def bench(n, columnar, seed):
+    gc.collect()
+    t0 = time.perf_counter()
+    kl_list = load_kl_list(n, columnar, seed)
+    cost = time.perf_counter() - t0
+    bi_cnt = len(kl_list.bi_list)
+    del kl_list
+    gc.collect()
+
+    tracemalloc.start()
+    kl_list = load_kl_list(n, columnar, seed)
+    gc.collect()
+    mem, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "backend": "columnar" if columnar else "object",
+        "bars": n,
+        "bi": bi_cnt,
+        "seconds": round(cost, 3),
+        "bars_per_sec": round(n / cost, 1),
+        "bytes_per_bar": round(mem / n, 1),
+        "store_bytes": kl_list.kl_store.nbytes if kl_list.kl_store is not None else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)  # 一次性计算线段时递归深度和线段个数成正比
+    res = [bench(args.n, columnar, args.seed) for columnar in [False, True]]
+    print(json.dumps(res, indent=2))
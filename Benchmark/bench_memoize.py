@@ -0,0 +1,112 @@
+"""
+make_cache缓存方法的调用开销：CBi.get_begin_val等热点方法命中缓存时的单次耗时(对比改动前每次访问都创建绑定方法、按str(func)查dict的实现)，
+以及一次性加载n根K线的端到端耗时
+python -m Benchmark.bench_memoize --n 100000
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import types
+
+from Benchmark.bench_append_bar import load_chan
+from Bi.Bi import CBi
+from ChanConfig import CChanConfig
+from Common.state_util import get_slots_state, set_slots_state
+
+METHODS = ["get_begin_val", "get_end_val", "get_begin_klu", "get_end_klu", "is_up", "is_down", "_high", "_low"]
+
+
+class legacy_make_cache:
+    # 改动前的实现，只用作对比
+    def __init__(self, func):
+        self.func = func
+        self.func_key = str(func)
+
+    def __get__(self, instance, cls):
+        if not hasattr(instance, "_memoize_cache"):
+            setattr(instance, "_memoize_cache", {})
+        return types.MethodType(self, instance)
+
+    def __call__(self, *args, **kwargs):
+        instance = args[0]
+        cache = instance._memoize_cache
+        if self.func_key in cache:
+            return cache[self.func_key]
+        result = self.func(*args, **kwargs)
+        cache[self.func_key] = result
+        return result
+
+
+class CLegacyBi(CBi):
+    # 没有__slots__，有__dict__可以挂_memoize_cache
+    pass
+
+
+for _name in METHODS:
+    setattr(CLegacyBi, _name, legacy_make_cache(getattr(CBi, _name).__wrapped__))
+
+
+def to_legacy(bi: CBi) -> CLegacyBi:
+    obj = CLegacyBi.__new__(CLegacyBi)
+    set_slots_state(obj, {name: value for name, value in get_slots_state(bi).items() if not name.startswith("_cache_")})
+    return obj
+
+
+def call_ns(bi_lst, method, loop) -> float:
+    calls = [getattr(bi, method) for bi in bi_lst]  # 先各调用一次填充缓存
+    for call in calls:
+        call()
+    gc.collect()
+    t0 = time.perf_counter()
+    for _ in range(loop):
+        for bi in bi_lst:
+            getattr(bi, method)()
+    # 扣掉getattr本身的开销，只留下调用和查缓存
+    t1 = time.perf_counter()
+    for _ in range(loop):
+        for bi in bi_lst:
+            getattr(bi, "idx")
+    t2 = time.perf_counter()
+    return ((t1 - t0) - (t2 - t1)) / (loop * len(bi_lst)) * 1e9
+
+
+def bench_accessor(bi_lst, loop):
+    legacy_lst = [to_legacy(bi) for bi in bi_lst]
+    res = {}
+    for method in METHODS:
+        new_ns, legacy_ns = call_ns(bi_lst, method, loop), call_ns(legacy_lst, method, loop)
+        res[method] = {
+            "legacy_ns": round(legacy_ns, 1),
+            "ns": round(new_ns, 1),
+            "speedup": round(legacy_ns / new_ns, 1),
+            "same": all(getattr(a, method)() is getattr(b, method)() for a, b in zip(bi_lst, legacy_lst)),
+        }
+    return res
+
+
+def bench_load(n, repeat):
+    cost = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        load_chan(n, CChanConfig({"print_warning": False}))
+        cost.append(time.perf_counter() - t0)
+    return {"bars": n, "load_seconds": round(min(cost), 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000, help="端到端加载的K线数")
+    parser.add_argument("--loop", type=int, default=200, help="每个方法在所有笔上循环调用的次数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)  # 一次性计算线段时递归深度和线段个数成正比
+
+    chan = load_chan(min(args.n, 20000), CChanConfig({"print_warning": False}))
+    result = {
+        "accessor": bench_accessor(list(chan[0].bi_list), args.loop),
+        "load": bench_load(args.n, args.repeat),
+    }
+    print(json.dumps(result, indent=2))
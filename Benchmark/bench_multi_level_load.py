@@ -0,0 +1,66 @@
+"""
+多级别(默认 天/60分/5分/1分 四级)联立加载的耗时：总耗时减去各级别perf_profile统计的计算耗时，即为读取数据和父子级别K线对齐的开销；
+输出父子关系(sup_kl/sub_kl_list)和各级别买卖点的摘要，改动前后各跑一次对比digest即可确认结果不变
+python -m Benchmark.bench_multi_level_load --day_cnt 250
+python -m Benchmark.bench_multi_level_load --day_cnt 60 --step
+"""
+import argparse
+import hashlib
+import json
+import time
+import zlib
+
+from Benchmark.SyntheticData import CPreparedStockApi, gen_multi_level_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+
+CODE = "SYN00000"
+LV_LIST = [KL_TYPE.K_DAY, KL_TYPE.K_60M, KL_TYPE.K_5M, KL_TYPE.K_1M]
+
+
+def align_signature(chan: CChan):
+    return [
+        (
+            [(str(klu.time), klu.idx, None if klu.sup_kl is None else klu.sup_kl.idx, len(klu.sub_kl_list)) for klu in chan[lv].klu_iter()],
+            sorted((bsp.klu.idx, bsp.is_buy, bsp.type2str()) for bsp in chan[lv].bs_point_lst.bsp_iter()),
+        )
+        for lv in chan.lv_list
+    ]
+
+
+def bench(day_cnt, lv_list, step, repeat):
+    bar_cnt = sum(CPreparedStockApi.prepare(CODE, lv, gen_multi_level_klu(day_cnt, lv, seed=zlib.crc32(CODE.encode()))) for lv in lv_list)
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "trigger_step": step, "perf_profile": True})
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chan = CChan(code=CODE, data_src=CPreparedStockApi, lv_list=lv_list, config=config)
+        step_cnt = sum(1 for _ in chan.step_load()) if step else None
+        cost = time.perf_counter() - t0
+        cal_cost = sum(item["seconds"] for report in chan.perf_report().values() for item in report.values())
+        if best is None or cost < best[0]:
+            best = (cost, cal_cost, chan, step_cnt)
+    cost, cal_cost, chan, step_cnt = best
+    return {
+        "levels": [lv.name for lv in lv_list],
+        "bars": bar_cnt,
+        "step": step,
+        "step_cnt": step_cnt,
+        "seconds": round(cost, 3),
+        "bars_per_sec": round(bar_cnt / cost),
+        "cal_seconds": round(cal_cost, 3),
+        "load_align_seconds": round(cost - cal_cost, 3),
+        "misalign_cnt": chan.kl_misalign_cnt,
+        "digest": hashlib.md5(repr(align_signature(chan)).encode()).hexdigest(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--day_cnt", type=int, default=250, help="交易日数，每天240根1分钟K线")
+    parser.add_argument("--lv", type=str, default=",".join(lv.name for lv in LV_LIST), help="级别列表，从高到低，如K_DAY,K_30M,K_5M")
+    parser.add_argument("--step", action="store_true", help="trigger_step逐根回放")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.day_cnt, [KL_TYPE[lv] for lv in args.lv.split(",")], args.step, args.repeat), indent=2))
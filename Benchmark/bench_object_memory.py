@@ -0,0 +1,145 @@
+"""
+CKLine_Unit/CKLine/CBi/CSeg/CZS/CBS_Point改成__slots__前后每个对象自身占用的字节数，
+before用同样属性(按同样顺序赋值)的普通__dict__对象模拟，属性值共用，只统计对象布局本身；
+并校验pickle/deepcopy前后结果一致，以及改成__slots__之前的__dict__状态、按当时格式写的整个CChan的pickle仍能恢复
+python -m Benchmark.bench_object_memory --n 20000
+"""
+import argparse
+import copy
+import copyreg
+import gc
+import json
+import os
+import pickle
+import sys
+import tempfile
+import tracemalloc
+from typing import Generic
+
+from Benchmark.bench_append_bar import chan_signature, load_chan
+from Bi.Bi import CBi
+from Bi.BiList import CBiList
+from BuySellPoint.BSPointList import CBSPointList
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.cache import is_cache_slot
+from Common.state_util import get_slots_state, set_slots_state, slot_names
+from KLine.KLine import CKLine
+from KLine.KLine_Unit import CKLine_Unit
+from Seg.Seg import CSeg
+from Snapshot.ChanSnapshot import CLevelDumper
+from ZS.ZSList import CZSList
+
+_DETACHED = (CKLine_Unit, CKLine, CBi, CSeg)  # chan_dump_pickle写之前断开pre/next，加载时重建
+_PRE_NEXT = ("pre", "next", "_CKLine_Combiner__pre", "_CKLine_Combiner__next")
+_ADDED_ATTRS = {  # 改成__slots__之后才加的属性，旧pickle里没有，由各自的__setstate__补上
+    CZSList: ("seg_zs_cache",),
+    CBiList: ("dirty_idx",),
+    CBSPointList: ("index",),
+}
+
+
+class CLegacyPickler(pickle.Pickler):
+    # 按改成__slots__之前的格式保存：state是实例的__dict__，缓存都在_memoize_cache里，
+    # 用CBS_Point[...]这样的泛型实例化出来的对象还带着typing加的__orig_class__
+    def reducer_override(self, obj):
+        cls = type(obj)
+        if cls in _ADDED_ATTRS:
+            return copyreg.__newobj__, (cls,), {name: value for name, value in obj.__dict__.items() if name not in _ADDED_ATTRS[cls]}
+        if getattr(cls, "__getstate__", None) is not get_slots_state:
+            return NotImplemented
+        state, cache = {}, {}
+        for name, value in get_slots_state(obj).items():
+            if is_cache_slot(name):
+                cache[name] = value
+            else:
+                state[name] = None if isinstance(obj, _DETACHED) and name in _PRE_NEXT else value
+        if any(map(is_cache_slot, slot_names(cls))):
+            state["_memoize_cache"] = cache
+        if issubclass(cls, Generic) and getattr(cls, "__parameters__", ()):
+            state["__orig_class__"] = cls[cls.__parameters__]
+        return copyreg.__newobj__, (cls,), state
+
+
+def collect_objects(chan):
+    kl_list = chan[0]
+    return {
+        "CKLine_Unit": list(kl_list.klu_iter()),
+        "CKLine": list(kl_list.lst),
+        "CBi": list(kl_list.bi_list),
+        "CSeg": list(kl_list.seg_list) + list(kl_list.segseg_list),
+        "CZS": list(kl_list.zs_list) + list(kl_list.segzs_list),
+        "CBS_Point": CLevelDumper.bsp_lst(kl_list.bs_point_lst) + CLevelDumper.bsp_lst(kl_list.seg_bs_point_lst),
+    }
+
+
+def traced_bytes(build, cnt) -> float:
+    res = [None] * cnt
+    gc.collect()
+    tracemalloc.start()
+    build(res)
+    gc.collect()
+    mem, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mem / cnt
+
+
+def bytes_per_object(obj_lst):
+    # 同一个类的对象属性赋值顺序一致，dict版本可以用上实例间共享key的紧凑dict，和改造前一致
+    cls = type(obj_lst[0])
+    dict_cls = type(f"Dict{cls.__name__}", (), {})
+    states = [get_slots_state(obj) for obj in obj_lst]
+
+    def build_dict(res):
+        for idx, state in enumerate(states):
+            obj = dict_cls()
+            for name, value in state.items():
+                setattr(obj, name, value)
+            res[idx] = obj
+
+    def build_slots(res):
+        for idx, state in enumerate(states):
+            obj = cls.__new__(cls)
+            set_slots_state(obj, state)
+            res[idx] = obj
+
+    before, after = traced_bytes(build_dict, len(states)), traced_bytes(build_slots, len(states))
+    # 改造前保存的{属性名: 值}仍能恢复
+    legacy = dict_cls()
+    for name, value in states[-1].items():
+        setattr(legacy, name, value)
+    obj = cls.__new__(cls)
+    obj.__setstate__(legacy.__dict__)
+    return {
+        "cnt": len(obj_lst),
+        "before_bytes": round(before, 1),
+        "after_bytes": round(after, 1),
+        "saved": f"{1 - after / before:.1%}",
+        "legacy_state_ok": get_slots_state(obj) == states[-1],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000, help="K线数")
+    parser.add_argument("--columnar", action="store_true", help="使用kl_columnar列式存储")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x100000)  # 一次性计算线段和deepcopy时递归深度和历史长度成正比
+
+    chan = load_chan(args.n, CChanConfig({"kl_columnar": args.columnar, "print_warning": False}))
+    signature = chan_signature(chan)
+    result = {name: bytes_per_object(obj_lst) for name, obj_lst in collect_objects(chan).items() if obj_lst}
+    result["deepcopy_same"] = chan_signature(copy.deepcopy(chan)) == signature
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chan.chan_dump_pickle(os.path.join(tmp_dir, "chan.pkl"))
+        result["pickle_same"] = chan_signature(CChan.chan_load_pickle(os.path.join(tmp_dir, "chan.pkl"))) == signature
+        with open(os.path.join(tmp_dir, "legacy.pkl"), "wb") as f:
+            CLegacyPickler(f).dump(chan)
+        legacy_chan = CChan.chan_load_pickle(os.path.join(tmp_dir, "legacy.pkl"))
+        for kl_list in legacy_chan.kl_datas.values():
+            kl_list.cal_seg_and_zs()  # 补上的属性要能继续计算
+        result["legacy_pickle_same"] = chan_signature(legacy_chan) == signature and all(
+            [bsp.klu.idx for bsp in legacy_chan[lv].bs_point_lst.query_bsp()] == [bsp.klu.idx for bsp in chan[lv].bs_point_lst.query_bsp()]
+            for lv in chan.lv_list
+        )
+    print(json.dumps(result, indent=2))
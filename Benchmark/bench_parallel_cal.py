@@ -0,0 +1,66 @@
+"""
+非逐步模式下多级别联立计算：各级别的线段/中枢/买卖点串行计算 vs parallel_cal 开启后放到子进程并行计算，
+按级别数分别统计耗时和加速比，并校验两者每个级别的笔/线段/中枢/买卖点完全一致(需要支持fork的多核系统，否则parallel_cal不生效、两者都是串行)
+python -m Benchmark.bench_parallel_cal --day_cnt 250
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+
+from Benchmark.bench_step_schedule import step_signature
+from Benchmark.SyntheticData import CPreparedStockApi, gen_multi_level_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Snapshot.ChanParallel import can_parallel
+
+CODE = "SYN00000"
+LV_LIST = [KL_TYPE.K_DAY, KL_TYPE.K_60M, KL_TYPE.K_15M, KL_TYPE.K_5M, KL_TYPE.K_1M]
+
+
+def run(lv_list, parallel_cal, repeat):
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "parallel_cal": parallel_cal})
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chan = CChan(code=CODE, data_src=CPreparedStockApi, lv_list=lv_list, config=config)
+        cost = time.perf_counter() - t0
+        if best is None or cost < best[0]:
+            best = (cost, chan)
+    cost, chan = best
+    digest = hashlib.md5()
+    for lv_idx in range(len(lv_list)):
+        digest.update(step_signature(chan[lv_idx]))
+    return cost, digest.hexdigest()
+
+
+def bench(day_cnt, lv_list, workers, repeat):
+    bar_cnt = {lv.name: CPreparedStockApi.prepare(CODE, lv, gen_multi_level_klu(day_cnt, lv, seed=zlib.crc32(CODE.encode()))) for lv in lv_list}
+    res = {"bars": bar_cnt, "workers": workers, "cpu_count": os.cpu_count(), "can_parallel": can_parallel(), "levels": {}}
+    for lv_cnt in range(2, len(lv_list) + 1):
+        sub_lv_list = lv_list[:lv_cnt]
+        serial_cost, serial_digest = run(sub_lv_list, 0, repeat)
+        parallel_cost, parallel_digest = run(sub_lv_list, workers, repeat)
+        res["levels"][lv_cnt] = {
+            "lv_list": [lv.name for lv in sub_lv_list],
+            "serial_seconds": round(serial_cost, 3),
+            "parallel_seconds": round(parallel_cost, 3),
+            "speedup": round(serial_cost / parallel_cost, 2),
+            "same": serial_digest == parallel_digest,
+        }
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--day_cnt", type=int, default=250, help="交易日数，每天240根1分钟K线")
+    parser.add_argument("--lv", type=str, default=",".join(lv.name for lv in LV_LIST), help="级别列表，从高到低；依次统计前2个、前3个...级别")
+    parser.add_argument("--workers", type=int, default=4, help="parallel_cal，最多同时计算的子进程数")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.day_cnt, [KL_TYPE[lv] for lv in args.lv.split(",")], args.workers, args.repeat), indent=2))
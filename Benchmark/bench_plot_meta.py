@@ -0,0 +1,69 @@
+"""
+画图元数据：构造全部K线的CChanPlotMeta vs 只构造最后x_range根K线窗口内的CChanPlotMeta，
+并校验窗口内的合并K线/笔/线段/特征序列/中枢/买卖点和全量构造之后按同样条件过滤的结果一致
+python -m Benchmark.bench_plot_meta --n 1000000 --x_range 200,2000
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+
+from Benchmark.SyntheticData import CPreparedStockApi, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Plot.PlotMeta import CChanPlotMeta
+
+CODE = "SYN00000"
+
+
+def meta_signature(meta: CChanPlotMeta, x_begin: int):
+    # 按绘图时的过滤条件取出窗口内的元素
+    def attrs(obj):
+        return {k: v for k, v in vars(obj).items() if k not in ("klu_list", "tl", "sub_zs_lst", "ele")}
+    return {
+        "klc": [attrs(klc) for klc in meta.klc_list if klc.end_idx >= x_begin],
+        "klu": [klu.idx for klu in meta.klu_iter() if klu.idx >= x_begin],
+        "bi": [attrs(bi) for bi in meta.bi_list if bi.end_x >= x_begin],
+        "seg": [attrs(seg) for seg in meta.seg_list if seg.end_x >= x_begin],
+        "segseg": [attrs(seg) for seg in meta.segseg_list if seg.end_x >= x_begin],
+        "eigen": sorted(attrs(ele).items().__repr__() for fx in meta.eigenfx_lst + meta.seg_eigenfx_lst for ele in fx.ele if ele.end_x >= x_begin),
+        "zs": [(attrs(zs), [attrs(sub) for sub in zs.sub_zs_lst]) for zs in meta.zs_lst + meta.segzs_lst if zs.end >= x_begin],
+        "bsp": sorted(repr(attrs(bsp)) for bsp in meta.bs_point_lst + meta.seg_bsp_lst if bsp.x >= x_begin),
+        "tick": [meta.datetick[idx] for idx in range(x_begin, meta.klu_len, max(1, (meta.klu_len - x_begin) // 10))],
+    }
+
+
+def bench(n, x_range_lst):
+    CPreparedStockApi.prepare(CODE, KL_TYPE.K_1M, gen_random_walk_klu(n, KL_TYPE.K_1M, seed=zlib.crc32(CODE.encode())))
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False})
+    kl_list = CChan(code=CODE, data_src=CPreparedStockApi, lv_list=[KL_TYPE.K_1M], config=config)[0]
+
+    t0 = time.perf_counter()
+    full_meta = CChanPlotMeta(kl_list)
+    full_cost = time.perf_counter() - t0
+
+    res = {"bars": n, "full_seconds": round(full_cost, 4), "window": {}}
+    for x_range in x_range_lst:
+        x_begin = max(full_meta.klu_len - x_range, 0)
+        t0 = time.perf_counter()
+        meta = CChanPlotMeta(kl_list, x_begin=x_begin)
+        cost = time.perf_counter() - t0
+        res["window"][x_range] = {
+            "seconds": round(cost, 4),
+            "speedup": round(full_cost / cost, 1),
+            "klc": len(meta.klc_list),
+            "bi": len(meta.bi_list),
+            "same": meta_signature(meta, x_begin) == meta_signature(full_meta, x_begin),
+        }
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--x_range", type=str, default="200,2000", help="窗口K线数，逗号分隔")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.n, [int(x) for x in args.x_range.split(",")]), indent=2))
@@ -0,0 +1,79 @@
+"""
+多级别并发预读：模拟每个级别的数据源有网络延迟(创建时一次，之后每页一次)，对比逐级别串行读取和kl_prefetch并发预读的总耗时，
+输出每个级别的读取耗时，并校验两种方式计算结果一致
+python -m Benchmark.bench_prefetch --days 250 --init_ms 300 --page_ms 100
+"""
+import argparse
+import json
+import time
+
+from Benchmark.SyntheticData import CSyntheticMultiLevelApi
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+
+LV_LIST = [KL_TYPE.K_DAY, KL_TYPE.K_60M, KL_TYPE.K_5M]
+
+
+class CSlowMultiLevelApi(CSyntheticMultiLevelApi):
+    # 数据提前生成好，读取时只有模拟的网络等待
+    INIT_LATENCY = 0.3
+    PAGE_LATENCY = 0.1
+    PAGE_SIZE = 1000
+    data = {}
+
+    def SetBasciInfo(self):
+        time.sleep(self.INIT_LATENCY)
+        super().SetBasciInfo()
+
+    def get_kl_data(self):
+        key = (self.code, self.k_type, self.DAY_CNT)
+        if key not in self.data:
+            self.data[key] = list(super().get_kl_data())
+        klu_lst = self.data[key]
+        for begin in range(0, len(klu_lst), self.PAGE_SIZE):
+            time.sleep(self.PAGE_LATENCY)
+            yield from klu_lst[begin:begin + self.PAGE_SIZE]
+
+
+def chan_signature(chan):
+    return [
+        ([(bi.idx, bi.get_begin_klu().time.key, bi.get_end_klu().time.key, bi.is_sure) for bi in chan[lv].bi_list],
+         [(seg.start_bi.idx, seg.end_bi.idx) for seg in chan[lv].seg_list],
+         sorted((bsp.klu.time.key, bsp.is_buy, bsp.type2str()) for bsp in chan[lv].bs_point_lst.bsp_iter()))
+        for lv in chan.lv_list
+    ]
+
+
+def load(prefetch):
+    config = CChanConfig({"kl_prefetch": prefetch, "print_warning": False})
+    t0 = time.perf_counter()
+    chan = CChan(code="SYN00001", data_src=CSlowMultiLevelApi, lv_list=LV_LIST, config=config)
+    return chan, time.perf_counter() - t0
+
+
+def bench(days, init_ms, page_ms):
+    CSlowMultiLevelApi.DAY_CNT = days
+    CSlowMultiLevelApi.INIT_LATENCY, CSlowMultiLevelApi.PAGE_LATENCY = 0, 0
+    load(False)  # 先生成好数据
+    compute_cost = load(False)[1]  # 不含网络等待的纯计算耗时
+    CSlowMultiLevelApi.INIT_LATENCY, CSlowMultiLevelApi.PAGE_LATENCY = init_ms / 1000, page_ms / 1000
+    serial_chan, serial_cost = load(False)
+    prefetch_chan, prefetch_cost = load(True)
+    return {
+        "bars": {lv.name: len(list(serial_chan[lv].klu_iter())) for lv in LV_LIST},
+        "compute_only_s": round(compute_cost, 3),
+        "serial_s": round(serial_cost, 3),
+        "prefetch_s": round(prefetch_cost, 3),
+        "lv_fetch_stat": {lv.name: {k: round(v, 3) if isinstance(v, float) else v for k, v in stat.items()} for lv, stat in prefetch_chan.lv_fetch_stat.items()},
+        "same": chan_signature(serial_chan) == chan_signature(prefetch_chan),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=250, help="交易日数")
+    parser.add_argument("--init_ms", type=float, default=300, help="创建数据源(获取基本信息)的模拟延迟")
+    parser.add_argument("--page_ms", type=float, default=100, help="每页1000根K线的模拟延迟")
+    args = parser.parse_args()
+    print(json.dumps(bench(args.days, args.init_ms, args.page_ms), indent=2))
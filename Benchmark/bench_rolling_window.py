@@ -0,0 +1,126 @@
+"""
+BollModel/CTrendModel/KDJ 在不同窗口长度下，逐根全窗口重算与O(1)滚动窗口的速度和最大误差对比
+python -m Benchmark.bench_rolling_window --n 100000 --window 5 20 60 250
+"""
+import argparse
+import json
+import math
+import time
+
+from Benchmark.SyntheticData import gen_random_walk_klu
+from Common.CEnum import KL_TYPE, TREND_TYPE
+from Math.BOLL import BOLL_Metric, BollModel
+from Math.KDJ import KDJ
+from Math.TrendModel import CTrendModel
+
+
+def naive_boll(close_lst, N):
+    # 原实现：每根K线对整个窗口重新求均值和方差
+    arr, res = [], []
+    for value in close_lst:
+        arr.append(value)
+        if len(arr) > N:
+            arr = arr[-N:]
+        ma = sum(arr)/len(arr)
+        item = BOLL_Metric(ma, math.sqrt(sum((x-ma)**2 for x in arr) / len(arr)))
+        res.append((item.MID, item.theta))
+    return res
+
+
+def naive_trend(close_lst, trend_type, T):
+    func = {TREND_TYPE.MEAN: lambda a: sum(a)/len(a), TREND_TYPE.MAX: max, TREND_TYPE.MIN: min}[trend_type]
+    arr, res = [], []
+    for value in close_lst:
+        arr.append(value)
+        if len(arr) > T:
+            arr = arr[-T:]
+        res.append(func(arr))
+    return res
+
+
+def naive_kdj(klu_lst, period):
+    arr, res = [], []
+    pre_k, pre_d = 50, 50
+    for high, low, close in klu_lst:
+        arr.append((high, low))
+        if len(arr) > period:
+            arr.pop(0)
+        hn = max(x[0] for x in arr)
+        ln = min(x[1] for x in arr)
+        rsv = 100 * (close - ln) / (hn - ln) if hn != ln else 0.0
+        pre_k = 2 / 3 * pre_k + 1 / 3 * rsv
+        pre_d = 2 / 3 * pre_d + 1 / 3 * pre_k
+        res.append((pre_k, pre_d, 3 * pre_k - 2 * pre_d))
+    return res
+
+
+def rolling_boll(close_lst, N):
+    model = BollModel(N)
+    res = []
+    for value in close_lst:
+        item = model.add(value)
+        res.append((item.MID, item.theta))
+    return res
+
+
+def rolling_trend(close_lst, trend_type, T):
+    model = CTrendModel(trend_type, T)
+    return [model.add(value) for value in close_lst]
+
+
+def rolling_kdj(klu_lst, period):
+    model = KDJ(period)
+    res = []
+    for high, low, close in klu_lst:
+        item = model.add(high, low, close)
+        res.append((item.k, item.d, item.j))
+    return res
+
+
+def max_rel_err(lhs, rhs):
+    res = 0.0
+    for a, b in zip(lhs, rhs):
+        for x, y in zip(a, b) if isinstance(a, tuple) else [(a, b)]:
+            if x != y:
+                res = max(res, abs(x - y) / max(abs(x), 1e-7))
+    return res
+
+
+def timeit(func, *args):
+    t0 = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - t0
+
+
+def bench_one(name, window, naive_func, rolling_func, *args):
+    naive_res, naive_cost = timeit(naive_func, *args)
+    rolling_res, rolling_cost = timeit(rolling_func, *args)
+    return {
+        "model": name,
+        "window": window,
+        "naive_seconds": round(naive_cost, 3),
+        "rolling_seconds": round(rolling_cost, 3),
+        "speedup": round(naive_cost / rolling_cost, 2),
+        "max_rel_err": max_rel_err(naive_res, rolling_res),
+    }
+
+
+def bench(n, window_lst, seed):
+    klu_lst = [(klu.high, klu.low, klu.close) for klu in gen_random_walk_klu(n, KL_TYPE.K_1M, seed=seed)]
+    close_lst = [close for _, _, close in klu_lst]
+    res = []
+    for window in window_lst:
+        res.append(bench_one("boll", window, naive_boll, rolling_boll, close_lst, window))
+        for trend_type in TREND_TYPE:
+            res.append(bench_one(f"trend.{trend_type.name}", window, naive_trend, rolling_trend, close_lst, trend_type, window))
+        res.append(bench_one("kdj", window, naive_kdj, rolling_kdj, klu_lst, window))
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--window", type=int, nargs="+", default=[5, 20, 60, 250])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.n, args.window, args.seed), indent=2))
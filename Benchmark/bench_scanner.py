@@ -0,0 +1,41 @@
+"""
+多股票扫描吞吐：不同进程数下的 symbols/sec，并校验结果与进程数无关
+python -m Benchmark.bench_scanner --n 200 --workers 1 2 4
+"""
+import argparse
+import json
+
+from Benchmark.SyntheticData import CSyntheticStockApi
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Scanner.ChanScanner import CChanScanner
+
+
+def result_signature(res_lst):
+    return [(res.code, res.error, res.klu_cnt, [str(bsp) for bsp in res.bsp_lst]) for res in res_lst]
+
+
+def bench(n, workers_lst, bar_cnt):
+    CSyntheticStockApi.BAR_CNT = bar_cnt
+    code_list = [f"SYN{i:05d}" for i in range(n)]
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False})
+    res, base_sig = [], None
+    for max_workers in workers_lst:
+        scanner = CChanScanner(code_list, config, data_src=CSyntheticStockApi, lv_list=[KL_TYPE.K_DAY], max_workers=max_workers)
+        sig = result_signature(scanner.scan())
+        if base_sig is None:
+            base_sig = sig
+        stat = scanner.stat()
+        stat["max_workers"] = max_workers
+        stat["same_as_first"] = sig == base_sig
+        res.append(stat)
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    print(json.dumps(bench(args.n, args.workers, args.bars), indent=2))
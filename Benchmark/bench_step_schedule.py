@@ -0,0 +1,91 @@
+"""
+逐步模式(trigger_step)下step_load的总耗时：线段没有变化时跳过线段的线段/线段中枢/线段买卖点这一层，
+对比每次都重算所有层(关闭线段对象复用)的耗时，统计线段有变化的步数，并逐步校验两者输出一致
+python -m Benchmark.bench_step_schedule --n 50000
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+import zlib
+
+from Benchmark.SyntheticData import CPreparedStockApi, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Seg.SegListChan import CSegListChan
+from Seg.SegListComm import CSegListComm
+
+CODE = "SYN00000"
+
+
+def line_sig(line):
+    return line.idx, line.get_begin_klu().idx, line.get_end_klu().idx, line.is_sure, line.seg_idx, line.bsp.type2str() if line.bsp else None
+
+
+def zs_sig(zs):
+    return zs.begin_bi.idx, zs.end_bi.idx, zs.low, zs.high, zs.bi_in.idx if zs.bi_in else None, zs.bi_out.idx if zs.bi_out else None, str(zs)
+
+
+def step_signature(kl_list) -> bytes:
+    return repr((
+        [line_sig(bi) for bi in kl_list.bi_list],
+        [line_sig(seg) + tuple(str(zs) for zs in seg.zs_lst) for seg in kl_list.seg_list],
+        [line_sig(segseg) + tuple(str(zs) for zs in segseg.zs_lst) for segseg in kl_list.segseg_list],
+        [zs_sig(zs) for zs in kl_list.zs_list],
+        [zs_sig(zs) for zs in kl_list.segzs_list],
+        sorted((bsp.klu.idx, bsp.is_buy, bsp.type2str()) for bsp in kl_list.bs_point_lst.bsp_iter()),
+        sorted((bsp.klu.idx, bsp.is_buy, bsp.type2str()) for bsp in kl_list.seg_bs_point_lst.bsp_iter()),
+    )).encode()
+
+
+def run(config: CChanConfig, check: bool):
+    chan = CChan(code=CODE, data_src=CPreparedStockApi, lv_list=[KL_TYPE.K_1M], config=config)
+    seg_changed_cnt = 0
+    digest = hashlib.md5()
+    t0 = time.perf_counter()
+    for _ in chan.step_load():
+        seg_changed_cnt += chan[0].seg_changed
+        if check:
+            digest.update(step_signature(chan[0]))
+    cost = time.perf_counter() - t0
+    report = chan.perf_report()[KL_TYPE.K_1M.name]
+    return {
+        "seconds": round(cost, 3),
+        "stage_calls": {stage: item["calls"] for stage, item in report.items() if stage in ("seg", "segseg", "seg_bsp")},
+        "stage_seconds": {stage: round(item["seconds"], 3) for stage, item in report.items()},
+        "seg_changed_steps": seg_changed_cnt,
+        "step_digest": digest.hexdigest() if check else None,
+    }
+
+
+def bench(n, check):
+    CPreparedStockApi.prepare(CODE, KL_TYPE.K_1M, gen_random_walk_klu(n, KL_TYPE.K_1M, seed=zlib.crc32(CODE.encode())))
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "trigger_step": True, "perf_profile": True})
+
+    mutable_begin = CSegListChan.mutable_begin
+    CSegListChan.mutable_begin = CSegListComm.mutable_begin  # 不复用线段对象，每次都重算所有层
+    try:
+        full = run(config, check)
+    finally:
+        CSegListChan.mutable_begin = mutable_begin
+    scheduled = run(config, check)
+    res = {
+        "bars": n,
+        "recompute_all": full,
+        "scheduled": scheduled,
+        "speedup": round(full["seconds"] / scheduled["seconds"], 2),
+    }
+    if check:
+        res["same_every_step"] = full["step_digest"] == scheduled["step_digest"]
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--no_check", action="store_true", help="不逐步校验输出(校验本身有额外耗时)")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.n, not args.no_check), indent=2))
@@ -0,0 +1,66 @@
+"""
+逐步模式(trigger_step)下每根K线的延迟，以及中枢相关阶段(zs/zs_in_seg/segzs/segzs_in_seg)的累计耗时；
+输出中枢结果的摘要(含bi_in/bi_out/bi_lst以及线段的zs_lst)，改动前后各跑一次对比digest即可确认结果不变
+python -m Benchmark.bench_step_zs --n 20000
+"""
+import argparse
+import hashlib
+import json
+import time
+import zlib
+
+from Benchmark.bench_append_bar import latency_stat
+from Benchmark.SyntheticData import CPreparedStockApi, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+
+CODE = "SYN00000"
+ZS_STAGES = ["zs", "zs_in_seg", "segzs", "segzs_in_seg"]
+
+
+def zs_signature(kl_list):
+    def line_idx(line):
+        return None if line is None else line.idx
+
+    def zs_sig(zs):
+        return (
+            zs.begin_bi.idx, zs.end_bi.idx, zs.is_sure, zs.low, zs.high, zs.peak_low, zs.peak_high,
+            line_idx(zs.bi_in), line_idx(zs.bi_out), [bi.idx for bi in zs.bi_lst], [str(sub_zs) for sub_zs in zs.sub_zs_lst],
+        )
+    return (
+        [zs_sig(zs) for zs in kl_list.zs_list],
+        [zs_sig(zs) for zs in kl_list.segzs_list],
+        [[str(zs) for zs in seg.zs_lst] for seg in kl_list.seg_list],
+        [[str(zs) for zs in seg.zs_lst] for seg in kl_list.segseg_list],
+        sorted((bsp.klu.idx, bsp.is_buy, bsp.type2str()) for bsp in kl_list.bs_point_lst.bsp_iter()),
+    )
+
+
+def bench(n, zs_algo):
+    config = CChanConfig({"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False, "zs_algo": zs_algo, "trigger_step": True, "perf_profile": True})
+    CPreparedStockApi.prepare(CODE, KL_TYPE.K_1M, gen_random_walk_klu(n, KL_TYPE.K_1M, seed=zlib.crc32(CODE.encode())))
+    chan = CChan(code=CODE, data_src=CPreparedStockApi, lv_list=[KL_TYPE.K_1M], config=config)
+    cost = []
+    for klu in CPreparedStockApi.iter_klu(CODE, KL_TYPE.K_1M):
+        t0 = time.perf_counter()
+        chan.trigger_load({KL_TYPE.K_1M: [klu]})
+        cost.append(time.perf_counter() - t0)
+    report = chan.perf_report()[KL_TYPE.K_1M.name]
+    return {
+        "bars": n,
+        "zs_algo": zs_algo,
+        "per_bar": latency_stat(cost),
+        "total_seconds": round(sum(cost), 3),
+        "zs_stage_seconds": {stage: round(report[stage]["seconds"], 4) for stage in ZS_STAGES},
+        "zs_cnt": len(chan[0].zs_list),
+        "digest": hashlib.md5(repr(zs_signature(chan[0])).encode()).hexdigest(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--zs_algo", type=str, nargs="+", default=["normal", "over_seg", "auto"])
+    args = parser.parse_args()
+    print(json.dumps([bench(args.n, zs_algo) for zs_algo in args.zs_algo], indent=2))
@@ -0,0 +1,210 @@
+"""
+可复现的基准测试集：数据全部由固定seed的合成K线生成，不依赖网络和本地文件，结果输出为JSON，便于不同版本、不同机器之间对比
+场景：
+    single_level_load: 单级别一次性加载
+    multi_level_load: 多级别(天/30分/5分)联立一次性加载
+    step_load: trigger_step逐根回放
+    trigger_load: trigger_step模式下逐根trigger_load喂K线
+    plot_meta: 构造CChanPlotMeta
+    pickle_dump / pickle_load: chan_dump_pickle / chan_load_pickle
+每个场景输出最好一次的耗时、bars/sec、tracemalloc统计的峰值内存，以及perf_profile统计的各计算阶段耗时
+python -m Benchmark.bench_suite --n 100000 --out result.json
+python -m Benchmark.bench_suite --scenario single_level_load,step_load --repeat 1
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Benchmark.SyntheticData import CPreparedStockApi, gen_multi_level_klu, gen_random_walk_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Plot.PlotMeta import CChanPlotMeta
+
+CODE = "SYN00000"
+SINGLE_LV = KL_TYPE.K_1M
+MULTI_LV_LIST = [KL_TYPE.K_DAY, KL_TYPE.K_30M, KL_TYPE.K_5M]
+BASE_CONFIG = {"bs_type": "1,1p,2,2s,3a,3b", "print_warning": False}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def env_info() -> dict:
+    return {
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def new_chan(lv_list: List[KL_TYPE], conf: dict) -> CChan:
+    return CChan(code=CODE, data_src=CPreparedStockApi, lv_list=lv_list, config=CChanConfig(dict(BASE_CONFIG, **conf)))
+
+
+class CScenario:
+    # prepare在计时之外执行，返回run的输入；run返回(处理的K线数, 用来读取各阶段耗时的CChan)
+    def __init__(self, prepare: Callable[[argparse.Namespace], object], run: Callable[[object, dict], Tuple[int, Optional[CChan]]]):
+        self.prepare = prepare
+        self.run = run
+
+
+def prepare_single(args):
+    return {"bars": CPreparedStockApi.prepare(CODE, SINGLE_LV, gen_random_walk_klu(args.n, SINGLE_LV, seed=args.seed))}
+
+
+def prepare_step(args):
+    return {"bars": CPreparedStockApi.prepare(CODE, SINGLE_LV, gen_random_walk_klu(args.step_n, SINGLE_LV, seed=args.seed))}
+
+
+def prepare_multi(args):
+    return {"bars": sum(CPreparedStockApi.prepare(CODE, lv, gen_multi_level_klu(args.day_cnt, lv, seed=args.seed)) for lv in MULTI_LV_LIST)}
+
+
+def run_single(state, conf):
+    return state["bars"], new_chan([SINGLE_LV], conf)
+
+
+def run_multi(state, conf):
+    return state["bars"], new_chan(MULTI_LV_LIST, conf)
+
+
+def run_step(state, conf):
+    chan = new_chan([SINGLE_LV], dict(conf, trigger_step=True))
+    for _ in chan.step_load():
+        ...
+    return state["bars"], chan
+
+
+def run_trigger(state, conf):
+    chan = new_chan([SINGLE_LV], dict(conf, trigger_step=True))
+    for klu in CPreparedStockApi.iter_klu(CODE, SINGLE_LV):
+        chan.trigger_load({SINGLE_LV: [klu]})
+    return state["bars"], chan
+
+
+def prepare_loaded(args):
+    state = prepare_single(args)
+    state["chan"] = run_single(state, {})[1]
+    return state
+
+
+def run_plot_meta(state, conf):
+    CChanPlotMeta(state["chan"][0])
+    return state["bars"], None
+
+
+def prepare_pickle_load(args):
+    state = prepare_loaded(args)
+    state["tmp_dir"] = tempfile.mkdtemp()
+    state["path"] = os.path.join(state["tmp_dir"], "chan.pkl")
+    state["chan"].chan_dump_pickle(state["path"])
+    return state
+
+
+def run_pickle_dump(state, conf):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state["chan"].chan_dump_pickle(os.path.join(tmp_dir, "chan.pkl"))
+    return state["bars"], None
+
+
+def run_pickle_load(state, conf):
+    CChan.chan_load_pickle(state["path"])
+    return state["bars"], None
+
+
+SCENARIOS: Dict[str, CScenario] = {
+    "single_level_load": CScenario(prepare_single, run_single),
+    "multi_level_load": CScenario(prepare_multi, run_multi),
+    "step_load": CScenario(prepare_step, run_step),
+    "trigger_load": CScenario(prepare_step, run_trigger),
+    "plot_meta": CScenario(prepare_loaded, run_plot_meta),
+    "pickle_dump": CScenario(prepare_loaded, run_pickle_dump),
+    "pickle_load": CScenario(prepare_pickle_load, run_pickle_load),
+}
+
+
+def bench_scenario(name: str, args) -> dict:
+    scenario = SCENARIOS[name]
+    state = scenario.prepare(args)
+    cost = []
+    for _ in range(args.repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        bars, _ = scenario.run(state, {})
+        cost.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    scenario.run(state, {})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "scenario": name,
+        "bars": bars,
+        "seconds": round(min(cost), 4),
+        "bars_per_sec": round(bars / min(cost), 1),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+    gc.collect()
+    _, chan = scenario.run(state, {"perf_profile": True})
+    if chan is not None:
+        result["stages"] = {
+            lv: {stage: round(item["seconds"], 4) for stage, item in report.items()}
+            for lv, report in chan.perf_report().items()
+        }
+    if "tmp_dir" in state:
+        os.remove(state["path"])
+        os.rmdir(state["tmp_dir"])
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", type=str, default=",".join(SCENARIOS), help="逗号分隔，默认全部")
+    parser.add_argument("--n", type=int, default=100000, help="单级别加载/绘图/pickle的K线数")
+    parser.add_argument("--day_cnt", type=int, default=250, help="多级别加载的交易日数")
+    parser.add_argument("--step_n", type=int, default=5000, help="step_load/trigger_load的K线数")
+    parser.add_argument("--repeat", type=int, default=3, help="计时重复次数，取最好一次")
+    parser.add_argument("--seed", type=int, default=zlib.crc32(CODE.encode()))
+    parser.add_argument("--out", type=str, default=None, help="结果另存为JSON文件")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x100000)  # 一次性计算线段和pickle时递归深度和历史长度成正比
+
+    res = {
+        "env": env_info(),
+        "params": {key: value for key, value in vars(args).items() if key != "out"},
+        "results": [bench_scenario(name, args) for name in args.scenario.split(",")],
+    }
+    output = json.dumps(res, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
@@ -0,0 +1,75 @@
+"""
+参数扫描：每组配置单独计算一个CChan vs CChanSweep按阶段共用前缀，统计耗时和各阶段实际计算次数，
+并校验每组配置每个级别的笔/线段/中枢/买卖点和单独计算完全一致
+python -m Benchmark.bench_sweep --day_cnt 60
+python -m Benchmark.bench_sweep --day_cnt 60 --workers 4
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import sys
+import time
+import zlib
+
+from Benchmark.bench_step_schedule import step_signature
+from Benchmark.SyntheticData import CPreparedStockApi, gen_multi_level_klu
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Sweep.ChanSweep import CChanSweep
+
+CODE = "SYN00000"
+LV_LIST = [KL_TYPE.K_60M, KL_TYPE.K_5M]
+GRID = {
+    "bi_strict": [True, False],
+    "seg_algo": ["chan"],
+    "zs_algo": ["normal", "over_seg"],
+    "divergence_rate": [0.8, 0.9, float("inf")],
+    "min_zs_cnt": [0, 1],
+    "macd_algo": ["peak", "area", "slope"],
+    "bs_type": ["1,1p,2,2s,3a,3b"],
+}
+
+
+def chan_digest(chan: CChan) -> str:
+    digest = hashlib.md5()
+    for lv_idx in range(len(chan.lv_list)):
+        digest.update(step_signature(chan[lv_idx]))
+    return digest.hexdigest()
+
+
+def bench(day_cnt, lv_list, workers):
+    bar_cnt = {lv.name: CPreparedStockApi.prepare(CODE, lv, gen_multi_level_klu(day_cnt, lv, seed=zlib.crc32(CODE.encode()))) for lv in lv_list}
+    base = {"print_warning": False}
+    config_list = [dict(base, **dict(zip(GRID, values))) for values in itertools.product(*GRID.values())]
+
+    t0 = time.perf_counter()
+    naive_digest = [chan_digest(CChan(code=CODE, data_src=CPreparedStockApi, lv_list=lv_list, config=CChanConfig(dict(conf)))) for conf in config_list]
+    naive_cost = time.perf_counter() - t0
+
+    sweeper = CChanSweep(CODE, config_list, data_src=CPreparedStockApi, lv_list=lv_list, max_workers=workers, result_func=chan_digest)
+    res_lst = sweeper.sweep()
+    stat = sweeper.stat()
+    return {
+        "bars": bar_cnt,
+        "configs": len(config_list),
+        "workers": workers,
+        "naive_seconds": round(naive_cost, 3),
+        "sweep_seconds": round(stat["elapsed"], 3),
+        "speedup": round(naive_cost / stat["elapsed"], 2),
+        "configs_per_sec": round(stat["configs_per_sec"], 2),
+        "recal_cnt": stat["recal_cnt"],
+        "error": stat["error"],
+        "same": [res.extra for res in res_lst] == naive_digest,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--day_cnt", type=int, default=60, help="交易日数，每天240根1分钟K线")
+    parser.add_argument("--lv", type=str, default=",".join(lv.name for lv in LV_LIST), help="级别列表，从高到低")
+    parser.add_argument("--workers", type=int, default=1, help="CChanSweep的max_workers，<=1时不开子进程")
+    args = parser.parse_args()
+    sys.setrecursionlimit(0x10000)
+    print(json.dumps(bench(args.day_cnt, [KL_TYPE[lv] for lv in args.lv.split(",")], args.workers), indent=2))
@@ -1,13 +1,23 @@
 from typing import List, Optional
 
-from Common.cache import make_cache
+from Common.cache import cache_slots, make_cache, reset_cache
 from Common.CEnum import BI_DIR, BI_TYPE, DATA_FIELD, FX_TYPE, MACD_ALGO
 from Common.ChanException import CChanException, ErrCode
+from Common.state_util import get_slots_state, set_slots_state
 from KLine.KLine import CKLine
 from KLine.KLine_Unit import CKLine_Unit
 
 
 class CBi:
+    __slots__ = (
+        "__begin_klc", "__end_klc", "__dir", "__idx", "__type", "__is_sure", "__sure_end", "__seg_idx",
+        "parent_seg", "bsp", "next", "pre",
+    ) + cache_slots(
+        "get_begin_val", "get_end_val", "get_begin_klu", "get_end_klu", "amp", "get_klu_cnt", "get_klc_cnt", "_high", "_low", "_mid",
+        "is_down", "is_up", "Cal_Rsi", "Cal_MACD_area", "Cal_MACD_peak", "Cal_MACD_half_obverse", "Cal_MACD_half_reverse",
+        "Cal_MACD_diff", "Cal_MACD_slope", "Cal_MACD_amp",
+    )
+
     def __init__(self, begin_klc: CKLine, end_klc: CKLine, idx: int, is_sure: bool):
         # self.__begin_klc = begin_klc
         # self.__end_klc = end_klc
@@ -31,8 +41,11 @@ class CBi:
         self.next: Optional[CBi] = None
         self.pre: Optional[CBi] = None
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     def clean_cache(self):
-        self._memoize_cache = {}
+        reset_cache(self)
 
     @property
     def begin_klc(self): return self.__begin_klc
@@ -15,6 +15,22 @@ class CBiList:
 
         self.free_klc_lst = []  # 仅仅用作第一笔未画出来之前的缓存，为了获得更精准的结果而已，不加这块逻辑其实对后续计算没太大影响
 
+        self.dirty_idx = 0  # 上次pop_dirty_idx之后新增/删除/修改过的笔中最小的idx
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("dirty_idx", 0)  # 旧版本pickle没有这个属性
+
+    def mark_dirty(self, idx: int):
+        if idx < self.dirty_idx:
+            self.dirty_idx = idx
+
+    def pop_dirty_idx(self) -> int:
+        # 返回并清空变化起点；最后一笔的结束K线可能还在合并，总是算作有变化
+        res = min(self.dirty_idx, len(self.bi_list) - 1)
+        self.dirty_idx = len(self.bi_list)
+        return max(res, 0)
+
     def __str__(self):
         return "\n".join([str(bi) for bi in self.bi_list])
 
@@ -75,6 +91,7 @@ class CBiList:
             return False
         _tmp_last_bi = self.bi_list[-1]
         self.bi_list.pop()
+        self.mark_dirty(len(self.bi_list) - 1)
         if not self.try_update_end(klc, for_virtual=for_virtual):
             self.bi_list.append(_tmp_last_bi)
             return False
@@ -105,6 +122,7 @@ class CBiList:
     def delete_virtual_bi(self):
         if len(self) > 0 and not self.bi_list[-1].is_sure:
             sure_end_list = [klc for klc in self.bi_list[-1].sure_end]
+            self.mark_dirty(len(self.bi_list) - 1)
             if len(sure_end_list):
                 self.bi_list[-1].restore_from_virtual_end(sure_end_list[0])
                 self.last_end = self[-1].end_klc
@@ -126,6 +144,7 @@ class CBiList:
             return False
         if (self[-1].is_up() and klc.high >= self[-1].end_klc.high) or (self[-1].is_down() and klc.low <= self[-1].end_klc.low):
             # 更新最后一笔
+            self.mark_dirty(len(self.bi_list) - 1)
             self.bi_list[-1].update_virtual_end(klc)
             return True
         _tmp_klc = klc
@@ -141,6 +160,7 @@ class CBiList:
         return False
 
     def add_new_bi(self, pre_klc, cur_klc, is_sure=True):
+        self.mark_dirty(len(self.bi_list))
         self.bi_list.append(CBi(pre_klc, cur_klc, idx=len(self.bi_list), is_sure=is_sure))
         if len(self.bi_list) >= 2:
             self.bi_list[-2].next = self.bi_list[-1]
@@ -203,6 +223,7 @@ class CBiList:
         last_bi = self.bi_list[-1]
         if (last_bi.is_up() and check_top(klc, for_virtual) and klc.high >= last_bi.get_end_val()) or \
            (last_bi.is_down() and check_bottom(klc, for_virtual) and klc.low <= last_bi.get_end_val()):
+            self.mark_dirty(last_bi.idx)
             last_bi.update_virtual_end(klc) if for_virtual else last_bi.update_new_end(klc)
             self.last_end = klc
             return True
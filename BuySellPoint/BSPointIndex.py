@@ -0,0 +1,88 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Common.CEnum import BSP_TYPE
+
+from .BS_Point import CBS_Point
+
+
+class CBSPointIndex:
+    """
+    买卖点按bi.idx排序的索引，由CBSPointList和bsp_store_dict同步增量维护：
+    新买卖点按bi.idx插入(基本都在尾部)，失效的买卖点总是bi.idx最大的一段，直接截断；
+    全部买卖点、每个(类型, 方向)、每个方向各一个有序的bi.idx列表，买卖点对象从bsp_store_flat_dict取；
+    买卖点K线时间和bi.idx同序，时间区间先在全部列表上二分换算成bi.idx区间，再到对应列表上二分
+    """
+    def __init__(self):
+        self.bi_idx_lst: List[int] = []
+        self.ts_lst: List[int] = []  # 和bi_idx_lst一一对应，买卖点K线时间的CTime.key
+        self.key_dict: Dict[Tuple[Optional[BSP_TYPE], bool], List[int]] = {}  # (类型, is_buy) -> bi.idx列表，类型为None表示该方向的全部买卖点
+
+    def __len__(self):
+        return len(self.bi_idx_lst)
+
+    def add(self, bsp: CBS_Point):
+        bi_idx = bsp.bi.idx
+        pos = bisect_left(self.bi_idx_lst, bi_idx)
+        assert pos == len(self.bi_idx_lst) or self.bi_idx_lst[pos] != bi_idx
+        self.bi_idx_lst.insert(pos, bi_idx)
+        self.ts_lst.insert(pos, bsp.klu.time.key)
+        self.add_key(None, bsp)
+        for bs_type in bsp.type:
+            self.add_key(bs_type, bsp)
+
+    def add_key(self, bs_type: Optional[BSP_TYPE], bsp: CBS_Point):
+        # 已有买卖点增加类型时也调用这里
+        lst = self.key_dict.setdefault((bs_type, bsp.is_buy), [])
+        pos = bisect_left(lst, bsp.bi.idx)
+        if pos == len(lst) or lst[pos] != bsp.bi.idx:
+            lst.insert(pos, bsp.bi.idx)
+
+    def truncate(self, bi_idx: int):
+        # 删除bi.idx>=bi_idx的买卖点
+        pos = bisect_left(self.bi_idx_lst, bi_idx)
+        del self.bi_idx_lst[pos:]
+        del self.ts_lst[pos:]
+        for lst in self.key_dict.values():
+            del lst[bisect_left(lst, bi_idx):]
+
+    def build(self, bsp_iter: Iterable[CBS_Point]):
+        self.bi_idx_lst, self.ts_lst, self.key_dict = [], [], {}
+        for bsp in sorted(bsp_iter, key=lambda bsp: bsp.bi.idx):
+            self.add(bsp)
+
+    def key_lst(self, types: Optional[Iterable[BSP_TYPE]], is_buy: Optional[bool]) -> List[List[int]]:
+        dir_lst = [True, False] if is_buy is None else [is_buy]
+        type_lst: List[Optional[BSP_TYPE]] = [None] if types is None else list(types)
+        return [self.key_dict[key] for key in ((bs_type, _dir) for bs_type in type_lst for _dir in dir_lst) if key in self.key_dict]
+
+    def query(self, begin_ts: Optional[int] = None, end_ts: Optional[int] = None, types: Optional[Iterable[BSP_TYPE]] = None, is_buy: Optional[bool] = None) -> List[int]:
+        # 时间在[begin_ts, end_ts]之间的买卖点的bi.idx，从旧到新
+        begin_pos = 0 if begin_ts is None else bisect_left(self.ts_lst, begin_ts)
+        end_pos = len(self.ts_lst) if end_ts is None else bisect_right(self.ts_lst, end_ts)
+        if begin_pos >= end_pos:
+            return []
+        if types is None and is_buy is None:
+            return self.bi_idx_lst[begin_pos:end_pos]
+        begin_bi_idx, end_bi_idx = self.bi_idx_lst[begin_pos], self.bi_idx_lst[end_pos-1] + 1
+        res: List[int] = []
+        key_lst = self.key_lst(types, is_buy)
+        for lst in key_lst:
+            res.extend(lst[bisect_left(lst, begin_bi_idx):bisect_left(lst, end_bi_idx)])
+        return sorted(set(res)) if len(key_lst) > 1 else res
+
+    def latest(self, number: int, types: Optional[Iterable[BSP_TYPE]] = None, is_buy: Optional[bool] = None) -> List[int]:
+        # 最近number个买卖点的bi.idx，从新到旧；number=0则取全部
+        key_lst = [self.bi_idx_lst] if types is None and is_buy is None else self.key_lst(types, is_buy)
+        if len(key_lst) == 1:
+            lst = key_lst[0] if number == 0 else key_lst[0][-number:]
+            return lst[::-1]
+        res: List[int] = []
+        for bi_idx in heapq.merge(*(reversed(lst) for lst in key_lst), reverse=True):
+            if res and res[-1] == bi_idx:  # 同一个买卖点有多个类型
+                continue
+            res.append(bi_idx)
+            if len(res) == number:
+                break
+        return res
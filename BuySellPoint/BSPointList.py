@@ -3,12 +3,14 @@ from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
 from Common.CEnum import BSP_TYPE
+from Common.CTime import CTime
 from Common.func_util import has_overlap
 from Seg.Seg import CSeg
 from Seg.SegListComm import CSegListComm
 from ZS.ZS import CZS
 
 from .BS_Point import CBS_Point
+from .BSPointIndex import CBSPointIndex
 from .BSPointConfig import CBSPointConfig, CPointConfig
 
 LINE_TYPE = TypeVar('LINE_TYPE', CBi, CSeg[CBi])
@@ -23,10 +25,18 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
         self.bsp1_list: List[CBS_Point[LINE_TYPE]] = []
         self.bsp1_dict: Dict[int, CBS_Point[LINE_TYPE]] = {}
 
+        self.index = CBSPointIndex()  # bsp_store_dict中买卖点按bi.idx/时间/类型的索引
+
         self.config = bs_point_config
         self.last_sure_pos = -1
         self.last_sure_seg_idx = 0
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "index" not in state:  # 旧版本pickle没有索引
+            self.index = CBSPointIndex()
+            self.index.build(self.bsp_iter())
+
     def store_add_bsp(self, bsp_type: BSP_TYPE, bsp: CBS_Point[LINE_TYPE]):
         if bsp_type not in self.bsp_store_dict:
             self.bsp_store_dict[bsp_type] = ([], [])
@@ -34,6 +44,7 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
             assert self.bsp_store_dict[bsp_type][bsp.is_buy][-1].bi.idx < bsp.bi.idx, f"{bsp_type}, {bsp.is_buy} {self.bsp_store_dict[bsp_type][bsp.is_buy][-1].bi.idx} {bsp.bi.idx}"
         self.bsp_store_dict[bsp_type][bsp.is_buy].append(bsp)
         self.bsp_store_flat_dict[bsp.bi.idx] = bsp
+        self.index.add(bsp)
 
     def add_bsp1(self, bsp: CBS_Point[LINE_TYPE]):
         if len(self.bsp1_list) > 0:
@@ -42,15 +53,20 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
         self.bsp1_dict[bsp.bi.idx] = bsp
 
     def clear_store_end(self):
+        min_del_bi_idx = None
         for bsp_list in self.bsp_store_dict.values():
             for is_buy in [True, False]:
                 while len(bsp_list[is_buy]) > 0:
                     if bsp_list[is_buy][-1].bi.get_end_klu().idx <= self.last_sure_pos:
                         break
                     del self.bsp_store_flat_dict[bsp_list[is_buy][-1].bi.idx]
+                    if min_del_bi_idx is None or bsp_list[is_buy][-1].bi.idx < min_del_bi_idx:
+                        min_del_bi_idx = bsp_list[is_buy][-1].bi.idx
                     # 同时把失效买卖点从Bi删除
                     bsp_list[is_buy][-1].bi.bsp = None
                     bsp_list[is_buy].pop()
+        if min_del_bi_idx is not None:
+            self.index.truncate(min_del_bi_idx)  # 删除的是bi.idx最大的一段(结束K线在last_sure_pos之后)
 
     def clear_bsp1_end(self):
         while len(self.bsp1_list) > 0:
@@ -133,6 +149,7 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
         if exist_bsp := self.bsp_store_flat_dict.get(bi.idx):
             assert exist_bsp.is_buy == is_buy
             exist_bsp.add_another_bsp_prop(bs_type, relate_bsp1)
+            self.index.add_key(bs_type, exist_bsp)
             return
         if bs_type not in self.config.GetBSConfig(is_buy).target_types:
             is_target_bsp = False
@@ -376,13 +393,27 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
     def getSortedBspList(self) -> List[CBS_Point[LINE_TYPE]]:
         return sorted(self.bsp_iter(), key=lambda bsp: bsp.bi.idx)
 
-    def get_latest_bsp(self, number: int) -> List[CBS_Point[LINE_TYPE]]:
-        res = []
-        for bsp in self.bsp_iter_v2():
-            res.append(bsp)
-            if number != 0 and len(res) >= number:
-                break
-        return res
+    def get_latest_bsp(self, number: int, types: Optional[Iterable[BSP_TYPE]] = None, is_buy: Optional[bool] = None) -> List[CBS_Point[LINE_TYPE]]:
+        # 从新到旧，number=0则取全部；types为买卖点类型列表，有其中任一类型即可
+        return [self.bsp_store_flat_dict[bi_idx] for bi_idx in self.index.latest(number, types, is_buy)]
+
+    def query_bsp(
+        self,
+        begin_time: Optional[CTime] = None,
+        end_time: Optional[CTime] = None,
+        types: Optional[Iterable[BSP_TYPE]] = None,
+        is_buy: Optional[bool] = None,
+    ) -> List[CBS_Point[LINE_TYPE]]:
+        # 买卖点K线时间在[begin_time, end_time]之间的买卖点，从旧到新
+        return [
+            self.bsp_store_flat_dict[bi_idx]
+            for bi_idx in self.index.query(
+                None if begin_time is None else begin_time.key,
+                None if end_time is None else end_time.key,
+                types,
+                is_buy,
+            )
+        ]
 
 
 def bsp2s_break_bsp1(bsp2s_bi: LINE_TYPE, bsp2_break_bi: LINE_TYPE) -> bool:
@@ -3,12 +3,15 @@ from typing import Dict, Generic, List, Optional, TypeVar, Union
 from Bi.Bi import CBi
 from ChanModel.Features import CFeatures
 from Common.CEnum import BSP_TYPE
+from Common.state_util import get_slots_state, set_slots_state
 from Seg.Seg import CSeg
 
 LINE_TYPE = TypeVar('LINE_TYPE', CBi, CSeg)
 
 
 class CBS_Point(Generic[LINE_TYPE]):
+    __slots__ = ("bi", "klu", "is_buy", "type", "relate_bsp1", "features", "is_segbsp")
+
     def __init__(self, bi: LINE_TYPE, is_buy, bs_type: BSP_TYPE, relate_bsp1: Optional['CBS_Point'], feature_dict=None):
         self.bi: LINE_TYPE = bi
         self.klu = bi.get_end_klu()
@@ -21,6 +24,9 @@ class CBS_Point(Generic[LINE_TYPE]):
 
         self.is_segbsp = False
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     def add_type(self, bs_type: BSP_TYPE):
         self.type.append(bs_type)
 
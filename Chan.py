@@ -1,19 +1,26 @@
 import copy
 import datetime
+import json
 import pickle
 import sys
 from collections import defaultdict
-from typing import Dict, Iterable, List, Optional, Union
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Type, Union
 
 from BuySellPoint.BS_Point import CBS_Point
 from ChanConfig import CChanConfig
-from Common.CEnum import AUTYPE, DATA_SRC, KL_TYPE
+from Common.CEnum import AUTYPE, BSP_TYPE, DATA_SRC, KL_TYPE
 from Common.ChanException import CChanException, ErrCode
 from Common.CTime import CTime
+from Common.PrefetchIter import CPrefetchIter
 from Common.func_util import check_kltype_order, kltype_lte_day
 from DataAPI.CommonStockAPI import CCommonStockApi
 from KLine.KLine_List import CKLine_List
+from KLine.KLine_Snapshot import CKLine_Diff, CKLine_Snapshot
 from KLine.KLine_Unit import CKLine_Unit
+from Snapshot.ChanFork import fork_chan
+from Snapshot.ChanParallel import can_parallel, parallel_cal_seg_and_zs
+from Snapshot.ChanSnapshot import CChanSnapshot
 
 
 class CChan:
@@ -22,7 +29,7 @@ class CChan:
         code,
         begin_time=None,
         end_time=None,
-        data_src: Union[DATA_SRC, str] = DATA_SRC.BAO_STOCK,
+        data_src: Union[DATA_SRC, str, Type[CCommonStockApi]] = DATA_SRC.BAO_STOCK,
         lv_list=None,
         config=None,
         autype: AUTYPE = AUTYPE.QFQ,
@@ -45,6 +52,7 @@ class CChan:
         self.kl_inconsistent_detail = defaultdict(list)
 
         self.g_kl_iter = defaultdict(list)
+        self.lv_fetch_stat: Dict[KL_TYPE, dict] = {}  # kl_prefetch开启时每个级别的读取耗时
 
         self.do_init()
 
@@ -66,6 +74,7 @@ class CChan:
         obj.kl_misalign_cnt = self.kl_misalign_cnt
         obj.kl_inconsistent_detail = copy.deepcopy(self.kl_inconsistent_detail, memo)
         obj.g_kl_iter = copy.deepcopy(self.g_kl_iter, memo)
+        obj.lv_fetch_stat = copy.deepcopy(getattr(self, "lv_fetch_stat", {}), memo)
         if hasattr(self, 'klu_cache'):
             obj.klu_cache = copy.deepcopy(self.klu_cache, memo)
         if hasattr(self, 'klu_last_t'):
@@ -82,6 +91,11 @@ class CChan:
                     memo[id(klu)].sub_kl_list = [memo[id(sub_kl)] for sub_kl in klu.sub_kl_list]
         return obj
 
+    def fork(self) -> 'CChan':
+        # 结构共享复制：已确定的部分两边共用，只复制会被重算的尾部，之后两边可以各自追加不同的K线
+        # 新对象没有update_bar用的回滚状态，需要先append_bar
+        return fork_chan(self)
+
     def do_init(self):
         self.kl_datas: Dict[KL_TYPE, CKLine_List] = {}
         for idx in range(len(self.lv_list)):
@@ -95,6 +109,7 @@ class CChan:
 
     def get_load_stock_iter(self, stockapi_cls, lv):
         stockapi_instance = stockapi_cls(code=self.code, k_type=lv, begin_date=self.begin_time, end_date=self.end_time, autype=self.autype)
+        stockapi_instance.klu_view = self.conf.kl_columnar
         return self.load_stock_data(stockapi_instance, lv)
 
     def add_lv_iter(self, lv_idx, iter):
@@ -103,19 +118,19 @@ class CChan:
         else:
             self.g_kl_iter[lv_idx].append(iter)
 
-    def get_next_lv_klu(self, lv_idx):
+    def get_next_lv_klu(self, lv_idx, default=...):
+        # 依次读取该级别的各个数据迭代器；都读完时返回default，没有传default时抛StopIteration
         if isinstance(lv_idx, int):
             lv_idx = self.lv_list[lv_idx]
-        if len(self.g_kl_iter[lv_idx]) == 0:
+        iter_lst = self.g_kl_iter[lv_idx]
+        while iter_lst:
+            kline_unit = next(iter_lst[0], None)
+            if kline_unit is not None:
+                return kline_unit
+            iter_lst.pop(0)
+        if default is ...:
             raise StopIteration
-        try:
-            return self.g_kl_iter[lv_idx][0].__next__()
-        except StopIteration:
-            self.g_kl_iter[lv_idx] = self.g_kl_iter[lv_idx][1:]
-            if len(self.g_kl_iter[lv_idx]) != 0:
-                return self.get_next_lv_klu(lv_idx)
-            else:
-                raise
+        return default
 
     def step_load(self):
         assert self.conf.trigger_step
@@ -129,12 +144,15 @@ class CChan:
         if not yielded:
             yield self
 
-    def trigger_load(self, inp):
-        # {type: [klu, ...]}
+    def init_klu_cache(self):
         if not hasattr(self, 'klu_cache'):
             self.klu_cache: List[Optional[CKLine_Unit]] = [None for _ in self.lv_list]
         if not hasattr(self, 'klu_last_t'):
             self.klu_last_t = [CTime(1980, 1, 1, 0, 0) for _ in self.lv_list]
+
+    def trigger_load(self, inp):
+        # {type: [klu, ...]}
+        self.init_klu_cache()
         for lv_idx, lv in enumerate(self.lv_list):
             if lv not in inp:
                 if lv_idx == 0:
@@ -147,16 +165,116 @@ class CChan:
         for _ in self.load_iterator(lv_idx=0, parent_klu=None, step=False):
             ...
         if not self.conf.trigger_step:  # 非回放模式全部算完之后才算一次中枢和线段
-            for lv in self.lv_list:
-                self.kl_datas[lv].cal_seg_and_zs()
+            self.cal_all_seg_and_zs()
+
+    def cal_all_seg_and_zs(self):
+        # 各级别互不依赖，parallel_cal>1时在子进程里并行计算(需要支持fork且多核)
+        if self.conf.parallel_cal > 1 and len(self.lv_list) > 1 and can_parallel():
+            parallel_cal_seg_and_zs(self, self.conf.parallel_cal)
+            return
+        for lv in self.lv_list:
+            self.kl_datas[lv].cal_seg_and_zs()
+
+    def get_lv_idx(self, lv) -> int:
+        if isinstance(lv, KL_TYPE):
+            if lv not in self.lv_list:
+                raise CChanException(f"{lv} not in lv_list", ErrCode.PARA_ERROR)
+            return self.lv_list.index(lv)
+        return lv
+
+    def get_live_parent_klu(self, lv_idx: int, klu: CKLine_Unit) -> Optional[CKLine_Unit]:
+        if lv_idx == 0:
+            return None
+        if len(self[lv_idx-1]) == 0:
+            raise CChanException(f"父级别{self.lv_list[lv_idx-1]}还没有K线", ErrCode.KL_DATA_NOT_ALIGN)
+        parent_klu = self[lv_idx-1][-1][-1]
+        if klu.time > parent_klu.time:
+            raise CChanException(f"次级别K线时间{klu.time}晚于父级别最后一根K线{parent_klu.time}，需要先追加父级别K线", ErrCode.KL_DATA_NOT_ALIGN)
+        return parent_klu
+
+    def check_live_klu_time(self, klu: CKLine_Unit, pre_klu: Optional[CKLine_Unit]):
+        if pre_klu is not None and not klu.time > pre_klu.time:
+            raise CChanException(f"kline time err, cur={klu.time}, last={pre_klu.time}", ErrCode.KL_NOT_MONOTONOUS)
+
+    def add_live_klu(self, lv_idx: int, klu: CKLine_Unit, pre_klu, parent_klu) -> CKLine_Unit:
+        cur_lv = self.lv_list[lv_idx]
+        klu.kl_type = cur_lv
+        klu = self.kl_datas[cur_lv].store_klu(klu)
+        klu.set_pre_klu(pre_klu)
+        self.add_new_kl(cur_lv, klu)
+        if parent_klu:
+            self.set_klu_parent_relation(parent_klu, klu, cur_lv, lv_idx)
+        if not self.kl_datas[cur_lv].step_calculation:
+            self.kl_datas[cur_lv].cal_seg_and_zs()
+        self.klu_last_t[lv_idx] = klu.time
+        return klu
+
+    def append_bar(self, lv, klu: CKLine_Unit) -> CKLine_Diff:
+        # 实盘推送一根新K线，只重算受影响的尾部，返回笔/线段/买卖点的变化
+        # 多级别时需要先追加父级别K线，次级别K线的时间不能晚于父级别最后一根K线
+        self.init_klu_cache()
+        lv_idx = self.get_lv_idx(lv)
+        kl_list = self[lv_idx]
+        pre_klu = kl_list[-1][-1] if len(kl_list) > 0 else None
+        self.check_live_klu_time(klu, pre_klu)
+        parent_klu = self.get_live_parent_klu(lv_idx, klu)
+        self.try_set_klu_idx(lv_idx, klu)
+
+        kl_list.live_snapshot = None
+        snapshot = CKLine_Snapshot(kl_list, pre_klu, parent_klu)
+        before = snapshot.collect()
+        snapshot.klu = self.add_live_klu(lv_idx, klu, pre_klu, parent_klu)
+        kl_list.live_snapshot = snapshot
+        return snapshot.get_diff(before)
+
+    def update_bar(self, lv, klu: CKLine_Unit) -> CKLine_Diff:
+        # 更新最近一次append_bar追加的K线（如未完成的分钟线），回滚后重新计算
+        self.init_klu_cache()
+        lv_idx = self.get_lv_idx(lv)
+        kl_list = self[lv_idx]
+        snapshot = kl_list.live_snapshot
+        if snapshot is None or len(kl_list) == 0 or kl_list[-1][-1] is not snapshot.klu:
+            raise CChanException("update_bar只能更新最近一次append_bar追加的K线", ErrCode.COMMON_ERROR)
+        old_klu = snapshot.klu
+        self.check_live_klu_time(klu, snapshot.pre_klu)
+        if snapshot.parent_klu is not None and klu.time > snapshot.parent_klu.time:
+            raise CChanException(f"次级别K线时间{klu.time}晚于父级别K线{snapshot.parent_klu.time}", ErrCode.KL_DATA_NOT_ALIGN)
+        klu.set_idx(old_klu.idx)
+
+        before = snapshot.collect()
+        snapshot.restore()
+        kl_list.live_snapshot = snapshot
+        klu = self.add_live_klu(lv_idx, klu, snapshot.pre_klu, snapshot.parent_klu)
+        for sub_klu in old_klu.sub_kl_list:  # 已经追加的次级别K线挂到新的K线上
+            klu.add_children(sub_klu)
+            sub_klu.set_parent(klu)
+        if lv_idx + 1 < len(self.lv_list):
+            sub_snapshot = self[lv_idx+1].live_snapshot
+            if sub_snapshot is not None and sub_snapshot.parent_klu is old_klu:
+                sub_snapshot.parent_klu = klu
+        snapshot.klu = klu
+        return snapshot.get_diff(before)
 
     def init_lv_klu_iter(self, stockapi_cls):
         # 为了跳过一些获取数据失败的级别
+        # kl_prefetch开启且数据源支持多线程时，每个级别在各自的线程里创建数据源并提前读取，耗时接近最慢的级别而不是各级别之和
+        prefetch_lst = []
+        if self.conf.kl_prefetch and stockapi_cls.CONCURRENT_FETCH:
+            prefetch_lst = [
+                CPrefetchIter(partial(self.get_load_stock_iter, stockapi_cls, lv), buffer_size=self.conf.kl_prefetch_buffer, name=f"{self.code}-{lv.name}")
+                for lv in self.lv_list
+            ]
+        self.lv_fetch_stat = {}
         lv_klu_iter = []
         valid_lv_list = []
-        for lv in self.lv_list:
+        for lv_idx, lv in enumerate(self.lv_list):
             try:
-                lv_klu_iter.append(self.get_load_stock_iter(stockapi_cls, lv))
+                if prefetch_lst:
+                    prefetch_lst[lv_idx].wait_init()
+                    lv_klu_iter.append(prefetch_lst[lv_idx])
+                    self.lv_fetch_stat[lv] = prefetch_lst[lv_idx].stat
+                else:
+                    lv_klu_iter.append(self.get_load_stock_iter(stockapi_cls, lv))
                 valid_lv_list.append(lv)
             except CChanException as e:
                 if e.errcode == ErrCode.SRC_DATA_NOT_FOUND and self.conf.auto_skip_illegal_sub_lv:
@@ -164,11 +282,15 @@ class CChan:
                         print(f"[WARNING-{self.code}]{lv}级别获取数据失败，跳过")
                     del self.kl_datas[lv]
                     continue
+                for prefetch_iter in prefetch_lst:
+                    prefetch_iter.close()
                 raise e
         self.lv_list = valid_lv_list
         return lv_klu_iter
 
     def GetStockAPI(self):
+        if isinstance(self.data_src, type) and issubclass(self.data_src, CCommonStockApi):
+            return self.data_src
         _dict = {}
         if self.data_src == DATA_SRC.BAO_STOCK:
             from DataAPI.BaoStockAPI import CBaoStock
@@ -195,6 +317,9 @@ class CChan:
 
     def load(self, step=False):
         stockapi_cls = self.GetStockAPI()
+        if self.conf.data_cache_dir is not None:
+            from DataAPI.DataCache import CCachedStockApi
+            stockapi_cls = CCachedStockApi.wrap(stockapi_cls, self.conf.data_cache_dir, self.conf.data_cache_max_mb)
         try:
             stockapi_cls.do_init()
             for lv_idx, klu_iter in enumerate(self.init_lv_klu_iter(stockapi_cls)):
@@ -204,11 +329,14 @@ class CChan:
 
             yield from self.load_iterator(lv_idx=0, parent_klu=None, step=step)  # 计算入口
             if not step:  # 非回放模式全部算完之后才算一次中枢和线段
-                for lv in self.lv_list:
-                    self.kl_datas[lv].cal_seg_and_zs()
+                self.cal_all_seg_and_zs()
         except Exception:
             raise
         finally:
+            for iter_lst in self.g_kl_iter.values():
+                for klu_iter in iter_lst:
+                    if isinstance(klu_iter, CPrefetchIter):
+                        klu_iter.close()  # 次级别可能还有没读完的数据
             stockapi_cls.do_close()
         if len(self[0]) == 0:
             raise CChanException("最高级别没有获得任何数据", ErrCode.NO_DATA)
@@ -238,36 +366,56 @@ class CChan:
     def load_iterator(self, lv_idx, parent_klu, step):
         # K线时间天级别以下描述的是结束时间，如60M线，每天第一根是10点30的
         # 天以上是当天日期
-        cur_lv = self.lv_list[lv_idx]
-        pre_klu = self[lv_idx][-1][-1] if len(self[lv_idx]) > 0 and len(self[lv_idx][-1]) > 0 else None
+        # 各级别按时间归并：当前级别的K线时间不晚于父级别K线时挂到父级别下，晚于时缓存起来回到父级别取下一根；
+        # 用级别下标代替递归，计算顺序和逐层递归完全一样(父K线 -> 其所有次级别K线 -> 检查对齐 -> 父级别下一根)
+        last_lv_idx = len(self.lv_list)-1
+        klu_cache = self.klu_cache
+        klu_last_t = self.klu_last_t
+        kl_list_lst = [self.kl_datas[lv] for lv in self.lv_list]
+        # 同set_klu_parent_relation，是否需要检查父子K线日期一致提前按级别算好
+        check_consistent_lst = [lv_idx > 0 and self.conf.kl_data_check and kltype_lte_day(lv) and kltype_lte_day(self.lv_list[lv_idx-1]) for lv_idx, lv in enumerate(self.lv_list)]
+        parent_lst: List[Optional[CKLine_Unit]] = [None for _ in self.lv_list]  # 每个级别当前的父K线
+        parent_lst[lv_idx] = parent_klu
+        pre_klu_lst = [kl_list[-1][-1] if len(kl_list) > 0 and len(kl_list[-1]) > 0 else None for kl_list in kl_list_lst]
+        begin_lv_idx = lv_idx
         while True:
-            if self.klu_cache[lv_idx]:
-                kline_unit = self.klu_cache[lv_idx]
-                assert kline_unit is not None
-                self.klu_cache[lv_idx] = None
+            kline_unit = klu_cache[lv_idx]
+            if kline_unit is not None:
+                klu_cache[lv_idx] = None
             else:
-                try:
-                    kline_unit = self.get_next_lv_klu(lv_idx)
-                    self.try_set_klu_idx(lv_idx, kline_unit)
-                    if not kline_unit.time > self.klu_last_t[lv_idx]:
-                        raise CChanException(f"kline time err, cur={kline_unit.time}, last={self.klu_last_t[lv_idx]}, or refer to quick_guide.md, try set auto=False in the CTime returned by your data source class", ErrCode.KL_NOT_MONOTONOUS)
-                    self.klu_last_t[lv_idx] = kline_unit.time
-                except StopIteration:
+                kline_unit = self.get_next_lv_klu(lv_idx, None)
+                if kline_unit is not None:
+                    if kline_unit.idx < 0:
+                        kline_unit.set_idx(0 if pre_klu_lst[lv_idx] is None else pre_klu_lst[lv_idx].idx + 1)
+                    if not kline_unit.time > klu_last_t[lv_idx]:
+                        raise CChanException(f"kline time err, cur={kline_unit.time}, last={klu_last_t[lv_idx]}, or refer to quick_guide.md, try set auto=False in the CTime returned by your data source class", ErrCode.KL_NOT_MONOTONOUS)
+                    klu_last_t[lv_idx] = kline_unit.time
+
+            parent_klu = parent_lst[lv_idx]
+            if kline_unit is None or (parent_klu and kline_unit.time > parent_klu.time):
+                # 当前级别在父K线内的部分已经读完，回到父级别
+                if kline_unit is not None:
+                    klu_cache[lv_idx] = kline_unit
+                if lv_idx == begin_lv_idx:
                     break
-
-            if parent_klu and kline_unit.time > parent_klu.time:
-                self.klu_cache[lv_idx] = kline_unit
-                break
-            kline_unit.set_pre_klu(pre_klu)
-            pre_klu = kline_unit
-            self.add_new_kl(cur_lv, kline_unit)
+                lv_idx -= 1
+                self.check_kl_align(parent_klu, lv_idx)
+                if lv_idx == 0 and step:
+                    yield self
+                continue
+            kline_unit = kl_list_lst[lv_idx].store_klu(kline_unit)
+            kline_unit.set_pre_klu(pre_klu_lst[lv_idx])
+            pre_klu_lst[lv_idx] = kline_unit
+            self.add_new_kl(self.lv_list[lv_idx], kline_unit)
             if parent_klu:
-                self.set_klu_parent_relation(parent_klu, kline_unit, cur_lv, lv_idx)
-            if lv_idx != len(self.lv_list)-1:
-                for _ in self.load_iterator(lv_idx+1, kline_unit, step):
-                    ...
-                self.check_kl_align(kline_unit, lv_idx)
-            if lv_idx == 0 and step:
+                if check_consistent_lst[lv_idx]:
+                    self.check_kl_consitent(parent_klu, kline_unit)
+                parent_klu.add_children(kline_unit)
+                kline_unit.set_parent(parent_klu)
+            if lv_idx != last_lv_idx:
+                lv_idx += 1
+                parent_lst[lv_idx] = kline_unit
+            elif lv_idx == 0 and step:
                 yield self
 
     def check_kl_consitent(self, parent_klu, sub_klu):
@@ -303,12 +451,41 @@ class CChan:
         assert len(self.lv_list) == 1
         return self[0].bs_point_lst.getSortedBspList()
 
-    def get_latest_bsp(self, idx=None, number=1) -> List[CBS_Point]:
-        # number=0则取全部bsp，从最新到最旧排序
+    def perf_report(self) -> Dict[str, Dict[str, dict]]:
+        # perf_profile开启时各级别各计算阶段的调用次数和累计耗时(秒)：{级别: {阶段: {"calls", "seconds"}}}
+        return {
+            lv.name: kl_list.profiler.report()
+            for lv, kl_list in self.kl_datas.items()
+            if kl_list.profiler is not None
+        }
+
+    def perf_report_json(self, file_path=None) -> str:
+        res = json.dumps(self.perf_report(), indent=2)
+        if file_path is not None:
+            with open(file_path, "w") as f:
+                f.write(res)
+        return res
+
+    def get_latest_bsp(self, idx=None, number=1, types: Optional[Iterable[BSP_TYPE]] = None, is_buy: Optional[bool] = None) -> List[CBS_Point]:
+        # number=0则取全部bsp，从最新到最旧排序；types/is_buy用于筛选类型和方向
         if idx is not None:
-            return self[idx].bs_point_lst.get_latest_bsp(number)
+            return self[idx].bs_point_lst.get_latest_bsp(number, types, is_buy)
         assert len(self.lv_list) == 1
-        return self[0].bs_point_lst.get_latest_bsp(number)
+        return self[0].bs_point_lst.get_latest_bsp(number, types, is_buy)
+
+    def query_bsp(
+        self,
+        idx=None,
+        begin_time: Optional[CTime] = None,
+        end_time: Optional[CTime] = None,
+        types: Optional[Iterable[BSP_TYPE]] = None,
+        is_buy: Optional[bool] = None,
+    ) -> List[CBS_Point]:
+        # 买卖点时间在[begin_time, end_time]之间(为None则不限)，且有types中任一类型的买卖点，从旧到新排序
+        if idx is None:
+            assert len(self.lv_list) == 1
+            idx = 0
+        return self[idx].bs_point_lst.query_bsp(begin_time, end_time, types, is_buy)
 
     def chan_dump_pickle(self, file_path):
         _pre_limit = sys.getrecursionlimit()
@@ -345,6 +522,15 @@ class CChan:
 
         return chan
 
+    def chan_dump_snapshot(self, file_path):
+        # K线按列、其余对象按表保存，比chan_dump_pickle快得多，且不需要调大递归深度
+        CChanSnapshot.dump(self, file_path)
+
+    @staticmethod
+    def chan_load_snapshot(file_path, use_mmap=True) -> 'CChan':
+        # use_mmap: K线列直接映射文件，不读入内存；加载后的CChan统一使用列式存储
+        return CChanSnapshot.load(file_path, use_mmap)
+
     def chan_pickle_restore(self):
         for kl_list in self.kl_datas.values():
             last_klu = None
@@ -15,6 +15,24 @@ from Seg.SegConfig import CSegConfig
 from ZS.ZSConfig import CZSConfig
 
 
+BSP_PARA_DEFAULT = {  # 买卖点参数及默认值，也可以加上-buy/-sell/-segbuy/-segsell/-seg后缀单独设置
+    "divergence_rate": float("inf"),
+    "min_zs_cnt": 1,
+    "bsp1_only_multibi_zs": True,
+    "max_bs2_rate": 0.9999,
+    "macd_algo": "peak",
+    "bs1_peak": True,
+    "bs_type": "1,1p,2,2s,3a,3b",
+    "bsp2_follow_1": True,
+    "bsp3_follow_1": True,
+    "bsp3_peak": False,
+    "bsp2s_follow_2": False,
+    "max_bsp2s_lv": None,
+    "strict_bsp3": False,
+    "bsp3a_max_zs_cnt": 1,
+}
+
+
 class CChanConfig:
     def __init__(self, conf=None):
         if conf is None:
@@ -48,6 +66,13 @@ class CChanConfig:
         self.auto_skip_illegal_sub_lv = conf.get("auto_skip_illegal_sub_lv", False)
         self.print_warning = conf.get("print_warning", True)
         self.print_err_time = conf.get("print_err_time", True)
+        self.kl_columnar = conf.get("kl_columnar", False)
+        self.data_cache_dir = conf.get("data_cache_dir", None)
+        self.data_cache_max_mb = conf.get("data_cache_max_mb", 1024)
+        self.kl_prefetch = conf.get("kl_prefetch", False)
+        self.kl_prefetch_buffer = conf.get("kl_prefetch_buffer", 65536)
+        self.perf_profile = conf.get("perf_profile", False)
+        self.parallel_cal = conf.get("parallel_cal", 0)
 
         self.mean_metrics: List[int] = conf.get("mean_metrics", [])
         self.trend_metrics: List[int] = conf.get("trend_metrics", [])
@@ -67,6 +92,7 @@ class CChanConfig:
             'countdown_cmp2close': True,
         })
         self.boll_n = conf.get("boll_n", 20)
+        self.batch_metric = conf.get("batch_metric", False)
 
         self.set_bsp_config(conf)
 
@@ -103,23 +129,7 @@ class CChanConfig:
         return res
 
     def set_bsp_config(self, conf):
-        para_dict = {
-            "divergence_rate": float("inf"),
-            "min_zs_cnt": 1,
-            "bsp1_only_multibi_zs": True,
-            "max_bs2_rate": 0.9999,
-            "macd_algo": "peak",
-            "bs1_peak": True,
-            "bs_type": "1,1p,2,2s,3a,3b",
-            "bsp2_follow_1": True,
-            "bsp3_follow_1": True,
-            "bsp3_peak": False,
-            "bsp2s_follow_2": False,
-            "max_bsp2s_lv": None,
-            "strict_bsp3": False,
-            "bsp3a_max_zs_cnt": 1,
-        }
-        args = {para: conf.get(para, default_value) for para, default_value in para_dict.items()}
+        args = {para: conf.get(para, default_value) for para, default_value in BSP_PARA_DEFAULT.items()}
         self.bs_point_conf = CBSPointConfig(**args)
 
         self.seg_bs_point_conf = CBSPointConfig(**args)
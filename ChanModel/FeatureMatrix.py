@@ -0,0 +1,239 @@
+import json
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from BuySellPoint.BS_Point import CBS_Point
+from Common.CEnum import BSP_TYPE
+from Common.ChanException import CChanException, ErrCode
+from KLine.KLine_Store import pack_time
+
+"""
+买卖点特征按列导出：
+每个买卖点一行，元信息列(code/级别/时间/K线下标/笔或线段下标/方向/是否线段买卖点/每种买卖点类型一列)加上特征列，
+特征列按第一次出现的顺序排列，没有该特征或者值为None时为nan；
+所有列预分配容量，不够时翻倍，逐个品种追加的总拷贝量和行数成线性
+"""
+
+FEATURE_MATRIX_VERSION = 1
+TYPE_COLUMNS = {bsp_type: f"type_{bsp_type.value}" for bsp_type in BSP_TYPE}
+META_COLUMNS = {
+    "code": np.int32,  # code_lst中的下标
+    "lv": np.int32,  # lv_lst中的下标
+    "time": np.int64,  # pack_time: YYYYMMDDHHMMSS
+    "klu_idx": np.int64,
+    "line_idx": np.int64,  # 笔买卖点为笔下标，线段买卖点为线段下标
+    "is_buy": np.bool_,
+    "is_segbsp": np.bool_,
+    **{name: np.bool_ for name in TYPE_COLUMNS.values()},
+}
+NEW_FEAT_MODE = ("add", "ignore", "error")
+
+
+class CFeatureMatrix:
+    def __init__(self, feature_names: Optional[Iterable[str]] = None, new_feat: str = "add", capacity: int = 1024):
+        # feature_names: 预先固定的特征列顺序；new_feat: 遇到不在schema里的特征时追加一列/忽略/报错
+        if new_feat not in NEW_FEAT_MODE:
+            raise CChanException(f"unknown new_feat = {new_feat}, should be one of {NEW_FEAT_MODE}", ErrCode.PARA_ERROR)
+        self.new_feat = new_feat
+        self.size = 0
+        self.capacity = max(capacity, 16)
+        self.code_lst: List[str] = []
+        self.lv_lst: List[str] = []
+        self.meta: Dict[str, np.ndarray] = {name: np.zeros(self.capacity, dtype=dtype) for name, dtype in META_COLUMNS.items()}
+        self.feat: Dict[str, np.ndarray] = {}  # 特征名 -> 列，dict保持插入顺序即schema顺序
+        for name in feature_names or []:
+            self.add_feat_column(name)
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # 跨进程传递/pickle时不带预留容量
+        state = dict(self.__dict__)
+        state["capacity"] = self.size
+        state["meta"] = {name: arr[:state["capacity"]].copy() for name, arr in self.meta.items()}
+        state["feat"] = {name: arr[:state["capacity"]].copy() for name, arr in self.feat.items()}
+        return state
+
+    @property
+    def feature_names(self) -> List[str]:
+        return list(self.feat.keys())
+
+    def add_feat_column(self, name: str):
+        if name in META_COLUMNS:
+            raise CChanException(f"feature name {name} conflicts with meta column", ErrCode.FEATURE_ERROR)
+        if name not in self.feat:
+            self.feat[name] = np.full(self.capacity, np.nan)
+
+    def reserve(self, size: int):
+        if size <= self.capacity:
+            return
+        capacity = max(self.capacity, 16)
+        while capacity < size:
+            capacity *= 2
+        for name, arr in self.meta.items():
+            self.meta[name] = np.zeros(capacity, dtype=arr.dtype)
+            self.meta[name][:self.size] = arr[:self.size]
+        for name, arr in self.feat.items():
+            self.feat[name] = np.full(capacity, np.nan)
+            self.feat[name][:self.size] = arr[:self.size]
+        self.capacity = capacity
+
+    def table_idx(self, lst: List[str], value: str) -> int:
+        if value not in lst:
+            lst.append(value)
+        return lst.index(value)
+
+    def add_bsp_lst(self, bsp_lst: List[CBS_Point], code, lv, is_segbsp: bool = False):
+        # 同一个品种同一个级别的一批买卖点，lv为KL_TYPE或者名字
+        n = len(bsp_lst)
+        if n == 0:
+            return self
+        begin, end = self.size, self.size + n
+        self.reserve(end)
+        self.meta["code"][begin:end] = self.table_idx(self.code_lst, str(code))
+        self.meta["lv"][begin:end] = self.table_idx(self.lv_lst, getattr(lv, "name", str(lv)))
+        self.meta["time"][begin:end] = np.fromiter((pack_time(bsp.klu.time) for bsp in bsp_lst), dtype=np.int64, count=n)
+        self.meta["klu_idx"][begin:end] = np.fromiter((bsp.klu.idx for bsp in bsp_lst), dtype=np.int64, count=n)
+        self.meta["line_idx"][begin:end] = np.fromiter((bsp.bi.idx for bsp in bsp_lst), dtype=np.int64, count=n)
+        self.meta["is_buy"][begin:end] = np.fromiter((bsp.is_buy for bsp in bsp_lst), dtype=np.bool_, count=n)
+        self.meta["is_segbsp"][begin:end] = is_segbsp
+        for bsp_type, name in TYPE_COLUMNS.items():
+            self.meta[name][begin:end] = np.fromiter((bsp_type in bsp.type for bsp in bsp_lst), dtype=np.bool_, count=n)
+
+        # 先按特征名收集这一批的值，再整列写入
+        value_dict: Dict[str, List[float]] = {}
+        for row, bsp in enumerate(bsp_lst):
+            for name, value in bsp.features.items():
+                if name not in value_dict:
+                    value_dict[name] = [np.nan] * n
+                value_dict[name][row] = np.nan if value is None else value
+        for name, value_lst in value_dict.items():
+            if name not in self.feat:
+                if self.new_feat == "ignore":
+                    continue
+                if self.new_feat == "error":
+                    raise CChanException(f"feature {name} not in schema", ErrCode.FEATURE_ERROR)
+                self.add_feat_column(name)
+            try:
+                self.feat[name][begin:end] = np.array(value_lst, dtype=np.float64)
+            except (TypeError, ValueError) as e:
+                raise CChanException(f"feature {name} is not numeric: {e}", ErrCode.FEATURE_ERROR) from e
+        self.size = end
+        return self
+
+    def add_chan(self, chan, code=None, lv_idx: Optional[Iterable[int]] = None, seg_bsp: bool = False):
+        # 默认导出所有级别的笔买卖点，seg_bsp=True时同时导出线段买卖点(is_segbsp列区分)
+        code = chan.code if code is None else code
+        for idx in range(len(chan.lv_list)) if lv_idx is None else lv_idx:
+            kl_list = chan[idx]
+            self.add_bsp_lst(kl_list.bs_point_lst.query_bsp(), code, chan.lv_list[idx])
+            if seg_bsp:
+                self.add_bsp_lst(kl_list.seg_bs_point_lst.query_bsp(), code, chan.lv_list[idx], is_segbsp=True)
+        return self
+
+    def extend(self, other: 'CFeatureMatrix'):
+        # 追加另一个矩阵的所有行(比如各进程分别导出的结果)，code/lv按名字重新编号
+        if other.size == 0:
+            return self
+        begin, end = self.size, self.size + other.size
+        self.reserve(end)
+        for name in ("code", "lv"):
+            table = self.code_lst if name == "code" else self.lv_lst
+            other_table = other.code_lst if name == "code" else other.lv_lst
+            remap = np.array([self.table_idx(table, value) for value in other_table], dtype=np.int32)
+            self.meta[name][begin:end] = remap[other.meta[name][:other.size]]
+        for name in META_COLUMNS:
+            if name not in ("code", "lv"):
+                self.meta[name][begin:end] = other.meta[name][:other.size]
+        for name, arr in other.feat.items():
+            if name not in self.feat:
+                if self.new_feat == "ignore":
+                    continue
+                if self.new_feat == "error":
+                    raise CChanException(f"feature {name} not in schema", ErrCode.FEATURE_ERROR)
+                self.add_feat_column(name)
+            self.feat[name][begin:end] = arr[:other.size]
+        self.size = end
+        return self
+
+    @classmethod
+    def concat(cls, matrix_lst: Iterable['CFeatureMatrix'], feature_names: Optional[Iterable[str]] = None, new_feat: str = "add") -> 'CFeatureMatrix':
+        matrix_lst = list(matrix_lst)
+        res = cls(feature_names, new_feat=new_feat, capacity=sum(matrix.size for matrix in matrix_lst))
+        for matrix in matrix_lst:
+            res.extend(matrix)
+        return res
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        # 元信息列+特征列，code/lv还原成字符串
+        res = {name: arr[:self.size] for name, arr in self.meta.items()}
+        res["code"] = np.array(self.code_lst, dtype=str)[res["code"]] if self.code_lst else np.array([], dtype=str)
+        res["lv"] = np.array(self.lv_lst, dtype=str)[res["lv"]] if self.lv_lst else np.array([], dtype=str)
+        res.update((name, arr[:self.size]) for name, arr in self.feat.items())
+        return res
+
+    def to_numpy(self, feature_names: Optional[Iterable[str]] = None) -> np.ndarray:
+        # (行数, 特征数)的float64矩阵；指定feature_names时按其顺序取列，不存在的特征整列为nan
+        names = self.feature_names if feature_names is None else list(feature_names)
+        res = np.full((self.size, len(names)), np.nan)
+        for col, name in enumerate(names):
+            if name in self.feat:
+                res[:, col] = self.feat[name][:self.size]
+        return res
+
+    def save_npy(self, path: str, feature_names: Optional[Iterable[str]] = None):
+        # path保存特征矩阵(.npy)，元信息列和schema保存在path + ".meta.npz"
+        names = self.feature_names if feature_names is None else list(feature_names)
+        np.save(path, self.to_numpy(names))
+        with open(f"{path}.meta.npz", "wb") as f:
+            np.savez(
+                f,
+                header=np.array(json.dumps({
+                    "version": FEATURE_MATRIX_VERSION,
+                    "feature_names": names,
+                    "code_lst": self.code_lst,
+                    "lv_lst": self.lv_lst,
+                })),
+                **{name: arr[:self.size] for name, arr in self.meta.items()},
+            )
+
+    @classmethod
+    def load_npy(cls, path: str, mmap_mode: Optional[str] = None) -> 'CFeatureMatrix':
+        # 特征列直接是矩阵的列视图，不复制；mmap_mode="r"时按需从文件读取，追加行时reserve才复制到内存
+        with np.load(f"{path}.meta.npz") as meta:
+            header = json.loads(str(meta["header"]))
+            if header["version"] > FEATURE_MATRIX_VERSION:
+                raise CChanException(f"feature matrix version {header['version']} > {FEATURE_MATRIX_VERSION}", ErrCode.FEATURE_ERROR)
+            meta_arrays = {name: meta[name] for name in META_COLUMNS}
+        matrix = np.load(path, mmap_mode=mmap_mode)
+        res = cls(capacity=matrix.shape[0])
+        res.size = res.capacity = matrix.shape[0]  # 特征列的长度就是行数
+        res.code_lst = header["code_lst"]
+        res.lv_lst = header["lv_lst"]
+        for name, arr in meta_arrays.items():
+            res.meta[name][:res.size] = arr
+        for col, name in enumerate(header["feature_names"]):
+            res.feat[name] = matrix[:, col]
+        return res
+
+    def save_parquet(self, path: str, feature_names: Optional[Iterable[str]] = None, **kwargs):
+        # 需要安装pyarrow，code/lv保存成dictionary列，kwargs透传给pyarrow.parquet.write_table
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise CChanException("save_parquet需要安装pyarrow", ErrCode.ENV_CONF_ERR) from e
+        names = self.feature_names if feature_names is None else list(feature_names)
+        data = {}
+        for name, arr in self.meta.items():
+            if name in ("code", "lv"):
+                data[name] = pa.DictionaryArray.from_arrays(arr[:self.size], self.code_lst if name == "code" else self.lv_lst)
+            else:
+                data[name] = arr[:self.size]
+        feat_matrix = self.to_numpy(names)
+        for col, name in enumerate(names):
+            data[name] = feat_matrix[:, col]
+        table = pa.table(data).replace_schema_metadata({"chan_feature_matrix": json.dumps({"version": FEATURE_MATRIX_VERSION, "feature_names": names})})
+        pq.write_table(table, path, **kwargs)
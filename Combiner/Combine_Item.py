@@ -12,8 +12,7 @@ class CCombine_Item:
             self.high = item._high()
             self.low = item._low()
         elif isinstance(item, CKLine_Unit):
-            self.time_begin = item.time
-            self.time_end = item.time
+            self.time_begin = self.time_end = item.time
             self.high = item.high
             self.low = item.low
         elif isinstance(item, CSeg):
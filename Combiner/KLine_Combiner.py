@@ -1,8 +1,9 @@
 from typing import Generic, Iterable, List, Optional, Self, TypeVar, Union, overload
 
-from Common.cache import make_cache
+from Common.cache import cache_slots, make_cache, reset_cache
 from Common.CEnum import FX_TYPE, KLINE_DIR
 from Common.ChanException import CChanException, ErrCode
+from Common.state_util import get_slots_state, set_slots_state
 from KLine.KLine_Unit import CKLine_Unit
 
 from .Combine_Item import CCombine_Item
@@ -11,6 +12,8 @@ T = TypeVar('T')
 
 
 class CKLine_Combiner(Generic[T]):
+    __slots__ = ("__time_begin", "__time_end", "__high", "__low", "__lst", "__dir", "__fx", "__pre", "__next") + cache_slots("get_high_peak_klu", "get_low_peak_klu")
+
     def __init__(self, kl_unit: T, _dir):
         item = CCombine_Item(kl_unit)
         self.__time_begin = item.time_begin
@@ -25,8 +28,11 @@ class CKLine_Combiner(Generic[T]):
         self.__pre: Optional[Self] = None
         self.__next: Optional[Self] = None
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     def clean_cache(self):
-        self._memoize_cache = {}
+        reset_cache(self)
 
     @property
     def time_begin(self): return self.__time_begin
@@ -1,7 +1,22 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import List, Union
+
+import numpy as np
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_AUTO_DAY_OFFSET = 23 * 3600 + 59 * 60  # 自适应的日线时间按当天23:59计算
+
+
+def _epoch(year, month, day, hour, minute, second, auto) -> int:
+    # 不带时区的整数秒，只用来比较先后
+    if hour == 0 and minute == 0 and auto:
+        return (date(year, month, day).toordinal() - _EPOCH_ORDINAL) * 86400 + _AUTO_DAY_OFFSET + second
+    return (date(year, month, day).toordinal() - _EPOCH_ORDINAL) * 86400 + hour * 3600 + minute * 60 + second
 
 
 class CTime:
+    __slots__ = ("year", "month", "day", "hour", "minute", "second", "auto", "key", "_str")
+
     def __init__(self, year, month, day, hour, minute, second=0, auto=True):
         self.year = year
         self.month = month
@@ -10,19 +25,21 @@ class CTime:
         self.minute = minute
         self.second = second
         self.auto = auto  # 自适应对天的理解
-        self.set_timestamp()  # set self.ts
+        self.set_timestamp()  # set self.key
 
     def __str__(self):
-        if self.hour == 0 and self.minute == 0:
-            return f"{self.year:04}/{self.month:02}/{self.day:02}"
-        else:
-            return f"{self.year:04}/{self.month:02}/{self.day:02} {self.hour:02}:{self.minute:02}"
+        return self.to_str()
+
+    def __repr__(self):
+        return f"CTime({self.to_str()})"
 
     def to_str(self):
-        if self.hour == 0 and self.minute == 0:
-            return f"{self.year:04}/{self.month:02}/{self.day:02}"
-        else:
-            return f"{self.year:04}/{self.month:02}/{self.day:02} {self.hour:02}:{self.minute:02}"
+        if self._str is None:
+            if self.hour == 0 and self.minute == 0:
+                self._str = "%04d/%02d/%02d" % (self.year, self.month, self.day)
+            else:
+                self._str = "%04d/%02d/%02d %02d:%02d" % (self.year, self.month, self.day, self.hour, self.minute)
+        return self._str
 
     def toDateStr(self, splt=''):
         return f"{self.year:04}{splt}{self.month:02}{splt}{self.day:02}"
@@ -30,15 +47,90 @@ class CTime:
     def toDate(self):
         return CTime(self.year, self.month, self.day, 0, 0, auto=False)
 
-    def set_timestamp(self):
+    @property
+    def ts(self) -> float:
+        # 本地时区的时间戳(datetime.timestamp())，自适应的日线按当天23:59；只比较先后时用key
         if self.hour == 0 and self.minute == 0 and self.auto:
-            date = datetime(self.year, self.month, self.day, 23, 59, self.second)
-        else:
-            date = datetime(self.year, self.month, self.day, self.hour, self.minute, self.second)
-        self.ts = date.timestamp()
+            return datetime(self.year, self.month, self.day, 23, 59, self.second).timestamp()
+        return datetime(self.year, self.month, self.day, self.hour, self.minute, self.second).timestamp()
+
+    def set_timestamp(self):
+        # 修改年月日等字段之后需要重新调用
+        self.key = _epoch(self.year, self.month, self.day, self.hour, self.minute, self.second, self.auto)
+        self._str = None
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__[:-1]}
+
+    def __setstate__(self, state):
+        for name in self.__slots__[:7]:
+            object.__setattr__(self, name, state[name])
+        self.set_timestamp()  # 旧版本pickle里只有按本地时区换算的浮点数ts，统一重算key
+
+    def __eq__(self, t2):
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.key == t2.key
+
+    def __ne__(self, t2):
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.key != t2.key
+
+    def __lt__(self, t2):
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.key < t2.key
+
+    def __le__(self, t2):
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.key <= t2.key
 
     def __gt__(self, t2):
-        return self.ts > t2.ts
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.key > t2.key
 
     def __ge__(self, t2):
-        return self.ts >= t2.ts
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.key >= t2.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    @classmethod
+    def from_fields(cls, year, month, day, hour, minute, second, auto: Union[bool, np.ndarray] = True) -> List['CTime']:
+        # 各字段是等长的整数数组(也可以是标量)，向量化算出key之后直接填属性，不逐个走__init__
+        year, month, day, hour, minute, second, auto = np.broadcast_arrays(*(np.asarray(arr, dtype=np.int64) for arr in (year, month, day, hour, minute, second)), np.asarray(auto, dtype=np.bool_))
+        days = ((year - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month - 1)).astype("datetime64[D]") + (day - 1)
+        in_day = np.where((hour == 0) & (minute == 0) & auto, _AUTO_DAY_OFFSET, hour * 3600 + minute * 60)
+        key = days.astype(np.int64) * 86400 + in_day + second
+        res = []
+        new = cls.__new__
+        for _year, _month, _day, _hour, _minute, _second, _auto, _key in zip(
+            year.tolist(), month.tolist(), day.tolist(), hour.tolist(), minute.tolist(), second.tolist(), auto.tolist(), key.tolist()
+        ):
+            t = new(cls)
+            t.year, t.month, t.day, t.hour, t.minute, t.second, t.auto, t.key, t._str = _year, _month, _day, _hour, _minute, _second, _auto, _key, None
+            res.append(t)
+        return res
+
+    @classmethod
+    def from_datetime64(cls, arr: np.ndarray, auto: Union[bool, np.ndarray] = True) -> List['CTime']:
+        # 从numpy datetime64列批量创建，数据源一次性读入大量K线时使用，精度截断到秒
+        sec = np.asarray(arr).astype("datetime64[s]")
+        days = sec.astype("datetime64[D]")
+        months = sec.astype("datetime64[M]")
+        years = sec.astype("datetime64[Y]")
+        in_day = (sec - days).astype(np.int64)
+        return cls.from_fields(
+            years.astype(np.int64) + 1970,
+            (months - years).astype(np.int64) + 1,
+            (days - months).astype(np.int64) + 1,
+            in_day // 3600,
+            in_day // 60 % 60,
+            in_day % 60,
+            auto,
+        )
@@ -21,6 +21,7 @@ class ErrCode(IntEnum):
     FEATURE_ERROR = 16
     CONFIG_ERROR = 17
     SRC_DATA_FORMAT_ERROR = 18
+    SNAPSHOT_FORMAT_ERR = 19
     _CHAN_ERR_END = 99
 
     # Trade Error
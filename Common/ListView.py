@@ -0,0 +1,44 @@
+from typing import Generic, Iterator, List, TypeVar, Union, overload
+
+T = TypeVar('T')
+
+
+class CListView(Generic[T]):
+    """
+    列表[begin, end)区间的只读视图，不复制元素，读取时按下标访问原列表；
+    要求原列表只在尾部追加/删除，区间内的元素不会被替换(如已确定的笔)
+    pickle/deepcopy时保存成普通list
+    """
+    __slots__ = ("lst", "begin", "end")
+
+    def __init__(self, lst: List[T], begin: int, end: int):
+        self.lst = lst
+        self.begin = begin
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.begin
+
+    def __iter__(self) -> Iterator[T]:
+        return map(self.lst.__getitem__, range(self.begin, self.end))
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: Union[slice, int]) -> Union[List[T], T]:
+        if isinstance(index, slice):
+            return self.lst[self.begin:self.end][index]
+        if index < 0:
+            index += self.end - self.begin
+        if not 0 <= index < self.end - self.begin:
+            raise IndexError("list view index out of range")
+        return self.lst[self.begin + index]
+
+    def is_same_range(self, lst: List[T], begin: int, end: int) -> bool:
+        return self.lst is lst and self.begin == begin and self.end == end
+
+    def __reduce__(self):
+        return list, (list(self),)
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+_END = object()
+
+
+class CPrefetchIter:
+    """
+    后台线程提前读取迭代器，按批放进有界队列；读取过程中的异常在消费端next时重新抛出。
+    factory在后台线程里调用，返回要读取的迭代器；stat记录：init_seconds(创建数据源)、fetch_seconds(从数据源读取的总耗时)、
+    wait_seconds(消费端等待数据的耗时)、bars、done_at(读完时距开始的秒数)
+    """
+    def __init__(self, factory: Callable[[], Iterable], buffer_size: int = 65536, batch_size: int = 256, name: Optional[str] = None):
+        self.batch_size = max(1, batch_size)
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, buffer_size // self.batch_size))
+        self.stop_event = threading.Event()
+        self.batch: List = []
+        self.batch_pos = 0
+        self.finished = False
+        self.begin_time = time.perf_counter()
+        self.stat = {"init_seconds": 0.0, "fetch_seconds": 0.0, "wait_seconds": 0.0, "bars": 0, "done_at": None}
+        self.inited = threading.Event()
+        self.init_error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self.run, args=(factory,), name=name, daemon=True)
+        self.thread.start()
+
+    def put(self, item) -> bool:
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self, factory: Callable[[], Iterable]):
+        t0 = time.perf_counter()
+        try:
+            source: Iterator = iter(factory())
+        except BaseException as e:
+            self.init_error = e
+            return
+        finally:
+            self.stat["init_seconds"] = time.perf_counter() - t0
+            self.inited.set()
+        try:
+            batch = []
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                try:
+                    item = next(source)
+                except StopIteration:
+                    self.stat["fetch_seconds"] += time.perf_counter() - t0
+                    break
+                self.stat["fetch_seconds"] += time.perf_counter() - t0
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    if not self.put(batch):
+                        return
+                    self.stat["bars"] += len(batch)
+                    batch = []
+            self.stat["bars"] += len(batch)
+            if batch and not self.put(batch):
+                return
+            self.stat["done_at"] = time.perf_counter() - self.begin_time
+            self.put(_END)
+        except BaseException as e:
+            self.put(e)
+
+    def wait_init(self):
+        # 等数据源创建完成，创建时的异常在这里抛出
+        self.inited.wait()
+        if self.init_error is not None:
+            raise self.init_error
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.batch_pos >= len(self.batch):
+            if self.finished:
+                raise StopIteration
+            t0 = time.perf_counter()
+            batch = self.queue.get()
+            self.stat["wait_seconds"] += time.perf_counter() - t0
+            if batch is _END:
+                self.finished = True
+                raise StopIteration
+            if isinstance(batch, BaseException):
+                self.finished = True
+                raise batch
+            self.batch, self.batch_pos = batch, 0
+        item = self.batch[self.batch_pos]
+        self.batch_pos += 1
+        return item
+
+    def close(self, timeout: Optional[float] = 30.0):
+        # 消费端不再读取时调用，等后台线程退出(最多timeout秒)之后再关闭数据源，避免线程还在读取时数据源的连接已经被关掉
+        self.stop_event.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout)
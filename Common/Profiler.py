@@ -0,0 +1,46 @@
+import time
+from typing import Dict, List
+
+# CKLine_List各计算阶段的调用次数和累计耗时；perf_profile关闭时不创建，调用处只多一次is None判断
+STAGE_LST = [
+    "metric",  # 指标(逐根set_metric或batch_metric的批量计算)
+    "combine",  # K线合并
+    "fx",  # 分型
+    "bi",  # 笔
+    "seg",  # 线段(cal_seg，含CSegListChan.update)
+    "zs",  # 笔中枢(CZSList.cal_bi_zs)
+    "zs_in_seg",  # update_zs_in_seg
+    "segseg",  # 线段的线段
+    "segzs",  # 线段中枢
+    "segzs_in_seg",
+    "seg_bsp",  # 线段买卖点
+    "bsp",  # 笔买卖点
+]
+
+
+class CStageProfiler:
+    def __init__(self):
+        self.stat: Dict[str, List] = {}  # stage -> [calls, seconds]
+        self.last = 0.0
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, stage: str):
+        # 记录上一次start/lap到现在的耗时
+        now = time.perf_counter()
+        item = self.stat.get(stage)
+        if item is None:
+            item = self.stat[stage] = [0, 0.0]
+        item[0] += 1
+        item[1] += now - self.last
+        self.last = now
+
+    def reset(self):
+        self.stat = {}
+
+    def report(self) -> Dict[str, dict]:
+        return {
+            stage: {"calls": self.stat[stage][0], "seconds": self.stat[stage][1]}
+            for stage in sorted(self.stat, key=lambda stage: STAGE_LST.index(stage) if stage in STAGE_LST else len(STAGE_LST))
+        }
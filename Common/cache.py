@@ -1,34 +1,83 @@
+import functools
 import inspect
-import types
+from typing import Callable, Dict, List, Tuple
 
+# 无参方法的结果缓存：每个被缓存的方法对应实例上一个名为 _cache_<方法名> 的属性(__slots__类需要用cache_slots声明)，
+# 读缓存和读普通属性一样快；依赖的状态变化后调用reset_cache清空该实例的全部缓存
 
-class make_cache:
-    def __init__(self, func):
-        self.func = func
+CACHE_PREFIX = "_cache_"
+
+
+class _CEmpty:
+    # 未缓存标记；pickle/deepcopy之后仍然是同一个对象
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "EMPTY"
+
+    def __repr__(self):
+        return "EMPTY"
+
+
+EMPTY = _CEmpty()
+
+_cache_names: Dict[type, List[str]] = {}
+_cleaner: Dict[type, Callable] = {}
 
-        fargspec = inspect.getfullargspec(func)
-        if len(fargspec.args) != 1 or fargspec.args[0] != "self":
-            raise Exception("@memoize must be `(self)`")
 
-        # set key for this function
-        self.func_key = str(func)
+def cache_slots(*func_names: str) -> Tuple[str, ...]:
+    return tuple(CACHE_PREFIX + name for name in func_names)
 
-    def __get__(self, instance, cls):
-        if instance is None:
-            raise Exception("@memoize's must be bound")
 
-        if not hasattr(instance, "_memoize_cache"):
-            setattr(instance, "_memoize_cache", {})
+def is_cache_slot(name: str) -> bool:
+    return name.startswith(CACHE_PREFIX)
 
-        return types.MethodType(self, instance)
 
-    def __call__(self, *args, **kwargs):
-        instance = args[0]
-        cache = instance._memoize_cache
+def _compile(src: str, name: str, namespace: dict) -> Callable:
+    exec(src, namespace)
+    return namespace[name]
 
-        if self.func_key in cache:
-            return cache[self.func_key]
 
-        result = self.func(*args, **kwargs)
-        cache[self.func_key] = result
-        return result
+def _build_cleaner(cls) -> Callable:
+    names = [CACHE_PREFIX + name for klass in cls.__mro__ for name in _cache_names.get(klass, [])]
+    if not names:
+        return lambda obj: None
+    body = " = ".join(f"obj.{name}" for name in names)
+    return _compile(f"def reset(obj):\n    {body} = EMPTY\n", "reset", {"EMPTY": EMPTY})
+
+
+def reset_cache(obj) -> None:
+    cleaner = _cleaner.get(type(obj))
+    if cleaner is None:
+        cleaner = _cleaner[type(obj)] = _build_cleaner(type(obj))
+    cleaner(obj)
+
+
+class make_cache:
+    def __init__(self, func):
+        self.func = func
+
+        fargspec = inspect.getfullargspec(func)
+        if len(fargspec.args) != 1 or fargspec.args[0] != "self":
+            raise Exception("@memoize must be `(self)`")
+
+    def __set_name__(self, owner, name):
+        # 类创建完成后把自己替换成一个普通函数，调用时不需要再经过描述符
+        attr = CACHE_PREFIX + name
+        if owner.__dictoffset__ == 0 and not any(attr in klass.__dict__.get("__slots__", ()) for klass in owner.__mro__):
+            raise Exception(f"@memoize: {owner.__name__}.__slots__ must include cache_slots(\"{name}\")")
+        src = (
+            f"def {name}(self):\n"
+            f"    try:\n"
+            f"        res = self.{attr}\n"
+            f"        if res is not EMPTY:\n"
+            f"            return res\n"
+            f"    except AttributeError:\n"
+            f"        pass\n"
+            f"    res = self.{attr} = func(self)\n"
+            f"    return res\n"
+        )
+        wrapper = functools.update_wrapper(_compile(src, name, {"EMPTY": EMPTY, "func": self.func}), self.func)
+        setattr(owner, name, wrapper)
+        _cache_names.setdefault(owner, []).append(name)
+        _cleaner.clear()
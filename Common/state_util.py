@@ -0,0 +1,151 @@
+import types
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# 保存对象状态用于回滚：只复制对象自身的属性和其中的容器(浅拷贝)，引用到的其他对象需要单独保存
+# deep=True 时递归保存 Math 下指标模型内部的状态对象；较长的列表只保存尾部，要求只在尾部追加/删除
+# tail={属性名: begin} 指定列表属性只保存 begin 之后的部分
+
+_TAIL_LEN = 16
+_CONTAINER_TYPES = (list, dict, set, deque)
+
+
+@lru_cache(maxsize=None)
+def _slot_names(cls) -> Tuple[str, ...]:
+    res = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = f"_{klass.__name__.lstrip('_')}{name}"
+            if not isinstance(_lookup(cls, name), types.MemberDescriptorType):
+                continue  # 被子类的property覆盖，如CKLine_Unit_View的time/open
+            res.append(name)
+    return tuple(res)
+
+
+def _lookup(cls, name):
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            return klass.__dict__[name]
+    return None
+
+
+def slot_names(cls) -> Tuple[str, ...]:
+    # 类及其父类声明的slot(私有属性为改写后的名字)
+    return _slot_names(cls)
+
+
+def iter_attrs(obj) -> Iterable[Tuple[str, Any]]:
+    # 同时支持 __dict__ 和 __slots__ 的对象
+    for name in _slot_names(type(obj)):
+        if hasattr(obj, name):
+            yield name, getattr(obj, name)
+    if hasattr(obj, "__dict__"):
+        yield from obj.__dict__.items()
+
+
+def get_slots_state(obj) -> Dict[str, Any]:
+    # __slots__类的__getstate__：和改成__slots__之前一样保存成{属性名: 值}，跳过未赋值以及被子类property覆盖的slot
+    return dict(iter_attrs(obj))
+
+
+def set_slots_state(obj, state) -> None:
+    # __slots__类的__setstate__：兼容默认的(None, {slot: value})格式，以及改成__slots__之前pickle下来的__dict__
+    # 不是slot的key直接丢弃：旧版make_cache的缓存dict(_memoize_cache)、typing泛型实例化时加的__orig_class__等
+    if isinstance(state, tuple):
+        _dict, slots = state
+        state = dict(_dict or {}, **(slots or {}))
+    names = _slot_names(type(obj))
+    has_dict = hasattr(obj, "__dict__")
+    for name, value in state.items():
+        if has_dict or name in names:
+            object.__setattr__(obj, name, value)
+
+
+def _is_model_state(value) -> bool:
+    return type(value).__module__.startswith("Math.") and (hasattr(value, "__dict__") or hasattr(type(value), "__slots__"))
+
+
+def _need_capture(value, deep: bool) -> bool:
+    return type(value) in _CONTAINER_TYPES or (deep and _is_model_state(value))
+
+
+def _capture_value(value, deep: bool, begin: Optional[int] = None):
+    _type = type(value)
+    if _type is list:
+        if begin is None:
+            begin = len(value) - _TAIL_LEN if deep and len(value) > 2 * _TAIL_LEN else 0
+        if deep:
+            return "list", value, begin, [_capture_value(x, deep) for x in value[begin:]]
+        return "list", value, begin, value[begin:]
+    if _type is dict:
+        return "dict", value, dict(value)
+    if _type is set:
+        return "set", value, set(value)
+    if _type is deque:
+        return "deque", value, list(value)
+    if deep and _is_model_state(value):
+        return "obj", capture_state(value, deep)
+    return "val", value
+
+
+def _restore_value(cap, deep: bool):
+    kind = cap[0]
+    if kind == "list":
+        _, lst, begin, items = cap
+        lst[begin:] = [_restore_value(x, deep) for x in items] if deep else items
+        return lst
+    if kind == "dict":
+        cap[1].clear()
+        cap[1].update(cap[2])
+        return cap[1]
+    if kind == "set":
+        cap[1].clear()
+        cap[1].update(cap[2])
+        return cap[1]
+    if kind == "deque":
+        cap[1].clear()
+        cap[1].extend(cap[2])
+        return cap[1]
+    if kind == "obj":
+        return restore_state(cap[1])
+    return cap[1]
+
+
+def capture_state(obj, deep=False, tail: Optional[Dict[str, int]] = None):
+    # 属性整体浅拷贝一份，容器(以及deep时的模型状态)另外保存内容，恢复时原地写回，外部持有的引用仍然有效
+    attrs = dict(iter_attrs(obj)) if _slot_names(type(obj)) else obj.__dict__.copy()
+    if tail is None:
+        containers = [_capture_value(value, deep) for value in attrs.values() if _need_capture(value, deep)]
+    else:
+        containers = [_capture_value(value, deep, tail.get(name)) for name, value in attrs.items() if _need_capture(value, deep)]
+    return obj, deep, attrs, containers, True
+
+
+def capture_attrs(obj, names: Iterable[str]):
+    # 只保存指定的属性，这些属性只会被整体替换，不会被原地修改
+    return obj, False, {name: getattr(obj, name) for name in names}, [], False
+
+
+def restore_state(state):
+    # 同一个state可以多次restore
+    obj, deep, attrs, containers, full = state
+    if _slot_names(type(obj)):
+        for name, value in attrs.items():
+            object.__setattr__(obj, name, value)
+        if full:
+            for name in [name for name, _ in iter_attrs(obj) if name not in attrs]:
+                delattr(obj, name)
+    else:
+        if full:
+            obj.__dict__.clear()
+        obj.__dict__.update(attrs)
+    for cap in containers:
+        _restore_value(cap, deep)
+    return obj
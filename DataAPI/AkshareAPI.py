@@ -102,7 +102,7 @@ class CAkshare(CCommonStockApi):
 
         # 遍历每一行生成K线单元
         for _, row in df.iterrows():
-            yield CKLine_Unit(create_item_dict(row, self.autype))
+            yield self.new_klu(create_item_dict(row, self.autype))
 
     def SetBasciInfo(self):
         """设置基本信息"""
@@ -56,6 +56,7 @@ def GetColumnNameFromFieldList(fileds: str):
 
 class CBaoStock(CCommonStockApi):
     is_connect = None
+    CONCURRENT_FETCH = False  # baostock所有请求共用一个连接
 
     def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=AUTYPE.QFQ):
         super(CBaoStock, self).__init__(code, k_type, begin_date, end_date, autype)
@@ -80,7 +81,7 @@ class CBaoStock(CCommonStockApi):
         if rs.error_code != '0':
             raise Exception(rs.error_msg)
         while rs.error_code == '0' and rs.next():
-            yield CKLine_Unit(create_item_dict(rs.get_row_data(), GetColumnNameFromFieldList(fields)))
+            yield self.new_klu(create_item_dict(rs.get_row_data(), GetColumnNameFromFieldList(fields)))
 
     def SetBasciInfo(self):
         rs = bs.query_stock_basic(code=self.code)
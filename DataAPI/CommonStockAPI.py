@@ -1,10 +1,14 @@
 import abc
 from typing import Iterable
 
+from KLine.KLine_Store import CKLine_Unit_View
 from KLine.KLine_Unit import CKLine_Unit
 
 
 class CCommonStockApi:
+    CONCURRENT_FETCH = True  # 不同级别能否在多个线程里同时读取，kl_prefetch用
+    klu_view = False  # CChan开启kl_columnar时设为True，new_klu直接生成列式存储的视图
+
     def __init__(self, code, k_type, begin_date, end_date, autype):
         self.code = code
         self.name = None
@@ -19,6 +23,12 @@ class CCommonStockApi:
     def get_kl_data(self) -> Iterable[CKLine_Unit]:
         pass
 
+    def new_klu(self, kl_dict, autofix=False) -> CKLine_Unit:
+        # 数据源统一用这个方法从kl_dict生成K线；列式存储时不创建中间的CKLine_Unit，kl_dict在主线程store_klu时直接写入列
+        if self.klu_view:
+            return CKLine_Unit_View.from_dict(kl_dict, autofix)
+        return CKLine_Unit(kl_dict, autofix)
+
     @abc.abstractmethod
     def SetBasciInfo(self):
         pass
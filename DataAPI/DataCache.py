@@ -0,0 +1,191 @@
+import json
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Type
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, KL_TYPE, TRADE_INFO_LST
+from KLine.KLine_Store import pack_time, unpack_time_lst
+from KLine.KLine_Unit import CKLine_Unit
+
+from .CommonStockAPI import CCommonStockApi
+from .csvAPI import date_key
+
+"""
+本地K线缓存：
+每个(数据源, code, k_type, autype)一个npz文件，按列保存时间/OHLC/成交信息，
+再次请求时只向数据源补拉最后一根缓存K线所在日期之后的数据，文件总大小超过上限时按最近使用时间淘汰
+"""
+
+PRICE_COLUMNS = [DATA_FIELD.FIELD_OPEN, DATA_FIELD.FIELD_HIGH, DATA_FIELD.FIELD_LOW, DATA_FIELD.FIELD_CLOSE]
+
+
+def klu_to_arrays(klu_lst: List[CKLine_Unit]) -> Dict[str, np.ndarray]:
+    n = len(klu_lst)
+    res = {
+        "time": np.fromiter((pack_time(klu.time) for klu in klu_lst), dtype=np.int64, count=n),
+        "time_auto": np.fromiter((klu.time.auto for klu in klu_lst), dtype=np.bool_, count=n),
+    }
+    for name in PRICE_COLUMNS:
+        res[name] = np.fromiter((getattr(klu, name) for klu in klu_lst), dtype=np.float64, count=n)
+    for name in TRADE_INFO_LST:
+        # None保存成nan
+        res[name] = np.array([klu.trade_info.metric.get(name) for klu in klu_lst], dtype=np.float64).reshape(n)
+    return res
+
+
+def arrays_to_klu(arrays: Dict[str, np.ndarray], new_klu: Callable[[dict], CKLine_Unit] = CKLine_Unit) -> Iterable[CKLine_Unit]:
+    time_lst = unpack_time_lst(arrays["time"], arrays["time_auto"])
+    trade_fields = [name for name in TRADE_INFO_LST if not np.isnan(arrays[name]).all()]
+    n_price = len(PRICE_COLUMNS)
+    for t, values in zip(time_lst, zip(*[arrays[name].tolist() for name in PRICE_COLUMNS + trade_fields])):
+        item = dict(zip(PRICE_COLUMNS, values[:n_price]))
+        for name, value in zip(trade_fields, values[n_price:]):
+            if value == value:  # nan为原数据没有这个字段，不放进item
+                item[name] = value
+        item[DATA_FIELD.FIELD_TIME] = t
+        yield new_klu(item)
+
+
+def concat_arrays(arr1: Dict[str, np.ndarray], arr2: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {name: np.concatenate([arr1[name], arr2[name]]) for name in arr1}
+
+
+def slice_arrays(arrays: Dict[str, np.ndarray], begin: int, end: int) -> Dict[str, np.ndarray]:
+    return {name: arr[begin:end] for name, arr in arrays.items()}
+
+
+class CDataCache:
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_path(self, src: str, code: str, k_type: KL_TYPE, autype) -> str:
+        autype_name = autype.name if autype is not None else "NONE"
+        file_name = re.sub(r"[^\w.-]", "_", f"{src}_{code}_{k_type.name}_{autype_name}")
+        return os.path.join(self.cache_dir, f"{file_name}.npz")
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return None, None
+        try:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files if name != "meta"}
+                meta = json.loads(str(npz["meta"]))
+        except (OSError, ValueError, KeyError):  # 文件损坏当作没有缓存
+            return None, None
+        os.utime(path)  # 按修改时间做LRU淘汰
+        return arrays, meta
+
+    def save(self, path: str, arrays: Dict[str, np.ndarray], meta: dict):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep: Optional[str] = None):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                file_path = os.path.join(self.cache_dir, name)
+                stat = os.stat(file_path)
+                files.append((stat.st_mtime, stat.st_size, file_path))
+        total = sum(size for _, size, _ in files)
+        for _, size, file_path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if file_path == keep:
+                continue
+            os.remove(file_path)
+            total -= size
+
+    def get_size(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in os.listdir(self.cache_dir) if name.endswith(".npz"))
+
+
+class CCachedStockApi(CCommonStockApi):
+    """
+    包装任意CCommonStockApi子类，用wrap生成具体的类之后可以直接作为CChan的data_src；
+    缓存覆盖请求的begin_date时只补拉尾部，否则从请求的begin_date重新拉取到最新；
+    补拉的第一根K线和缓存里同一时间的K线开盘价不一致时(比如前复权因子变了)，整段重新拉取
+    """
+    upstream_cls: Type[CCommonStockApi] = CCommonStockApi
+    cache: Optional[CDataCache] = None
+    _wrapped: Dict[tuple, type] = {}
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        assert self.cache is not None, "use CCachedStockApi.wrap to create a cached data source"
+        self.__upstream: Optional[CCommonStockApi] = None
+        self.path = self.cache.get_path(self.upstream_cls.__name__, code, k_type, autype)
+        self.arrays, self.meta = self.cache.load(self.path)
+        super(CCachedStockApi, self).__init__(code, k_type, begin_date, end_date, autype)
+
+    @classmethod
+    def wrap(cls, upstream_cls: Type[CCommonStockApi], cache_dir: str, max_mb: float = 1024) -> type:
+        key = (upstream_cls, os.path.abspath(cache_dir), max_mb)
+        if key not in cls._wrapped:
+            cls._wrapped[key] = type(f"CCached{upstream_cls.__name__}", (cls,), {
+                "upstream_cls": upstream_cls,
+                "CONCURRENT_FETCH": upstream_cls.CONCURRENT_FETCH,
+                "cache": CDataCache(cache_dir, int(max_mb * (1 << 20))),
+            })
+        return cls._wrapped[key]
+
+    @property
+    def upstream(self) -> CCommonStockApi:
+        # 只有需要拉数据的时候才创建，创建时数据源可能会请求网络获取基本信息
+        if self.__upstream is None:
+            self.__upstream = self.upstream_cls(code=self.code, k_type=self.k_type, begin_date=self.begin_date, end_date=self.end_date, autype=self.autype)
+        return self.__upstream
+
+    def SetBasciInfo(self):
+        if self.meta is not None:
+            self.name, self.is_stock = self.meta["name"], self.meta["is_stock"]
+        else:
+            self.name, self.is_stock = self.upstream.name, self.upstream.is_stock
+
+    def fetch(self, begin_date, end_date) -> Dict[str, np.ndarray]:
+        self.upstream.begin_date, self.upstream.end_date = begin_date, end_date
+        return klu_to_arrays(list(self.upstream.get_kl_data()))
+
+    def update_cache(self, begin_key: Optional[int]):
+        arrays, meta = self.arrays, self.meta
+        fetch_begin_key, fetch_begin_date = begin_key, self.begin_date
+        if arrays is not None and (meta["begin_key"] is None or (begin_key is not None and begin_key >= meta["begin_key"])):
+            last_key = int(arrays["time"][-1]) // 100 if len(arrays["time"]) else None
+            end_key = date_key(self.end_date, True)
+            if last_key is not None and end_key is not None and end_key <= last_key:
+                return  # 请求的区间都在缓存里
+            tail_begin = meta["begin_date"] if last_key is None else f"{last_key // 100000000:04}-{last_key // 1000000 % 100:02}-{last_key // 10000 % 100:02}"
+            tail = self.fetch(tail_begin, self.end_date)
+            if len(tail["time"]) == 0:
+                return
+            pos = int(np.searchsorted(arrays["time"], tail["time"][0]))
+            if pos == len(arrays["time"]) or arrays["time"][pos] != tail["time"][0] or all(arrays[name][pos] == tail[name][0] for name in PRICE_COLUMNS):
+                self.arrays = concat_arrays(slice_arrays(arrays, 0, pos), tail)
+                self.cache.save(self.path, self.arrays, meta)
+                return
+            fetch_begin_key, fetch_begin_date = meta["begin_key"], meta["begin_date"]  # 历史数据变了(比如复权)，整段重新拉取
+        # 有缓存但是没有覆盖请求的开始时间时拉到最新，避免和缓存拼接时中间缺数据
+        self.arrays = self.fetch(fetch_begin_date, self.end_date if arrays is None else None)
+        self.meta = {"begin_key": fetch_begin_key, "begin_date": fetch_begin_date, "name": self.upstream.name, "is_stock": self.upstream.is_stock}
+        self.cache.save(self.path, self.arrays, self.meta)
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        begin_key, end_key = date_key(self.begin_date, False), date_key(self.end_date, True)
+        self.update_cache(begin_key)
+        keys = self.arrays["time"] // 100
+        begin = 0 if begin_key is None else int(np.searchsorted(keys, begin_key, side="left"))
+        end = len(keys) if end_key is None else int(np.searchsorted(keys, end_key, side="right"))
+        yield from arrays_to_klu(slice_arrays(self.arrays, begin, end), self.new_klu)
+
+    @classmethod
+    def do_init(cls):
+        cls.upstream_cls.do_init()
+
+    @classmethod
+    def do_close(cls):
+        cls.upstream_cls.do_close()
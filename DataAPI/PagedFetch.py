@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from Common.CEnum import KL_TYPE
+
+"""
+分页拉取K线：交易所单次fetch_ohlcv最多返回几百到一千根，
+把[since, end]按每页limit根切成多个窗口，用有限个线程并发拉取，所有线程共用一个限速器，最后按时间拼接去重
+"""
+
+TIMEFRAME_MS = {
+    KL_TYPE.K_1M: 60 * 1000,
+    KL_TYPE.K_3M: 3 * 60 * 1000,
+    KL_TYPE.K_5M: 5 * 60 * 1000,
+    KL_TYPE.K_15M: 15 * 60 * 1000,
+    KL_TYPE.K_30M: 30 * 60 * 1000,
+    KL_TYPE.K_60M: 60 * 60 * 1000,
+    KL_TYPE.K_4H: 4 * 60 * 60 * 1000,
+    KL_TYPE.K_DAY: 24 * 60 * 60 * 1000,
+    KL_TYPE.K_WEEK: 7 * 24 * 60 * 60 * 1000,
+    KL_TYPE.K_MON: 31 * 24 * 60 * 60 * 1000,  # 按最长的月份切窗口，窗口之间的重叠靠去重处理；只用来切窗口，不用来推算下一根的时间
+}
+
+
+class CRateLimiter:
+    # 相邻两次请求至少间隔interval_ms毫秒，多线程共用
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def split_windows(since: int, end: int, step: int) -> List[Tuple[int, int]]:
+    # 左闭右开
+    return [(begin, min(begin + step, end + 1)) for begin in range(since, end + 1, step)]
+
+
+def fetch_window(exchange, symbol: str, timeframe: str, window: Tuple[int, int], limit: int, limiter: CRateLimiter) -> List[list]:
+    # 交易所实际单页上限可能比limit小，一个窗口没取完就从最后一根的下一毫秒接着取(月线等周期不定长，不能加固定周期)
+    begin, stop = window
+    res = []
+    while begin < stop:
+        limiter.wait()
+        page = exchange.fetch_ohlcv(symbol, timeframe, since=begin, limit=limit)
+        if not page:
+            break
+        res.extend(candle for candle in page if begin <= candle[0] < stop)
+        if page[-1][0] < begin:  # 没有前进，避免死循环
+            break
+        begin = page[-1][0] + 1
+    return res
+
+
+def fetch_ohlcv_paged(
+    exchange,
+    symbol: str,
+    timeframe: str,
+    since: int,
+    end: int,
+    tf_ms: int,
+    limit: int = 1000,
+    max_workers: int = 4,
+    rate_limit_ms: Optional[float] = None,
+    limiter: Optional[CRateLimiter] = None,
+) -> List[list]:
+    """
+    since/end为毫秒时间戳(都包含)，tf_ms为单根K线的毫秒数(只用来按limit切窗口)，返回按时间排序、时间戳不重复的[ts, open, high, low, close, volume]列表；
+    limiter为多次调用之间共用的限速器(同一个交易所的所有请求应该共用一个)，不传时按rate_limit_ms(默认取exchange.rateLimit)新建一个
+    """
+    if since > end:
+        return []
+    if limiter is None:
+        limiter = CRateLimiter(getattr(exchange, "rateLimit", 0) if rate_limit_ms is None else rate_limit_ms)
+    windows = split_windows(since, end, tf_ms * limit)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        pages = list(pool.map(lambda window: fetch_window(exchange, symbol, timeframe, window, limit, limiter), windows))
+    candles = {}
+    for page in pages:
+        for candle in page:
+            candles[candle[0]] = candle  # 重复的时间戳保留后拉到的
+    return [candles[ts] for ts in sorted(candles)]
@@ -34,7 +34,7 @@ class Binance(CCommonStockApi):
                 item[4],
                 item[5]
             ]
-            yield CKLine_Unit(self.create_item_dict(item_data, GetColumnNameFromFieldList(fields)), autofix=True)
+            yield self.new_klu(self.create_item_dict(item_data, GetColumnNameFromFieldList(fields)), autofix=True)
 
     def SetBasciInfo(self):
         try:
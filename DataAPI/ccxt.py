@@ -1,4 +1,5 @@
 import ssl
+import threading
 from datetime import datetime
 
 import ccxt
@@ -13,6 +14,7 @@ from Common.func_util import kltype_lt_day, str2float
 from KLine.KLine_Unit import CKLine_Unit
 
 from .CommonStockAPI import CCommonStockApi
+from .PagedFetch import TIMEFRAME_MS, CRateLimiter, fetch_ohlcv_paged
 
 def create_ssl_context():
     context = ssl.create_default_context()
@@ -59,23 +61,37 @@ def GetColumnNameFromFieldList(fileds: str):
 
 class CCXT(CCommonStockApi):
     is_connect = None
+    exchange = None
+    limiter: CRateLimiter = None  # 所有级别/线程/CChan共用一个限速器，总请求频率不超过交易所的rateLimit
+    init_cnt = 0  # do_init/do_close引用计数，最后一个使用者do_close时才关闭session
+    lock = threading.Lock()
+    PAGE_LIMIT = 1000  # 每页请求的K线数
+    MAX_WORKERS = 4  # 并发拉取的线程数，所有线程共用交易所的rateLimit
 
     def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=AUTYPE.QFQ):
         super(CCXT, self).__init__(code, k_type, begin_date, end_date, autype)
 
     def get_kl_data(self):
         fields = "time,open,high,low,close"
-        ssl_ctx = create_ssl_context()
-        my_session = create_session_with_ssl_context(ssl_ctx)
-        exchange = ccxt.binance({
-            'session': my_session,
-                                 'enableRateLimit': True
-                                    ,'options': {
-                            'defaultType': 'future',  # fapi
-                        } })
+        exchange, limiter = self.get_exchange()
         timeframe = self.__convert_type()
-        since_date = exchange.parse8601(f'{self.begin_date}T00:00:00')
-        data = exchange.fetch_ohlcv(self.code, timeframe, since=since_date)
+        if self.begin_date is None:
+            limiter.wait()
+            data = exchange.fetch_ohlcv(self.code, timeframe)  # 只取交易所默认返回的最近一页
+        else:
+            since_date = exchange.parse8601(f'{self.begin_date}T00:00:00')
+            end_date = exchange.parse8601(f'{self.end_date}T23:59:59') if self.end_date is not None else exchange.milliseconds()
+            data = fetch_ohlcv_paged(
+                exchange,
+                self.code,
+                timeframe,
+                since_date,
+                end_date,
+                TIMEFRAME_MS[self.k_type],
+                limit=self.PAGE_LIMIT,
+                max_workers=self.MAX_WORKERS,
+                limiter=limiter,
+            )
 
         for item in data:
             time_obj = datetime.fromtimestamp(item[0] / 1000)
@@ -87,18 +103,46 @@ class CCXT(CCommonStockApi):
                 item[3],
                 item[4]
             ]
-            yield CKLine_Unit(self.create_item_dict(item_data, GetColumnNameFromFieldList(fields)), autofix=True)
+            yield self.new_klu(self.create_item_dict(item_data, GetColumnNameFromFieldList(fields)), autofix=True)
 
     def SetBasciInfo(self):
         pass
 
+    @classmethod
+    def get_exchange(cls):
+        # 所有请求共用一个session和限速器；限速由cls.limiter统一控制，关掉ccxt自带的(非线程安全)限速
+        with cls.lock:
+            if cls.exchange is None:
+                my_session = create_session_with_ssl_context(create_ssl_context())
+                cls.exchange = ccxt.binance({
+                    'session': my_session,
+                    'enableRateLimit': False,
+                    'options': {
+                        'defaultType': 'future',  # fapi
+                    },
+                })
+                cls.limiter = CRateLimiter(cls.exchange.rateLimit)
+            return cls.exchange, cls.limiter
+
     @classmethod
     def do_init(cls):
-        pass
+        cls.get_exchange()
+        with cls.lock:
+            cls.init_cnt += 1
+            cls.is_connect = True
 
     @classmethod
     def do_close(cls):
-        pass
+        # 其他CChan/预读线程可能还在用共用的exchange，只有最后一个使用者关闭session
+        with cls.lock:
+            cls.init_cnt = max(cls.init_cnt - 1, 0)
+            if cls.init_cnt > 0:
+                return
+            if cls.exchange is not None:
+                cls.exchange.session.close()
+                cls.exchange = None
+                cls.limiter = None
+            cls.is_connect = None
 
     def __convert_type(self):
         _dict = {
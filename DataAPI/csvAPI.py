@@ -1,4 +1,8 @@
 import os
+import re
+from typing import Dict, Iterable, Optional
+
+import numpy as np
 
 from Common.CEnum import DATA_FIELD, KL_TYPE
 from Common.ChanException import CChanException, ErrCode
@@ -40,7 +44,59 @@ def parse_time_column(inp):
     return CTime(year, month, day, hour, minute)
 
 
+# 三种时间格式中年月日时分的起始位置，和parse_time_column一致，秒不解析
+TIME_LAYOUT = {
+    10: (0, 5, 8, None, None),  # 2021-09-13
+    17: (0, 4, 6, 8, 10),  # 20210902113000000
+    19: (0, 5, 8, 11, 14),  # 2021-09-13 11:30:00
+}
+
+
+def parse_time_array(col: np.ndarray) -> Dict[str, np.ndarray]:
+    # col是定长bytes数组，按字符位置把数字直接算出来
+    width = len(col[0]) if len(col) else 10
+    if width not in TIME_LAYOUT or not np.all(np.char.str_len(col) == width):
+        raise CChanException(f"unknown time column from csv:{col[0] if len(col) else ''}", ErrCode.SRC_DATA_FORMAT_ERROR)
+    digit = col.astype(f"S{width}").view(np.uint8).reshape(-1, width).astype(np.int64) - ord("0")
+
+    def get_num(begin, size):
+        if begin is None:
+            return np.zeros(len(col), dtype=np.int64)
+        res = digit[:, begin]
+        for pos in range(begin + 1, begin + size):
+            res = res * 10 + digit[:, pos]
+        return res
+    y, m, d, h, mi = TIME_LAYOUT[width]
+    return {"year": get_num(y, 4), "month": get_num(m, 2), "day": get_num(d, 2), "hour": get_num(h, 2), "minute": get_num(mi, 2)}
+
+
+def time_key(fields: Dict[str, np.ndarray]) -> np.ndarray:
+    # YYYYMMDDhhmm，用于二分查找begin_date/end_date
+    return (((fields["year"] * 100 + fields["month"]) * 100 + fields["day"]) * 100 + fields["hour"]) * 100 + fields["minute"]
+
+
+def date_key(date: Optional[str], is_end: bool) -> Optional[int]:
+    # 只取日期字符串里的数字：只有日期的end_date包含当天所有K线
+    if date is None:
+        return None
+    digits = re.sub(r"\D", "", date)[:12]
+    if len(digits) < 8:
+        raise CChanException(f"unknown date format: {date}", ErrCode.PARA_ERROR)
+    if len(digits) == 8 and is_end:
+        digits += "2359"
+    return int(digits.ljust(12, "0"))
+
+
+def col_to_float(col: np.ndarray) -> np.ndarray:
+    try:
+        return col.astype(np.float64)
+    except ValueError:  # 有空值或非法值时退回逐个转换，和str2float一致当作0
+        return np.fromiter((str2float(item.decode()) for item in col), dtype=np.float64, count=len(col))
+
+
 class CSV_API(CCommonStockApi):
+    CHUNK_SIZE = 32 << 20  # 每次解析的字节数
+
     def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
         self.headers_exist = True  # 第一行是否是标题，如果是数据，设置为False
         self.columns = [
@@ -52,28 +108,117 @@ class CSV_API(CCommonStockApi):
             # DATA_FIELD.FIELD_VOLUME,
             # DATA_FIELD.FIELD_TURNOVER,
             # DATA_FIELD.FIELD_TURNRATE,
-        ]  # 每一列字段
+        ]  # 每一列字段，不需要的列填None
         self.time_column_idx = self.columns.index(DATA_FIELD.FIELD_TIME)
         super(CSV_API, self).__init__(code, k_type, begin_date, end_date, autype)
 
-    def get_kl_data(self):
+    def get_file_path(self):
         cur_path = os.path.dirname(os.path.realpath(__file__))
         k_type = self.k_type.name[2:].lower()
         file_path = f"{cur_path}/../{self.code}_{k_type}.csv"
         if not os.path.exists(file_path):
             raise CChanException(f"file not exist: {file_path}", ErrCode.SRC_DATA_NOT_FOUND)
+        return file_path
 
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        # 整块解析成数组之后再逐根生成K线
+        fields = [field for field in self.columns if field is not None and field != DATA_FIELD.FIELD_TIME]
+        for arrays in self.iter_arrays():
+            time_lst = CTime.from_fields(arrays["year"], arrays["month"], arrays["day"], arrays["hour"], arrays["minute"], 0)
+            for t, values in zip(time_lst, zip(*[arrays[field].tolist() for field in fields])):
+                item = dict(zip(fields, values))
+                item[DATA_FIELD.FIELD_TIME] = t
+                yield self.new_klu(item)
+
+    def get_kl_data_by_line(self) -> Iterable[CKLine_Unit]:
+        # 逐行解析，结果和get_kl_data一致(只有日期的end_date包含当天的分钟K线)
+        begin_key, end_key = date_key(self.begin_date, False), date_key(self.end_date, True)
+        file_path = self.get_file_path()
         for line_number, line in enumerate(open(file_path, 'r')):
             if self.headers_exist and line_number == 0:
                 continue
             data = line.strip("\n").split(",")
             if len(data) != len(self.columns):
                 raise CChanException(f"file format error: {file_path}", ErrCode.SRC_DATA_FORMAT_ERROR)
-            if self.begin_date is not None and data[self.time_column_idx] < self.begin_date:
-                continue
-            if self.end_date is not None and data[self.time_column_idx] > self.end_date:
+            item = create_item_dict(data, self.columns)
+            item.pop(None, None)
+            t = item[DATA_FIELD.FIELD_TIME]
+            key = (((t.year * 100 + t.month) * 100 + t.day) * 100 + t.hour) * 100 + t.minute
+            if begin_key is not None and key < begin_key:
                 continue
-            yield CKLine_Unit(create_item_dict(data, self.columns))
+            if end_key is not None and key > end_key:
+                break
+            yield self.new_klu(item)
+
+    def iter_arrays(self) -> Iterable[Dict[str, np.ndarray]]:
+        # 按块读取，每块返回时间各字段和数值列的数组，已按begin_date/end_date过滤
+        begin_key, end_key = date_key(self.begin_date, False), date_key(self.end_date, True)
+        file_path = self.get_file_path()
+        with open(file_path, 'rb') as f:
+            if self.headers_exist:
+                f.readline()
+            if begin_key is not None:
+                self.seek_to_key(f, begin_key)
+            last_key = -1
+            rest = b""
+            while True:
+                buf = f.read(self.CHUNK_SIZE)
+                chunk = rest + buf
+                if not buf:
+                    rest = b""
+                elif chunk.rfind(b"\n") >= 0:
+                    split_pos = chunk.rfind(b"\n") + 1
+                    chunk, rest = chunk[:split_pos], chunk[split_pos:]
+                else:
+                    rest = chunk
+                    continue
+                if chunk.strip():
+                    arrays = self.parse_chunk(chunk, file_path)
+                    keys = time_key(arrays)
+                    if keys[0] < last_key or np.any(keys[1:] < keys[:-1]):
+                        raise CChanException(f"kline time not sorted: {file_path}", ErrCode.SRC_DATA_FORMAT_ERROR)
+                    last_key = keys[-1]
+                    begin = 0 if begin_key is None else np.searchsorted(keys, begin_key, side="left")
+                    end = len(keys) if end_key is None else np.searchsorted(keys, end_key, side="right")
+                    if begin < end:
+                        yield {name: arr[begin:end] for name, arr in arrays.items()}
+                    if end < len(keys):
+                        return
+                if not buf:
+                    return
+
+    def seek_to_key(self, f, key: int):
+        # 文件按时间排序，按字节偏移二分找到第一根时间>=key的K线所在行的开头
+        lo = f.tell()
+        hi = f.seek(0, os.SEEK_END)
+        while hi - lo > self.CHUNK_SIZE:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()  # 跳到下一行开头
+            line_begin = f.tell()
+            line = f.readline().strip()
+            if not line or self.line_key(line) >= key:
+                hi = mid
+            else:
+                lo = line_begin
+        f.seek(lo)
+
+    def line_key(self, line: bytes) -> int:
+        time_col = np.array([line.split(b",")[self.time_column_idx]])
+        return int(time_key(parse_time_array(time_col))[0])
+
+    def parse_chunk(self, chunk: bytes, file_path) -> Dict[str, np.ndarray]:
+        chunk = chunk.replace(b"\r", b"").rstrip(b"\n")
+        row_cnt = chunk.count(b"\n") + 1
+        cells = chunk.replace(b"\n", b",").split(b",")
+        if len(cells) != row_cnt * len(self.columns):
+            raise CChanException(f"file format error: {file_path}", ErrCode.SRC_DATA_FORMAT_ERROR)
+        table = np.array(cells, dtype=np.bytes_).reshape(row_cnt, len(self.columns))
+        res = parse_time_array(table[:, self.time_column_idx])
+        for idx, field in enumerate(self.columns):
+            if field is not None and field != DATA_FIELD.FIELD_TIME:
+                res[field] = col_to_float(table[:, idx])
+        return res
 
     def SetBasciInfo(self):
         pass
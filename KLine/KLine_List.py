@@ -1,5 +1,5 @@
 import copy
-from typing import List, Union, overload
+from typing import List, Optional, Tuple, Union, overload
 
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
@@ -7,13 +7,17 @@ from BuySellPoint.BSPointList import CBSPointList
 from ChanConfig import CChanConfig
 from Common.CEnum import KLINE_DIR, SEG_TYPE
 from Common.ChanException import CChanException, ErrCode
+from Common.ListView import CListView
+from Common.Profiler import CStageProfiler
 from Seg.Seg import CSeg
 from Seg.SegConfig import CSegConfig
 from Seg.SegListComm import CSegListComm
 from ZS.ZSList import CZSList
 
 from .KLine import CKLine
-from .KLine_Unit import CKLine_Unit
+from .KLine_Snapshot import CKLine_Snapshot
+from .KLine_Store import CKLine_Store, CKLine_Unit_View
+from .KLine_Unit import CKLine_Unit, set_metric_batch
 
 
 def get_seglist_instance(seg_config: CSegConfig, lv) -> CSegListComm:
@@ -37,6 +41,7 @@ class CKLine_List:
         self.kl_type = kl_type
         self.config = conf
         self.lst: List[CKLine] = []  # K线列表，可递归  元素KLine类型
+        self.kl_store: Optional[CKLine_Store] = CKLine_Store() if conf.kl_columnar else None  # 列式存储后端
         self.bi_list = CBiList(bi_conf=conf.bi_conf)
         self.seg_list: CSegListComm[CBi] = get_seglist_instance(seg_config=conf.seg_conf, lv=SEG_TYPE.BI)
         self.segseg_list: CSegListComm[CSeg[CBi]] = get_seglist_instance(seg_config=conf.seg_conf, lv=SEG_TYPE.SEG)
@@ -50,13 +55,23 @@ class CKLine_List:
         self.metric_model_lst = conf.GetMetricModel()
 
         self.step_calculation = self.need_cal_step_by_step()
+        self.batch_metric = conf.batch_metric and not self.step_calculation  # 非逐步模式下指标延迟到计算线段中枢前批量计算
+        self.metric_pending: List[CKLine_Unit] = []
 
         self.last_sure_seg_start_bi_idx = -1
         self.last_sure_segseg_start_bi_idx = -1
 
+        self.seg_changed = False  # 最近一根K线(非逐步模式下为最近一次计算)是否改变了线段列表，没有改变时跳过线段的线段这一层
+
+        self.live_snapshot: Optional[CKLine_Snapshot] = None  # 最近一次append_bar之前的尾部状态，供update_bar回滚
+
+        self.profiler: Optional[CStageProfiler] = CStageProfiler() if conf.perf_profile else None  # 各计算阶段耗时
+
     def __deepcopy__(self, memo):
         new_obj = CKLine_List(self.kl_type, self.config)
         memo[id(self)] = new_obj
+        if self.kl_store is not None:
+            new_obj.kl_store = copy.deepcopy(self.kl_store, memo)
         for klc in self.lst:
             klus_new = []
             for klu in klc.lst:
@@ -86,7 +101,9 @@ class CKLine_List:
         new_obj.bs_point_lst = copy.deepcopy(self.bs_point_lst, memo)
         new_obj.metric_model_lst = copy.deepcopy(self.metric_model_lst, memo)
         new_obj.step_calculation = copy.deepcopy(self.step_calculation, memo)
+        new_obj.metric_pending = [memo[id(klu)] for klu in self.metric_pending]
         new_obj.seg_bs_point_lst = copy.deepcopy(self.seg_bs_point_lst, memo)
+        new_obj.profiler = copy.deepcopy(self.profiler, memo)
         return new_obj
 
     @overload
@@ -101,51 +118,126 @@ class CKLine_List:
     def __len__(self):
         return len(self.lst)
 
+    def cal_metric_batch(self):
+        klu_lst, self.metric_pending = self.metric_pending, []
+        if self.kl_store is not None:
+            self.kl_store.set_metric_batch(klu_lst, self.metric_model_lst)
+        else:
+            set_metric_batch(klu_lst, self.metric_model_lst)
+
     def cal_seg_and_zs(self):
+        prof = self.profiler
+        if prof is not None:
+            prof.start()
+        if self.metric_pending:
+            self.cal_metric_batch()
+            if prof is not None:
+                prof.lap("metric")
         if not self.step_calculation:
-            self.bi_list.try_add_virtual_bi(self.lst[-1])
-        self.last_sure_seg_start_bi_idx = cal_seg(self.bi_list, self.seg_list, self.last_sure_seg_start_bi_idx)
+            self.bi_list.try_add_virtual_bi(self.lst[-1], need_del_end=True)  # 多次追加数据时需要先删掉上次的虚笔
+            if prof is not None:
+                prof.lap("bi")
+        bi_dirty_idx = self.bi_list.pop_dirty_idx()
+        self.last_sure_seg_start_bi_idx, self.seg_changed = cal_seg(self.bi_list, self.seg_list, self.last_sure_seg_start_bi_idx, bi_dirty_idx)
+        if prof is not None:
+            prof.lap("seg")
         self.zs_list.cal_bi_zs(self.bi_list, self.seg_list)
+        if prof is not None:
+            prof.lap("zs")
         update_zs_in_seg(self.bi_list, self.seg_list, self.zs_list)  # 计算seg的zs_lst，以及中枢的bi_in, bi_out
+        if prof is not None:
+            prof.lap("zs_in_seg")
 
-        self.last_sure_segseg_start_bi_idx = cal_seg(self.seg_list, self.segseg_list, self.last_sure_segseg_start_bi_idx)
-        self.segzs_list.cal_bi_zs(self.seg_list, self.segseg_list)
-        update_zs_in_seg(self.seg_list, self.segseg_list, self.segzs_list)  # 计算segseg的zs_lst，以及中枢的bi_in, bi_out
+        if self.seg_changed:  # 线段没有变化时，线段的线段、线段中枢、线段买卖点都不需要重算
+            self.cal_segseg_layer()
 
         # 计算买卖点
-        self.seg_bs_point_lst.cal(self.seg_list, self.segseg_list)  # 线段线段买卖点
         self.bs_point_lst.cal(self.bi_list, self.seg_list)  # 再算笔买卖点
+        if prof is not None:
+            prof.lap("bsp")
+
+    def cal_segseg_layer(self):
+        prof = self.profiler
+        self.last_sure_segseg_start_bi_idx, _ = cal_seg(self.seg_list, self.segseg_list, self.last_sure_segseg_start_bi_idx)
+        if prof is not None:
+            prof.lap("segseg")
+        self.segzs_list.cal_bi_zs(self.seg_list, self.segseg_list)
+        if prof is not None:
+            prof.lap("segzs")
+        update_zs_in_seg(self.seg_list, self.segseg_list, self.segzs_list)  # 计算segseg的zs_lst，以及中枢的bi_in, bi_out
+        if prof is not None:
+            prof.lap("segzs_in_seg")
+        self.seg_bs_point_lst.cal(self.seg_list, self.segseg_list)  # 线段线段买卖点
+        if prof is not None:
+            prof.lap("seg_bsp")
 
     def need_cal_step_by_step(self):
         return self.config.trigger_step
 
+    def store_klu(self, klu: CKLine_Unit) -> CKLine_Unit:
+        # 列式存储模式下，把klu数据写入kl_store并返回对应的视图对象；否则原样返回
+        if self.kl_store is None:
+            return klu
+        if isinstance(klu, CKLine_Unit_View) and klu._store is None:  # 数据源直接生成的视图
+            return self.kl_store.attach(klu)
+        return self.kl_store.append(klu)
+
     def add_single_klu(self, klu: CKLine_Unit):
-        klu.set_metric(self.metric_model_lst)
+        prof = self.profiler
+        self.seg_changed = False
+        if prof is not None:
+            prof.start()
+        if self.batch_metric:
+            self.metric_pending.append(klu)
+        else:
+            klu.set_metric(self.metric_model_lst)
+            if prof is not None:
+                prof.lap("metric")
         if len(self.lst) == 0:
             self.lst.append(CKLine(klu, idx=0))
+            if prof is not None:
+                prof.lap("combine")
         else:
             _dir = self.lst[-1].try_add(klu)
             if _dir != KLINE_DIR.COMBINE:  # 不需要合并K线
                 self.lst.append(CKLine(klu, idx=len(self.lst), _dir=_dir))
+                if prof is not None:
+                    prof.lap("combine")
                 if len(self.lst) >= 3:
                     self.lst[-2].update_fx(self.lst[-3], self.lst[-1])
-                if self.bi_list.update_bi(self.lst[-2], self.lst[-1], self.step_calculation) and self.step_calculation:
+                    if prof is not None:
+                        prof.lap("fx")
+                bi_changed = self.bi_list.update_bi(self.lst[-2], self.lst[-1], self.step_calculation)
+                if prof is not None:
+                    prof.lap("bi")
+                if bi_changed and self.step_calculation:
                     self.cal_seg_and_zs()
-            elif self.step_calculation and self.bi_list.try_add_virtual_bi(self.lst[-1], need_del_end=True):  # 这里的必要性参见issue#175
-                self.cal_seg_and_zs()
+            else:
+                if prof is not None:
+                    prof.lap("combine")
+                if self.step_calculation:
+                    bi_changed = self.bi_list.try_add_virtual_bi(self.lst[-1], need_del_end=True)  # 这里的必要性参见issue#175
+                    if prof is not None:
+                        prof.lap("bi")
+                    if bi_changed:
+                        self.cal_seg_and_zs()
 
     def klu_iter(self, klc_begin_idx=0):
         for klc in self.lst[klc_begin_idx:]:
             yield from klc.lst
 
 
-def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx):
+def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx, line_dirty_idx: Optional[int] = None) -> Tuple[int, bool]:
+    # line_dirty_idx: 上次计算之后有变化的第一笔，传入时复用没有变化的线段对象；返回值的第二项为线段列表是否有变化
+    reuse_begin = seg_list.mutable_begin() if line_dirty_idx is not None else None
+    old_tail = seg_list[reuse_begin:] if reuse_begin is not None else []
     seg_list.update(bi_list)
+    seg_changed = seg_list.reuse_unchanged_seg(reuse_begin, old_tail, line_dirty_idx) if reuse_begin is not None else True
 
     if len(seg_list) == 0:
         for bi in bi_list:
             bi.set_seg_idx(0)
-        return -1
+        return -1, seg_changed
 
     cur_seg: CSeg = seg_list[-1]
 
@@ -171,12 +263,15 @@ def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx):
             last_sure_seg_start_bi_idx = seg.start_bi.idx
             break
         seg = seg.pre
-    return last_sure_seg_start_bi_idx
+    return last_sure_seg_start_bi_idx, seg_changed
 
 
 def update_zs_in_seg(bi_list, seg_list, zs_list):
+    # 线段从后往前、中枢也从后往前扫，每个中枢的bi_in/bi_out/bi_lst只更新一次，bi_lst是bi_list上的区间视图
     sure_seg_cnt = 0
     seg_idx = len(seg_list) - 1
+    zs_end_idx = len(zs_list) - 1  # 之后的中枢起点都在当前线段之后
+    updated_idx = len(zs_list)  # 下标>=updated_idx的中枢已经更新过(包括最后一个线段之后的中枢)
     while seg_idx >= 0:
         seg = seg_list[seg_idx]
         if seg.ele_inside_is_sure:
@@ -184,21 +279,31 @@ def update_zs_in_seg(bi_list, seg_list, zs_list):
         if seg.is_sure:
             sure_seg_cnt += 1
         seg.clear_zs_lst()
-        _zs_idx = len(zs_list) - 1
+        while zs_end_idx >= 0 and zs_list[zs_end_idx].begin_bi.idx > seg.end_bi.idx:
+            zs_end_idx -= 1
+        seg_begin_klu_idx = seg.start_bi.get_begin_klu().idx
+        _zs_idx = max(zs_end_idx, updated_idx - 1)
         while _zs_idx >= 0:
             zs = zs_list[_zs_idx]
-            if zs.end.idx < seg.start_bi.get_begin_klu().idx:
+            if zs.end.idx < seg_begin_klu_idx:
                 break
             if zs.is_inside(seg):
                 seg.add_zs(zs)
-            assert zs.begin_bi.idx > 0
-            zs.set_bi_in(bi_list[zs.begin_bi.idx-1])
-            if zs.end_bi.idx+1 < len(bi_list):
-                zs.set_bi_out(bi_list[zs.end_bi.idx+1])
-            zs.set_bi_lst(list(bi_list[zs.begin_bi.idx:zs.end_bi.idx+1]))
+            if _zs_idx < updated_idx:
+                update_zs_bi(bi_list, zs)
+                updated_idx = _zs_idx
             _zs_idx -= 1
 
         if sure_seg_cnt > 2:
             if not seg.ele_inside_is_sure:
                 seg.ele_inside_is_sure = True
         seg_idx -= 1
+
+
+def update_zs_bi(bi_list, zs):
+    assert zs.begin_bi.idx > 0
+    zs.set_bi_in(bi_list[zs.begin_bi.idx-1])
+    if zs.end_bi.idx+1 < len(bi_list):
+        zs.set_bi_out(bi_list[zs.end_bi.idx+1])
+    if not (isinstance(zs.bi_lst, CListView) and zs.bi_lst.is_same_range(bi_list, zs.begin_bi.idx, zs.end_bi.idx+1)):
+        zs.set_bi_lst(CListView(bi_list, zs.begin_bi.idx, zs.end_bi.idx+1))
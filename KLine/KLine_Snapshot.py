@@ -0,0 +1,218 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from Common.state_util import capture_attrs, capture_state, restore_state
+
+from .KLine_Unit import CKLine_Unit
+
+if TYPE_CHECKING:
+    from .KLine_List import CKLine_List
+
+
+def get_seg_frontier(seg_list) -> int:
+    # ele_inside_is_sure的线段及之前的线段不会再被修改，之后的都可能重算
+    seg_idx = len(seg_list) - 1
+    while seg_idx > 0 and not seg_list[seg_idx].ele_inside_is_sure:
+        seg_idx -= 1
+    return max(seg_idx, 0)
+
+
+def get_line_frontier(line_cnt: int, seg_list) -> int:
+    # 笔(或作为次级别的线段)可能被修改的起点
+    if len(seg_list) == 0:
+        return 0
+    begin = min(seg_list[get_seg_frontier(seg_list)].start_bi.idx, line_cnt - 3) - 1
+    return max(begin, 0)
+
+
+def get_zs_frontier(zs_list, line_begin: int) -> int:
+    zs_idx = len(zs_list)
+    while zs_idx > 0 and zs_list[zs_idx-1].end_bi.idx >= line_begin:
+        zs_idx -= 1
+    return max(zs_idx - 2, 0)  # 新中枢可能与前一个中枢合并
+
+
+def get_bsp_frontier(bsp_lst: list, line_begin: int) -> int:
+    bsp_idx = len(bsp_lst)
+    while bsp_idx > 0 and bsp_lst[bsp_idx-1].bi.idx >= line_begin:
+        bsp_idx -= 1
+    return bsp_idx
+
+
+class CBSPoint_Snapshot:
+    # 保存买卖点列表中bi.idx>=line_begin的部分
+    def __init__(self, bs_point_lst, line_begin: int):
+        self.bs_point_lst = bs_point_lst
+        self.line_begin = line_begin
+        self.store_dict = dict(bs_point_lst.bsp_store_dict)
+        self.store_tail: List[Tuple[list, int, list]] = []
+        for bsp_list in self.store_dict.values():
+            for lst in bsp_list:
+                begin = get_bsp_frontier(lst, line_begin)
+                self.store_tail.append((lst, begin, lst[begin:]))
+        bsp1_begin = get_bsp_frontier(bs_point_lst.bsp1_list, line_begin)
+        self.bsp1_tail = bs_point_lst.bsp1_list[bsp1_begin:]
+        bsp_set = {id(bsp): bsp for _, _, tail in self.store_tail for bsp in tail}
+        bsp_set.update({id(bsp): bsp for bsp in self.bsp1_tail})
+        self.bsp_state = [capture_state(bsp) for bsp in bsp_set.values()]
+        self.feature_state = [capture_state(bsp.features) for bsp in bsp_set.values()]
+        self.scalar = (bs_point_lst.last_sure_pos, bs_point_lst.last_sure_seg_idx)
+
+    def restore(self):
+        bs_point_lst = self.bs_point_lst
+        for bsp in self.cur_bsp_iter():
+            bs_point_lst.bsp_store_flat_dict.pop(bsp.bi.idx, None)
+        for bsp in bs_point_lst.bsp1_list[get_bsp_frontier(bs_point_lst.bsp1_list, self.line_begin):]:
+            bs_point_lst.bsp1_dict.pop(bsp.bi.idx, None)
+        bs_point_lst.bsp_store_dict.clear()
+        bs_point_lst.bsp_store_dict.update(self.store_dict)
+        for lst, begin, tail in self.store_tail:
+            lst[begin:] = tail
+            for bsp in tail:
+                bs_point_lst.bsp_store_flat_dict[bsp.bi.idx] = bsp
+        bsp1_list = bs_point_lst.bsp1_list
+        bsp1_list[get_bsp_frontier(bsp1_list, self.line_begin):] = self.bsp1_tail
+        for bsp in self.bsp1_tail:
+            bs_point_lst.bsp1_dict[bsp.bi.idx] = bsp
+        for state in self.bsp_state:
+            restore_state(state)
+        for state in self.feature_state:
+            restore_state(state)
+        bs_point_lst.index.truncate(self.line_begin)
+        for bsp in sorted((bsp for _, _, tail in self.store_tail for bsp in tail), key=lambda bsp: bsp.bi.idx):
+            bs_point_lst.index.add(bsp)
+        bs_point_lst.last_sure_pos, bs_point_lst.last_sure_seg_idx = self.scalar
+
+    def cur_bsp_iter(self):
+        for bsp_list in self.bs_point_lst.bsp_store_dict.values():
+            for lst in bsp_list:
+                yield from lst[get_bsp_frontier(lst, self.line_begin):]
+
+
+class CKLine_Diff:
+    # append_bar/update_bar前后笔、线段、买卖点的变化，按idx对比
+    def __init__(self):
+        self.new_bi: list = []
+        self.updated_bi: list = []
+        self.removed_bi: list = []
+        self.new_seg: list = []
+        self.updated_seg: list = []
+        self.removed_seg: list = []
+        self.new_bsp: list = []
+        self.updated_bsp: list = []
+        self.removed_bsp: list = []
+
+    @property
+    def has_change(self) -> bool:
+        return any([
+            self.new_bi, self.updated_bi, self.removed_bi,
+            self.new_seg, self.updated_seg, self.removed_seg,
+            self.new_bsp, self.updated_bsp, self.removed_bsp,
+        ])
+
+    def __str__(self):
+        return ", ".join(
+            f"{name}={len(lst)}" for name, lst in self.__dict__.items() if lst
+        )
+
+
+def bi_sig(bi):
+    return bi.begin_klc.idx, bi.end_klc.idx, bi.is_sure
+
+
+def seg_sig(seg):
+    return seg.start_bi.idx, seg.end_bi.idx, seg.is_sure
+
+
+def bsp_sig(bsp):
+    return bsp.is_buy, bsp.type2str(), bsp.klu.idx
+
+
+def diff_items(before: Dict[int, tuple], after: Dict[int, tuple], new_lst: list, updated_lst: list, removed_lst: list):
+    for key, (item, sig) in after.items():
+        if key not in before:
+            new_lst.append(item)
+        elif before[key][1] != sig:
+            updated_lst.append(item)
+    for key, (item, _) in before.items():
+        if key not in after:
+            removed_lst.append(item)
+
+
+class CKLine_Snapshot:
+    """
+    追加一根K线前，保存这根K线可能修改到的尾部状态：
+    合并K线、笔、线段、中枢、买卖点都只会从最后一个内部元素已确定的线段之后开始重算，
+    所以只需要保存这之后的对象；update_bar时回滚到这个状态再重新追加
+    """
+    def __init__(self, kl_list: 'CKLine_List', pre_klu: Optional[CKLine_Unit], parent_klu: Optional[CKLine_Unit]):
+        self.kl_list = kl_list
+        self.pre_klu = pre_klu
+        self.parent_klu = parent_klu
+        self.klu: Optional[CKLine_Unit] = None  # 追加的K线
+
+        self.bi_begin = get_line_frontier(len(kl_list.bi_list), kl_list.seg_list)
+        self.seg_begin = get_seg_frontier(kl_list.seg_list)
+        _seg_begin = min(self.seg_begin, get_line_frontier(len(kl_list.seg_list), kl_list.segseg_list))
+        segseg_begin = get_seg_frontier(kl_list.segseg_list)
+
+        self.state = [capture_state(kl_list, tail={"lst": max(len(kl_list) - 2, 0)})]
+        self.state.extend(capture_state(klc) for klc in kl_list[-2:])
+        self.state.extend(capture_state(metric_model, deep=True) for metric_model in kl_list.metric_model_lst)
+        self.add_line_state(kl_list.bi_list, "bi_list", self.bi_begin)
+        self.add_line_state(kl_list.seg_list, "lst", self.seg_begin, _seg_begin)
+        self.add_line_state(kl_list.segseg_list, "lst", segseg_begin)
+        self.add_zs_state(kl_list.zs_list, self.bi_begin)
+        self.add_zs_state(kl_list.segzs_list, _seg_begin)
+        self.bsp_state = [
+            CBSPoint_Snapshot(kl_list.bs_point_lst, self.bi_begin),
+            CBSPoint_Snapshot(kl_list.seg_bs_point_lst, _seg_begin),
+        ]
+
+        self.pre_klu_next = pre_klu.next if pre_klu is not None else None
+        self.parent_sub_cnt = len(parent_klu.sub_kl_list) if parent_klu is not None else 0
+        self.store_size = len(kl_list.kl_store) if kl_list.kl_store is not None else 0
+
+    def add_line_state(self, line_list, attr: str, begin: int, sup_begin: Optional[int] = None):
+        # sup_begin: 作为次级别的线时，[sup_begin, begin)之间只会修改所属的上级线段和买卖点
+        begin = max(begin - 1, 0)  # 前一个元素的next也会被修改
+        lst = getattr(line_list, attr)
+        if sup_begin is not None and sup_begin < begin:
+            sup_begin = max(sup_begin - 1, 0)
+            self.state.append(capture_state(line_list, tail={attr: sup_begin}))
+            self.state.extend(capture_attrs(line, ["seg_idx", "parent_seg", "bsp", "next"]) for line in lst[sup_begin:begin])
+        else:
+            self.state.append(capture_state(line_list, tail={attr: begin}))
+        self.state.extend(capture_state(line) for line in lst[begin:])
+
+    def add_zs_state(self, zs_list, line_begin: int):
+        zs_begin = get_zs_frontier(zs_list, line_begin)
+        self.state.append(capture_state(zs_list, tail={"zs_lst": zs_begin}))
+        self.state.extend(capture_state(zs) for zs in zs_list.zs_lst[zs_begin:])
+
+    def restore(self):
+        for state in self.state:
+            restore_state(state)
+        for bsp_state in self.bsp_state:
+            bsp_state.restore()
+        if self.pre_klu is not None:
+            self.pre_klu.next = self.pre_klu_next
+        if self.parent_klu is not None:
+            del self.parent_klu.sub_kl_list[self.parent_sub_cnt:]
+        if self.kl_list.kl_store is not None:
+            self.kl_list.kl_store.truncate(self.store_size)
+
+    def collect(self) -> Dict[str, Dict[int, tuple]]:
+        kl_list = self.kl_list
+        return {
+            "bi": {bi.idx: (bi, bi_sig(bi)) for bi in kl_list.bi_list[self.bi_begin:]},
+            "seg": {seg.idx: (seg, seg_sig(seg)) for seg in kl_list.seg_list[self.seg_begin:]},
+            "bsp": {bsp.bi.idx: (bsp, bsp_sig(bsp)) for bsp in self.bsp_state[0].cur_bsp_iter()},
+        }
+
+    def get_diff(self, before: Dict[str, Dict[int, tuple]]) -> CKLine_Diff:
+        after = self.collect()
+        diff = CKLine_Diff()
+        diff_items(before["bi"], after["bi"], diff.new_bi, diff.updated_bi, diff.removed_bi)
+        diff_items(before["seg"], after["seg"], diff.new_seg, diff.updated_seg, diff.removed_seg)
+        diff_items(before["bsp"], after["bsp"], diff.new_bsp, diff.updated_bsp, diff.removed_bsp)
+        return diff
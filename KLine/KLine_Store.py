@@ -0,0 +1,369 @@
+import copy
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, TRADE_INFO_LST, TREND_TYPE
+from Common.CTime import CTime
+from Math.BOLL import BOLL_Metric, BollModel
+from Math.Demark import CDemarkEngine, CDemarkIndex
+from Math.KDJ import KDJ, KDJ_Item
+from Math.MACD import CMACD, CMACD_item
+from Math.RSI import RSI
+from Math.TrendModel import CTrendModel
+
+from .KLine_Unit import CKLine_Unit, check_ohlc
+from .TradeInfo import CTradeInfo
+
+MACD_COLUMNS = ["macd.fast_ema", "macd.slow_ema", "macd.DIF", "macd.DEA"]
+BOLL_COLUMNS = ["boll.MID", "boll.UP", "boll.DOWN", "boll.theta"]
+KDJ_COLUMNS = ["kdj.k", "kdj.d", "kdj.j"]
+
+
+def pack_time(t: CTime) -> int:
+    return ((((t.year * 100 + t.month) * 100 + t.day) * 100 + t.hour) * 100 + t.minute) * 100 + t.second
+
+
+def unpack_time(key: int, auto: bool) -> CTime:
+    key, second = divmod(key, 100)
+    key, minute = divmod(key, 100)
+    key, hour = divmod(key, 100)
+    key, day = divmod(key, 100)
+    year, month = divmod(key, 100)
+    return CTime(year, month, day, hour, minute, second, auto=auto)
+
+
+def unpack_time_lst(packed: np.ndarray, auto) -> List[CTime]:
+    # unpack_time的向量化版本
+    key, second = np.divmod(packed, 100)
+    key, minute = np.divmod(key, 100)
+    key, hour = np.divmod(key, 100)
+    year_month, day = np.divmod(key, 100)
+    year, month = np.divmod(year_month, 100)
+    return CTime.from_fields(year, month, day, hour, minute, second, auto)
+
+
+def trend_column(trend_type: TREND_TYPE, T: int) -> str:
+    return f"trend.{trend_type.name}.{T}"
+
+
+class CKLine_Store:
+    # 列式存储：时间/OHLC/成交信息以及每根K线的指标结果保存在连续的numpy数组里
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.capacity = max(capacity, 16)
+        self.columns: Dict[str, np.ndarray] = {}
+        self.add_column("time", np.int64, 0)
+        self.add_column("time_auto", np.bool_, True)
+        for name in ["open", "high", "low", "close"]:
+            self.add_column(name)
+        for name in TRADE_INFO_LST:
+            self.add_column(name)
+        self.trend_columns: Dict[TREND_TYPE, Dict[int, str]] = {}
+        self.demark: Dict[int, CDemarkIndex] = {}  # 稀疏存储，只保存非空的demark结果
+        self.time_cache: Dict[int, CTime] = {}  # 最近访问的CTime，合并K线时会反复读取同一批K线的时间
+        self.shared_size = 0  # 前shared_size行的列和其他存储共用(fork或mmap)，改写之前先复制
+
+    def add_column(self, name, dtype=np.float64, fill=np.nan):
+        if name not in self.columns:
+            self.columns[name] = np.full(self.capacity, fill, dtype=dtype)
+        return self.columns[name]
+
+    def has_column(self, name) -> bool:
+        return name in self.columns
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in self.columns.values())
+
+    def reserve(self, n: int):
+        if n <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < n:
+            new_capacity *= 2
+        for name, arr in self.columns.items():
+            fill = True if arr.dtype == np.bool_ else (0 if arr.dtype == np.int64 else np.nan)
+            new_arr = np.full(new_capacity, fill, dtype=arr.dtype)
+            new_arr[:self.size] = arr[:self.size]
+            self.columns[name] = new_arr
+        self.capacity = new_capacity
+        self.shared_size = 0
+
+    def before_write(self, row: int):
+        if row < self.shared_size:
+            self.columns = {name: arr.copy() for name, arr in self.columns.items()}
+            self.shared_size = 0
+
+    def fork(self) -> 'CKLine_Store':
+        # 写时复制：新存储和自己共用已有的列，容量等于行数，追加时扩容会复制；任何一方改写已有行之前先复制
+        obj = CKLine_Store.__new__(CKLine_Store)
+        obj.size = obj.capacity = obj.shared_size = self.size
+        obj.columns = dict(self.columns)
+        obj.trend_columns = {trend_type: dict(T_dict) for trend_type, T_dict in self.trend_columns.items()}
+        obj.demark = dict(self.demark)
+        obj.time_cache = {}
+        self.shared_size = max(self.shared_size, self.size)
+        return obj
+
+    def new_row(self, t: CTime, _open, high, low, close, trade_info: Dict[str, Optional[float]]) -> int:
+        row = self.size
+        self.reserve(row + 1)
+        self.before_write(row)
+        cols = self.columns
+        cols["time"][row] = pack_time(t)
+        cols["time_auto"][row] = t.auto
+        cols["open"][row] = _open
+        cols["high"][row] = high
+        cols["low"][row] = low
+        cols["close"][row] = close
+        for name in TRADE_INFO_LST:
+            value = trade_info.get(name)
+            cols[name][row] = value if value is not None else np.nan  # 截断后重新追加时不能残留旧值
+        self.size += 1
+        return row
+
+    def append(self, klu: CKLine_Unit) -> 'CKLine_Unit_View':
+        # 外部传入的CKLine_Unit(如append_bar)，复制一份数据写入列
+        row = self.new_row(klu.time, klu.open, klu.high, klu.low, klu.close, klu.trade_info.metric)
+        return CKLine_Unit_View(self, row, klu)
+
+    def attach(self, klu: 'CKLine_Unit_View') -> 'CKLine_Unit_View':
+        # 数据源用CKLine_Unit_View.from_dict生成的视图，把暂存的kl_dict直接写入列，不经过CKLine_Unit
+        kl_dict = klu._row
+        klu._row = self.new_row(
+            kl_dict[DATA_FIELD.FIELD_TIME],
+            kl_dict[DATA_FIELD.FIELD_OPEN],
+            kl_dict[DATA_FIELD.FIELD_HIGH],
+            kl_dict[DATA_FIELD.FIELD_LOW],
+            kl_dict[DATA_FIELD.FIELD_CLOSE],
+            kl_dict,
+        )
+        klu._store = self
+        return klu
+
+    def truncate(self, size: int):
+        # 丢弃size之后的行，用于实盘更新最后一根K线时回滚
+        for row in range(size, self.size):
+            self.demark.pop(row, None)
+        self.time_cache.clear()
+        self.size = size
+
+    def get(self, name, row):
+        return self.columns[name].item(row)
+
+    def get_time(self, row) -> CTime:
+        if row in self.time_cache:
+            return self.time_cache[row]
+        if len(self.time_cache) >= 64:
+            self.time_cache.clear()
+        t = unpack_time(self.columns["time"].item(row), self.columns["time_auto"].item(row))
+        self.time_cache[row] = t
+        return t
+
+    def get_trend_column(self, trend_type: TREND_TYPE, T: int) -> str:
+        if trend_type not in self.trend_columns:
+            self.trend_columns[trend_type] = {}
+        if T not in self.trend_columns[trend_type]:
+            name = trend_column(trend_type, T)
+            self.add_column(name)
+            self.trend_columns[trend_type][T] = name
+        return self.trend_columns[trend_type][T]
+
+    def set_macd(self, row, item: CMACD_item):
+        for name, value in zip(MACD_COLUMNS, [item.fast_ema, item.slow_ema, item.DIF, item.DEA]):
+            self.add_column(name)[row] = value
+
+    def set_boll(self, row, item: BOLL_Metric):
+        for name, value in zip(BOLL_COLUMNS, [item.MID, item.UP, item.DOWN, item.theta]):
+            self.add_column(name)[row] = value
+
+    def set_kdj(self, row, item: KDJ_Item):
+        for name, value in zip(KDJ_COLUMNS, [item.k, item.d, item.j]):
+            self.add_column(name)[row] = value
+
+    def set_metric_batch(self, klu_lst: List['CKLine_Unit_View'], metric_model_lst: list):
+        # 批量计算结果直接写入列，不再逐根创建指标对象
+        if not klu_lst:
+            return
+        rows = np.fromiter((klu.row for klu in klu_lst), dtype=np.int64, count=len(klu_lst))
+        self.before_write(int(rows.min()))
+        close = self.columns["close"][rows]
+        for metric_model in metric_model_lst:
+            if isinstance(metric_model, CMACD):
+                for name, arr in zip(MACD_COLUMNS, metric_model.add_batch(close)):
+                    self.add_column(name)[rows] = arr
+                del metric_model.macd_info[:-1]
+            elif isinstance(metric_model, CTrendModel):
+                self.columns[self.get_trend_column(metric_model.type, metric_model.T)][rows] = metric_model.add_batch(close)
+            elif isinstance(metric_model, BollModel):
+                ma, theta = metric_model.add_batch(close)
+                down = ma - 2 * theta
+                for name, arr in zip(BOLL_COLUMNS, [ma, ma + 2 * theta, np.where(down != 0, down, 1e-7), np.where(theta != 0, theta, 1e-7)]):
+                    self.add_column(name)[rows] = arr
+            elif isinstance(metric_model, CDemarkEngine):
+                for klu in klu_lst:
+                    demark = metric_model.update(idx=klu.idx, close=klu.close, high=klu.high, low=klu.low)
+                    if demark.data:
+                        self.demark[klu.row] = demark
+            elif isinstance(metric_model, RSI):
+                self.add_column("rsi")[rows] = metric_model.add_batch(close)
+            elif isinstance(metric_model, KDJ):
+                for name, arr in zip(KDJ_COLUMNS, metric_model.add_batch(self.columns["high"][rows], self.columns["low"][rows], close)):
+                    self.add_column(name)[rows] = arr
+
+    def set_metric(self, row, klu: CKLine_Unit, metric_model_lst: list):
+        self.before_write(row)
+        for metric_model in metric_model_lst:
+            if isinstance(metric_model, CMACD):
+                self.set_macd(row, metric_model.add(klu.close))
+                del metric_model.macd_info[:-1]  # 历史结果已经保存在列中，模型只需保留最后一项
+            elif isinstance(metric_model, CTrendModel):
+                self.columns[self.get_trend_column(metric_model.type, metric_model.T)][row] = metric_model.add(klu.close)
+            elif isinstance(metric_model, BollModel):
+                self.set_boll(row, metric_model.add(klu.close))
+            elif isinstance(metric_model, CDemarkEngine):
+                demark = metric_model.update(idx=klu.idx, close=klu.close, high=klu.high, low=klu.low)
+                if demark.data:
+                    self.demark[row] = demark
+            elif isinstance(metric_model, RSI):
+                self.add_column("rsi")[row] = metric_model.add(klu.close)
+            elif isinstance(metric_model, KDJ):
+                self.set_kdj(row, metric_model.add(klu.high, klu.low, klu.close))
+
+
+class CKLine_Unit_View(CKLine_Unit):
+    # 列式存储下的K线单元，价格/成交/指标按行号从CKLine_Store读取，其余结构信息(父子/前后/klc)仍挂在对象上
+    # 继承的价格/指标slot被下面的property覆盖，不会赋值；from_dict生成、还没写入存储时_store为None，_row暂存数据源的kl_dict
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: CKLine_Store, row: int, klu: CKLine_Unit):
+        self._store = store
+        self._row = row
+        self.kl_type = klu.kl_type
+        self.sub_kl_list: List[CKLine_Unit] = klu.sub_kl_list
+        self.sup_kl: Optional[CKLine_Unit] = klu.sup_kl
+        self.set_klc(None)
+        self.limit_flag = klu.limit_flag
+        self.pre: Optional[CKLine_Unit] = klu.pre
+        self.next: Optional[CKLine_Unit] = klu.next
+        self.set_idx(klu.idx)
+
+    @classmethod
+    def from_dict(cls, kl_dict, autofix=False) -> 'CKLine_Unit_View':
+        # 数据源直接生成的视图，store_klu时由CKLine_Store.attach写入列
+        high, low = check_ohlc(
+            kl_dict[DATA_FIELD.FIELD_TIME],
+            kl_dict[DATA_FIELD.FIELD_OPEN],
+            kl_dict[DATA_FIELD.FIELD_HIGH],
+            kl_dict[DATA_FIELD.FIELD_LOW],
+            kl_dict[DATA_FIELD.FIELD_CLOSE],
+            autofix,
+        )
+        if high != kl_dict[DATA_FIELD.FIELD_HIGH] or low != kl_dict[DATA_FIELD.FIELD_LOW]:
+            kl_dict = dict(kl_dict, **{DATA_FIELD.FIELD_HIGH: high, DATA_FIELD.FIELD_LOW: low})
+        obj = cls.__new__(cls)
+        obj._store = None
+        obj._row = kl_dict
+        obj.kl_type = None
+        obj.sub_kl_list = []
+        obj.sup_kl = None
+        obj.set_klc(None)
+        obj.limit_flag = 0
+        obj.pre = None
+        obj.next = None
+        obj.set_idx(-1)
+        return obj
+
+    def __deepcopy__(self, memo):
+        obj = CKLine_Unit_View.__new__(CKLine_Unit_View)
+        obj._store = copy.deepcopy(self._store, memo)
+        obj._row = self._row
+        obj.kl_type = self.kl_type
+        obj.sub_kl_list = []
+        obj.sup_kl = None
+        obj.set_klc(None)
+        obj.limit_flag = self.limit_flag
+        obj.pre = None
+        obj.next = None
+        obj.set_idx(self.idx)
+        memo[id(self)] = obj
+        return obj
+
+    @property
+    def row(self):
+        return self._row
+
+    @property
+    def time(self) -> CTime:
+        if self._store is None:  # 还没写入存储，加载时写入之前需要按时间和父级别对齐
+            return self._row[DATA_FIELD.FIELD_TIME]
+        return self._store.get_time(self._row)
+
+    @property
+    def open(self):
+        return self._store.columns["open"].item(self._row)
+
+    @property
+    def high(self):
+        return self._store.columns["high"].item(self._row)
+
+    @property
+    def low(self):
+        return self._store.columns["low"].item(self._row)
+
+    @property
+    def close(self):
+        return self._store.columns["close"].item(self._row)
+
+    @property
+    def trade_info(self) -> CTradeInfo:
+        info = {}
+        for name in TRADE_INFO_LST:
+            value = self._store.get(name, self._row)
+            if value == value:  # 非nan
+                info[name] = value
+        return CTradeInfo(info)
+
+    @property
+    def demark(self) -> CDemarkIndex:
+        return self._store.demark.get(self._row, CDemarkIndex())
+
+    @property
+    def trend(self) -> Dict[TREND_TYPE, Dict[int, float]]:
+        return {
+            trend_type: {T: self._store.get(name, self._row) for T, name in T_dict.items()}
+            for trend_type, T_dict in self._store.trend_columns.items()
+        }
+
+    @property
+    def macd(self) -> CMACD_item:
+        if not self._store.has_column(MACD_COLUMNS[0]):
+            raise AttributeError("macd")
+        return CMACD_item(*[self._store.get(name, self._row) for name in MACD_COLUMNS])
+
+    @property
+    def boll(self) -> BOLL_Metric:
+        if not self._store.has_column(BOLL_COLUMNS[0]):
+            raise AttributeError("boll")
+        boll = BOLL_Metric.__new__(BOLL_Metric)
+        boll.MID, boll.UP, boll.DOWN, boll.theta = [self._store.get(name, self._row) for name in BOLL_COLUMNS]
+        return boll
+
+    @property
+    def rsi(self) -> float:
+        if not self._store.has_column("rsi"):
+            raise AttributeError("rsi")
+        return self._store.get("rsi", self._row)
+
+    @property
+    def kdj(self) -> KDJ_Item:
+        if not self._store.has_column(KDJ_COLUMNS[0]):
+            raise AttributeError("kdj")
+        return KDJ_Item(*[self._store.get(name, self._row) for name in KDJ_COLUMNS])
+
+    def set_metric(self, metric_model_lst: list) -> None:
+        self._store.set_metric(self._row, self, metric_model_lst)
@@ -1,12 +1,15 @@
 import copy
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from Common.CEnum import DATA_FIELD, TRADE_INFO_LST, TREND_TYPE
 from Common.ChanException import CChanException, ErrCode
 from Common.CTime import CTime
+from Common.state_util import get_slots_state, set_slots_state
 from Math.BOLL import BOLL_Metric, BollModel
 from Math.Demark import CDemarkEngine, CDemarkIndex
-from Math.KDJ import KDJ
+from Math.KDJ import KDJ, KDJ_Item
 from Math.MACD import CMACD, CMACD_item
 from Math.RSI import RSI
 from Math.TrendModel import CTrendModel
@@ -15,6 +18,12 @@ from .TradeInfo import CTradeInfo
 
 
 class CKLine_Unit:
+    # 对象数量和K线根数相同，用__slots__省掉每个对象的__dict__；macd/boll/rsi/kdj只在配置了对应指标时赋值
+    __slots__ = (
+        "kl_type", "time", "close", "open", "high", "low", "trade_info", "demark", "sub_kl_list", "sup_kl", "__klc",
+        "trend", "limit_flag", "pre", "next", "__idx", "macd", "boll", "rsi", "kdj",
+    )
+
     def __init__(self, kl_dict, autofix=False):
         # _time, _close, _open, _high, _low, _extra_info={}
         self.kl_type = None
@@ -71,6 +80,9 @@ class CKLine_Unit:
         memo[id(self)] = obj
         return obj
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     @property
     def klc(self):
         assert self.__klc is not None
@@ -90,16 +102,7 @@ class CKLine_Unit:
         return f"{self.idx}:{self.time}/{self.kl_type} open={self.open} close={self.close} high={self.high} low={self.low} {self.trade_info}"
 
     def check(self, autofix=False):
-        if self.low > min([self.low, self.open, self.high, self.close]):
-            if autofix:
-                self.low = min([self.low, self.open, self.high, self.close])
-            else:
-                raise CChanException(f"{self.time} low price={self.low} is not min of [low={self.low}, open={self.open}, high={self.high}, close={self.close}]", ErrCode.KL_DATA_INVALID)
-        if self.high < max([self.low, self.open, self.high, self.close]):
-            if autofix:
-                self.high = max([self.low, self.open, self.high, self.close])
-            else:
-                raise CChanException(f"{self.time} high price={self.high} is not max of [low={self.low}, open={self.open}, high={self.high}, close={self.close}]", ErrCode.KL_DATA_INVALID)
+        self.high, self.low = check_ohlc(self.time, self.open, self.high, self.low, self.close, autofix)
 
     def add_children(self, child):
         self.sub_kl_list.append(child)
@@ -152,3 +155,48 @@ class CKLine_Unit:
             return
         pre_klu.next = self
         self.pre = pre_klu
+
+
+def check_ohlc(t, _open, high, low, close, autofix=False) -> Tuple[float, float]:
+    # high/low必须是四个价格里的最高/最低，autofix时修正，返回(high, low)
+    if low > min([low, _open, high, close]):
+        if autofix:
+            low = min([low, _open, high, close])
+        else:
+            raise CChanException(f"{t} low price={low} is not min of [low={low}, open={_open}, high={high}, close={close}]", ErrCode.KL_DATA_INVALID)
+    if high < max([low, _open, high, close]):
+        if autofix:
+            high = max([low, _open, high, close])
+        else:
+            raise CChanException(f"{t} high price={high} is not max of [low={low}, open={_open}, high={high}, close={close}]", ErrCode.KL_DATA_INVALID)
+    return high, low
+
+
+def set_metric_batch(klu_lst: List[CKLine_Unit], metric_model_lst: list) -> None:
+    # 非逐步模式下一次性向量化计算klu_lst的所有指标，结果与逐根set_metric一致
+    if not klu_lst:
+        return
+    close = np.fromiter((klu.close for klu in klu_lst), dtype=np.float64, count=len(klu_lst))
+    for metric_model in metric_model_lst:
+        if isinstance(metric_model, CMACD):
+            for klu, fast_ema, slow_ema, dif, dea in zip(klu_lst, *[arr.tolist() for arr in metric_model.add_batch(close)]):
+                klu.macd = CMACD_item(fast_ema=fast_ema, slow_ema=slow_ema, DIF=dif, DEA=dea)
+        elif isinstance(metric_model, CTrendModel):
+            for klu, value in zip(klu_lst, metric_model.add_batch(close).tolist()):
+                if metric_model.type not in klu.trend:
+                    klu.trend[metric_model.type] = {}
+                klu.trend[metric_model.type][metric_model.T] = value
+        elif isinstance(metric_model, BollModel):
+            for klu, ma, theta in zip(klu_lst, *[arr.tolist() for arr in metric_model.add_batch(close)]):
+                klu.boll = BOLL_Metric(ma, theta)
+        elif isinstance(metric_model, CDemarkEngine):
+            for klu in klu_lst:
+                klu.demark = metric_model.update(idx=klu.idx, close=klu.close, high=klu.high, low=klu.low)
+        elif isinstance(metric_model, RSI):
+            for klu, value in zip(klu_lst, metric_model.add_batch(close).tolist()):
+                klu.rsi = value
+        elif isinstance(metric_model, KDJ):
+            high = np.fromiter((klu.high for klu in klu_lst), dtype=np.float64, count=len(klu_lst))
+            low = np.fromiter((klu.low for klu in klu_lst), dtype=np.float64, count=len(klu_lst))
+            for klu, k, d, j in zip(klu_lst, *[arr.tolist() for arr in metric_model.add_batch(high, low, close)]):
+                klu.kdj = KDJ_Item(k, d, j)
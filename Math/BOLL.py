@@ -1,4 +1,10 @@
 import math
+from typing import Tuple
+
+import numpy as np
+
+from .RollingWindow import CRollingMean
+from .batch_util import rolling_mean, rolling_std
 
 
 def _truncate(x):
@@ -17,12 +23,21 @@ class BollModel:
     def __init__(self, N=20):
         assert N > 1
         self.N = N
-        self.arr = []
+        self.window = CRollingMean(N, cal_var=True)
+
+    @property
+    def arr(self):
+        return self.window.arr
 
     def add(self, value) -> BOLL_Metric:
-        self.arr.append(value)
-        if len(self.arr) > self.N:
-            self.arr = self.arr[-self.N:]
-        ma = sum(self.arr)/len(self.arr)
-        theta = math.sqrt(sum((x-ma)**2 for x in self.arr) / len(self.arr))
-        return BOLL_Metric(ma, theta)
+        self.window.add(value)
+        return BOLL_Metric(self.window.mean, math.sqrt(self.window.var))
+
+    def add_batch(self, value: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # 向量化批量计算，返回均值和(未截断的)标准差序列
+        n = len(value)
+        arr = np.concatenate([np.asarray(self.arr, dtype=np.float64), value])
+        ma = rolling_mean(arr, self.N)
+        theta = rolling_std(arr, self.N, ma)
+        self.window.reset(arr[-self.N:].tolist())
+        return ma[len(arr)-n:], theta[len(arr)-n:]
@@ -1,3 +1,12 @@
+from collections import deque
+from typing import Tuple
+
+import numpy as np
+
+from .RollingWindow import CMonotonicQueue
+from .batch_util import ema_filter, rolling_max, rolling_min
+
+
 class KDJ_Item:
     def __init__(self, k, d, j):
         self.k = k
@@ -8,20 +17,21 @@ class KDJ_Item:
 class KDJ:
     def __init__(self, period: int = 9):
         super(KDJ, self).__init__()
-        self.arr = []
+        self.high_arr = deque(maxlen=period)
+        self.low_arr = deque(maxlen=period)
+        self.high_queue = CMonotonicQueue(period, is_max=True)
+        self.low_queue = CMonotonicQueue(period, is_max=False)
         self.period = period
         self.pre_kdj = KDJ_Item(50, 50, 50)
 
     def add(self, high, low, close) -> KDJ_Item:
-        self.arr.append({
-            'high': high,
-            'low': low,
-        })
-        if len(self.arr) > self.period:
-            self.arr.pop(0)
-
-        hn = max([x['high'] for x in self.arr])
-        ln = min([x['low'] for x in self.arr])
+        self.high_arr.append(high)
+        self.low_arr.append(low)
+        self.high_queue.add(high)
+        self.low_queue.add(low)
+
+        hn = self.high_queue.value
+        ln = self.low_queue.value
         cn = close
         rsv = 100 * (cn - ln) / (hn - ln) if hn != ln else 0.0
 
@@ -32,3 +42,22 @@ class KDJ:
         self.pre_kdj = cur_kdj
 
         return cur_kdj
+
+    def add_batch(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(close)
+        high_arr = np.concatenate([np.asarray(self.high_arr, dtype=np.float64), high])
+        low_arr = np.concatenate([np.asarray(self.low_arr, dtype=np.float64), low])
+        hn = rolling_max(high_arr, self.period)[len(high_arr)-n:]
+        ln = rolling_min(low_arr, self.period)[len(low_arr)-n:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsv = np.where(hn != ln, 100 * (close - ln) / (hn - ln), 0.0)
+        k = ema_filter(rsv, 2 / 3, self.pre_kdj.k)
+        d = ema_filter(k, 2 / 3, self.pre_kdj.d)
+        j = 3 * k - 2 * d
+        self.high_arr.extend(high.tolist())
+        self.low_arr.extend(low.tolist())
+        self.high_queue.reset(self.high_arr)
+        self.low_queue.reset(self.low_arr)
+        if n > 0:
+            self.pre_kdj = KDJ_Item(k[-1].item(), d[-1].item(), j[-1].item())
+        return k, d, j
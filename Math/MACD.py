@@ -1,4 +1,8 @@
-from typing import List
+from typing import List, Tuple
+
+import numpy as np
+
+from .batch_util import ema_filter
 
 
 class CMACD_item:
@@ -27,3 +31,26 @@ class CMACD:
             _dea = (2 * _dif + (self.signalperiod - 1) * self.macd_info[-1].DEA) / (self.signalperiod + 1)
             self.macd_info.append(CMACD_item(fast_ema=_fast_ema, slow_ema=_slow_ema, DIF=_dif, DEA=_dea))
         return self.macd_info[-1]
+
+    def add_batch(self, value: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # 向量化批量计算，返回fast_ema, slow_ema, DIF, DEA序列；计算后只同步最后一项状态，可继续调用add
+        n = len(value)
+        fast_ema = np.empty(n)
+        slow_ema = np.empty(n)
+        dea = np.empty(n)
+        if n == 0:
+            return fast_ema, slow_ema, fast_ema - slow_ema, dea
+        begin = 0
+        if not self.macd_info:
+            fast_ema[0] = slow_ema[0] = value[0]
+            dea[0] = 0
+            begin = 1
+            pre_fast, pre_slow, pre_dea = value[0], value[0], 0.0
+        else:
+            pre_fast, pre_slow, pre_dea = self.macd_info[-1].fast_ema, self.macd_info[-1].slow_ema, self.macd_info[-1].DEA
+        fast_ema[begin:] = ema_filter(value[begin:], (self.fastperiod - 1) / (self.fastperiod + 1), pre_fast)
+        slow_ema[begin:] = ema_filter(value[begin:], (self.slowperiod - 1) / (self.slowperiod + 1), pre_slow)
+        dif = fast_ema - slow_ema
+        dea[begin:] = ema_filter(dif[begin:], (self.signalperiod - 1) / (self.signalperiod + 1), pre_dea)
+        self.macd_info.append(CMACD_item(fast_ema=fast_ema[-1].item(), slow_ema=slow_ema[-1].item(), DIF=dif[-1].item(), DEA=dea[-1].item()))
+        return fast_ema, slow_ema, dif, dea
@@ -1,3 +1,8 @@
+import numpy as np
+
+from .batch_util import ema_filter
+
+
 class RSI:
     def __init__(self, period: int = 14):
         super(RSI, self).__init__()
@@ -36,3 +41,36 @@ class RSI:
         rs = self.up[-1] / self.down[-1]
         rsi = 100.0 - 100.0 / (1.0 + rs)
         return rsi
+
+    def add_batch(self, close: np.ndarray) -> np.ndarray:
+        n = len(close)
+        res = np.empty(n)
+        if n == 0:
+            return res
+        diff = np.diff(np.concatenate([np.asarray(self.close_arr[-1:], dtype=np.float64), close]))
+        up_val = np.where(diff > 0, diff, 0.0)
+        down_val = np.where(diff < 0, -diff, 0.0)
+        up = np.empty(len(diff))
+        down = np.empty(len(diff))
+        # 前period-1个diff用全部历史的均值，之后用平滑递推
+        head = max(0, min(len(diff), self.period - 1 - len(self.diff)))
+        if head > 0:
+            cnt = np.arange(len(self.diff) + 1, len(self.diff) + head + 1)
+            up[:head] = (sum(x for x in self.diff if x > 0) + np.cumsum(up_val[:head])) / cnt
+            down[:head] = (sum(-x for x in self.diff if x < 0) + np.cumsum(down_val[:head])) / cnt
+        if head < len(diff):
+            a = (self.period - 1) / self.period
+            up[head:] = ema_filter(up_val[head:], a, up[head-1] if head > 0 else self.up[-1])
+            down[head:] = ema_filter(down_val[head:], a, down[head-1] if head > 0 else self.down[-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(down == 0, np.where(up > 0, 100.0, 0.0), 100.0 - 100.0 / (1.0 + up / down))
+        if self.close_arr:
+            res[:] = rsi
+        else:
+            res[0] = 50.0
+            res[1:] = rsi
+        self.close_arr.extend(close.tolist())
+        self.diff.extend(diff.tolist())
+        self.up.extend(up.tolist())
+        self.down.extend(down.tolist())
+        return res
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Deque, Iterable, Tuple
+
+
+class CRollingMean:
+    # 固定长度窗口的均值/方差，O(1)更新；窗口未满时为扩展窗口
+    # 以参考值shift为原点累计一次和与二次和，shift取上次重算时的窗口均值，
+    # 各项都是窗口内的小偏差，避免价格较大、窗口接近水平时 sum(x^2)-sum(x)^2/n 的抵消误差
+    def __init__(self, N: int, cal_var: bool = False):
+        self.N = N
+        self.cal_var = cal_var
+        self.arr: Deque[float] = deque()
+        self.shift = 0.0
+        self.sum = 0.0  # sum(x - shift)
+        self.sum2 = 0.0  # sum((x - shift) ** 2)
+        self.resync_interval = N  # 每N次更新按窗口重算一次，消除累计浮点误差，均摊仍为O(1)
+        self.update_cnt = 0
+
+    def __len__(self):
+        return len(self.arr)
+
+    def add(self, value: float) -> None:
+        if not self.arr:
+            self.shift, self.sum, self.sum2 = value, 0.0, 0.0
+        self.arr.append(value)
+        diff = value - self.shift
+        self.sum += diff
+        if self.cal_var:
+            self.sum2 += diff * diff
+        if len(self.arr) > self.N:
+            diff = self.arr.popleft() - self.shift
+            self.sum -= diff
+            if self.cal_var:
+                self.sum2 -= diff * diff
+        self.update_cnt += 1
+        if self.update_cnt >= self.resync_interval:
+            self.resync()
+
+    def resync(self) -> None:
+        # 参考值跟上价格的漂移，同时重新求和
+        self.update_cnt = 0
+        if not self.arr:
+            self.shift, self.sum, self.sum2 = 0.0, 0.0, 0.0
+            return
+        shift = sum(self.arr) / len(self.arr)
+        self.shift = shift
+        self.sum = sum(x - shift for x in self.arr)
+        if self.cal_var:
+            self.sum2 = sum((x - shift) ** 2 for x in self.arr)
+
+    def reset(self, values: Iterable[float]) -> None:
+        self.arr = deque(values)
+        while len(self.arr) > self.N:
+            self.arr.popleft()
+        self.resync()
+
+    @property
+    def mean(self) -> float:
+        return self.shift + self.sum / len(self.arr) if self.arr else 0.0
+
+    @property
+    def var(self) -> float:
+        if not self.arr:
+            return 0.0
+        n = len(self.arr)
+        return max(self.sum2 - self.sum * self.sum / n, 0.0) / n
+
+
+class CMonotonicQueue:
+    # 单调队列求固定长度窗口的最大值(is_max=True)或最小值，均摊O(1)
+    def __init__(self, N: int, is_max: bool = True):
+        self.N = N
+        self.is_max = is_max
+        self.queue: Deque[Tuple[int, float]] = deque()  # (序号, 值)
+        self.cnt = 0
+
+    def add(self, value: float) -> None:
+        queue = self.queue
+        if self.is_max:
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] >= value:
+                queue.pop()
+        queue.append((self.cnt, value))
+        self.cnt += 1
+        if queue[0][0] <= self.cnt - 1 - self.N:
+            queue.popleft()
+
+    def reset(self, values: Iterable[float]) -> None:
+        self.queue = deque()
+        self.cnt = 0
+        for value in values:
+            self.add(value)
+
+    @property
+    def value(self) -> float:
+        return self.queue[0][1]
@@ -1,22 +1,44 @@
+from collections import deque
+
+import numpy as np
+
 from Common.CEnum import TREND_TYPE
 from Common.ChanException import CChanException, ErrCode
 
+from .RollingWindow import CMonotonicQueue, CRollingMean
+from .batch_util import rolling_max, rolling_mean, rolling_min
+
 
 class CTrendModel:
     def __init__(self, trend_type: TREND_TYPE, T: int):
         self.T = T
-        self.arr = []
         self.type = trend_type
+        self.arr = deque(maxlen=T)
+        if trend_type == TREND_TYPE.MEAN:
+            self.window = CRollingMean(T)
+        elif trend_type in [TREND_TYPE.MAX, TREND_TYPE.MIN]:
+            self.window = CMonotonicQueue(T, is_max=trend_type == TREND_TYPE.MAX)
+        else:
+            raise CChanException(f"Unknown trendModel Type = {self.type}", ErrCode.PARA_ERROR)
 
     def add(self, value) -> float:
         self.arr.append(value)
-        if len(self.arr) > self.T:
-            self.arr = self.arr[-self.T:]
+        self.window.add(value)
+        if self.type == TREND_TYPE.MEAN:
+            return self.window.mean
+        return self.window.value
+
+    def add_batch(self, value: np.ndarray) -> np.ndarray:
+        n = len(value)
+        arr = np.concatenate([np.asarray(self.arr, dtype=np.float64), value])
         if self.type == TREND_TYPE.MEAN:
-            return sum(self.arr)/len(self.arr)
+            res = rolling_mean(arr, self.T)
         elif self.type == TREND_TYPE.MAX:
-            return max(self.arr)
+            res = rolling_max(arr, self.T)
         elif self.type == TREND_TYPE.MIN:
-            return min(self.arr)
+            res = rolling_min(arr, self.T)
         else:
             raise CChanException(f"Unknown trendModel Type = {self.type}", ErrCode.PARA_ERROR)
+        self.arr.extend(value.tolist())
+        self.window.reset(self.arr)
+        return res[len(arr)-n:]
@@ -0,0 +1,87 @@
+import math
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_EMA_BLOCK_MAX_SCALE = 1e15  # 分块闭式解中 a^-k 的上限，避免溢出
+_WINDOW_CHUNK = 1 << 16  # 滑动窗口按行分块，避免 n*T 的临时数组过大
+
+
+def ema_filter(x: np.ndarray, a: float, y0: float) -> np.ndarray:
+    # y[t] = a * y[t-1] + (1-a) * x[t]，y[-1] = y0
+    # 按块用闭式解 y[s+k] = a^(k+1)*y_prev + (1-a)*a^k*cumsum(a^-j * x[s+j]) 计算
+    n = len(x)
+    res = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return res
+    if a == 0:
+        res[:] = x
+        return res
+    block = n if a == 1 else max(1, min(n, int(math.log(_EMA_BLOCK_MAX_SCALE) / -math.log(a))))
+    k = np.arange(block, dtype=np.float64)
+    pow_k = a ** k
+    inv_pow_k = a ** -k
+    y_prev = y0
+    for begin in range(0, n, block):
+        end = min(begin + block, n)
+        m = end - begin
+        acc = np.cumsum(x[begin:end] * inv_pow_k[:m])
+        res[begin:end] = pow_k[:m] * (a * y_prev + (1 - a) * acc)
+        y_prev = res[end-1]
+    return res
+
+
+def _sliding_apply(x: np.ndarray, T: int, func) -> np.ndarray:
+    # 对完整窗口 x[i-T+1:i+1] (i >= T-1) 分块做 func(window, axis=1)
+    win = sliding_window_view(x, T)
+    res = np.empty(len(win), dtype=np.float64)
+    for begin in range(0, len(win), _WINDOW_CHUNK):
+        res[begin:begin+_WINDOW_CHUNK] = func(win[begin:begin+_WINDOW_CHUNK])
+    return res
+
+
+def rolling_apply(x: np.ndarray, T: int, func, prefix_func) -> np.ndarray:
+    # 窗口长度为T，前T-1个位置使用已有数据的扩展窗口
+    n = len(x)
+    res = np.empty(n, dtype=np.float64)
+    head = min(n, T - 1)
+    if head > 0:
+        res[:head] = prefix_func(x[:head])
+    if n >= T:
+        res[T-1:] = _sliding_apply(x, T, func)
+    return res
+
+
+def rolling_mean(x: np.ndarray, T: int) -> np.ndarray:
+    return rolling_apply(
+        x, T,
+        lambda w: w.mean(axis=1),
+        lambda h: np.cumsum(h) / np.arange(1, len(h) + 1),
+    )
+
+
+def rolling_max(x: np.ndarray, T: int) -> np.ndarray:
+    return rolling_apply(x, T, lambda w: w.max(axis=1), np.maximum.accumulate)
+
+
+def rolling_min(x: np.ndarray, T: int) -> np.ndarray:
+    return rolling_apply(x, T, lambda w: w.min(axis=1), np.minimum.accumulate)
+
+
+def rolling_std(x: np.ndarray, T: int, mean: Optional[np.ndarray] = None) -> np.ndarray:
+    # 总体标准差，和逐根计算一样先求均值再求离差平方和
+    if mean is None:
+        mean = rolling_mean(x, T)
+    n = len(x)
+    res = np.empty(n, dtype=np.float64)
+    head = min(n, T - 1)
+    for i in range(head):
+        res[i] = np.sqrt(np.mean((x[:i+1] - mean[i]) ** 2))
+    if n >= T:
+        win = sliding_window_view(x, T)
+        full_mean = mean[T-1:]
+        for begin in range(0, len(win), _WINDOW_CHUNK):
+            w = win[begin:begin+_WINDOW_CHUNK]
+            res[T-1+begin:T-1+begin+len(w)] = np.sqrt(((w - full_mean[begin:begin+len(w), None]) ** 2).mean(axis=1))
+    return res
@@ -12,7 +12,7 @@ from Common.ChanException import CChanException, ErrCode
 from Common.CTime import CTime
 from Math.Demark import T_DEMARK_INDEX, CDemarkEngine
 
-from .PlotMeta import CBi_meta, CChanPlotMeta, CZS_meta
+from .PlotMeta import CBi_meta, CChanPlotMeta, CDateTick, CZS_meta, get_klu_len
 
 
 def reformat_plot_config(plot_config: Dict[str, bool]):
@@ -129,8 +129,7 @@ def create_figure(plot_macd: Dict[KL_TYPE, bool], figure_config, lv_lst: List[KL
     return figure, axes_dict
 
 
-def cal_x_limit(meta: CChanPlotMeta, x_range):
-    X_LEN = meta.klu_len
+def cal_x_limit(X_LEN: int, x_range):
     return [X_LEN - x_range, X_LEN - 1] if x_range and X_LEN > x_range else [0, X_LEN - 1]
 
 
@@ -146,11 +145,10 @@ def set_grid(ax, config):
     raise CChanException(f"unsupport grid config={config}", ErrCode.PLOT_ERR)
 
 
-def GetPlotMeta(chan: CChan, figure_config) -> List[CChanPlotMeta]:
-    plot_metas = [CChanPlotMeta(chan[kl_type]) for kl_type in chan.lv_list]
+def GetPlotLv(chan: CChan, figure_config) -> List[KL_TYPE]:
     if figure_config.get("only_top_lv", False):
-        plot_metas = [plot_metas[0]]
-    return plot_metas
+        return chan.lv_list[:1]
+    return chan.lv_list
 
 
 class CPlotDriver:
@@ -160,10 +158,9 @@ class CPlotDriver:
         figure_config: dict = plot_para.get('figure', {})
 
         plot_config = parse_plot_config(plot_config, chan.lv_list)
-        plot_metas = GetPlotMeta(chan, figure_config)
-        self.lv_lst = chan.lv_list[:len(plot_metas)]
+        self.lv_lst = GetPlotLv(chan, figure_config)
 
-        x_range = self.GetRealXrange(figure_config, plot_metas[0])
+        x_range = self.GetRealXrange(figure_config, chan[self.lv_lst[0]])
         plot_macd: Dict[KL_TYPE, bool] = {kl_type: conf.get("plot_macd", False) for kl_type, conf in plot_config.items()}
         self.figure, axes = create_figure(plot_macd, figure_config, self.lv_lst)
 
@@ -174,18 +171,19 @@ class CPlotDriver:
         srange_begin = 0
         assert slv_seg_cnt is None or slv_bi_cnt is None, "you can set at most one of seg_sub_lv_cnt/bi_sub_lv_cnt"
 
-        for meta, lv in zip(plot_metas, self.lv_lst):  # type: ignore
+        for lv in self.lv_lst:
             ax = axes[lv][0]
             ax_macd = None if len(axes[lv]) == 1 else axes[lv][1]
             set_grid(ax, figure_config.get("grid", "xy"))
             ax.set_title(f"{chan.code}/{lv.name.split('K_')[1]}", fontsize=16, loc='left', color='r')
 
-            x_limits = cal_x_limit(meta, x_range)
+            x_limits = cal_x_limit(get_klu_len(chan[lv]), x_range)
             if lv != self.lv_lst[0]:
                 if sseg_begin != 0 or sbi_begin != 0:
                     x_limits[0] = max(sseg_begin, sbi_begin)
                 elif srange_begin != 0:
                     x_limits[0] = srange_begin
+            meta = CChanPlotMeta(chan[lv], x_begin=x_limits[0])  # 只构造x_limits范围内的元素
             set_x_tick(ax, x_limits, meta.datetick, figure_config.get('x_tick_num', 10))
             if ax_macd:
                 set_x_tick(ax_macd, x_limits, meta.datetick, figure_config.get('x_tick_num', 10))
@@ -203,7 +201,7 @@ class CPlotDriver:
 
             ax.set_ylim(self.y_min, self.y_max)
 
-    def GetRealXrange(self, figure_config, meta: CChanPlotMeta):
+    def GetRealXrange(self, figure_config, kl_list):
         x_range = figure_config.get("x_range", 0)
         bi_cnt = figure_config.get("x_bi_cnt", 0)
         seg_cnt = figure_config.get("x_seg_cnt", 0)
@@ -213,22 +211,22 @@ class CPlotDriver:
             return x_range
         if bi_cnt != 0:
             assert x_range == 0 and seg_cnt == 0 and x_begin_date == 0, "x_range/x_bi_cnt/x_seg_cnt/x_begin_date can not be set at the same time"
-            X_LEN = meta.klu_len
-            if len(meta.bi_list) < bi_cnt:
+            X_LEN = get_klu_len(kl_list)
+            if len(kl_list.bi_list) < bi_cnt:
                 return 0
-            x_range = X_LEN-meta.bi_list[-bi_cnt].begin_x
+            x_range = X_LEN-kl_list.bi_list[-bi_cnt].get_begin_klu().idx
             return x_range
         if seg_cnt != 0:
             assert x_range == 0 and bi_cnt == 0 and x_begin_date == 0, "x_range/x_bi_cnt/x_seg_cnt/x_begin_date can not be set at the same time"
-            X_LEN = meta.klu_len
-            if len(meta.seg_list) < seg_cnt:
+            X_LEN = get_klu_len(kl_list)
+            if len(kl_list.seg_list) < seg_cnt:
                 return 0
-            x_range = X_LEN-meta.seg_list[-seg_cnt].begin_x
+            x_range = X_LEN-kl_list.seg_list[-seg_cnt].get_begin_klu().idx
             return x_range
         if x_begin_date != 0:
             assert x_range == 0 and bi_cnt == 0 and seg_cnt == 0, "x_range/x_bi_cnt/x_seg_cnt/x_begin_date can not be set at the same time"
             x_range = 0
-            for date_tick in meta.datetick[::-1]:
+            for date_tick in reversed(CDateTick(kl_list)):
                 if date_tick >= x_begin_date:
                     x_range += 1
                 else:
@@ -358,7 +356,7 @@ class CPlotDriver:
         end_fontsize=10,
     ):
         x_begin = ax.get_xlim()[0]
-        for bi_idx, bi in enumerate(meta.bi_list):
+        for bi in meta.bi_list:
             if bi.end_x < x_begin:
                 continue
             plot_bi_element(bi, ax, color)
@@ -366,12 +364,12 @@ class CPlotDriver:
                 ax.text((bi.begin_x+bi.end_x)/2, (bi.begin_y+bi.end_y)/2, f'{bi.idx}', fontsize=num_fontsize, color=num_color)
 
             if disp_end:
-                bi_text(bi_idx, ax, bi, end_fontsize, end_color)
+                bi_text(bi.idx, ax, bi, end_fontsize, end_color)
         if sub_lv_cnt is not None and len(self.lv_lst) > 1 and lv != self.lv_lst[-1]:
-            if sub_lv_cnt >= len(meta.bi_list):
+            if sub_lv_cnt >= len(meta.data.bi_list):
                 return
             else:
-                begin_idx = meta.bi_list[-sub_lv_cnt].begin_x
+                begin_idx = meta.data.bi_list[-sub_lv_cnt].get_begin_klu().idx
             y_begin, y_end = ax.get_ylim()
             x_end = int(ax.get_xlim()[1])
             ax.fill_between(range(begin_idx, x_end + 1), y_begin, y_end, facecolor=facecolor, alpha=alpha)
@@ -398,7 +396,7 @@ class CPlotDriver:
     ):
         x_begin = ax.get_xlim()[0]
 
-        for seg_idx, seg_meta in enumerate(meta.seg_list):
+        for seg_meta in meta.seg_list:
             if seg_meta.end_x < x_begin:
                 continue
             if seg_meta.is_sure:
@@ -406,7 +404,7 @@ class CPlotDriver:
             else:
                 ax.plot([seg_meta.begin_x, seg_meta.end_x], [seg_meta.begin_y, seg_meta.end_y], color=color, linewidth=width, linestyle='dashed')
             if disp_end:
-                bi_text(seg_idx, ax, seg_meta, end_fontsize, end_color)
+                bi_text(seg_meta.idx, ax, seg_meta, end_fontsize, end_color)
             if plot_trendline:
                 if seg_meta.tl.get('support'):
                     tl_meta = seg_meta.format_tl(seg_meta.tl['support'])
@@ -417,10 +415,10 @@ class CPlotDriver:
             if show_num and seg_meta.begin_x >= x_begin:
                 ax.text((seg_meta.begin_x+seg_meta.end_x)/2, (seg_meta.begin_y+seg_meta.end_y)/2, f'{seg_meta.idx}', fontsize=num_fontsize, color=num_color)
         if sub_lv_cnt is not None and len(self.lv_lst) > 1 and lv != self.lv_lst[-1]:
-            if sub_lv_cnt >= len(meta.seg_list):
+            if sub_lv_cnt >= len(meta.data.seg_list):
                 return
             else:
-                begin_idx = meta.seg_list[-sub_lv_cnt].begin_x
+                begin_idx = meta.data.seg_list[-sub_lv_cnt].get_begin_klu().idx
             y_begin, y_end = ax.get_ylim()
             x_end = int(ax.get_xlim()[1])
             ax.fill_between(range(begin_idx, x_end+1), y_begin, y_end, facecolor=facecolor, alpha=alpha)
@@ -440,7 +438,7 @@ class CPlotDriver:
     ):
         x_begin = ax.get_xlim()[0]
 
-        for seg_idx, seg_meta in enumerate(meta.segseg_list):
+        for seg_meta in meta.segseg_list:
             if seg_meta.end_x < x_begin:
                 continue
             if seg_meta.is_sure:
@@ -448,7 +446,7 @@ class CPlotDriver:
             else:
                 ax.plot([seg_meta.begin_x, seg_meta.end_x], [seg_meta.begin_y, seg_meta.end_y], color=color, linewidth=width, linestyle='dashed')
             if disp_end:
-                if seg_idx == 0:
+                if seg_meta.idx == 0:
                     ax.text(
                         seg_meta.begin_x,
                         seg_meta.begin_y,
@@ -535,14 +533,14 @@ class CPlotDriver:
                 ax.add_patch(Rectangle((sub_zs_meta.begin, sub_zs_meta.low), sub_zs_meta.w, sub_zs_meta.h, fill=False, color=color, linewidth=sub_linewidth, linestyle=line_style))
 
     def draw_macd(self, meta: CChanPlotMeta, ax: Axes, x_limits, width=0.4):
-        macd_lst = [klu.macd for klu in meta.klu_iter()]
-        assert macd_lst[0] is not None, "you can't draw macd until you delete macd_metric=False"
-
         x_begin = x_limits[0]
-        x_idx = range(len(macd_lst))[x_begin:]
-        dif_line = [macd.DIF for macd in macd_lst[x_begin:]]
-        dea_line = [macd.DEA for macd in macd_lst[x_begin:]]
-        macd_bar = [macd.macd for macd in macd_lst[x_begin:]]
+        klu_lst = [klu for klu in meta.klu_iter() if klu.idx >= x_begin]
+        assert klu_lst[0].macd is not None, "you can't draw macd until you delete macd_metric=False"
+
+        x_idx = [klu.idx for klu in klu_lst]
+        dif_line = [klu.macd.DIF for klu in klu_lst]
+        dea_line = [klu.macd.DEA for klu in klu_lst]
+        macd_bar = [klu.macd.macd for klu in klu_lst]
         y_min = min([min(dif_line), min(dea_line), min(macd_bar)])
         y_max = max([max(dif_line), max(dea_line), max(macd_bar)])
         ax.plot(x_idx, dif_line, "#FFA500")
@@ -554,15 +552,17 @@ class CPlotDriver:
         ax.set_ylim(y_min, y_max)
 
     def draw_mean(self, meta: CChanPlotMeta, ax: Axes):
+        x_idx = [klu.idx for klu in meta.klu_iter()]
         mean_lst = [klu.trend[TREND_TYPE.MEAN] for klu in meta.klu_iter()]
         Ts = list(mean_lst[0].keys())
         cmap = plt.cm.get_cmap('hsv', max([10, len(Ts)]))  # type: ignore
         for cmap_idx, T in enumerate(Ts):
             mean_arr = [mean_dict[T] for mean_dict in mean_lst]
-            ax.plot(range(len(mean_arr)), mean_arr, c=cmap(cmap_idx), label=f'{T} meanline')
+            ax.plot(x_idx, mean_arr, c=cmap(cmap_idx), label=f'{T} meanline')
         ax.legend()
 
     def draw_channel(self, meta: CChanPlotMeta, ax: Axes, T=None, top_color="r", bottom_color="b", linewidth=3, linestyle="solid"):
+        x_idx = [klu.idx for klu in meta.klu_iter()]
         max_lst = [klu.trend[TREND_TYPE.MAX] for klu in meta.klu_iter()]
         min_lst = [klu.trend[TREND_TYPE.MIN] for klu in meta.klu_iter()]
         config_T_lst = sorted(list(max_lst[0].keys()))
@@ -572,16 +572,16 @@ class CPlotDriver:
             raise CChanException(f"plot channel of T={T} is not setted in CChanConfig.trend_metrics = {config_T_lst}", ErrCode.PLOT_ERR)
         top_array = [_d[T] for _d in max_lst]
         bottom_array = [_d[T] for _d in min_lst]
-        ax.plot(range(len(top_array)), top_array, c=top_color, linewidth=linewidth, linestyle=linestyle, label=f'{T}-TOP-channel')
-        ax.plot(range(len(bottom_array)), bottom_array, c=bottom_color, linewidth=linewidth, linestyle=linestyle, label=f'{T}-BUTTOM-channel')
+        ax.plot(x_idx, top_array, c=top_color, linewidth=linewidth, linestyle=linestyle, label=f'{T}-TOP-channel')
+        ax.plot(x_idx, bottom_array, c=bottom_color, linewidth=linewidth, linestyle=linestyle, label=f'{T}-BUTTOM-channel')
         ax.legend()
 
     def draw_boll(self, meta: CChanPlotMeta, ax: Axes, mid_color="black", up_color="blue", down_color="purple"):
         x_begin = int(ax.get_xlim()[0])
         try:
-            ma = [klu.boll.MID for klu in meta.klu_iter()][x_begin:]
-            up = [klu.boll.UP for klu in meta.klu_iter()][x_begin:]
-            down = [klu.boll.DOWN for klu in meta.klu_iter()][x_begin:]
+            ma = [klu.boll.MID for klu in meta.klu_iter() if klu.idx >= x_begin]
+            up = [klu.boll.UP for klu in meta.klu_iter() if klu.idx >= x_begin]
+            down = [klu.boll.DOWN for klu in meta.klu_iter() if klu.idx >= x_begin]
         except AttributeError as e:
             raise CChanException("you can't draw boll until you set boll_n in CChanConfig", ErrCode.PLOT_ERR) from e
 
@@ -676,7 +676,7 @@ class CPlotDriver:
     ):
         # {'2022/03/01': ('xxx', 'up', 'red'), '2022/03/02': ('yyy', 'down')}
         x_begin, x_end = ax.get_xlim()
-        datetick_dict = {date: idx for idx, date in enumerate(meta.datetick)}
+        datetick_dict = {klu.time.to_str(): klu.idx for klu in meta.klu_iter()}
 
         new_marker = {}
         for klu in meta.klu_iter():
@@ -686,7 +686,7 @@ class CPlotDriver:
                     new_marker[klu.time.to_str()] = marker
         new_marker.update(markers)
 
-        kl_dict = dict(enumerate(meta.klu_iter()))
+        kl_dict = {klu.idx: klu for klu in meta.klu_iter()}
         y_range = self.y_max-self.y_min
         arror_len = arrow_l*y_range
         arrow_h = arror_len*arrow_h_r
@@ -746,9 +746,9 @@ class CPlotDriver:
         ax,
         color='b',
     ):
-        data = [klu.rsi for klu in meta.klu_iter()]
         x_begin, x_end = int(ax.get_xlim()[0]), int(ax.get_xlim()[1])
-        ax.plot(range(x_begin, x_end), data[x_begin: x_end], c=color)
+        klu_lst = [klu for klu in meta.klu_iter() if x_begin <= klu.idx < x_end]
+        ax.plot([klu.idx for klu in klu_lst], [klu.rsi for klu in klu_lst], c=color)
 
     def draw_kdj(
         self,
@@ -758,11 +758,12 @@ class CPlotDriver:
         d_color='blue',
         j_color='pink',
     ):
-        kdj = [klu.kdj for klu in meta.klu_iter()]
         x_begin, x_end = int(ax.get_xlim()[0]), int(ax.get_xlim()[1])
-        ax.plot(range(x_begin, x_end), [x.k for x in kdj][x_begin: x_end], c=k_color, label='K')
-        ax.plot(range(x_begin, x_end), [x.d for x in kdj][x_begin: x_end], c=d_color, label='D')
-        ax.plot(range(x_begin, x_end), [x.j for x in kdj][x_begin: x_end], c=j_color, label='J')
+        klu_lst = [klu for klu in meta.klu_iter() if x_begin <= klu.idx < x_end]
+        x_idx = [klu.idx for klu in klu_lst]
+        ax.plot(x_idx, [klu.kdj.k for klu in klu_lst], c=k_color, label='K')
+        ax.plot(x_idx, [klu.kdj.d for klu in klu_lst], c=d_color, label='D')
+        ax.plot(x_idx, [klu.kdj.j for klu in klu_lst], c=j_color, label='J')
         ax.legend()
 
     def draw_demark(
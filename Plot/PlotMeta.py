@@ -1,10 +1,12 @@
-from typing import List
+from bisect import bisect_left
+from typing import Callable, List
 
 from Bi.Bi import CBi
 from BuySellPoint.BS_Point import CBS_Point
 from Common.CEnum import FX_TYPE
 from KLine.KLine import CKLine
 from KLine.KLine_List import CKLine_List
+from KLine.KLine_Unit import CKLine_Unit
 from Seg.Eigen import CEigen
 from Seg.EigenFX import CEigenFX
 from Seg.Seg import CSeg
@@ -115,35 +117,87 @@ class CBS_Point_meta:
         return f'{is_seg_flag}b{self.type}' if self.is_buy else f'{is_seg_flag}s{self.type}'
 
 
-class CChanPlotMeta:
+def first_idx(lst, x: int, key: Callable) -> int:
+    # lst按key递增，二分找第一个key(ele) >= x的下标
+    return bisect_left(range(len(lst)), x, key=lambda idx: key(lst[idx]))
+
+
+def get_klu_len(kl_list: CKLine_List) -> int:
+    return kl_list.lst[-1].lst[-1].idx + 1 if len(kl_list.lst) else 0
+
+
+def get_klu(kl_list: CKLine_List, klu_idx: int) -> CKLine_Unit:
+    klc = kl_list.lst[first_idx(kl_list.lst, klu_idx, lambda klc: klc.lst[-1].idx)]
+    return klc.lst[klu_idx - klc.lst[0].idx]
+
+
+class CDateTick:
+    # 按K线下标取时间字符串，只转换用到的那几根
     def __init__(self, kl_list: CKLine_List):
+        self.kl_list = kl_list
+        self.klu_len = get_klu_len(kl_list)
+
+    def __len__(self):
+        return self.klu_len
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.klu_len))]
+        if idx < 0:
+            idx += self.klu_len
+        if not 0 <= idx < self.klu_len:
+            raise IndexError(idx)
+        return get_klu(self.kl_list, idx).time.to_str()
+
+    def __iter__(self):
+        for klu in self.kl_list.klu_iter():
+            yield klu.time.to_str()
+
+    def __reversed__(self):
+        for klc in reversed(self.kl_list.lst):
+            for klu in reversed(klc.lst):
+                yield klu.time.to_str()
+
+
+def eigenfx_end_x(seg: CSeg) -> int:
+    return max(ele.lst[-1].get_end_klu().idx for ele in seg.eigen_fx.ele if ele is not None) if seg.eigen_fx else -1
+
+
+class CChanPlotMeta:
+    def __init__(self, kl_list: CKLine_List, x_begin: int = 0):
+        # 只构造结束位置不早于x_begin(K线下标)的元素，x_begin=0时为全部
         self.data = kl_list
+        self.x_begin = x_begin
+
+        self.klc_list: List[Cklc_meta] = [Cklc_meta(klc) for klc in kl_list.lst[first_idx(kl_list.lst, x_begin, lambda klc: klc.lst[-1].idx):]]
+        self.datetick = CDateTick(kl_list)
+        self.klu_len = self.datetick.klu_len
+
+        self.bi_list = [CBi_meta(bi) for bi in self.window(kl_list.bi_list, lambda bi: bi.get_end_klu().idx)]
 
-        self.klc_list: List[Cklc_meta] = [Cklc_meta(klc) for klc in kl_list.lst]
-        self.datetick = [klu.time.to_str() for klu in self.klu_iter()]
-        self.klu_len = sum(len(klc.klu_list) for klc in self.klc_list)
+        self.seg_list: List[CSeg_meta] = [CSeg_meta(seg) for seg in self.window(kl_list.seg_list, lambda seg: seg.get_end_klu().idx)]
+        self.eigenfx_lst: List[CEigenFX_meta] = [CEigenFX_meta(seg.eigen_fx) for seg in self.eigenfx_window(kl_list.seg_list)]
 
-        self.bi_list = [CBi_meta(bi) for bi in kl_list.bi_list]
+        self.segseg_list: List[CSeg_meta] = [CSeg_meta(segseg) for segseg in self.window(kl_list.segseg_list, lambda seg: seg.get_end_klu().idx)]
+        self.seg_eigenfx_lst: List[CEigenFX_meta] = [CEigenFX_meta(segseg.eigen_fx) for segseg in self.eigenfx_window(kl_list.segseg_list)]
 
-        self.seg_list: List[CSeg_meta] = []
-        self.eigenfx_lst: List[CEigenFX_meta] = []
-        for seg in kl_list.seg_list:
-            self.seg_list.append(CSeg_meta(seg))
-            if seg.eigen_fx:
-                self.eigenfx_lst.append(CEigenFX_meta(seg.eigen_fx))
+        self.zs_lst: List[CZS_meta] = [CZS_meta(zs) for zs in self.window(kl_list.zs_list, lambda zs: zs.end.idx)]
+        self.segzs_lst: List[CZS_meta] = [CZS_meta(segzs) for segzs in self.window(kl_list.segzs_list, lambda zs: zs.end.idx)]
 
-        self.seg_eigenfx_lst: List[CEigenFX_meta] = []
-        self.segseg_list: List[CSeg_meta] = []
-        for segseg in kl_list.segseg_list:
-            self.segseg_list.append(CSeg_meta(segseg))
-            if segseg.eigen_fx:
-                self.seg_eigenfx_lst.append(CEigenFX_meta(segseg.eigen_fx))
+        begin_time = get_klu(kl_list, x_begin).time if 0 < x_begin < self.klu_len else None
+        self.bs_point_lst: List[CBS_Point_meta] = [CBS_Point_meta(bs_point, is_seg=False) for bs_point in kl_list.bs_point_lst.query_bsp(begin_time)]
+        self.seg_bsp_lst: List[CBS_Point_meta] = [CBS_Point_meta(seg_bsp, is_seg=True) for seg_bsp in kl_list.seg_bs_point_lst.query_bsp(begin_time)]
 
-        self.zs_lst: List[CZS_meta] = [CZS_meta(zs) for zs in kl_list.zs_list]
-        self.segzs_lst: List[CZS_meta] = [CZS_meta(segzs) for segzs in kl_list.segzs_list]
+    def window(self, lst, end_x: Callable) -> list:
+        # lst按结束K线下标递增，返回结束位置不早于x_begin的部分
+        return lst[first_idx(lst, self.x_begin, end_x):]
 
-        self.bs_point_lst: List[CBS_Point_meta] = [CBS_Point_meta(bs_point, is_seg=False) for bs_point in kl_list.bs_point_lst.bsp_iter()]
-        self.seg_bsp_lst: List[CBS_Point_meta] = [CBS_Point_meta(seg_bsp, is_seg=True) for seg_bsp in kl_list.seg_bs_point_lst.bsp_iter()]
+    def eigenfx_window(self, seg_lst) -> List[CSeg]:
+        # 特征序列分形的第三个元素在线段结束之后，往前多找几个线段
+        begin = first_idx(seg_lst, self.x_begin, lambda seg: seg.get_end_klu().idx)
+        while begin > 0 and eigenfx_end_x(seg_lst[begin-1]) >= self.x_begin:
+            begin -= 1
+        return [seg for seg in seg_lst[begin:] if seg.eigen_fx]
 
     def klu_iter(self):
         for klc in self.klc_list:
@@ -162,8 +216,8 @@ class CChanPlotMeta:
             return self.data.bi_list[-bi_cnt].begin_klc.lst[0].sub_kl_list[0].idx
 
     def sub_range_start_idx(self, x_range):
-        for klc in self.data[::-1]:
-            for klu in klc[::-1]:
+        for klc in reversed(self.data.lst):
+            for klu in reversed(klc.lst):
                 x_range -= 1
                 if x_range == 0:
                     return klu.sub_kl_list[0].idx
@@ -0,0 +1,204 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import AUTYPE, DATA_SRC, KL_TYPE
+from Common.ChanException import CChanException
+from Common.CTime import CTime
+
+
+class CScanBsp:
+    # 买卖点摘要，只保留可以跨进程传递的信息
+    def __init__(self, bsp):
+        self.type = bsp.type2str()
+        self.is_buy = bsp.is_buy
+        self.time: CTime = bsp.klu.time
+        self.klu_idx = bsp.klu.idx
+        self.price = bsp.klu.close
+
+    def __str__(self):
+        return f"{self.time} {'buy' if self.is_buy else 'sell'} {self.type}"
+
+
+class CScanResult:
+    def __init__(self, idx: int, code):
+        self.idx = idx  # 在输入code列表中的位置
+        self.code = code
+        self.bsp_lst: List[CScanBsp] = []  # 最高级别的买卖点，从新到旧
+        self.last_time: Optional[CTime] = None  # 最高级别最后一根K线的时间
+        self.last_close: Optional[float] = None
+        self.klu_cnt = 0
+        self.extra: Any = None  # result_func的返回值
+        self.error: Optional[str] = None
+        self.errcode: Optional[int] = None
+        self.cost = 0.0  # 单只股票计算耗时(秒)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "code": self.code,
+            "bsp": [{"type": bsp.type, "is_buy": bsp.is_buy, "time": str(bsp.time), "price": bsp.price} for bsp in self.bsp_lst],
+            "last_time": str(self.last_time) if self.last_time is not None else None,
+            "last_close": self.last_close,
+            "klu_cnt": self.klu_cnt,
+            "extra": self.extra,
+            "error": self.error,
+            "cost": self.cost,
+        }
+
+
+_worker_para: Optional[dict] = None
+
+
+def _init_worker(para: dict):
+    # 每个进程只接收一次配置，之后只传code
+    global _worker_para
+    _worker_para = para
+
+
+def _scan_one(idx: int, code, para: Optional[dict] = None) -> CScanResult:
+    if para is None:
+        para = _worker_para
+    res = CScanResult(idx, code)
+    begin = time.perf_counter()
+    try:
+        chan = CChan(
+            code=code,
+            begin_time=para["begin_time"],
+            end_time=para["end_time"],
+            data_src=para["data_src"],
+            lv_list=para["lv_list"],
+            config=para["config"],
+            autype=para["autype"],
+        )
+        kl_list = chan[0]
+        res.klu_cnt = sum(len(klc.lst) for klc in kl_list.lst)
+        if len(kl_list) > 0:
+            last_klu = kl_list[-1][-1]
+            res.last_time = last_klu.time
+            res.last_close = last_klu.close
+        res.bsp_lst = [CScanBsp(bsp) for bsp in kl_list.bs_point_lst.get_latest_bsp(para["bsp_number"])]
+        if para["result_func"] is not None:
+            res.extra = para["result_func"](chan)
+    except CChanException as e:
+        res.error = str(e.msg)
+        res.errcode = e.errcode
+    except Exception as e:
+        res.error = f"{type(e).__name__}: {e}"
+    res.cost = time.perf_counter() - begin
+    return res
+
+
+def get_future_result(future, idx: int, code) -> CScanResult:
+    # 子进程崩溃(BrokenProcessPool)、结果无法pickle等异常只记为这只股票的错误
+    try:
+        return future.result()
+    except Exception as e:
+        res = CScanResult(idx, code)
+        res.error = f"{type(e).__name__}: {e}"
+        return res
+
+
+class CChanScanner:
+    """
+    多股票扫描：每只股票独立计算CChan，可选进程池并行，结果按完成顺序流式返回
+    每只股票的结果与进程数无关；scan()返回的列表按输入code顺序排列
+    """
+    def __init__(
+        self,
+        code_list: Iterable,
+        config: Optional[CChanConfig] = None,
+        data_src=DATA_SRC.BAO_STOCK,
+        lv_list: Optional[List[KL_TYPE]] = None,
+        begin_time=None,
+        end_time=None,
+        autype: AUTYPE = AUTYPE.QFQ,
+        max_workers: Optional[int] = None,
+        bsp_number: int = 0,
+        result_func: Optional[Callable[[CChan], Any]] = None,
+    ):
+        self.code_list = list(code_list)
+        self.para = {
+            "config": config if config is not None else CChanConfig(),
+            "data_src": data_src,
+            "lv_list": lv_list if lv_list is not None else [KL_TYPE.K_DAY],
+            "begin_time": begin_time,
+            "end_time": end_time,
+            "autype": autype,
+            "bsp_number": bsp_number,  # 返回最新的多少个买卖点，0表示全部
+            "result_func": result_func,  # 在子进程中对CChan做额外提取，必须可以pickle（模块级函数）
+        }
+        self.max_workers = max_workers  # None表示cpu个数，<=1时在当前进程中顺序计算
+        self.is_running = False
+        self.finish_cnt = 0
+        self.error_cnt = 0
+        self.begin_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+
+    def stop(self):
+        # 可在其他线程调用，已提交但未开始的任务会被取消
+        self.is_running = False
+
+    @property
+    def elapsed(self) -> float:
+        if self.begin_time is None:
+            return 0.0
+        return (self.end_time if self.end_time is not None else time.perf_counter()) - self.begin_time
+
+    @property
+    def symbols_per_sec(self) -> float:
+        elapsed = self.elapsed
+        return self.finish_cnt / elapsed if elapsed > 0 else 0.0
+
+    def scan_iter(self) -> Iterable[CScanResult]:
+        self.is_running = True
+        self.finish_cnt = 0
+        self.error_cnt = 0
+        self.begin_time = time.perf_counter()
+        self.end_time = None
+        try:
+            if self.max_workers is not None and self.max_workers <= 1:
+                for idx, code in enumerate(self.code_list):
+                    if not self.is_running:
+                        break
+                    yield self._on_finish(_scan_one(idx, code, self.para))
+            else:
+                yield from self._scan_iter_pool()
+        finally:
+            self.is_running = False
+            self.end_time = time.perf_counter()
+
+    def _scan_iter_pool(self) -> Iterable[CScanResult]:
+        executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(self.para,))
+        try:
+            future_dict = {executor.submit(_scan_one, idx, code): (idx, code) for idx, code in enumerate(self.code_list)}
+            pending = set(future_dict)
+            while pending and self.is_running:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: future_dict[f][0]):
+                    yield self._on_finish(get_future_result(future, *future_dict[future]))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _on_finish(self, res: CScanResult) -> CScanResult:
+        self.finish_cnt += 1
+        if not res.ok:
+            self.error_cnt += 1
+        return res
+
+    def scan(self) -> List[CScanResult]:
+        return sorted(self.scan_iter(), key=lambda res: res.idx)
+
+    def stat(self) -> Dict[str, Any]:
+        return {
+            "total": len(self.code_list),
+            "finish": self.finish_cnt,
+            "error": self.error_cnt,
+            "elapsed": self.elapsed,
+            "symbols_per_sec": self.symbols_per_sec,
+        }
@@ -3,6 +3,7 @@ from typing import Generic, List, Optional, Self, TypeVar
 from Bi.Bi import CBi
 from Common.CEnum import BI_DIR, MACD_ALGO, TREND_LINE_SIDE
 from Common.ChanException import CChanException, ErrCode
+from Common.state_util import get_slots_state, set_slots_state
 from KLine.KLine_Unit import CKLine_Unit
 from Math.TrendLine import CTrendLine
 
@@ -12,6 +13,11 @@ LINE_TYPE = TypeVar('LINE_TYPE', CBi, "CSeg")
 
 
 class CSeg(Generic[LINE_TYPE]):
+    __slots__ = (
+        "idx", "start_bi", "end_bi", "is_sure", "dir", "zs_lst", "eigen_fx", "seg_idx", "parent_seg", "pre", "next",
+        "bsp", "bi_list", "reason", "support_trend_line", "resistance_trend_line", "ele_inside_is_sure",
+    )
+
     def __init__(self, idx: int, start_bi: LINE_TYPE, end_bi: LINE_TYPE, is_sure=True, seg_dir=None, reason="normal"):
         assert start_bi.idx == 0 or start_bi.dir == end_bi.dir or not is_sure, f"{start_bi.idx} {end_bi.idx} {start_bi.dir} {end_bi.dir}"
         self.idx = idx
@@ -42,6 +48,23 @@ class CSeg(Generic[LINE_TYPE]):
 
         self.ele_inside_is_sure = False
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
+    def same_as(self, seg: 'CSeg') -> bool:
+        # 重新计算出来的同一个线段：首尾是同一对象，其余属性都由首尾之间的笔决定
+        return type(self) is type(seg) and self.idx == seg.idx and self.start_bi is seg.start_bi and self.end_bi is seg.end_bi and \
+            self.is_sure == seg.is_sure and self.dir == seg.dir and self.reason == seg.reason and len(self.bi_list) == len(seg.bi_list)
+
+    def take_over(self, seg: 'CSeg'):
+        # 用本对象替换重新计算出来的同一个线段seg：取seg的线段层属性，保留上一级计算写入的seg_idx/parent_seg/bsp
+        self.eigen_fx = seg.eigen_fx
+        self.bi_list = seg.bi_list
+        self.support_trend_line = seg.support_trend_line
+        self.resistance_trend_line = seg.resistance_trend_line
+        for bi in self.bi_list:
+            bi.parent_seg = self
+
     def set_seg_idx(self, idx):
         self.seg_idx = idx
 
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from Bi.BiList import CBiList
 from Common.CEnum import BI_DIR, SEG_TYPE
 
@@ -25,6 +27,13 @@ class CSegListChan(CSegListComm):
                 # 如果确定线段的分形的第三元素包含不确定笔，也需要重新算，不然线段分形元素的高低点可能不对
                 self.lst.pop()
 
+    def mutable_begin(self) -> Optional[int]:
+        # do_init只会删除末尾不确定的线段，以及最后一个确定线段
+        idx = len(self) - 1
+        while idx >= 0 and not self.lst[idx].is_sure:
+            idx -= 1
+        return max(idx, 0)
+
     def update(self, bi_lst: CBiList):
         self.do_init()
         if len(self) == 0:
@@ -1,5 +1,5 @@
 import abc
-from typing import Generic, List, TypeVar, Union, overload
+from typing import Generic, List, Optional, TypeVar, Union, overload
 
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
@@ -37,6 +37,35 @@ class CSegListComm(Generic[SUB_LINE_TYPE]):
     def __len__(self):
         return len(self.lst)
 
+    def mutable_begin(self) -> Optional[int]:
+        # update时可能被删除重建的第一个线段下标；None表示update会原地修改线段，不支持复用
+        return None
+
+    def reuse_unchanged_seg(self, begin: int, old_tail: List[CSeg[SUB_LINE_TYPE]], line_dirty_idx: int) -> bool:
+        """
+        update重建出来的线段如果和原来同一位置的线段完全一样(首尾笔是同一对象，且线段内的笔没有变化)，换回原来的对象，
+        这样上一级(线段的线段、线段中枢、线段买卖点)保存的引用仍然有效；
+        返回线段列表是否有变化，没有变化时上一级不需要重算
+        """
+        changed = len(self.lst) != begin + len(old_tail)
+        for idx in range(begin, len(self.lst)):
+            seg = self.lst[idx]
+            old_seg = old_tail[idx - begin] if idx - begin < len(old_tail) else None
+            if seg.end_bi.idx >= line_dirty_idx:
+                changed = True
+            elif seg is not old_seg:
+                if old_seg is not None and old_seg.same_as(seg):
+                    old_seg.take_over(seg)
+                    self.lst[idx] = old_seg
+                else:
+                    changed = True
+        for idx in range(max(begin, 1), len(self.lst)):
+            self.lst[idx].pre = self.lst[idx-1]
+            self.lst[idx-1].next = self.lst[idx]
+        if len(self.lst):
+            self.lst[-1].next = None
+        return changed
+
     def left_bi_break(self, bi_lst: CBiList):
         # 最后一个确定线段之后的笔有突破该线段最后一笔的
         if len(self) == 0:
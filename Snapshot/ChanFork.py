@@ -0,0 +1,256 @@
+from bisect import bisect_left
+from collections import defaultdict, deque
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from Bi.Bi import CBi
+from BuySellPoint.BS_Point import CBS_Point
+from BuySellPoint.BSPointList import CBSPointList
+from Common.cache import is_cache_slot
+from Common.CTime import CTime
+from Common.state_util import iter_attrs
+from KLine.KLine import CKLine
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_Snapshot import (get_bsp_frontier, get_line_frontier,
+                                  get_seg_frontier, get_zs_frontier)
+from KLine.KLine_Store import CKLine_Unit_View
+from KLine.KLine_Unit import CKLine_Unit
+from Math.Demark import CDemarkEngine
+from Math.MACD import CMACD
+from Seg.Seg import CSeg
+from ZS.ZS import CZS
+from ZS.ZSList import CZSList
+
+if TYPE_CHECKING:
+    from Chan import CChan
+
+"""
+CChan结构共享复制：
+已确定的K线、笔、线段、中枢、买卖点之后不会再被修改，新旧两个CChan直接共用这些对象，
+只复制可能被重算的尾部(和CKLine_Snapshot保存的范围一致，再多留几个余量)，
+列表本身复制引用，列式存储的K线列写时复制；复制耗时和尾部长度成正比，和历史长度基本无关
+"""
+
+FORK_MARGIN = 2  # 尾部之前多复制几个元素，这些元素的next会指向尾部
+_TRACKED_TYPES = {CKLine_Unit, CKLine_Unit_View, CKLine, CBi, CSeg, CZS, CBS_Point}
+_ATOMIC_TYPES = {int, float, str, bool, bytes, type(None), CTime}
+
+
+class CForkCopier:
+    """
+    尾部的K线/合并K线/笔/线段/中枢/买卖点先建好空对象，再统一复制属性：
+    引用到尾部对象的替换成新对象，引用到尾部之外的直接共用；其余容器和小对象(特征序列、特征、指标等)逐个复制
+    """
+    def __init__(self):
+        self.memo: Dict[int, object] = {}
+        self.list_begin: Dict[int, int] = {}  # 长列表只复制begin之后的元素，之前的元素共用
+        self.dict_keys: Dict[int, list] = {}  # 长字典只复制指定key对应的值
+        self.tail: list = []
+        self.keep: list = []  # memo按id索引，复制期间原对象不能被回收
+
+    def add(self, obj):
+        if obj is not None and id(obj) not in self.memo:
+            self.memo[id(obj)] = obj.__class__.__new__(obj.__class__)
+            self.tail.append(obj)
+
+    def add_list(self, lst: list, begin: int):
+        begin = max(begin, 0)
+        self.list_begin[id(lst)] = begin
+        self.keep.append(lst)
+        for obj in lst[begin:]:
+            self.add(obj)
+
+    def add_plain_list(self, lst: list, begin: int):
+        # 元素不需要复制的长列表(如整数)，只复制begin之后的部分
+        self.list_begin[id(lst)] = max(begin, 0)
+        self.keep.append(lst)
+
+    def set_dict_keys(self, _dict: dict, keys: list):
+        self.dict_keys[id(_dict)] = keys
+        self.keep.append(_dict)
+
+    def map_to(self, obj, new_obj):
+        self.memo[id(obj)] = new_obj
+        self.keep.append(obj)
+
+    def fill_tail(self):
+        for obj in self.tail:
+            self.copy_attrs(obj, self.memo[id(obj)])
+
+    def copy_attrs(self, obj, new_obj):
+        for name, value in iter_attrs(obj):
+            if is_cache_slot(name):  # 缓存直接丢弃，用到时make_cache会重新计算
+                continue
+            object.__setattr__(new_obj, name, self.copy(value))
+        return new_obj
+
+    def copy(self, value):
+        _type = type(value)
+        if _type in _ATOMIC_TYPES:
+            return value
+        res = self.memo.get(id(value))
+        if res is not None:
+            return res
+        if _type in _TRACKED_TYPES:
+            return value  # 尾部之外的对象共用
+        if _type is list:
+            begin = self.list_begin.get(id(value), 0)
+            res = value[:begin]
+            self.map_to(value, res)
+            res.extend([self.copy(item) for item in value[begin:]])
+        elif _type is dict or _type is defaultdict:
+            res = _type.__new__(_type)
+            if _type is defaultdict:
+                res.default_factory = value.default_factory
+            self.map_to(value, res)
+            if id(value) in self.dict_keys:
+                res.update(value)
+                for key in self.dict_keys[id(value)]:
+                    res[key] = self.copy(value[key])
+            else:
+                res.update((key, self.copy(item)) for key, item in value.items())
+        elif _type is tuple:
+            res = tuple(self.copy(item) for item in value)
+            self.map_to(value, res)
+        elif _type is set:
+            res = set(value)
+            self.map_to(value, res)
+        elif _type is deque:
+            res = deque(maxlen=value.maxlen)
+            self.map_to(value, res)
+            res.extend(self.copy(item) for item in value)
+        elif isinstance(value, (Enum, type)) or not (hasattr(value, "__dict__") or hasattr(_type, "__slots__")):
+            return value
+        elif _type.__module__.endswith("Config"):
+            return value  # 配置只读，共用
+        else:
+            res = _type.__new__(_type)
+            self.map_to(value, res)
+            self.copy_attrs(value, res)
+        return res
+
+
+def get_klc_frontier(kl_list: CKLine_List, bi_begin: int) -> int:
+    # 尾部笔用到的合并K线，最后两根合并K线会被新K线修改
+    klc_begin = len(kl_list) - 2
+    if len(kl_list.bi_list) > 0:
+        klc_begin = min(klc_begin, kl_list.bi_list[bi_begin].begin_klc.idx)
+    else:
+        klc_begin = 0  # 第一笔出来之前的合并K线都缓存在free_klc_lst里
+    return max(klc_begin - FORK_MARGIN, 0)
+
+
+class CLevelFork:
+    # 单个级别需要复制的尾部范围
+    def __init__(self, kl_list: CKLine_List):
+        self.kl_list = kl_list
+        bi_begin = get_line_frontier(len(kl_list.bi_list), kl_list.seg_list)
+        seg_begin = get_seg_frontier(kl_list.seg_list)
+        seg_begin = min(seg_begin, get_line_frontier(len(kl_list.seg_list), kl_list.segseg_list))
+        segseg_begin = get_seg_frontier(kl_list.segseg_list)
+
+        # 只因为线段的线段重算而复制的线段，其中笔的parent_seg仍指向共用的旧线段，这些线段的idx/bi_list不会再变
+        self.bi_begin = max(bi_begin - FORK_MARGIN, 0)
+        self.seg_begin = max(seg_begin - FORK_MARGIN, 0)
+        self.segseg_begin = max(segseg_begin - FORK_MARGIN, 0)
+        self.klc_begin = get_klc_frontier(kl_list, min(self.bi_begin, max(len(kl_list.bi_list) - 1, 0)))
+
+    def first_klu(self) -> Optional[CKLine_Unit]:
+        return self.kl_list[self.klc_begin][0] if self.klc_begin < len(self.kl_list) else None
+
+    def extend_to_klu(self, klu: Optional[CKLine_Unit]) -> bool:
+        if klu is None or klu.klc.idx >= self.klc_begin:
+            return False
+        self.klc_begin = klu.klc.idx
+        return True
+
+    def add_to(self, copier: CForkCopier):
+        kl_list = self.kl_list
+        copier.add_list(kl_list.lst, self.klc_begin)
+        for klc in kl_list.lst[self.klc_begin:]:
+            for klu in klc.lst:
+                copier.add(klu)
+        copier.add_list(kl_list.bi_list.bi_list, self.bi_begin)
+        copier.add_list(kl_list.seg_list.lst, self.seg_begin)
+        copier.add_list(kl_list.segseg_list.lst, self.segseg_begin)
+        self.add_zs_list(copier, kl_list.zs_list, self.bi_begin)
+        self.add_zs_list(copier, kl_list.segzs_list, self.seg_begin)
+        self.add_bsp_list(copier, kl_list.bs_point_lst, self.bi_begin)
+        self.add_bsp_list(copier, kl_list.seg_bs_point_lst, self.seg_begin)
+        for metric_model in kl_list.metric_model_lst:
+            if isinstance(metric_model, CMACD):
+                copier.add_list(metric_model.macd_info, len(metric_model.macd_info) - 1)
+            elif isinstance(metric_model, CDemarkEngine):
+                copier.add_list(metric_model.kl_lst, len(metric_model.kl_lst) - CDemarkEngine.SETUP_BIAS - 2)
+        if kl_list.kl_store is not None:
+            store = kl_list.kl_store.fork()
+            copier.map_to(kl_list.kl_store, store)
+            first_klu = self.first_klu()
+            if first_klu is not None:
+                for row in range(first_klu.row, len(store)):
+                    if row in store.demark:
+                        store.demark[row] = copier.copy(store.demark[row])
+
+    @staticmethod
+    def add_zs_list(copier: CForkCopier, zs_list: CZSList, line_begin: int):
+        copier.add_list(zs_list.zs_lst, get_zs_frontier(zs_list, line_begin))
+
+    @staticmethod
+    def add_bsp_list(copier: CForkCopier, bsp_list: CBSPointList, line_begin: int):
+        flat_keys = []
+        for bsp_lst in bsp_list.bsp_store_dict.values():
+            for lst in bsp_lst:
+                begin = get_bsp_frontier(lst, line_begin)
+                copier.add_list(lst, begin)
+                flat_keys.extend(bsp.bi.idx for bsp in lst[begin:] if bsp_list.bsp_store_flat_dict.get(bsp.bi.idx) is bsp)
+        copier.set_dict_keys(bsp_list.bsp_store_flat_dict, flat_keys)
+        index = bsp_list.index
+        begin = bisect_left(index.bi_idx_lst, line_begin)
+        copier.add_plain_list(index.bi_idx_lst, begin)
+        copier.add_plain_list(index.ts_lst, begin)
+        for lst in index.key_dict.values():
+            copier.add_plain_list(lst, bisect_left(lst, line_begin))
+        begin = get_bsp_frontier(bsp_list.bsp1_list, line_begin)
+        copier.add_list(bsp_list.bsp1_list, begin)
+        copier.set_dict_keys(bsp_list.bsp1_dict, [bsp.bi.idx for bsp in bsp_list.bsp1_list[begin:] if bsp_list.bsp1_dict.get(bsp.bi.idx) is bsp])
+
+    def fork(self, copier: CForkCopier) -> CKLine_List:
+        new_kl_list = copier.copy(self.kl_list)
+        new_kl_list.live_snapshot = None
+        return new_kl_list
+
+
+def align_levels(level_lst: List[CLevelFork]):
+    # 父级别复制的K线，其次级别K线的sup_kl要指向新对象；反过来次级别复制的K线，父级别K线的sub_kl_list也要更新
+    changed = True
+    while changed:
+        changed = False
+        for parent, child in zip(level_lst[:-1], level_lst[1:]):
+            parent_klu = parent.first_klu()
+            while parent_klu is not None and len(parent_klu.sub_kl_list) == 0:
+                parent_klu = parent_klu.next
+            if parent_klu is not None:
+                changed |= child.extend_to_klu(parent_klu.sub_kl_list[0])
+            child_klu = child.first_klu()
+            if child_klu is not None:
+                changed |= parent.extend_to_klu(child_klu.sup_kl)
+
+
+def fork_chan(chan: 'CChan') -> 'CChan':
+    level_lst = [CLevelFork(chan[lv]) for lv in chan.lv_list]
+    align_levels(level_lst)
+    copier = CForkCopier()
+    for level in level_lst:
+        level.add_to(copier)
+    for klu in getattr(chan, "klu_cache", []):
+        copier.add(klu)
+    copier.fill_tail()
+
+    new_chan = chan.__class__.__new__(chan.__class__)
+    for name, value in chan.__dict__.items():
+        if name in ("kl_datas", "g_kl_iter"):
+            continue
+        new_chan.__dict__[name] = copier.copy(value)
+    new_chan.g_kl_iter = defaultdict(list)  # 数据源的迭代器不能共用
+    new_chan.kl_datas = {lv: level.fork(copier) for lv, level in zip(chan.lv_list, level_lst)}
+    return new_chan
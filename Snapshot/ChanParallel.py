@@ -0,0 +1,151 @@
+import copyreg
+import io
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from Common.ListView import CListView
+from Common.state_util import iter_attrs, set_slots_state
+from KLine.KLine_List import CKLine_List
+
+from .ChanSnapshot import (KIND_BI, KIND_BSP, KIND_CNT, KIND_EIGEN,
+                           KIND_EIGENFX, KIND_KLC, KIND_KLU, KIND_SEG,
+                           KIND_SEGBSP, KIND_SEGEIGEN, KIND_SEGEIGENFX,
+                           KIND_SEGSEG, KIND_SEGZS, KIND_ZS, MAX_LV_CNT,
+                           TABLE_CLASS, CLevelDumper,
+                           _gc_paused, _link_pre_next, _pid, _SnapshotPickler,
+                           _SnapshotUnpickler, _table_state)
+
+if TYPE_CHECKING:
+    from Chan import CChan
+
+"""
+非逐步模式下各级别的线段/中枢/买卖点计算(cal_seg_and_zs)互不依赖，可以放到子进程里并行：
+子进程fork出来时已经有加载好的K线和笔，算完之后把结果按ChanSnapshot的对象表导出，
+对K线/合并K线/配置的引用替换成编号，主进程按编号指回自己的对象，再回填到CKLine_List；
+K线最多的级别由主进程自己算，不需要导出导入
+"""
+
+KIND_SHARED = KIND_CNT  # 配置等只读对象，两边按同样的顺序收集
+RESULT_ATTRS = (
+    "bi_list", "seg_list", "segseg_list", "zs_list", "segzs_list", "bs_point_lst", "seg_bs_point_lst",
+    "last_sure_seg_start_bi_idx", "last_sure_segseg_start_bi_idx", "seg_changed", "profiler",
+)
+
+_FORK_CHAN: Optional['CChan'] = None  # fork之前设置，子进程直接继承
+
+
+def can_parallel() -> bool:
+    # 需要fork，单核机器上并行只会多出进程和序列化的开销
+    return "fork" in multiprocessing.get_all_start_methods() and (os.cpu_count() or 1) > 1
+
+
+def shared_obj_lst(kl_list: CKLine_List) -> list:
+    # 结果容器直接引用的配置对象，计算前后不会变
+    res = {}
+    for name in RESULT_ATTRS:
+        value = getattr(kl_list, name)
+        if not hasattr(value, "__dict__"):
+            continue
+        for _, attr in iter_attrs(value):
+            if type(attr).__module__.endswith("Config"):
+                res[id(attr)] = attr
+    return list(res.values())
+
+
+def result_tables(kl_list: CKLine_List, shared_lst: list) -> Dict[int, list]:
+    res = {
+        KIND_KLU: [klu for klc in kl_list.lst for klu in klc.lst],
+        KIND_KLC: kl_list.lst,
+        KIND_SHARED: shared_lst,
+        KIND_BI: kl_list.bi_list.bi_list,
+        KIND_SEG: kl_list.seg_list.lst,
+        KIND_SEGSEG: kl_list.segseg_list.lst,
+        KIND_ZS: kl_list.zs_list.zs_lst,
+        KIND_SEGZS: kl_list.segzs_list.zs_lst,
+        KIND_BSP: CLevelDumper.bsp_lst(kl_list.bs_point_lst),
+        KIND_SEGBSP: CLevelDumper.bsp_lst(kl_list.seg_bs_point_lst),
+        KIND_EIGENFX: CLevelDumper.eigen_fx_lst(kl_list.seg_list),
+        KIND_SEGEIGENFX: CLevelDumper.eigen_fx_lst(kl_list.segseg_list),
+    }
+    res[KIND_EIGEN] = CLevelDumper.eigen_lst(res[KIND_EIGENFX])
+    res[KIND_SEGEIGEN] = CLevelDumper.eigen_lst(res[KIND_SEGEIGENFX])
+    return res
+
+
+def dump_level_result(kl_list: CKLine_List, shared_lst: list) -> bytes:
+    # 先写各对象表的长度，主进程建好空对象之后再反序列化属性
+    tables = result_tables(kl_list, shared_lst)
+    pid_dict = {id(obj): _pid(kind, 0, pos) for kind, lst in tables.items() for pos, obj in enumerate(lst)}
+    buf = io.BytesIO()
+    pickle.dump({kind: len(tables[kind]) for kind in TABLE_CLASS}, buf, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler = _SnapshotPickler(buf, pid_dict)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[CListView] = lambda view: (CListView, (view.lst, view.begin, view.end))  # 保持区间视图，不展开成list
+    pickler.dump({
+        "attrs": {name: getattr(kl_list, name) for name in RESULT_ATTRS},
+        "tables": {kind: [_table_state(item) for item in tables[kind]] for kind in TABLE_CLASS},
+    })
+    return buf.getvalue()
+
+
+def load_level_result(kl_list: CKLine_List, shared_lst: list, data: bytes):
+    buf = io.BytesIO(data)
+    table_cnt: Dict[int, int] = pickle.load(buf)
+    obj_tables: List[List[list]] = [[[] for _ in range(MAX_LV_CNT)] for _ in range(KIND_SHARED + 1)]
+    obj_tables[KIND_KLU][0] = [klu for klc in kl_list.lst for klu in klc.lst]
+    obj_tables[KIND_KLC][0] = kl_list.lst
+    obj_tables[KIND_SHARED][0] = shared_lst
+    for kind, cls in TABLE_CLASS.items():
+        obj_tables[kind][0] = [cls.__new__(cls) for _ in range(table_cnt[kind])]
+    res = _SnapshotUnpickler(buf, obj_tables).load()
+    for kind, states in res["tables"].items():
+        for obj, state in zip(obj_tables[kind][0], states):
+            set_slots_state(obj, state)
+    for kind in [KIND_BI, KIND_SEG, KIND_SEGSEG]:
+        _link_pre_next(obj_tables[kind][0])
+    for name, value in res["attrs"].items():
+        setattr(kl_list, name, value)
+
+
+def _cal_level_in_worker(lv_idx: int) -> bytes:
+    assert _FORK_CHAN is not None
+    kl_list = _FORK_CHAN[lv_idx]
+    shared_lst = shared_obj_lst(kl_list)
+    kl_list.cal_seg_and_zs()
+    with _gc_paused():
+        return dump_level_result(kl_list, shared_lst)
+
+
+def cal_metric_pending(kl_list: CKLine_List):
+    # batch_metric会修改K线和指标模型，fork之前在主进程里先算掉
+    if not kl_list.metric_pending:
+        return
+    prof = kl_list.profiler
+    if prof is not None:
+        prof.start()
+    kl_list.cal_metric_batch()
+    if prof is not None:
+        prof.lap("metric")
+
+
+def parallel_cal_seg_and_zs(chan: 'CChan', max_workers: int):
+    global _FORK_CHAN
+    kl_list_lst = [chan[lv_idx] for lv_idx in range(len(chan.lv_list))]
+    for kl_list in kl_list_lst:
+        cal_metric_pending(kl_list)
+    local_idx = max(range(len(kl_list_lst)), key=lambda lv_idx: len(kl_list_lst[lv_idx]))
+    remote_idx_lst = [lv_idx for lv_idx in range(len(kl_list_lst)) if lv_idx != local_idx]
+    _FORK_CHAN = chan
+    try:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(remote_idx_lst), (os.cpu_count() or 1) - 1), mp_context=multiprocessing.get_context("fork")) as executor:
+            future_lst = [executor.submit(_cal_level_in_worker, lv_idx) for lv_idx in remote_idx_lst]
+            shared_lst_lst = [shared_obj_lst(kl_list_lst[lv_idx]) for lv_idx in remote_idx_lst]
+            kl_list_lst[local_idx].cal_seg_and_zs()
+            for lv_idx, shared_lst, future in zip(remote_idx_lst, shared_lst_lst, future_lst):
+                with _gc_paused():
+                    load_level_result(kl_list_lst[lv_idx], shared_lst, future.result())
+    finally:
+        _FORK_CHAN = None
@@ -0,0 +1,931 @@
+import copy
+import gc
+import io
+import json
+import mmap
+import pickle
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain, compress, repeat
+from operator import attrgetter, itemgetter
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+import numpy as np
+
+from Bi.Bi import CBi
+from BuySellPoint.BS_Point import CBS_Point
+from ChanModel.Features import CFeatures
+from Common.cache import is_cache_slot
+from Common.CEnum import (BI_DIR, BI_TYPE, BSP_TYPE, FX_TYPE, KL_TYPE,
+                          KLINE_DIR, SEG_TYPE, TRADE_INFO_LST,
+                          TREND_LINE_SIDE, TREND_TYPE)
+from Common.ChanException import CChanException, ErrCode
+from Common.ListView import CListView
+from Common.state_util import iter_attrs, slot_names
+from KLine.KLine import CKLine
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_Store import (BOLL_COLUMNS, KDJ_COLUMNS, MACD_COLUMNS,
+                               CKLine_Store, CKLine_Unit_View, trend_column,
+                               unpack_time_lst)
+from KLine.KLine_Unit import CKLine_Unit
+from Math.BOLL import BollModel
+from Math.Demark import CDemarkEngine
+from Math.KDJ import KDJ
+from Math.MACD import CMACD
+from Math.RSI import RSI
+from Math.TrendLine import CTrendLine, Line, Point
+from Math.TrendModel import CTrendModel
+from Seg.Eigen import CEigen
+from Seg.EigenFX import CEigenFX
+from Seg.Seg import CSeg
+from ZS.ZS import CZS
+
+if TYPE_CHECKING:
+    from Chan import CChan
+
+"""
+CChan快照文件：
+    MAGIC(8字节) | version(uint32) | header长度(uint64) | header(json) | 数组区(每个数组按64字节对齐)
+每个级别的K线按列保存(和CKLine_Store的列一致)，合并K线保存为定长表，加载时直接mmap成只读numpy数组；
+笔/线段/中枢/买卖点/特征序列按对象表每个属性保存成列(见TABLE_SPEC)，对象之间以及对K线的引用全部替换成表里的序号，
+不会像pickle整个CChan那样沿着对象引用一路递归下去；只有CKLine_List等容器的其余属性和少量编码不了的值pickle到residual
+"""
+
+SNAPSHOT_MAGIC = b"CHANSNAP"
+SNAPSHOT_VERSION = 3  # 文件布局变化时加一，不读其他版本的文件
+_ALIGN = 64
+_PREFIX_LEN = len(SNAPSHOT_MAGIC) + 12
+
+KLINE_DIR_LST = list(KLINE_DIR)
+FX_TYPE_LST = list(FX_TYPE)
+TREND_LINE_SIDE_LST = list(TREND_LINE_SIDE)
+
+# 对象编号 = (表内序号 << 8) | (对象类型 << 4) | 级别序号
+KIND_KLU, KIND_KLC, KIND_BI, KIND_SEG, KIND_SEGSEG, KIND_ZS, KIND_SEGZS, KIND_BSP, KIND_SEGBSP = range(9)
+KIND_EIGENFX, KIND_SEGEIGENFX, KIND_EIGEN, KIND_SEGEIGEN = range(9, 13)
+KIND_CNT = 13
+MAX_LV_CNT = 16
+TABLE_CLASS = {
+    KIND_BI: CBi,
+    KIND_SEG: CSeg,
+    KIND_SEGSEG: CSeg,
+    KIND_ZS: CZS,
+    KIND_SEGZS: CZS,
+    KIND_BSP: CBS_Point,
+    KIND_SEGBSP: CBS_Point,
+    KIND_EIGENFX: CEigenFX,
+    KIND_SEGEIGENFX: CEigenFX,
+    KIND_EIGEN: CEigen,
+    KIND_SEGEIGEN: CEigen,
+}
+TABLE_NAME = {
+    KIND_BI: "bi",
+    KIND_SEG: "seg",
+    KIND_SEGSEG: "segseg",
+    KIND_ZS: "zs",
+    KIND_SEGZS: "segzs",
+    KIND_BSP: "bsp",
+    KIND_SEGBSP: "segbsp",
+    KIND_EIGENFX: "eigenfx",
+    KIND_SEGEIGENFX: "segeigenfx",
+    KIND_EIGEN: "eigen",
+    KIND_SEGEIGEN: "segeigen",
+}
+
+
+def _pid(kind: int, lv_idx: int, pos: int) -> int:
+    return (pos << 8) | (kind << 4) | lv_idx
+
+
+def _klu_metric_attrs(metric_model_lst) -> List[str]:
+    # 非列式存储时klu对象上指标的属性路径，和CKLine_Store的列名一致；趋势指标单独处理
+    attrs: List[str] = []
+    for metric_model in metric_model_lst:
+        if isinstance(metric_model, CMACD):
+            attrs.extend(MACD_COLUMNS)
+        elif isinstance(metric_model, BollModel):
+            attrs.extend(BOLL_COLUMNS)
+        elif isinstance(metric_model, RSI):
+            attrs.append("rsi")
+        elif isinstance(metric_model, KDJ):
+            attrs.extend(KDJ_COLUMNS)
+    return attrs
+
+
+def _trim_metric_model(metric_model):
+    # 历史指标已经在列里了，模型只保留继续计算需要的尾部
+    if isinstance(metric_model, CMACD) and len(metric_model.macd_info) > 1:
+        metric_model = copy.copy(metric_model)
+        metric_model.macd_info = metric_model.macd_info[-1:]
+    elif isinstance(metric_model, CDemarkEngine) and len(metric_model.kl_lst) > CDemarkEngine.SETUP_BIAS + 2:
+        metric_model = copy.copy(metric_model)
+        metric_model.kl_lst = metric_model.kl_lst[-CDemarkEngine.SETUP_BIAS-2:]
+    return metric_model
+
+
+def _table_state(obj) -> dict:
+    # pre/next加载时按列表顺序重建；缓存直接丢弃，用到时make_cache会重新计算
+    return {name: value for name, value in iter_attrs(obj) if name not in ("pre", "next") and not is_cache_slot(name)}
+
+
+class _CUnset:
+    # 没有赋值的slot；pickle之后仍然是同一个对象
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "UNSET"
+
+    def __repr__(self):
+        return "UNSET"
+
+
+UNSET = _CUnset()
+
+
+def _bi_spec():
+    return [
+        ("_CBi__begin_klc", "ref", KIND_KLC),
+        ("_CBi__end_klc", "ref", KIND_KLC),
+        ("_CBi__dir", "enum", BI_DIR),
+        ("_CBi__idx", "int", None),
+        ("_CBi__type", "enum", BI_TYPE),
+        ("_CBi__is_sure", "bool", None),
+        ("_CBi__sure_end", "reflist", KIND_KLC),
+        ("_CBi__seg_idx", "int", None),
+        ("parent_seg", "ref", KIND_SEG),
+        ("bsp", "ref", KIND_BSP),
+    ]
+
+
+def _seg_spec(line_kind: int, parent_kind: int, zs_kind: int, bsp_kind: int, eigen_fx_kind: int):
+    return [
+        ("idx", "int", None),
+        ("start_bi", "ref", line_kind),
+        ("end_bi", "ref", line_kind),
+        ("is_sure", "bool", None),
+        ("dir", "enum", BI_DIR),
+        ("zs_lst", "reflist", zs_kind),
+        ("eigen_fx", "ref", eigen_fx_kind),
+        ("seg_idx", "int", None),
+        ("parent_seg", "ref", parent_kind),
+        ("bsp", "ref", bsp_kind),
+        ("bi_list", "reflist", line_kind),
+        ("reason", "str", None),
+        ("support_trend_line", "trend_line", None),
+        ("resistance_trend_line", "trend_line", None),
+        ("ele_inside_is_sure", "bool", None),
+    ]
+
+
+def _zs_spec(line_kind: int, line_list: str):
+    return [
+        ("_CZS__is_sure", "bool", None),
+        ("_CZS__sub_zs_lst", "obj", list),
+        ("_CZS__begin", "ref", KIND_KLU),
+        ("_CZS__begin_bi", "ref", line_kind),
+        ("_CZS__end", "ref", KIND_KLU),
+        ("_CZS__end_bi", "ref", line_kind),
+        ("_CZS__low", "float", None),
+        ("_CZS__high", "float", None),
+        ("_CZS__mid", "float", None),
+        ("_CZS__peak_high", "float", None),
+        ("_CZS__peak_low", "float", None),
+        ("_CZS__bi_in", "ref", line_kind),
+        ("_CZS__bi_out", "ref", line_kind),
+        ("_CZS__bi_lst", "view", line_list),
+    ]
+
+
+def _eigen_fx_spec(line_kind: int, eigen_kind: int):
+    return [
+        ("lv", "enum", SEG_TYPE),
+        ("dir", "enum", BI_DIR),
+        ("ele", "reflist", eigen_kind),
+        ("lst", "reflist", line_kind),
+        ("exclude_included", "bool", None),
+        ("kl_dir", "enum", KLINE_DIR),
+        ("last_evidence_bi", "ref", line_kind),
+    ]
+
+
+def _eigen_spec(line_kind: int, eigen_kind: int):
+    return [
+        ("_CKLine_Combiner__time_begin", "int", None),
+        ("_CKLine_Combiner__time_end", "int", None),
+        ("_CKLine_Combiner__high", "float", None),
+        ("_CKLine_Combiner__low", "float", None),
+        ("_CKLine_Combiner__lst", "reflist", line_kind),
+        ("_CKLine_Combiner__dir", "enum", KLINE_DIR),
+        ("_CKLine_Combiner__fx", "enum", FX_TYPE),
+        ("_CKLine_Combiner__pre", "ref", eigen_kind),
+        ("_CKLine_Combiner__next", "ref", eigen_kind),
+        ("gap", "bool", None),
+    ]
+
+
+def _bsp_spec(line_kind: int, bsp_kind: int):
+    return [
+        ("bi", "ref", line_kind),
+        ("klu", "ref", KIND_KLU),
+        ("is_buy", "bool", None),
+        ("type", "enumlist", BSP_TYPE),
+        ("relate_bsp1", "ref", bsp_kind),
+        ("features", "features", None),
+        ("is_segbsp", "bool", None),
+    ]
+
+
+# 对象表每个属性一列(或几列)：(属性名, 编码, 参数)
+#   ref: 引用表里的对象，保存序号，None为-1；reflist: 对象列表，保存长度和拼接后的序号(None同样为-1)
+#   view: CKLine_List的笔/线段列表(参数为属性名)上的CListView，保存区间，空列表的区间为(-1, -1)
+#   int(None为INT_NONE)/float/bool/str/enum/enumlist(参数为枚举类)；features: CFeatures，特征名保存在header里
+#   trend_line: CTrendLine，保存直线上的点、斜率和side
+#   obj: 很少出现的对象(子中枢)，只有不是默认值(参数为None时是None，为list时是空列表)时才放进residual
+# 编码不了的值(类型不符、引用的对象不在表里、slot未赋值)逐个放进residual，加载时覆盖列里的占位值
+TABLE_SPEC = {
+    KIND_BI: _bi_spec(),
+    KIND_SEG: _seg_spec(KIND_BI, KIND_SEGSEG, KIND_ZS, KIND_SEGBSP, KIND_EIGENFX),
+    KIND_SEGSEG: _seg_spec(KIND_SEG, KIND_SEGSEG, KIND_SEGZS, KIND_SEGBSP, KIND_SEGEIGENFX),
+    KIND_ZS: _zs_spec(KIND_BI, "bi_list"),
+    KIND_SEGZS: _zs_spec(KIND_SEG, "seg_list"),
+    KIND_BSP: _bsp_spec(KIND_BI, KIND_BSP),
+    KIND_SEGBSP: _bsp_spec(KIND_SEG, KIND_SEGBSP),
+    KIND_EIGENFX: _eigen_fx_spec(KIND_BI, KIND_EIGEN),
+    KIND_SEGEIGENFX: _eigen_fx_spec(KIND_SEG, KIND_SEGEIGEN),
+    KIND_EIGEN: _eigen_spec(KIND_BI, KIND_EIGEN),
+    KIND_SEGEIGEN: _eigen_spec(KIND_SEG, KIND_SEGEIGEN),
+}
+INT_NONE = np.iinfo(np.int64).min
+_BAD = -2  # ref/enum列里编码不了的值
+
+
+def _ref_col(values: list, pos_dict: Dict[int, int]):
+    arr = np.fromiter(map(pos_dict.get, map(id, values), repeat(_BAD, len(values))), dtype=np.int64, count=len(values))
+    return {"": arr}, np.flatnonzero(arr == _BAD).tolist()
+
+
+def _reflist_col(values: list, pos_dict: Dict[int, int]):
+    lens, flat, bad = [], [], []
+    for pos, value in enumerate(values):
+        if type(value) is list:
+            item_pos = [pos_dict.get(id(item), _BAD) for item in value]
+            if _BAD not in item_pos:
+                lens.append(len(item_pos))
+                flat.extend(item_pos)
+                continue
+        lens.append(0)
+        bad.append(pos)
+    return {".len": np.array(lens, dtype=np.int64), ".item": np.array(flat, dtype=np.int64)}, bad
+
+
+def _view_col(values: list, line_list):
+    begin, end, bad = [], [], []
+    for pos, value in enumerate(values):
+        if type(value) is CListView and value.lst is line_list:
+            begin.append(value.begin)
+            end.append(value.end)
+        elif type(value) is list and not value:
+            begin.append(-1)
+            end.append(-1)
+        else:
+            begin.append(0)
+            end.append(0)
+            bad.append(pos)
+    return {".begin": np.array(begin, dtype=np.int64), ".end": np.array(end, dtype=np.int64)}, bad
+
+
+def _scalar_col(values: list, _type, dtype, none_value, default):
+    if not set(map(type, values)) - {_type}:
+        return {"": np.array(values, dtype=dtype)}, []
+    res, bad = [], []
+    for pos, value in enumerate(values):
+        if type(value) is _type:
+            res.append(value)
+        elif value is None and none_value is not None:
+            res.append(none_value)
+        else:
+            res.append(default)
+            bad.append(pos)
+    return {"": np.array(res, dtype=dtype)}, bad
+
+
+def _enum_col(values: list, enum_cls):
+    if not set(map(type, values)) - {enum_cls}:  # 枚举的__hash__是python函数，按下标查比查dict快
+        return {"": np.fromiter(map(list(enum_cls).index, values), dtype=np.int16, count=len(values))}, []
+    code = {member: idx for idx, member in enumerate(enum_cls)}
+    arr = np.array([code[value] if type(value) is enum_cls else -1 if value is None else _BAD for value in values], dtype=np.int16)
+    return {"": arr}, np.flatnonzero(arr == _BAD).tolist()
+
+
+def _enumlist_col(values: list, enum_cls):
+    code = {member: idx for idx, member in enumerate(enum_cls)}
+    lens, flat, bad = [], [], []
+    for pos, value in enumerate(values):
+        if type(value) is list and all(type(item) is enum_cls for item in value):
+            lens.append(len(value))
+            flat.extend(map(code.__getitem__, value))
+        else:
+            lens.append(0)
+            bad.append(pos)
+    return {".len": np.array(lens, dtype=np.int64), ".item": np.array(flat, dtype=np.int16)}, bad
+
+
+def _category_col(values: list, category: List[str]):
+    # 字符串保存成category里的序号
+    code = {name: idx for idx, name in enumerate(category)}
+    res, bad = [], []
+    for pos, value in enumerate(values):
+        if type(value) is str:
+            if value not in code:
+                code[value] = len(category)
+                category.append(value)
+            res.append(code[value])
+        else:
+            res.append(0)
+            bad.append(pos)
+    return {"": np.array(res, dtype=np.int32)}, bad
+
+
+def _features_col(values: list, keys: List[str]):
+    code = {name: idx for idx, name in enumerate(keys)}
+    lens, key_lst, value_lst, bad = [], [], [], []
+    for pos, value in enumerate(values):
+        if type(value) is CFeatures and len(value.__dict__) == 1:
+            items = list(value.items())
+            if all(type(item_value) is float for _, item_value in items):
+                for name, _ in items:
+                    if name not in code:
+                        code[name] = len(keys)
+                        keys.append(name)
+                lens.append(len(items))
+                key_lst.extend(code[name] for name, _ in items)
+                value_lst.extend(item_value for _, item_value in items)
+                continue
+        lens.append(0)
+        bad.append(pos)
+    return {
+        ".len": np.array(lens, dtype=np.int64),
+        ".key": np.array(key_lst, dtype=np.int32),
+        ".value": np.array(value_lst, dtype=np.float64),
+    }, bad
+
+
+def _trend_line_col(values: list):
+    x, y, slope, side, bad = [], [], [], [], []
+    for pos, value in enumerate(values):
+        if value is None:
+            x.append(0)
+            y.append(0.0)
+            slope.append(0.0)
+            side.append(-1)
+            continue
+        if type(value) is CTrendLine and len(value.__dict__) == 2 and type(value.side) is TREND_LINE_SIDE:
+            line = value.line
+            if type(line) is Line and type(line.p) is Point and type(line.p.x) is int and type(line.p.y) is float and type(line.slope) is float:
+                x.append(line.p.x)
+                y.append(line.p.y)
+                slope.append(line.slope)
+                side.append(TREND_LINE_SIDE_LST.index(value.side))
+                continue
+        x.append(0)
+        y.append(0.0)
+        slope.append(0.0)
+        side.append(-1)
+        bad.append(pos)
+    return {
+        ".x": np.array(x, dtype=np.int64),
+        ".y": np.array(y, dtype=np.float64),
+        ".slope": np.array(slope, dtype=np.float64),
+        ".side": np.array(side, dtype=np.int16),
+    }, bad
+
+
+def _new_trend_line(x: int, y: float, slope: float, side: int) -> CTrendLine:
+    res = CTrendLine.__new__(CTrendLine)
+    res.line = Line(Point(x, y), slope)
+    res.side = TREND_LINE_SIDE_LST[side]
+    return res
+
+
+def _split(flat: list, lens: np.ndarray) -> List[list]:
+    end = np.cumsum(lens).tolist()
+    return [flat[_begin:_end] for _begin, _end in zip([0] + end[:-1], end)]
+
+
+def _pos_dict(lst: list) -> Dict[int, int]:
+    # id(对象) -> 表内序号，None为-1
+    res = dict(zip(map(id, lst), range(len(lst))))
+    res[id(None)] = -1
+    return res
+
+
+class CLevelDumper:
+    # 导出单个级别：K线列、合并K线表，以及笔/线段/中枢/买卖点的对象表，对象之间的引用保存成表里的序号
+    def __init__(self, lv_idx: int, kl_list: CKLine_List, sup_pos: Dict[int, int]):
+        self.lv_idx = lv_idx
+        self.kl_list = kl_list
+        self.sup_pos = sup_pos  # 上一级别 id(klu) -> 序号
+        # 直接读slot，避开property的函数调用
+        self.klc_klu_lst = list(map(attrgetter("_CKLine_Combiner__lst"), kl_list.lst))
+        self.klu_lst = list(chain.from_iterable(self.klc_klu_lst))
+        self.tables: Dict[int, list] = {
+            KIND_KLU: self.klu_lst,
+            KIND_KLC: kl_list.lst,
+            KIND_BI: kl_list.bi_list.bi_list,
+            KIND_SEG: kl_list.seg_list.lst,
+            KIND_SEGSEG: kl_list.segseg_list.lst,
+            KIND_ZS: kl_list.zs_list.zs_lst,
+            KIND_SEGZS: kl_list.segzs_list.zs_lst,
+            KIND_BSP: self.bsp_lst(kl_list.bs_point_lst),
+            KIND_SEGBSP: self.bsp_lst(kl_list.seg_bs_point_lst),
+            KIND_EIGENFX: self.eigen_fx_lst(kl_list.seg_list),
+            KIND_SEGEIGENFX: self.eigen_fx_lst(kl_list.segseg_list),
+        }
+        self.tables[KIND_EIGEN] = self.eigen_lst(self.tables[KIND_EIGENFX])
+        self.tables[KIND_SEGEIGEN] = self.eigen_lst(self.tables[KIND_SEGEIGENFX])
+        self.pos_dict: Dict[int, Dict[int, int]] = {kind: _pos_dict(lst) for kind, lst in self.tables.items()}
+        self.klu_pos = self.pos_dict[KIND_KLU]
+        self.arrays: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def bsp_lst(bs_point_lst) -> list:
+        res = {}
+        for bsp_list in bs_point_lst.bsp_store_dict.values():
+            for lst in bsp_list:
+                res.update((id(bsp), bsp) for bsp in lst)
+        res.update((id(bsp), bsp) for bsp in bs_point_lst.bsp1_list)
+        return list(res.values())
+
+    @staticmethod
+    def eigen_fx_lst(seg_list) -> list:
+        res = {}
+        for seg in seg_list.lst:
+            eigen_fx = getattr(seg, "eigen_fx", None)
+            if type(eigen_fx) is CEigenFX:
+                res[id(eigen_fx)] = eigen_fx
+        return list(res.values())
+
+    @staticmethod
+    def eigen_lst(eigen_fx_lst: List[CEigenFX]) -> list:
+        # 特征序列的三个元素，以及顺着pre/next能找到的已经移出去的元素
+        res = {}
+        stack = [ele for eigen_fx in eigen_fx_lst if type(getattr(eigen_fx, "ele", None)) is list for ele in eigen_fx.ele]
+        while stack:
+            ele = stack.pop()
+            if type(ele) is CEigen and id(ele) not in res:
+                res[id(ele)] = ele
+                stack.append(getattr(ele, "_CKLine_Combiner__pre", None))
+                stack.append(getattr(ele, "_CKLine_Combiner__next", None))
+        return list(res.values())
+
+    def pid_items(self):
+        # residual里可能引用到的对象：笔/线段/中枢/买卖点以及各个表本身；K线由persistent_id按类型单独查
+        for kind, lst in self.tables.items():
+            yield id(lst), -1 - ((kind << 4) | self.lv_idx)
+            if kind in TABLE_CLASS:
+                pid_lst = ((np.arange(len(lst), dtype=np.int64) << 8) | (kind << 4) | self.lv_idx).tolist()
+                yield from zip(map(id, lst), pid_lst)
+
+    def kline_pid(self, obj):
+        kind = KIND_KLU if isinstance(obj, CKLine_Unit) else KIND_KLC
+        pos = self.pos_dict[kind].get(id(obj))
+        return None if pos is None else _pid(kind, self.lv_idx, pos)
+
+    def add_array(self, name, arr: np.ndarray):
+        self.arrays[f"lv{self.lv_idx}.{name}"] = np.ascontiguousarray(arr)
+
+    def add_columns(self, names: List[str], values: Iterable[tuple], cnt: int, dtype=np.float64):
+        # values为每个元素一个tuple，按列拆开
+        arr = np.fromiter(chain.from_iterable(values), dtype=dtype, count=cnt * len(names)).reshape(cnt, len(names))
+        for col, name in enumerate(names):
+            self.add_array(name, arr[:, col])
+
+    def dump_klu(self) -> dict:
+        klu_lst, store = self.klu_lst, self.kl_list.kl_store
+        n = len(klu_lst)
+        self.add_columns(["klu.idx", "klu.limit_flag"], map(attrgetter("_CKLine_Unit__idx", "limit_flag"), klu_lst), n, np.int64)
+        sup_pos = self.sup_pos
+        self.add_array("klu.sup", np.fromiter(map(sup_pos.__getitem__, map(id, map(attrgetter("sup_kl"), klu_lst))), dtype=np.int64, count=n))
+        if store is not None:
+            rows = np.fromiter(map(attrgetter("row"), klu_lst), dtype=np.int64, count=n)
+            for name, arr in store.columns.items():
+                self.add_array(f"klu.{name}", arr[rows])
+            pos_of_row = dict(zip(rows.tolist(), range(n)))
+            demark = {pos_of_row[row]: item for row, item in store.demark.items() if row in pos_of_row}
+            return {"trend_columns": store.trend_columns, "demark": demark}
+
+        time_getter = attrgetter("year", "month", "day", "hour", "minute", "second", "auto")
+        time_arr = np.fromiter(chain.from_iterable(map(time_getter, map(attrgetter("time"), klu_lst))), dtype=np.int64, count=n * 7).reshape(n, 7)
+        packed = np.zeros(n, dtype=np.int64)
+        for col in range(6):
+            packed = packed * 100 + time_arr[:, col]
+        self.add_array("klu.time", packed)
+        self.add_array("klu.time_auto", time_arr[:, 6].astype(np.bool_))
+        attrs = ["open", "high", "low", "close"] + _klu_metric_attrs(self.kl_list.metric_model_lst)
+        self.add_columns([f"klu.{name}" for name in attrs], map(attrgetter(*attrs), klu_lst), n)
+        metric_lst = list(map(attrgetter("trade_info.metric"), klu_lst))
+        try:  # CTradeInfo总是带全部字段
+            trade_arr = np.fromiter(chain.from_iterable(map(itemgetter(*TRADE_INFO_LST), metric_lst)), dtype=np.float64, count=n * len(TRADE_INFO_LST))
+        except KeyError:
+            nan = float("nan")
+            trade_arr = np.array([[metric.get(name, nan) for name in TRADE_INFO_LST] for metric in metric_lst], dtype=np.float64)
+        trade_arr = trade_arr.reshape(n, len(TRADE_INFO_LST))
+        for col, name in enumerate(TRADE_INFO_LST):
+            self.add_array(f"klu.{name}", trade_arr[:, col])
+        trend_columns: Dict[TREND_TYPE, Dict[int, str]] = defaultdict(dict)
+        for metric_model in self.kl_list.metric_model_lst:
+            if isinstance(metric_model, CTrendModel):
+                name = trend_column(metric_model.type, metric_model.T)
+                trend_columns[metric_model.type][metric_model.T] = name
+                self.add_array(f"klu.{name}", np.fromiter((trend[metric_model.type][metric_model.T] for trend in map(attrgetter("trend"), klu_lst)), dtype=np.float64, count=n))
+        demark = {pos: klu_lst[pos].demark for pos in compress(range(n), map(attrgetter("demark.data"), klu_lst))}
+        return {"trend_columns": dict(trend_columns), "demark": demark}
+
+    def dump_klc(self):
+        klc_lst = self.kl_list.lst
+        n = len(klc_lst)
+        self.add_array("klc.idx", np.fromiter(map(attrgetter("idx"), klc_lst), dtype=np.int64, count=n))
+        self.add_array("klc.klu_cnt", np.fromiter(map(len, self.klc_klu_lst), dtype=np.int64, count=n))
+        # 枚举的__hash__是python函数，按下标查比查dict快
+        self.add_array("klc.dir", np.fromiter(map(KLINE_DIR_LST.index, map(attrgetter("_CKLine_Combiner__dir"), klc_lst)), dtype=np.int64, count=n))
+        self.add_array("klc.fx", np.fromiter(map(FX_TYPE_LST.index, map(attrgetter("_CKLine_Combiner__fx"), klc_lst)), dtype=np.int64, count=n))
+        self.add_columns(["klc.high", "klc.low"], map(attrgetter("_CKLine_Combiner__high", "_CKLine_Combiner__low"), klc_lst), n)
+
+    def dump_table(self, kind: int, meta: dict) -> Dict[int, dict]:
+        # 按TABLE_SPEC逐列编码，meta里记录str/features列的取值表；返回编码不了的值 {序号: {属性名: 值}}
+        lst = self.tables[kind]
+        table = TABLE_NAME[kind]
+        extra: Dict[int, dict] = defaultdict(dict)
+        spec_names = set()
+        for name, codec, arg in TABLE_SPEC[kind]:
+            spec_names.add(name)
+            try:
+                values = list(map(attrgetter(name), lst))
+            except AttributeError:
+                values = [getattr(obj, name, UNSET) for obj in lst]
+            if codec == "ref":
+                cols, bad = _ref_col(values, self.pos_dict[arg])
+            elif codec == "reflist":
+                cols, bad = _reflist_col(values, self.pos_dict[arg])
+            elif codec == "view":
+                cols, bad = _view_col(values, getattr(self.kl_list, arg))
+            elif codec == "int":
+                cols, bad = _scalar_col(values, int, np.int64, INT_NONE, 0)
+            elif codec == "float":
+                cols, bad = _scalar_col(values, float, np.float64, None, float("nan"))
+            elif codec == "bool":
+                cols, bad = _scalar_col(values, bool, np.bool_, None, False)
+            elif codec == "enum":
+                cols, bad = _enum_col(values, arg)
+            elif codec == "enumlist":
+                cols, bad = _enumlist_col(values, arg)
+            elif codec == "str":
+                cols, bad = _category_col(values, meta.setdefault(name, []))
+            elif codec == "features":
+                cols, bad = _features_col(values, meta.setdefault(name, []))
+            elif codec == "trend_line":
+                cols, bad = _trend_line_col(values)
+            else:
+                cols, bad = {}, [pos for pos, value in enumerate(values) if not (value is None if arg is None else type(value) is arg and not value)]
+            for suffix, arr in cols.items():
+                self.add_array(f"{table}.{name}{suffix}", arr)
+            for pos in bad:
+                extra[pos][name] = values[pos]
+        # 子类或者以后新增的属性
+        other = [name for name in slot_names(TABLE_CLASS[kind]) if name not in spec_names and name not in ("pre", "next") and not is_cache_slot(name)]
+        for pos, obj in enumerate(lst):
+            for name in other:
+                value = getattr(obj, name, UNSET)
+                if value is not UNSET:
+                    extra[pos][name] = value
+            for name, value in getattr(obj, "__dict__", {}).items():
+                if name not in spec_names:
+                    extra[pos][name] = value
+        return dict(extra)
+
+    def dump(self) -> dict:
+        kl_list = self.kl_list
+        store_meta = self.dump_klu()
+        self.dump_klc()
+        attrs = {name: value for name, value in kl_list.__dict__.items() if name not in ("lst", "kl_store", "live_snapshot")}
+        attrs["metric_model_lst"] = [_trim_metric_model(metric_model) for metric_model in kl_list.metric_model_lst]
+        self.table_meta = {TABLE_NAME[kind]: {} for kind in TABLE_CLASS}
+        return {
+            "kl_list": attrs,
+            "store": store_meta,
+            "extra": {kind: self.dump_table(kind, self.table_meta[TABLE_NAME[kind]]) for kind in TABLE_CLASS},
+        }
+
+
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, pid_dict: Dict[int, int], dumpers: Iterable[CLevelDumper] = ()):
+        # pid_dict里没有的K线再到各级别的dumper里查
+        super(_SnapshotPickler, self).__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.pid_dict = pid_dict
+        self.dumpers = list(dumpers)
+
+    def persistent_id(self, obj):
+        pid = self.pid_dict.get(id(obj))
+        if pid is None and isinstance(obj, (CKLine_Unit, CKLine)):
+            for dumper in self.dumpers:
+                pid = dumper.kline_pid(obj)
+                if pid is not None:
+                    break
+        return pid
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, obj_tables: List[List[list]]):
+        super(_SnapshotUnpickler, self).__init__(file)
+        self.obj_tables = obj_tables
+
+    def persistent_load(self, pid):
+        if pid < 0:  # 整个表
+            code = -1 - pid
+            return self.obj_tables[code >> 4][code & 0xF]
+        return self.obj_tables[(pid >> 4) & 0xF][pid & 0xF][pid >> 8]
+
+
+def _write_file(file_path, header: dict, arrays: Dict[str, np.ndarray]):
+    arr_meta = []
+    offset = 0
+    for name, arr in arrays.items():
+        offset = (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+        arr_meta.append({"name": name, "dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset})
+        offset += arr.nbytes
+    header_bytes = json.dumps(dict(header, arrays=arr_meta)).encode("utf-8")
+    data_begin = (_PREFIX_LEN + len(header_bytes) + _ALIGN - 1) // _ALIGN * _ALIGN
+    header_bytes += b" " * (data_begin - _PREFIX_LEN - len(header_bytes))  # 数组区对齐
+    with open(file_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(np.uint32(SNAPSHOT_VERSION).tobytes())
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        pos = 0
+        for meta, arr in zip(arr_meta, arrays.values()):
+            f.write(b"\0" * (meta["offset"] - pos))
+            f.write(memoryview(arr).cast("B"))
+            pos = meta["offset"] + arr.nbytes
+
+
+def _read_file(file_path, use_mmap: bool):
+    with open(file_path, "rb") as f:
+        if use_mmap:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+    if len(buf) < _PREFIX_LEN or buf[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise CChanException(f"{file_path} is not a chan snapshot file", ErrCode.SNAPSHOT_FORMAT_ERR)
+    version = int(np.frombuffer(buf, dtype=np.uint32, count=1, offset=len(SNAPSHOT_MAGIC))[0])
+    if version != SNAPSHOT_VERSION:
+        raise CChanException(f"snapshot version {version} is not supported (current version {SNAPSHOT_VERSION}), please dump it again", ErrCode.SNAPSHOT_FORMAT_ERR)
+    header_len = int(np.frombuffer(buf, dtype=np.uint64, count=1, offset=len(SNAPSHOT_MAGIC) + 4)[0])
+    data_begin = _PREFIX_LEN + header_len
+    header = json.loads(bytes(buf[_PREFIX_LEN:data_begin]))
+    arrays = {}
+    for meta in header["arrays"]:
+        count = int(np.prod(meta["shape"], dtype=np.int64))
+        arr = np.frombuffer(buf, dtype=np.dtype(meta["dtype"]), count=count, offset=data_begin + meta["offset"])
+        arrays[meta["name"]] = arr.reshape(meta["shape"])
+    return header, arrays
+
+
+@contextmanager
+def _gc_paused():
+    # 一次性创建大量互相引用的对象时，分代GC会反复扫描整个堆
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _link_pre_next(lst: list):
+    pre = None
+    for item in lst:
+        item.pre = pre
+        item.next = None
+        if pre is not None:
+            pre.next = item
+        pre = item
+
+
+class CChanSnapshot:
+    @staticmethod
+    def dump(chan: 'CChan', file_path):
+        with _gc_paused():
+            CChanSnapshot.do_dump(chan, file_path)
+
+    @staticmethod
+    def load(file_path, use_mmap=True) -> 'CChan':
+        with _gc_paused():
+            return CChanSnapshot.do_load(file_path, use_mmap)
+
+    @staticmethod
+    def do_dump(chan: 'CChan', file_path):
+        if len(chan.lv_list) > MAX_LV_CNT:
+            raise CChanException(f"snapshot supports at most {MAX_LV_CNT} levels", ErrCode.SNAPSHOT_FORMAT_ERR)
+        arrays: Dict[str, np.ndarray] = {}
+        dumpers: List[CLevelDumper] = []
+        levels = []
+        sup_pos: Dict[int, int] = {id(None): -1}
+        for lv_idx, lv in enumerate(chan.lv_list):
+            dumper = CLevelDumper(lv_idx, chan.kl_datas[lv], sup_pos)
+            levels.append(dumper.dump())
+            arrays.update(dumper.arrays)
+            dumpers.append(dumper)
+            sup_pos = dumper.klu_pos
+        chan_attrs = {name: value for name, value in chan.__dict__.items() if name not in ("kl_datas", "g_kl_iter")}
+        buf = io.BytesIO()
+        pid_dict: Dict[int, int] = {}
+        for dumper in dumpers:
+            pid_dict.update(dumper.pid_items())
+        _SnapshotPickler(buf, pid_dict, dumpers).dump({"chan": chan_attrs, "levels": levels})
+        arrays["residual"] = np.frombuffer(buf.getbuffer(), dtype=np.uint8)
+        header = {
+            "code": str(chan.code),
+            "lv_list": [lv.name for lv in chan.lv_list],
+            "table_cnt": [[len(dumper.tables[kind]) for kind in range(KIND_CNT)] for dumper in dumpers],
+            "table_meta": [dumper.table_meta for dumper in dumpers],
+        }
+        _write_file(file_path, header, arrays)
+
+    @staticmethod
+    def do_load(file_path, use_mmap: bool) -> 'CChan':
+        from Chan import CChan
+
+        header, arrays = _read_file(file_path, use_mmap)
+        lv_list = [KL_TYPE[name] for name in header["lv_list"]]
+        obj_tables: List[List[list]] = [[[] for _ in range(MAX_LV_CNT)] for _ in range(KIND_CNT)]
+        stores: List[CKLine_Store] = []
+        for lv_idx, (lv, table_cnt) in enumerate(zip(lv_list, header["table_cnt"])):
+            store = CChanSnapshot.load_store(arrays, lv_idx)
+            stores.append(store)
+            klc_lst = [CKLine.__new__(CKLine) for _ in range(len(arrays[f"lv{lv_idx}.klc.idx"]))]
+            klu_lst = CChanSnapshot.load_klu(arrays, lv_idx, lv, store, klc_lst)
+            CChanSnapshot.load_klc(arrays, lv_idx, lv, klu_lst, klc_lst)
+            obj_tables[KIND_KLU][lv_idx] = klu_lst
+            obj_tables[KIND_KLC][lv_idx] = klc_lst
+            if lv_idx > 0:
+                CChanSnapshot.link_parent(obj_tables[KIND_KLU][lv_idx-1], klu_lst, arrays[f"lv{lv_idx}.klu.sup"])
+            for kind, cls in TABLE_CLASS.items():
+                obj_tables[kind][lv_idx] = [cls.__new__(cls) for _ in range(table_cnt[kind])]
+
+        # 对象都已建好，反序列化时引用直接指向表里的对象
+        residual = _SnapshotUnpickler(io.BytesIO(arrays["residual"]), obj_tables).load()
+
+        chan = CChan.__new__(CChan)
+        chan.__dict__.update(residual["chan"])
+        chan.g_kl_iter = defaultdict(list)
+        chan.kl_datas = {}
+        for lv_idx, (lv, level) in enumerate(zip(lv_list, residual["levels"])):
+            store = stores[lv_idx]
+            store.trend_columns = level["store"]["trend_columns"]
+            store.demark = level["store"]["demark"]
+            kl_list = CKLine_List.__new__(CKLine_List)
+            kl_list.__dict__.update(level["kl_list"])
+            kl_list.lst = obj_tables[KIND_KLC][lv_idx]
+            kl_list.kl_store = store
+            kl_list.live_snapshot = None
+            for kind, extra in level["extra"].items():
+                CChanSnapshot.load_table(arrays, lv_idx, kind, kl_list, header["table_meta"][lv_idx][TABLE_NAME[kind]], obj_tables, extra)
+            for kind in [KIND_BI, KIND_SEG, KIND_SEGSEG]:
+                _link_pre_next(obj_tables[kind][lv_idx])
+            chan.kl_datas[lv] = kl_list
+        return chan
+
+    @staticmethod
+    def load_table(arrays: Dict[str, np.ndarray], lv_idx: int, kind: int, kl_list: CKLine_List, meta: dict, obj_tables: List[List[list]], extra: Dict[int, dict]):
+        # CLevelDumper.dump_table的逆过程：逐列解码后回填属性，再用residual里的值覆盖
+        lst = obj_tables[kind][lv_idx]
+        prefix = f"lv{lv_idx}.{TABLE_NAME[kind]}."
+        for name, codec, arg in TABLE_SPEC[kind]:
+            col = prefix + name
+            if codec == "ref":
+                table = obj_tables[arg][lv_idx]
+                values = [table[pos] if pos >= 0 else None for pos in arrays[col].tolist()]
+            elif codec == "reflist":
+                table = obj_tables[arg][lv_idx]
+                values = _split([table[pos] if pos >= 0 else None for pos in arrays[col + ".item"].tolist()], arrays[col + ".len"])
+            elif codec == "view":
+                line_list = getattr(kl_list, arg)
+                values = [CListView(line_list, begin, end) if begin >= 0 else [] for begin, end in zip(arrays[col + ".begin"].tolist(), arrays[col + ".end"].tolist())]
+            elif codec == "int":
+                values = [None if value == INT_NONE else value for value in arrays[col].tolist()]
+            elif codec in ("float", "bool"):
+                values = arrays[col].tolist()
+            elif codec == "enum":
+                members = list(arg)
+                values = [members[code] if code >= 0 else None for code in arrays[col].tolist()]
+            elif codec == "enumlist":
+                values = _split(list(map(list(arg).__getitem__, arrays[col + ".item"].tolist())), arrays[col + ".len"])
+            elif codec == "str":
+                values = list(map(meta[name].__getitem__, arrays[col].tolist()))
+            elif codec == "features":
+                lens = arrays[col + ".len"]
+                keys = _split(list(map(meta[name].__getitem__, arrays[col + ".key"].tolist())), lens)
+                values = [CFeatures(zip(key_lst, value_lst)) for key_lst, value_lst in zip(keys, _split(arrays[col + ".value"].tolist(), lens))]
+            elif codec == "trend_line":
+                values = [
+                    _new_trend_line(x, y, slope, side) if side >= 0 else None
+                    for x, y, slope, side in zip(*(arrays[col + suffix].tolist() for suffix in (".x", ".y", ".slope", ".side")))
+                ]
+            else:
+                values = [None] * len(lst) if arg is None else [arg() for _ in lst]
+            for obj, value in zip(lst, values):
+                setattr(obj, name, value)
+        for pos, state in extra.items():
+            obj = lst[pos]
+            for name, value in state.items():
+                if value is not UNSET:
+                    setattr(obj, name, value)
+                elif hasattr(obj, name):
+                    delattr(obj, name)
+
+    @staticmethod
+    def load_store(arrays: Dict[str, np.ndarray], lv_idx: int) -> CKLine_Store:
+        # 列直接引用文件里的只读数组；容量等于行数，追加时扩容或改写已有行之前会复制成可写数组
+        prefix = f"lv{lv_idx}.klu."
+        store = CKLine_Store.__new__(CKLine_Store)
+        store.columns = {
+            name[len(prefix):]: arr for name, arr in arrays.items()
+            if name.startswith(prefix) and name[len(prefix):] not in ("idx", "limit_flag", "sup")
+        }
+        store.size = store.capacity = store.shared_size = len(store.columns["time"])
+        store.time_cache = {}
+        return store
+
+    @staticmethod
+    def load_klu(arrays: Dict[str, np.ndarray], lv_idx: int, lv: KL_TYPE, store: CKLine_Store, klc_lst: List[CKLine]) -> List[CKLine_Unit_View]:
+        prefix = f"lv{lv_idx}."
+        klu_cnt = arrays[prefix + "klc.klu_cnt"]
+        new = CKLine_Unit_View.__new__
+        klu_lst = [new(CKLine_Unit_View) for _ in range(store.size)]
+        klc_of_klu = map(klc_lst.__getitem__, np.repeat(np.arange(len(klc_lst)), klu_cnt).tolist())
+        for row, klu, klc, idx, limit_flag, pre, _next in zip(
+            range(store.size),
+            klu_lst,
+            klc_of_klu,
+            arrays[prefix + "klu.idx"].tolist(),
+            arrays[prefix + "klu.limit_flag"].tolist(),
+            [None] + klu_lst[:-1],
+            klu_lst[1:] + [None],
+        ):
+            klu._store = store
+            klu._row = row
+            klu.kl_type = lv
+            klu.sub_kl_list = []
+            klu.sup_kl = None
+            klu.set_klc(klc)
+            klu.limit_flag = limit_flag
+            klu.pre = pre
+            klu.next = _next
+            klu.set_idx(idx)
+        return klu_lst
+
+    @staticmethod
+    def load_klc(arrays: Dict[str, np.ndarray], lv_idx: int, lv: KL_TYPE, klu_lst: List[CKLine_Unit_View], klc_lst: List[CKLine]):
+        prefix = f"lv{lv_idx}."
+        klu_cnt = arrays[prefix + "klc.klu_cnt"]
+        end = np.cumsum(klu_cnt)
+        begin = end - klu_cnt
+        # 只包含一根K线的klc开始结束时间相同，共用一个CTime
+        rows = np.union1d(begin, end - 1)
+        time_lst = unpack_time_lst(arrays[prefix + "klu.time"][rows], arrays[prefix + "klu.time_auto"][rows])
+        time_begin = map(time_lst.__getitem__, np.searchsorted(rows, begin).tolist())
+        time_end = map(time_lst.__getitem__, np.searchsorted(rows, end - 1).tolist())
+        for klc, _begin, _end, idx, high, low, _dir, fx, t_begin, t_end, pre, _next in zip(
+            klc_lst,
+            begin.tolist(),
+            end.tolist(),
+            arrays[prefix + "klc.idx"].tolist(),
+            arrays[prefix + "klc.high"].tolist(),
+            arrays[prefix + "klc.low"].tolist(),
+            arrays[prefix + "klc.dir"].tolist(),
+            arrays[prefix + "klc.fx"].tolist(),
+            time_begin,
+            time_end,
+            [None] + klc_lst[:-1],
+            klc_lst[1:] + [None],
+        ):
+            klc._CKLine_Combiner__time_begin = t_begin
+            klc._CKLine_Combiner__time_end = t_end
+            klc._CKLine_Combiner__high = high
+            klc._CKLine_Combiner__low = low
+            klc._CKLine_Combiner__lst = klu_lst[_begin:_end]
+            klc._CKLine_Combiner__dir = KLINE_DIR_LST[_dir]
+            klc._CKLine_Combiner__fx = FX_TYPE_LST[fx]
+            klc._CKLine_Combiner__pre = pre
+            klc._CKLine_Combiner__next = _next
+            klc.idx = idx
+            klc.kl_type = lv
+
+    @staticmethod
+    def link_parent(parent_lst: List[CKLine_Unit_View], klu_lst: List[CKLine_Unit_View], sup: np.ndarray):
+        for klu, sup_pos in zip(klu_lst, sup.tolist()):
+            if sup_pos >= 0:
+                parent = parent_lst[sup_pos]
+                klu.sup_kl = parent
+                parent.sub_kl_list.append(klu)
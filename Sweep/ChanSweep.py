@@ -0,0 +1,386 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from Bi.Bi import CBi
+from Bi.BiList import CBiList
+from BuySellPoint.BSPointList import CBSPointList
+from Chan import CChan
+from ChanConfig import BSP_PARA_DEFAULT, CChanConfig
+from Common.CEnum import AUTYPE, DATA_SRC, KL_TYPE, SEG_TYPE
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.CommonStockAPI import CCommonStockApi
+from DataAPI.DataCache import arrays_to_klu, klu_to_arrays
+from KLine.KLine_List import CKLine_List, get_seglist_instance, update_zs_in_seg
+from KLine.KLine_Unit import CKLine_Unit
+from Scanner.ChanScanner import CScanBsp
+from Seg.Seg import CSeg
+from Seg.SegListComm import CSegListComm
+from Snapshot.ChanParallel import can_parallel
+from ZS.ZSList import CZSList
+
+"""
+同一份K线数据、多组CChanConfig的参数扫描：
+配置项按最早影响到的计算阶段分组：
+    load: 数据/指标/K线合并/笔(bi_conf)，笔是在K线合并的过程中逐根算出来的，分型校验还会看到正在合并的下一根K线，所以和K线一起算
+    seg: seg_algo, left_seg_method
+    zs: zs_combine, zs_combine_mode, one_bi_zs, zs_algo
+    bsp: 买卖点参数(BSP_PARA_DEFAULT及带-buy/-sell/-segbuy/-segsell/-seg后缀的参数)
+同一个load分组只加载一次；分组内的配置按(seg, zs, bsp)排序后依次计算，每个配置只从和上一个配置第一个不同的阶段开始重算，
+相同的前缀只算一次；数据只从数据源读取一次，其余load分组从内存里的K线重新加载
+"""
+
+STAGE_LOAD, STAGE_SEG, STAGE_ZS, STAGE_BSP = range(4)
+STAGE_NAME = ("load", "seg", "zs", "bsp")
+SEG_CONF_KEYS = {"seg_algo", "left_seg_method"}
+ZS_CONF_KEYS = {"zs_combine", "zs_combine_mode", "one_bi_zs", "zs_algo"}
+BSP_CONF_SUFFIX = ("-buy", "-sell", "-segbuy", "-segsell", "-seg")
+
+
+def config_stage(key: str) -> int:
+    if key in SEG_CONF_KEYS:
+        return STAGE_SEG
+    if key in ZS_CONF_KEYS:
+        return STAGE_ZS
+    if key in BSP_PARA_DEFAULT or key.endswith(BSP_CONF_SUFFIX):
+        return STAGE_BSP
+    return STAGE_LOAD
+
+
+def config_stage_key(conf: dict) -> Tuple[str, str, str, str]:
+    # 每个阶段一个可比较的key，值相同的配置在该阶段的计算结果相同
+    items: List[list] = [[] for _ in STAGE_NAME]
+    for k, v in conf.items():
+        items[config_stage(k)].append((k, v))
+    return tuple(repr(sorted(stage_items)) for stage_items in items)  # type: ignore[return-value]
+
+
+class CSweepStockApi(CCommonStockApi):
+    # 第一个load分组从数据源读到的K线，其余分组直接从这里构造，不再请求数据源
+    BARS: Dict[Tuple[Any, KL_TYPE], Dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def prepare(cls, code, k_type: KL_TYPE, klu_iter: Iterable[CKLine_Unit]):
+        cls.BARS[(code, k_type)] = klu_to_arrays(list(klu_iter))
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from arrays_to_klu(self.BARS[(self.code, self.k_type)], self.new_klu)
+
+    def SetBasciInfo(self):
+        self.name = str(self.code)
+        self.is_stock = True
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+def recal_from_seg(kl_list: CKLine_List, conf: CChanConfig):
+    for bi in kl_list.bi_list:
+        bi.parent_seg = None
+        bi.set_seg_idx(None)
+        bi.bsp = None
+    kl_list.seg_list = get_seglist_instance(seg_config=conf.seg_conf, lv=SEG_TYPE.BI)
+    kl_list.segseg_list = get_seglist_instance(seg_config=conf.seg_conf, lv=SEG_TYPE.SEG)
+    kl_list.last_sure_seg_start_bi_idx = -1
+    kl_list.last_sure_segseg_start_bi_idx = -1
+    kl_list.zs_list = CZSList(zs_config=conf.zs_conf)
+    kl_list.segzs_list = CZSList(zs_config=conf.zs_conf)
+    kl_list.bs_point_lst = CBSPointList[CBi, CBiList](bs_point_config=conf.bs_point_conf)
+    kl_list.seg_bs_point_lst = CBSPointList[CSeg, CSegListComm](bs_point_config=conf.seg_bs_point_conf)
+    kl_list.bi_list.mark_dirty(0)
+    kl_list.cal_seg_and_zs()
+
+
+def recal_from_zs(kl_list: CKLine_List, conf: CChanConfig):
+    for bi in kl_list.bi_list:
+        bi.bsp = None
+    for seg in list(kl_list.seg_list) + list(kl_list.segseg_list):
+        seg.clear_zs_lst()
+        seg.ele_inside_is_sure = False
+        seg.bsp = None
+    kl_list.zs_list = CZSList(zs_config=conf.zs_conf)
+    kl_list.segzs_list = CZSList(zs_config=conf.zs_conf)
+    kl_list.bs_point_lst = CBSPointList[CBi, CBiList](bs_point_config=conf.bs_point_conf)
+    kl_list.seg_bs_point_lst = CBSPointList[CSeg, CSegListComm](bs_point_config=conf.seg_bs_point_conf)
+    kl_list.zs_list.cal_bi_zs(kl_list.bi_list, kl_list.seg_list)
+    update_zs_in_seg(kl_list.bi_list, kl_list.seg_list, kl_list.zs_list)
+    kl_list.segzs_list.cal_bi_zs(kl_list.seg_list, kl_list.segseg_list)
+    update_zs_in_seg(kl_list.seg_list, kl_list.segseg_list, kl_list.segzs_list)
+    kl_list.seg_bs_point_lst.cal(kl_list.seg_list, kl_list.segseg_list)
+    kl_list.bs_point_lst.cal(kl_list.bi_list, kl_list.seg_list)
+
+
+def recal_from_bsp(kl_list: CKLine_List, conf: CChanConfig):
+    for bi in kl_list.bi_list:
+        bi.bsp = None
+    for seg in list(kl_list.seg_list) + list(kl_list.segseg_list):
+        seg.bsp = None
+    kl_list.bs_point_lst = CBSPointList[CBi, CBiList](bs_point_config=conf.bs_point_conf)
+    kl_list.seg_bs_point_lst = CBSPointList[CSeg, CSegListComm](bs_point_config=conf.seg_bs_point_conf)
+    kl_list.seg_bs_point_lst.cal(kl_list.seg_list, kl_list.segseg_list)
+    kl_list.bs_point_lst.cal(kl_list.bi_list, kl_list.seg_list)
+
+
+RECAL_FUNC = {STAGE_SEG: recal_from_seg, STAGE_ZS: recal_from_zs, STAGE_BSP: recal_from_bsp}
+
+
+class CSweepResult:
+    def __init__(self, idx: int, conf: dict):
+        self.idx = idx  # 在输入配置列表中的位置
+        self.conf = conf
+        self.bsp_lst: List[CScanBsp] = []  # 最高级别的买卖点，从新到旧
+        self.extra: Any = None  # result_func的返回值
+        self.recal_stage: Optional[str] = None  # 从哪个阶段开始重算的
+        self.error: Optional[str] = None
+        self.errcode: Optional[int] = None
+        self.cost = 0.0  # 重算和提取结果的耗时(秒)，不包括共用的前缀
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def set_error(self, e: Exception):
+        if isinstance(e, CChanException):
+            self.error, self.errcode = str(e.msg), e.errcode
+        else:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "conf": self.conf,
+            "bsp": [{"type": bsp.type, "is_buy": bsp.is_buy, "time": str(bsp.time), "price": bsp.price} for bsp in self.bsp_lst],
+            "extra": self.extra,
+            "recal_stage": self.recal_stage,
+            "error": self.error,
+            "cost": self.cost,
+        }
+
+
+class CSweepRunner:
+    # 一个load分组的CChan，以及当前的计算结果对应哪组阶段key
+    def __init__(self, chan: CChan, stage_key: tuple):
+        self.chan = chan
+        self.stage_key: Optional[tuple] = stage_key
+
+    def goto(self, stage_key: tuple, conf: CChanConfig) -> Optional[int]:
+        # 从第一个不同的阶段开始重算，返回重算的阶段，完全相同时返回None
+        if self.stage_key is None:
+            stage = STAGE_SEG
+        else:
+            stage = next((stage for stage in (STAGE_SEG, STAGE_ZS, STAGE_BSP) if stage_key[stage] != self.stage_key[stage]), None)
+            if stage is None:
+                return None
+        self.stage_key = None  # 中途出错时，下一个配置从头重算
+        self.chan.conf = conf
+        for lv in self.chan.lv_list:
+            kl_list = self.chan[lv]
+            kl_list.config = conf
+            RECAL_FUNC[stage](kl_list, conf)
+        self.stage_key = stage_key
+        return stage
+
+
+def load_chan(para: dict, conf: CChanConfig, data_src) -> CChan:
+    return CChan(
+        code=para["code"],
+        begin_time=para["begin_time"],
+        end_time=para["end_time"],
+        data_src=data_src,
+        lv_list=para["lv_list"],
+        config=conf,
+        autype=para["autype"],
+    )
+
+
+def run_leaf_lst(runner: Optional[CSweepRunner], leaf_lst: List[Tuple[tuple, int, dict]], para: dict) -> Tuple[List[CSweepResult], Dict[str, int]]:
+    # leaf_lst: 同一个load分组内按阶段key排好序的(阶段key, 配置下标, 配置)；runner为None时先从内存里的K线加载
+    res_lst: List[CSweepResult] = []
+    recal_cnt = {name: 0 for name in STAGE_NAME}
+    if runner is None:
+        stage_key, _, conf = leaf_lst[0]
+        try:
+            chan_conf = CChanConfig(dict(conf))
+            chan_conf.data_cache_dir, chan_conf.kl_prefetch = None, False  # K线已经在内存里了
+            runner = CSweepRunner(load_chan(para, chan_conf, CSweepStockApi), stage_key)
+            recal_cnt["load"] += 1
+        except Exception as e:
+            for _, idx, conf in leaf_lst:
+                res = CSweepResult(idx, conf)
+                res.set_error(e)
+                res_lst.append(res)
+            return res_lst, recal_cnt
+    for stage_key, idx, conf in leaf_lst:
+        res = CSweepResult(idx, conf)
+        begin = time.perf_counter()
+        try:
+            stage = runner.goto(stage_key, CChanConfig(dict(conf)))
+            if stage is not None:
+                res.recal_stage = STAGE_NAME[stage]
+                recal_cnt[res.recal_stage] += 1
+            res.bsp_lst = [CScanBsp(bsp) for bsp in runner.chan[0].bs_point_lst.get_latest_bsp(para["bsp_number"])]
+            if para["result_func"] is not None:
+                res.extra = para["result_func"](runner.chan)
+        except Exception as e:
+            res.set_error(e)
+        res.cost = time.perf_counter() - begin
+        res_lst.append(res)
+    return res_lst, recal_cnt
+
+
+_worker_para: Optional[dict] = None
+_FORK_RUNNER: Optional[CSweepRunner] = None  # 第一个load分组，主进程加载好之后fork，子进程直接继承
+
+
+def _init_worker(para: dict):
+    global _worker_para
+    _worker_para = para
+
+
+def _sweep_task(use_fork_runner: bool, leaf_lst: List[Tuple[tuple, int, dict]]) -> Tuple[List[CSweepResult], Dict[str, int]]:
+    assert _worker_para is not None
+    return run_leaf_lst(_FORK_RUNNER if use_fork_runner else None, leaf_lst, _worker_para)
+
+
+class CChanSweep:
+    """
+    参数扫描：同一只股票同一份K线，批量计算多组配置(dict，同CChanConfig的参数)，只支持非逐步模式
+    第一个load分组在主进程里加载(同时缓存K线)，它的配置按线段/中枢/买卖点分成足够多的块，和其余load分组一起分给fork出来的子进程；
+    每个配置的结果和单独用这组配置计算CChan一致，与进程数无关；sweep()返回的列表按输入配置顺序排列
+    """
+    def __init__(
+        self,
+        code,
+        config_list: Iterable[dict],
+        data_src=DATA_SRC.BAO_STOCK,
+        lv_list: Optional[List[KL_TYPE]] = None,
+        begin_time=None,
+        end_time=None,
+        autype: AUTYPE = AUTYPE.QFQ,
+        max_workers: Optional[int] = None,
+        bsp_number: int = 0,
+        result_func: Optional[Callable[[CChan], Any]] = None,
+    ):
+        self.conf_list: List[dict] = [dict(conf) for conf in config_list]
+        self.para = {
+            "code": code,
+            "data_src": data_src,
+            "lv_list": lv_list if lv_list is not None else [KL_TYPE.K_DAY],
+            "begin_time": begin_time,
+            "end_time": end_time,
+            "autype": autype,
+            "bsp_number": bsp_number,  # 返回最高级别最新的多少个买卖点，0表示全部
+            "result_func": result_func,  # 对每组配置算好的CChan做额外提取，返回值必须可以pickle；并行时在子进程中调用，必须是模块级函数
+        }
+        self.max_workers = max_workers  # None表示cpu个数，<=1时在当前进程中顺序计算
+        self.recal_cnt = {name: 0 for name in STAGE_NAME}  # 各阶段实际计算的次数
+        self.error_cnt = 0
+        self.elapsed = 0.0
+
+    def group_leaf(self, res_lst: List[Optional[CSweepResult]]) -> Dict[str, List[Tuple[tuple, int, dict]]]:
+        # 按load分组，组内按阶段key排序；非法配置直接记录错误
+        group_dict: Dict[str, List[Tuple[tuple, int, dict]]] = {}
+        for idx, conf in enumerate(self.conf_list):
+            try:
+                if CChanConfig(dict(conf)).trigger_step:
+                    raise CChanException("参数扫描不支持trigger_step", ErrCode.PARA_ERROR)
+            except Exception as e:
+                res_lst[idx] = CSweepResult(idx, conf)
+                res_lst[idx].set_error(e)  # type: ignore[union-attr]
+                continue
+            stage_key = config_stage_key(conf)
+            group_dict.setdefault(stage_key[STAGE_LOAD], []).append((stage_key, idx, conf))
+        for leaf_lst in group_dict.values():
+            leaf_lst.sort(key=lambda leaf: (leaf[0][STAGE_SEG:], leaf[1]))
+        return group_dict
+
+    def worker_cnt(self) -> int:
+        if self.max_workers is None:
+            return os.cpu_count() or 1
+        return self.max_workers
+
+    def split_task(self, first_leaf_lst: List[Tuple[tuple, int, dict]], other_leaf_lst: List[List[Tuple[tuple, int, dict]]]) -> List[Tuple[bool, list]]:
+        # 其余load分组每组一个任务；第一个分组按尽量浅的阶段切块，使任务数不少于进程数
+        target_cnt = max(self.worker_cnt() - len(other_leaf_lst), 1)
+        chunk_lst: List[list] = []
+        for stage in (STAGE_SEG, STAGE_ZS, STAGE_BSP):
+            chunk_lst = [list(chunk) for _, chunk in groupby(first_leaf_lst, key=lambda leaf: leaf[0][STAGE_SEG:stage+1])]
+            if len(chunk_lst) >= target_cnt:
+                break
+        return [(True, chunk) for chunk in chunk_lst] + [(False, leaf_lst) for leaf_lst in other_leaf_lst]
+
+    def load_first(self, group_lst: List[List[Tuple[tuple, int, dict]]], para: dict, res_lst: List[Optional[CSweepResult]]) -> Optional[Tuple[CSweepRunner, list]]:
+        # 从数据源加载第一个能加载的分组，并把K线缓存到内存里；加载失败时用只包含load阶段参数的配置再试一次(可能是后面阶段的参数互相冲突)
+        for leaf_lst in sorted(group_lst, key=lambda leaf_lst: min(leaf[1] for leaf in leaf_lst)):
+            conf = leaf_lst[0][2]
+            load_conf = {k: v for k, v in conf.items() if config_stage(k) == STAGE_LOAD}
+            for try_conf in [conf, load_conf]:
+                try:
+                    chan = load_chan(para, CChanConfig(dict(try_conf)), para["data_src"])
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                for _, idx, conf in leaf_lst:
+                    res_lst[idx] = CSweepResult(idx, conf)
+                    res_lst[idx].set_error(error)  # type: ignore[union-attr]
+                continue
+            self.recal_cnt["load"] += 1
+            for lv in chan.lv_list:
+                CSweepStockApi.prepare(para["code"], lv, chan[lv].klu_iter())
+            para["lv_list"] = chan.lv_list  # 去掉了自动跳过的级别
+            return CSweepRunner(chan, config_stage_key(try_conf)), leaf_lst
+        return None
+
+    def sweep(self) -> List[CSweepResult]:
+        global _FORK_RUNNER
+        begin = time.perf_counter()
+        self.recal_cnt = {name: 0 for name in STAGE_NAME}
+        res_lst: List[Optional[CSweepResult]] = [None for _ in self.conf_list]
+        group_dict = self.group_leaf(res_lst)
+        para = dict(self.para)
+        first = self.load_first(list(group_dict.values()), para, res_lst)
+        if first is not None:
+            runner, first_leaf_lst = first
+            other_leaf_lst = [leaf_lst for leaf_lst in group_dict.values() if leaf_lst is not first_leaf_lst and res_lst[leaf_lst[0][1]] is None]
+            task_lst = self.split_task(first_leaf_lst, other_leaf_lst)
+            if self.worker_cnt() <= 1 or len(task_lst) <= 1 or not can_parallel():
+                output_lst = [run_leaf_lst(runner if use_fork_runner else None, leaf_lst, para) for use_fork_runner, leaf_lst in task_lst]
+            else:
+                _FORK_RUNNER = runner
+                try:
+                    with ProcessPoolExecutor(
+                        max_workers=min(self.worker_cnt(), len(task_lst)),
+                        mp_context=multiprocessing.get_context("fork"),
+                        initializer=_init_worker,
+                        initargs=(para,),
+                    ) as executor:
+                        output_lst = list(executor.map(_sweep_task, *zip(*task_lst)))
+                finally:
+                    _FORK_RUNNER = None
+            for task_res_lst, recal_cnt in output_lst:
+                for res in task_res_lst:
+                    res_lst[res.idx] = res
+                for name, cnt in recal_cnt.items():
+                    self.recal_cnt[name] += cnt
+        self.error_cnt = sum(not res.ok for res in res_lst if res is not None)
+        self.elapsed = time.perf_counter() - begin
+        return [res for res in res_lst if res is not None]
+
+    def stat(self) -> Dict[str, Any]:
+        return {
+            "total": len(self.conf_list),
+            "error": self.error_cnt,
+            "elapsed": self.elapsed,
+            "configs_per_sec": len(self.conf_list) / self.elapsed if self.elapsed > 0 else 0.0,
+            "recal_cnt": dict(self.recal_cnt),
+        }
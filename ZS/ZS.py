@@ -1,9 +1,11 @@
-from typing import Generic, List, Optional, TypeVar
+from typing import Generic, List, Optional, Sequence, TypeVar
 
 from Bi.Bi import CBi
 from BuySellPoint.BSPointConfig import CPointConfig
+from Common.cache import reset_cache
 from Common.ChanException import CChanException, ErrCode
 from Common.func_util import has_overlap
+from Common.state_util import get_slots_state, set_slots_state
 from KLine.KLine_Unit import CKLine_Unit
 from Seg.Seg import CSeg
 
@@ -11,6 +13,11 @@ LINE_TYPE = TypeVar('LINE_TYPE', CBi, "CSeg")
 
 
 class CZS(Generic[LINE_TYPE]):
+    __slots__ = (
+        "__is_sure", "__sub_zs_lst", "__begin", "__begin_bi", "__end", "__end_bi", "__low", "__high", "__mid",
+        "__peak_high", "__peak_low", "__bi_in", "__bi_out", "__bi_lst",
+    )
+
     def __init__(self, lst: Optional[List[LINE_TYPE]], is_sure=True):
         # begin/end：永远指向 klu
         # low/high: 中枢的范围
@@ -39,10 +46,13 @@ class CZS(Generic[LINE_TYPE]):
         self.__bi_in: Optional[LINE_TYPE] = None  # 进中枢那一笔
         self.__bi_out: Optional[LINE_TYPE] = None  # 出中枢那一笔
 
-        self.__bi_lst: List[LINE_TYPE] = []  # begin_bi~end_bi之间的笔，在update_zs_in_seg函数中更新
+        self.__bi_lst: Sequence[LINE_TYPE] = []  # begin_bi~end_bi之间的笔(笔列表上的CListView)，在update_zs_in_seg函数中更新
+
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
 
     def clean_cache(self):
-        self._memoize_cache = {}
+        reset_cache(self)
 
     @property
     def is_sure(self): return self.__is_sure
@@ -1,4 +1,4 @@
-from typing import List, Union, overload
+from typing import Dict, List, Tuple, Union, overload
 
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
@@ -20,6 +20,13 @@ class CZSList:
         self.last_sure_pos = -1
         self.last_seg_idx = 0
 
+        # zs_algo=normal时按线段缓存上次算出的中枢：线段起点idx -> (线段末笔, 线段指纹, 中枢列表)
+        self.seg_zs_cache: Dict[int, Tuple[object, tuple, List[CZS]]] = {}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("seg_zs_cache", {})  # 旧版本pickle没有这个属性
+
     def update_last_pos(self, seg_list: CSegListComm):
         self.last_sure_pos = -1
         self.last_seg_idx = 0
@@ -59,9 +66,11 @@ class CZSList:
     def try_add_to_end(self, bi):
         return False if len(self.zs_lst) == 0 else self[-1].try_add_to_end(bi)
 
-    def add_zs_from_bi_range(self, seg_bi_lst: list, seg_dir, seg_is_sure):
+    def add_zs_from_bi_range(self, bi_lst: Union[CBiList, CSegListComm], begin: int, end: int, seg_dir, seg_is_sure):
+        # 处理bi_lst[begin:end]，按下标遍历，不复制切片
         deal_bi_cnt = 0
-        for bi in seg_bi_lst:
+        for bi_idx in range(begin, end):
+            bi = bi_lst[bi_idx]
             if bi.dir == seg_dir:
                 continue
             if deal_bi_cnt < 1:  # 防止try_add_to_end执行到上一个线段的中枢里面去
@@ -92,23 +101,24 @@ class CZSList:
         while self.zs_lst and self.zs_lst[-1].begin_bi.idx >= self.last_sure_pos:
             self.zs_lst.pop()
         if self.config.zs_algo == "normal":
-            for seg in seg_lst[self.last_seg_idx:]:
+            seg_zs_cache = {}
+            for seg_idx in range(self.last_seg_idx, len(seg_lst)):
+                seg = seg_lst[seg_idx]
                 if not self.seg_need_cal(seg):
                     continue
-                self.clear_free_lst()
-                seg_bi_lst = bi_lst[seg.start_bi.idx:seg.end_bi.idx+1]
-                self.add_zs_from_bi_range(seg_bi_lst, seg.dir, seg.is_sure)
+                seg_zs_cache[seg.start_bi.idx] = self.add_zs_from_seg(bi_lst, seg)
+            self.seg_zs_cache = seg_zs_cache
 
             # 处理未生成新线段的部分
             if len(seg_lst):
                 self.clear_free_lst()
-                self.add_zs_from_bi_range(bi_lst[seg_lst[-1].end_bi.idx+1:], revert_bi_dir(seg_lst[-1].dir), False)
+                self.add_zs_from_bi_range(bi_lst, seg_lst[-1].end_bi.idx+1, len(bi_lst), revert_bi_dir(seg_lst[-1].dir), False)
         elif self.config.zs_algo == "over_seg":
             assert self.config.one_bi_zs is False
             self.clear_free_lst()
             begin_bi_idx = self.zs_lst[-1].end_bi.idx+1 if self.zs_lst else 0
-            for bi in bi_lst[begin_bi_idx:]:
-                self.update_overseg_zs(bi)
+            for bi_idx in range(begin_bi_idx, len(bi_lst)):
+                self.update_overseg_zs(bi_lst[bi_idx])
         elif self.config.zs_algo == "auto":
             sure_seg_appear = False
             exist_sure_seg = seg_lst.exist_sure_seg()
@@ -119,16 +129,33 @@ class CZSList:
                     continue
                 if seg.is_sure or (not sure_seg_appear and exist_sure_seg):
                     self.clear_free_lst()
-                    self.add_zs_from_bi_range(bi_lst[seg.start_bi.idx:seg.end_bi.idx+1], seg.dir, seg.is_sure)
+                    self.add_zs_from_bi_range(bi_lst, seg.start_bi.idx, seg.end_bi.idx+1, seg.dir, seg.is_sure)
                 else:
                     self.clear_free_lst()
-                    for bi in bi_lst[seg.start_bi.idx:]:
-                        self.update_overseg_zs(bi)
+                    for bi_idx in range(seg.start_bi.idx, len(bi_lst)):
+                        self.update_overseg_zs(bi_lst[bi_idx])
                     break
         else:
             raise Exception(f"unknown zs_algo {self.config.zs_algo}")
         self.update_last_pos(seg_lst)
 
+    def add_zs_from_seg(self, bi_lst: Union[CBiList, CSegListComm], seg: CSeg):
+        """
+        笔只会在列表尾部被修改/删除(修改倒数第二笔之前一定会先删掉最后一笔)，
+        所以线段末笔还是同一个对象且没有变化时，线段内的笔都没变，上次在这个线段里算出的中枢可以直接复用；
+        线段内的中枢只由线段内的笔构造，不会和其他线段的中枢合并
+        """
+        end_bi = seg.end_bi
+        fingerprint = (seg.end_bi.idx, seg.dir, seg.is_sure, end_bi.is_sure, end_bi.get_end_klu().idx, end_bi._high(), end_bi._low())
+        cache = self.seg_zs_cache.get(seg.start_bi.idx)
+        if cache is not None and cache[0] is end_bi and cache[1] == fingerprint:
+            self.zs_lst.extend(cache[2])
+            return cache
+        self.clear_free_lst()
+        zs_begin = len(self.zs_lst)
+        self.add_zs_from_bi_range(bi_lst, seg.start_bi.idx, seg.end_bi.idx+1, seg.dir, seg.is_sure)
+        return end_bi, fingerprint, self.zs_lst[zs_begin:]
+
     def update_overseg_zs(self, bi: CBi | CSeg):
         if len(self.zs_lst) and len(self.free_item_lst) == 0:
             if bi.next is None:
@@ -162,6 +162,12 @@ try:
 except ImportError:
     from DataAPI.CommonStockAPI import CCommonStockApi
 
+# 导入批量扫描类
+try:
+    from .Scanner.ChanScanner import CChanScanner, CScanResult
+except ImportError:
+    from Scanner.ChanScanner import CChanScanner, CScanResult
+
 # 导入工具函数
 try:
     from .Common.func_util import (
@@ -247,6 +253,10 @@ __all__ = [
     # 数据API
     "CCommonStockApi",
     
+    # 批量扫描
+    "CChanScanner",
+    "CScanResult",
+    
     # 工具函数
     "check_kltype_order",
     "kltype_lte_day",